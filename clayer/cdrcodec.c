@@ -0,0 +1,1239 @@
+/*
+ * Copyright(c) 2021 to 2022 ZettaScale Technology and others
+ *
+ * This program and the accompanying materials are made available under the
+ * terms of the Eclipse Public License v. 2.0 which is available at
+ * http://www.eclipse.org/legal/epl-2.0, or the Eclipse Distribution License
+ * v. 1.0 which is available at
+ * http://www.eclipse.org/org/documents/edl-v10.php.
+ *
+ * SPDX-License-Identifier: EPL-2.0 OR BSD-3-Clause
+ */
+
+#include "cdrcodec.h"
+#include <string.h>
+#include <math.h>
+#include <float.h>
+
+/// The codec is a flattened version of the python machine tree (cyclonedds/idl/_machinery.py). The op list is a
+/// pre-order walk of the tree: composite ops are directly followed by the ops of their children, and carry the
+/// number of ops in their subtree in `size` where a child may need to be skipped (empty sequences, absent optionals).
+/// Any error, including constructs in the data that the codec does not handle, raises a python exception and the
+/// python side falls back to the machines.
+
+#define CDR_CODEC_CAPSULE "cyclonedds._clayer.cdr_codec"
+
+static inline size_t ALIGN(size_t x, size_t val)
+{
+    return ((x + (val - 1)) & ~(val - 1));
+}
+
+static inline bool native_little_endian(void)
+{
+    const uint16_t one = 1;
+    return *((const uint8_t*) &one) == 1;
+}
+
+typedef union cdr_codec_scalar_u
+{
+    int8_t i8;
+    int16_t i16;
+    int32_t i32;
+    int64_t i64;
+    uint8_t u8;
+    uint16_t u16;
+    uint32_t u32;
+    uint64_t u64;
+    float f;
+    double d;
+}
+cdr_codec_scalar;
+
+typedef struct cdr_codec_writer_s
+{
+    // When target is set buf is the storage of that bytearray
+    PyObject* target;
+    uint8_t* buf;
+    size_t pos;
+    size_t size;
+    size_t origin;
+    uint32_t align_max;
+    bool swap;
+}
+cdr_codec_writer;
+
+typedef struct cdr_codec_reader_s
+{
+    const uint8_t* buf;
+    size_t pos;
+    size_t size;
+    size_t origin;
+    uint32_t align_max;
+    bool swap;
+    // The object the data was taken from and a byte view on it, created when the
+    // first bytes member decoded as a memoryview slice is encountered
+    PyObject* source;
+    PyObject* view;
+}
+cdr_codec_reader;
+
+
+/* Writer */
+
+static int w_resize(cdr_codec_writer* w, size_t nsize)
+{
+    if (w->target != NULL) {
+        // Fails if the bytearray is exported (e.g. a memoryview of it is still alive)
+        if (PyByteArray_Resize(w->target, (Py_ssize_t) nsize) < 0) return -1;
+        w->buf = (uint8_t*) PyByteArray_AS_STRING(w->target);
+        memset(w->buf + w->size, 0, nsize - w->size);
+    } else {
+        uint8_t* nbuf = (uint8_t*) PyMem_Realloc(w->buf, nsize);
+        if (nbuf == NULL) {
+            PyErr_NoMemory();
+            return -1;
+        }
+        w->buf = nbuf;
+    }
+    w->size = nsize;
+    return 0;
+}
+
+static int w_reserve(cdr_codec_writer* w, size_t n)
+{
+    if (w->pos + n <= w->size) return 0;
+
+    size_t nsize = w->size ? w->size : 256;
+    while (nsize < w->pos + n) nsize *= 2;
+    return w_resize(w, nsize);
+}
+
+static int w_align(cdr_codec_writer* w, size_t align)
+{
+    if (align > w->align_max) align = w->align_max;
+    if (align <= 1) return 0;
+
+    size_t npos = ALIGN(w->pos - w->origin, align) + w->origin;
+    if (w_reserve(w, npos - w->pos) < 0) return -1;
+    memset(w->buf + w->pos, 0, npos - w->pos);
+    w->pos = npos;
+    return 0;
+}
+
+static int w_bytes(cdr_codec_writer* w, const void* src, size_t n)
+{
+    if (w_reserve(w, n) < 0) return -1;
+    memcpy(w->buf + w->pos, src, n);
+    w->pos += n;
+    return 0;
+}
+
+static int w_scalar(cdr_codec_writer* w, const void* src, size_t n)
+{
+    if (w_reserve(w, n) < 0) return -1;
+    if (w->swap) {
+        for (size_t i = 0; i < n; ++i)
+            w->buf[w->pos + i] = ((const uint8_t*) src)[n - 1 - i];
+    } else {
+        memcpy(w->buf + w->pos, src, n);
+    }
+    w->pos += n;
+    return 0;
+}
+
+static int w_u32(cdr_codec_writer* w, uint32_t value)
+{
+    if (w_align(w, 4) < 0) return -1;
+    return w_scalar(w, &value, 4);
+}
+
+static void w_u32_at(cdr_codec_writer* w, size_t pos, uint32_t value)
+{
+    size_t cpos = w->pos;
+    w->pos = pos;
+    // Space was reserved when the placeholder was written
+    (void) w_scalar(w, &value, 4);
+    w->pos = cpos;
+}
+
+
+/* Reader */
+
+static int r_underflow(void)
+{
+    PyErr_SetString(PyExc_ValueError, "CDR stream is too short.");
+    return -1;
+}
+
+static PyObject* r_view_slice(cdr_codec_reader* r, size_t len)
+{
+    if (r->view == NULL) {
+        if (r->source == NULL) {
+            PyErr_SetString(PyExc_TypeError, "Data does not support memoryview slices.");
+            return NULL;
+        }
+        PyObject* view = PyMemoryView_FromObject(r->source);
+        if (view == NULL) return NULL;
+        const Py_buffer* b = PyMemoryView_GET_BUFFER(view);
+        if (b->itemsize != 1 || b->ndim != 1) {
+            PyObject* cast = PyObject_CallMethod(view, "cast", "s", "B");
+            Py_DECREF(view);
+            if (cast == NULL) return NULL;
+            view = cast;
+        }
+        r->view = view;
+    }
+    return PySequence_GetSlice(r->view, (Py_ssize_t) r->pos, (Py_ssize_t) (r->pos + len));
+}
+
+static int r_align(cdr_codec_reader* r, size_t align)
+{
+    if (align > r->align_max) align = r->align_max;
+    if (align <= 1) return 0;
+
+    size_t npos = ALIGN(r->pos - r->origin, align) + r->origin;
+    if (npos > r->size) return r_underflow();
+    r->pos = npos;
+    return 0;
+}
+
+static int r_scalar(cdr_codec_reader* r, void* dst, size_t n)
+{
+    if (r->pos + n > r->size) return r_underflow();
+    if (r->swap) {
+        for (size_t i = 0; i < n; ++i)
+            ((uint8_t*) dst)[i] = r->buf[r->pos + n - 1 - i];
+    } else {
+        memcpy(dst, r->buf + r->pos, n);
+    }
+    r->pos += n;
+    return 0;
+}
+
+static int r_u32(cdr_codec_reader* r, uint32_t* value)
+{
+    if (r_align(r, 4) < 0) return -1;
+    return r_scalar(r, value, 4);
+}
+
+
+/* Primitives */
+
+static int encode_primitive(cdr_codec_writer* w, char code, uint8_t align, PyObject* value)
+{
+    cdr_codec_scalar v;
+    size_t size;
+
+    switch (code) {
+        case 'b': case 'h': case 'i': case 'q': {
+            PyObject* index = PyNumber_Index(value);
+            if (index == NULL) return -1;
+            long long x = PyLong_AsLongLong(index);
+            Py_DECREF(index);
+            if (x == -1 && PyErr_Occurred()) return -1;
+
+            if (code == 'b') {
+                if (x < INT8_MIN || x > INT8_MAX) goto overflow;
+                v.i8 = (int8_t) x;
+                size = 1;
+            } else if (code == 'h') {
+                if (x < INT16_MIN || x > INT16_MAX) goto overflow;
+                v.i16 = (int16_t) x;
+                size = 2;
+            } else if (code == 'i') {
+                if (x < INT32_MIN || x > INT32_MAX) goto overflow;
+                v.i32 = (int32_t) x;
+                size = 4;
+            } else {
+                v.i64 = (int64_t) x;
+                size = 8;
+            }
+        }
+        break;
+        case 'B': case 'H': case 'I': case 'Q': {
+            PyObject* index = PyNumber_Index(value);
+            if (index == NULL) return -1;
+            unsigned long long x = PyLong_AsUnsignedLongLong(index);
+            Py_DECREF(index);
+            if (x == (unsigned long long) -1 && PyErr_Occurred()) return -1;
+
+            if (code == 'B') {
+                if (x > UINT8_MAX) goto overflow;
+                v.u8 = (uint8_t) x;
+                size = 1;
+            } else if (code == 'H') {
+                if (x > UINT16_MAX) goto overflow;
+                v.u16 = (uint16_t) x;
+                size = 2;
+            } else if (code == 'I') {
+                if (x > UINT32_MAX) goto overflow;
+                v.u32 = (uint32_t) x;
+                size = 4;
+            } else {
+                v.u64 = (uint64_t) x;
+                size = 8;
+            }
+        }
+        break;
+        case 'f': {
+            double x = PyFloat_AsDouble(value);
+            if (x == -1.0 && PyErr_Occurred()) return -1;
+            if (fabs(x) > FLT_MAX && !isinf(x)) goto overflow;
+            v.f = (float) x;
+            size = 4;
+        }
+        break;
+        case 'd': {
+            double x = PyFloat_AsDouble(value);
+            if (x == -1.0 && PyErr_Occurred()) return -1;
+            v.d = x;
+            size = 8;
+        }
+        break;
+        case '?': {
+            int x = PyObject_IsTrue(value);
+            if (x < 0) return -1;
+            v.u8 = (uint8_t) x;
+            size = 1;
+        }
+        break;
+        default:
+            PyErr_SetString(PyExc_ValueError, "Unknown primitive in CDR codec.");
+            return -1;
+    }
+
+    if (w_align(w, align) < 0) return -1;
+    return w_scalar(w, &v, size);
+
+overflow:
+    PyErr_SetString(PyExc_OverflowError, "Value out of range for CDR primitive.");
+    return -1;
+}
+
+static PyObject* decode_primitive(cdr_codec_reader* r, char code, uint8_t align)
+{
+    cdr_codec_scalar v;
+
+    if (r_align(r, align) < 0) return NULL;
+
+    switch (code) {
+        case 'b':
+            if (r_scalar(r, &v, 1) < 0) return NULL;
+            return PyLong_FromLong(v.i8);
+        case 'h':
+            if (r_scalar(r, &v, 2) < 0) return NULL;
+            return PyLong_FromLong(v.i16);
+        case 'i':
+            if (r_scalar(r, &v, 4) < 0) return NULL;
+            return PyLong_FromLong(v.i32);
+        case 'q':
+            if (r_scalar(r, &v, 8) < 0) return NULL;
+            return PyLong_FromLongLong(v.i64);
+        case 'B':
+            if (r_scalar(r, &v, 1) < 0) return NULL;
+            return PyLong_FromUnsignedLong(v.u8);
+        case 'H':
+            if (r_scalar(r, &v, 2) < 0) return NULL;
+            return PyLong_FromUnsignedLong(v.u16);
+        case 'I':
+            if (r_scalar(r, &v, 4) < 0) return NULL;
+            return PyLong_FromUnsignedLong(v.u32);
+        case 'Q':
+            if (r_scalar(r, &v, 8) < 0) return NULL;
+            return PyLong_FromUnsignedLongLong(v.u64);
+        case 'f':
+            if (r_scalar(r, &v, 4) < 0) return NULL;
+            return PyFloat_FromDouble((double) v.f);
+        case 'd':
+            if (r_scalar(r, &v, 8) < 0) return NULL;
+            return PyFloat_FromDouble(v.d);
+        case '?':
+            if (r_scalar(r, &v, 1) < 0) return NULL;
+            return PyBool_FromLong(v.u8);
+        default:
+            PyErr_SetString(PyExc_ValueError, "Unknown primitive in CDR codec.");
+            return NULL;
+    }
+}
+
+
+/* Encode */
+
+static Py_ssize_t encode_op(const cdr_codec* codec, size_t i, cdr_codec_writer* w, PyObject* value);
+
+static Py_ssize_t encode_struct_members(const cdr_codec* codec, size_t i, cdr_codec_writer* w, PyObject* value)
+{
+    const cdr_codec_op* op = &codec->ops[i];
+    size_t next = i + 1;
+
+    for (uint32_t m = 0; m < op->count; ++m) {
+        if (next >= codec->num_ops || codec->ops[next].type != CdrCodecOpMember) {
+            PyErr_SetString(PyExc_ValueError, "Malformed CDR codec program.");
+            return -1;
+        }
+        PyObject* member = PyObject_GetAttr(value, codec->ops[next].obj);
+        if (member == NULL) return -1;
+        Py_ssize_t n = encode_op(codec, next + 1, w, member);
+        Py_DECREF(member);
+        if (n < 0) return -1;
+        next = (size_t) n;
+    }
+    return (Py_ssize_t) next;
+}
+
+static Py_ssize_t encode_op(const cdr_codec* codec, size_t i, cdr_codec_writer* w, PyObject* value)
+{
+    if (i >= codec->num_ops) {
+        PyErr_SetString(PyExc_ValueError, "Malformed CDR codec program.");
+        return -1;
+    }
+
+    const cdr_codec_op* op = &codec->ops[i];
+    const size_t next = i + 1 + op->size;
+
+    switch (op->type) {
+        case CdrCodecOpPrimitive:
+            if (encode_primitive(w, op->code, op->align, value) < 0) return -1;
+            return (Py_ssize_t) (i + 1);
+
+        case CdrCodecOpChar: {
+            if (!PyUnicode_Check(value) || PyUnicode_GetLength(value) != 1) {
+                PyErr_SetString(PyExc_TypeError, "Expected a single character.");
+                return -1;
+            }
+            Py_UCS4 c = PyUnicode_ReadChar(value, 0);
+            if (c > 127) {
+                PyErr_SetString(PyExc_OverflowError, "Character out of range.");
+                return -1;
+            }
+            uint8_t b = (uint8_t) c;
+            if (w_bytes(w, &b, 1) < 0) return -1;
+            return (Py_ssize_t) (i + 1);
+        }
+
+        case CdrCodecOpString: {
+            if (!PyUnicode_Check(value)) {
+                PyErr_SetString(PyExc_TypeError, "Expected a string.");
+                return -1;
+            }
+            if (op->count && PyUnicode_GetLength(value) > (Py_ssize_t) op->count) {
+                PyErr_SetString(PyExc_ValueError, "String longer than bound.");
+                return -1;
+            }
+            Py_ssize_t len;
+            const char* str = PyUnicode_AsUTF8AndSize(value, &len);
+            if (str == NULL) return -1;
+            if ((size_t) len >= UINT32_MAX) {
+                PyErr_SetString(PyExc_OverflowError, "String too long.");
+                return -1;
+            }
+            const uint8_t nul = 0;
+            if (w_u32(w, (uint32_t) len + 1) < 0) return -1;
+            if (w_bytes(w, str, (size_t) len) < 0) return -1;
+            if (w_bytes(w, &nul, 1) < 0) return -1;
+            return (Py_ssize_t) (i + 1);
+        }
+
+        case CdrCodecOpBytes:
+        case CdrCodecOpByteArray: {
+            Py_buffer view;
+            if (PyObject_GetBuffer(value, &view, PyBUF_SIMPLE) < 0) return -1;
+            int ret = 0;
+            if (op->type == CdrCodecOpBytes) {
+                if ((op->count && view.len > (Py_ssize_t) op->count) || (size_t) view.len > UINT32_MAX) {
+                    PyErr_SetString(PyExc_ValueError, "Bytes longer than bound.");
+                    ret = -1;
+                } else {
+                    ret = w_u32(w, (uint32_t) view.len);
+                }
+            } else if (view.len != (Py_ssize_t) op->count) {
+                PyErr_SetString(PyExc_ValueError, "Incorrectly sized array.");
+                ret = -1;
+            }
+            if (ret == 0) ret = w_bytes(w, view.buf, (size_t) view.len);
+            PyBuffer_Release(&view);
+            if (ret < 0) return -1;
+            return (Py_ssize_t) (i + 1);
+        }
+
+        case CdrCodecOpPrimitiveArray:
+        case CdrCodecOpPrimitiveSequence: {
+            PyObject* seq = PySequence_Fast(value, "Expected a sequence.");
+            if (seq == NULL) return -1;
+            Py_ssize_t len = PySequence_Fast_GET_SIZE(seq);
+            PyObject** items = PySequence_Fast_ITEMS(seq);
+
+            if (op->type == CdrCodecOpPrimitiveArray) {
+                if (len != (Py_ssize_t) op->count) {
+                    PyErr_SetString(PyExc_ValueError, "Incorrectly sized array.");
+                    goto seq_err;
+                }
+            } else {
+                if ((op->count && len > (Py_ssize_t) op->count) || (size_t) len > UINT32_MAX) {
+                    PyErr_SetString(PyExc_ValueError, "Sequence longer than bound.");
+                    goto seq_err;
+                }
+                if (w_u32(w, (uint32_t) len) < 0) goto seq_err;
+            }
+            for (Py_ssize_t j = 0; j < len; ++j) {
+                if (encode_primitive(w, op->code, op->align, items[j]) < 0) goto seq_err;
+            }
+            Py_DECREF(seq);
+            return (Py_ssize_t) (i + 1);
+seq_err:
+            Py_DECREF(seq);
+            return -1;
+        }
+
+        case CdrCodecOpEnum: {
+            PyObject* integer;
+            if (PyLong_CheckExact(value)) {
+                Py_INCREF(value);
+                integer = value;
+            } else {
+                integer = PyObject_GetAttrString(value, "value");
+                if (integer == NULL) return -1;
+            }
+            int ret = encode_primitive(w, op->code, op->align, integer);
+            Py_DECREF(integer);
+            if (ret < 0) return -1;
+            return (Py_ssize_t) (i + 1);
+        }
+
+        case CdrCodecOpBitMask: {
+            PyObject* mask = PyObject_CallMethod(value, "as_mask", NULL);
+            if (mask == NULL) return -1;
+            int ret = encode_primitive(w, op->code, op->align, mask);
+            Py_DECREF(mask);
+            if (ret < 0) return -1;
+            return (Py_ssize_t) (i + 1);
+        }
+
+        case CdrCodecOpStruct:
+            return encode_struct_members(codec, i, w, value);
+
+        case CdrCodecOpAppendable: {
+            if (w_u32(w, 0) < 0) return -1;
+            size_t hpos = w->pos - 4;
+            size_t dpos = w->pos;
+            Py_ssize_t n = encode_op(codec, i + 1, w, value);
+            if (n < 0) return -1;
+            w_u32_at(w, hpos, (uint32_t) (w->pos - dpos));
+            return n;
+        }
+
+        case CdrCodecOpSequence:
+        case CdrCodecOpArray: {
+            PyObject* seq = PySequence_Fast(value, "Expected a sequence.");
+            if (seq == NULL) return -1;
+            Py_ssize_t len = PySequence_Fast_GET_SIZE(seq);
+            PyObject** items = PySequence_Fast_ITEMS(seq);
+            size_t hpos = 0;
+
+            if (op->type == CdrCodecOpArray) {
+                if (len != (Py_ssize_t) op->count) {
+                    PyErr_SetString(PyExc_ValueError, "Incorrectly sized array.");
+                    goto cseq_err;
+                }
+            } else if ((op->count && len > (Py_ssize_t) op->count) || (size_t) len > UINT32_MAX) {
+                PyErr_SetString(PyExc_ValueError, "Sequence longer than bound.");
+                goto cseq_err;
+            }
+
+            if (op->value) {
+                // Delimiter header
+                if (w_u32(w, 0) < 0) goto cseq_err;
+                hpos = w->pos;
+            }
+            if (op->type == CdrCodecOpSequence) {
+                if (w_u32(w, (uint32_t) len) < 0) goto cseq_err;
+            }
+            for (Py_ssize_t j = 0; j < len; ++j) {
+                if (encode_op(codec, i + 1, w, items[j]) < 0) goto cseq_err;
+            }
+            if (op->value) {
+                w_u32_at(w, hpos - 4, (uint32_t) (w->pos - hpos));
+            }
+            Py_DECREF(seq);
+            return (Py_ssize_t) next;
+cseq_err:
+            Py_DECREF(seq);
+            return -1;
+        }
+
+        case CdrCodecOpOptional: {
+            uint8_t present = value != Py_None;
+            if (w_bytes(w, &present, 1) < 0) return -1;
+            if (present && encode_op(codec, i + 1, w, value) < 0) return -1;
+            return (Py_ssize_t) next;
+        }
+
+        case CdrCodecOpDone:
+        case CdrCodecOpMember:
+        default:
+            PyErr_SetString(PyExc_ValueError, "Malformed CDR codec program.");
+            return -1;
+    }
+}
+
+
+/* Decode */
+
+static Py_ssize_t decode_op(const cdr_codec* codec, size_t i, cdr_codec_reader* r, PyObject** out);
+
+static Py_ssize_t decode_struct_members(const cdr_codec* codec, size_t i, cdr_codec_reader* r, PyObject** out)
+{
+    const cdr_codec_op* op = &codec->ops[i];
+    size_t next = i + 1;
+    PyObject* kwargs = PyDict_New();
+    if (kwargs == NULL) return -1;
+
+    for (uint32_t m = 0; m < op->count; ++m) {
+        if (next >= codec->num_ops || codec->ops[next].type != CdrCodecOpMember) {
+            PyErr_SetString(PyExc_ValueError, "Malformed CDR codec program.");
+            goto err;
+        }
+        PyObject* member;
+        Py_ssize_t n = decode_op(codec, next + 1, r, &member);
+        if (n < 0) goto err;
+        int ret = PyDict_SetItem(kwargs, codec->ops[next].obj, member);
+        Py_DECREF(member);
+        if (ret < 0) goto err;
+        next = (size_t) n;
+    }
+
+    PyObject* args = PyTuple_New(0);
+    if (args == NULL) goto err;
+    *out = PyObject_Call(op->obj, args, kwargs);
+    Py_DECREF(args);
+    Py_DECREF(kwargs);
+    if (*out == NULL) return -1;
+    return (Py_ssize_t) next;
+
+err:
+    Py_DECREF(kwargs);
+    return -1;
+}
+
+static PyObject* decode_enum(PyObject* enumtype, PyObject* integer)
+{
+    PyObject* result = PyObject_CallFunctionObjArgs(enumtype, integer, NULL);
+    if (result == NULL && PyErr_ExceptionMatches(PyExc_ValueError)) {
+        // Unknown enumerator, the machines pass the integer on
+        PyErr_Clear();
+        Py_INCREF(integer);
+        result = integer;
+    }
+    Py_DECREF(integer);
+    return result;
+}
+
+static Py_ssize_t decode_op(const cdr_codec* codec, size_t i, cdr_codec_reader* r, PyObject** out)
+{
+    if (i >= codec->num_ops) {
+        PyErr_SetString(PyExc_ValueError, "Malformed CDR codec program.");
+        return -1;
+    }
+
+    const cdr_codec_op* op = &codec->ops[i];
+    const size_t next = i + 1 + op->size;
+
+    switch (op->type) {
+        case CdrCodecOpPrimitive:
+            *out = decode_primitive(r, op->code, op->align);
+            return *out == NULL ? -1 : (Py_ssize_t) (i + 1);
+
+        case CdrCodecOpChar: {
+            int8_t c;
+            if (r_scalar(r, &c, 1) < 0) return -1;
+            if (c < 0) {
+                PyErr_SetString(PyExc_ValueError, "Character out of range.");
+                return -1;
+            }
+            *out = PyUnicode_FromOrdinal(c);
+            return *out == NULL ? -1 : (Py_ssize_t) (i + 1);
+        }
+
+        case CdrCodecOpString: {
+            uint32_t len;
+            if (r_u32(r, &len) < 0) return -1;
+            if (len == 0) {
+                PyErr_SetString(PyExc_ValueError, "Invalid string length.");
+                return -1;
+            }
+            if (r->pos + len > r->size) return r_underflow();
+            *out = PyUnicode_DecodeUTF8((const char*) r->buf + r->pos, (Py_ssize_t) len - 1, NULL);
+            r->pos += len;
+            return *out == NULL ? -1 : (Py_ssize_t) (i + 1);
+        }
+
+        case CdrCodecOpBytes:
+        case CdrCodecOpByteArray: {
+            uint32_t len = op->count;
+            if (op->type == CdrCodecOpBytes && r_u32(r, &len) < 0) return -1;
+            if (r->pos + len > r->size) return r_underflow();
+            if (op->type == CdrCodecOpBytes && op->value)
+                *out = r_view_slice(r, len);
+            else
+                *out = PyBytes_FromStringAndSize((const char*) r->buf + r->pos, (Py_ssize_t) len);
+            r->pos += len;
+            return *out == NULL ? -1 : (Py_ssize_t) (i + 1);
+        }
+
+        case CdrCodecOpPrimitiveArray:
+        case CdrCodecOpPrimitiveSequence: {
+            uint32_t len = op->count;
+            if (op->type == CdrCodecOpPrimitiveSequence && r_u32(r, &len) < 0) return -1;
+            if (len > r->size - r->pos) return r_underflow();
+
+            PyObject* list = PyList_New((Py_ssize_t) len);
+            if (list == NULL) return -1;
+            for (uint32_t j = 0; j < len; ++j) {
+                PyObject* item = decode_primitive(r, op->code, op->align);
+                if (item == NULL) {
+                    Py_DECREF(list);
+                    return -1;
+                }
+                PyList_SET_ITEM(list, (Py_ssize_t) j, item);
+            }
+            *out = list;
+            return (Py_ssize_t) (i + 1);
+        }
+
+        case CdrCodecOpEnum: {
+            PyObject* integer = decode_primitive(r, op->code, op->align);
+            if (integer == NULL) return -1;
+            *out = decode_enum(op->obj, integer);
+            return *out == NULL ? -1 : (Py_ssize_t) (i + 1);
+        }
+
+        case CdrCodecOpBitMask: {
+            PyObject* mask = decode_primitive(r, op->code, op->align);
+            if (mask == NULL) return -1;
+            *out = PyObject_CallMethod(op->obj, "from_mask", "O", mask);
+            Py_DECREF(mask);
+            return *out == NULL ? -1 : (Py_ssize_t) (i + 1);
+        }
+
+        case CdrCodecOpStruct:
+            return decode_struct_members(codec, i, r, out);
+
+        case CdrCodecOpAppendable: {
+            uint32_t len;
+            if (r_u32(r, &len) < 0) return -1;
+            if (len > r->size - r->pos) return r_underflow();
+
+            // Members missing from a shorter (older) version of the type run into the end of
+            // the limited stream, the machines then take care of default initialization.
+            size_t size = r->size;
+            size_t end = r->pos + len;
+            r->size = end;
+            Py_ssize_t n = decode_op(codec, i + 1, r, out);
+            r->size = size;
+            if (n < 0) return -1;
+            r->pos = end;
+            return n;
+        }
+
+        case CdrCodecOpSequence:
+        case CdrCodecOpArray: {
+            uint32_t len = op->count, dheader = 0;
+            size_t hpos = 0;
+
+            if (op->value) {
+                if (r_u32(r, &dheader) < 0) return -1;
+                hpos = r->pos;
+                if (dheader > r->size - hpos) return r_underflow();
+            }
+            if (op->type == CdrCodecOpSequence) {
+                if (r_u32(r, &len) < 0) return -1;
+                if (len > r->size - r->pos) return r_underflow();
+            }
+
+            PyObject* list = PyList_New((Py_ssize_t) len);
+            if (list == NULL) return -1;
+            for (uint32_t j = 0; j < len; ++j) {
+                PyObject* item;
+                if (decode_op(codec, i + 1, r, &item) < 0) {
+                    Py_DECREF(list);
+                    return -1;
+                }
+                PyList_SET_ITEM(list, (Py_ssize_t) j, item);
+            }
+
+            if (op->value) {
+                if (op->type == CdrCodecOpArray && r->pos != hpos + dheader) {
+                    Py_DECREF(list);
+                    PyErr_SetString(PyExc_ValueError, "Array size does not match delimiter header.");
+                    return -1;
+                }
+                r->pos = hpos + dheader;
+            }
+            *out = list;
+            return (Py_ssize_t) next;
+        }
+
+        case CdrCodecOpOptional: {
+            uint8_t present;
+            if (r_scalar(r, &present, 1) < 0) return -1;
+            if (present) {
+                if (decode_op(codec, i + 1, r, out) < 0) return -1;
+            } else {
+                Py_INCREF(Py_None);
+                *out = Py_None;
+            }
+            return (Py_ssize_t) next;
+        }
+
+        case CdrCodecOpDone:
+        case CdrCodecOpMember:
+        default:
+            PyErr_SetString(PyExc_ValueError, "Malformed CDR codec program.");
+            return -1;
+    }
+}
+
+
+/* Python bindings */
+
+/* Skip */
+
+static int primitive_size(char code)
+{
+    switch (code) {
+        case 'b': case 'B': case '?': return 1;
+        case 'h': case 'H': return 2;
+        case 'i': case 'I': case 'f': return 4;
+        case 'q': case 'Q': case 'd': return 8;
+        default:
+            PyErr_SetString(PyExc_ValueError, "Unknown primitive in CDR codec.");
+            return -1;
+    }
+}
+
+static int r_skip(cdr_codec_reader* r, size_t n)
+{
+    if (n > r->size - r->pos) return r_underflow();
+    r->pos += n;
+    return 0;
+}
+
+/// Index of the op following the subtree of op i, without looking at any data
+static Py_ssize_t op_end(const cdr_codec* codec, size_t i)
+{
+    if (i >= codec->num_ops) {
+        PyErr_SetString(PyExc_ValueError, "Malformed CDR codec program.");
+        return -1;
+    }
+
+    const cdr_codec_op* op = &codec->ops[i];
+    switch (op->type) {
+        case CdrCodecOpStruct: {
+            Py_ssize_t next = (Py_ssize_t) (i + 1);
+            for (uint32_t m = 0; m < op->count && next >= 0; ++m)
+                next = op_end(codec, (size_t) next + 1);
+            return next;
+        }
+        case CdrCodecOpAppendable:
+            return op_end(codec, i + 1);
+        default:
+            return (Py_ssize_t) (i + 1 + op->size);
+    }
+}
+
+/// Moves the reader past the value of op i without creating python objects
+static Py_ssize_t skip_op(const cdr_codec* codec, size_t i, cdr_codec_reader* r)
+{
+    if (i >= codec->num_ops) {
+        PyErr_SetString(PyExc_ValueError, "Malformed CDR codec program.");
+        return -1;
+    }
+
+    const cdr_codec_op* op = &codec->ops[i];
+    const size_t next = i + 1 + op->size;
+
+    switch (op->type) {
+        case CdrCodecOpPrimitive:
+        case CdrCodecOpEnum:
+        case CdrCodecOpBitMask: {
+            int size = primitive_size(op->code);
+            if (size < 0 || r_align(r, op->align) < 0 || r_skip(r, (size_t) size) < 0) return -1;
+            return (Py_ssize_t) (i + 1);
+        }
+
+        case CdrCodecOpChar:
+            return r_skip(r, 1) < 0 ? -1 : (Py_ssize_t) (i + 1);
+
+        case CdrCodecOpString:
+        case CdrCodecOpBytes:
+        case CdrCodecOpByteArray: {
+            uint32_t len = op->count;
+            if (op->type != CdrCodecOpByteArray && r_u32(r, &len) < 0) return -1;
+            return r_skip(r, len) < 0 ? -1 : (Py_ssize_t) (i + 1);
+        }
+
+        case CdrCodecOpPrimitiveArray:
+        case CdrCodecOpPrimitiveSequence: {
+            uint32_t len = op->count;
+            if (op->type == CdrCodecOpPrimitiveSequence && r_u32(r, &len) < 0) return -1;
+            if (len == 0) return (Py_ssize_t) (i + 1);
+
+            // Elements are naturally aligned, so after aligning the first they are contiguous
+            int size = primitive_size(op->code);
+            if (size < 0 || r_align(r, op->align) < 0) return -1;
+            if (len > (r->size - r->pos) / (size_t) size) return r_underflow();
+            r->pos += (size_t) len * (size_t) size;
+            return (Py_ssize_t) (i + 1);
+        }
+
+        case CdrCodecOpStruct: {
+            size_t n = i + 1;
+            for (uint32_t m = 0; m < op->count; ++m) {
+                if (n >= codec->num_ops || codec->ops[n].type != CdrCodecOpMember) {
+                    PyErr_SetString(PyExc_ValueError, "Malformed CDR codec program.");
+                    return -1;
+                }
+                Py_ssize_t k = skip_op(codec, n + 1, r);
+                if (k < 0) return -1;
+                n = (size_t) k;
+            }
+            return (Py_ssize_t) n;
+        }
+
+        case CdrCodecOpAppendable: {
+            uint32_t len;
+            if (r_u32(r, &len) < 0 || r_skip(r, len) < 0) return -1;
+            return op_end(codec, i + 1);
+        }
+
+        case CdrCodecOpSequence:
+        case CdrCodecOpArray: {
+            uint32_t len = op->count;
+
+            if (op->value) {
+                uint32_t dheader;
+                if (r_u32(r, &dheader) < 0 || r_skip(r, dheader) < 0) return -1;
+                return (Py_ssize_t) next;
+            }
+            if (op->type == CdrCodecOpSequence) {
+                if (r_u32(r, &len) < 0) return -1;
+                if (len > r->size - r->pos) return r_underflow();
+            }
+            for (uint32_t j = 0; j < len; ++j) {
+                if (skip_op(codec, i + 1, r) < 0) return -1;
+            }
+            return (Py_ssize_t) next;
+        }
+
+        case CdrCodecOpOptional: {
+            uint8_t present;
+            if (r_scalar(r, &present, 1) < 0) return -1;
+            if (present && skip_op(codec, i + 1, r) < 0) return -1;
+            return (Py_ssize_t) next;
+        }
+
+        case CdrCodecOpDone:
+        case CdrCodecOpMember:
+        default:
+            PyErr_SetString(PyExc_ValueError, "Malformed CDR codec program.");
+            return -1;
+    }
+}
+
+
+static void cdr_codec_free(cdr_codec* codec)
+{
+    if (codec->ops != NULL) {
+        for (size_t i = 0; i < codec->num_ops; ++i)
+            Py_XDECREF(codec->ops[i].obj);
+        PyMem_Free(codec->ops);
+    }
+    PyMem_Free(codec);
+}
+
+static void cdr_codec_capsule_destructor(PyObject* capsule)
+{
+    cdr_codec* codec = (cdr_codec*) PyCapsule_GetPointer(capsule, CDR_CODEC_CAPSULE);
+    if (codec != NULL)
+        cdr_codec_free(codec);
+}
+
+static bool get_uint32_attr(PyObject* obj, const char* name, uint32_t* value)
+{
+    PyObject* attr = PyObject_GetAttrString(obj, name);
+    if (attr == NULL) return false;
+    unsigned long v = PyLong_AsUnsignedLong(attr);
+    Py_DECREF(attr);
+    if (PyErr_Occurred()) return false;
+    if (v > UINT32_MAX) {
+        PyErr_SetString(PyExc_OverflowError, "CDR codec op field out of range.");
+        return false;
+    }
+    *value = (uint32_t) v;
+    return true;
+}
+
+PyObject* ddspy_codec_create(PyObject *self, PyObject *args)
+{
+    PyObject* list;
+    unsigned int align_max;
+    (void)self;
+
+    if (!PyArg_ParseTuple(args, "O!I", &PyList_Type, &list, &align_max))
+        return NULL;
+
+    cdr_codec* codec = (cdr_codec*) PyMem_Malloc(sizeof(cdr_codec));
+    if (codec == NULL) return PyErr_NoMemory();
+
+    codec->align_max = align_max;
+    codec->num_ops = (size_t) PyList_GET_SIZE(list);
+    codec->ops = (cdr_codec_op*) PyMem_Calloc(codec->num_ops + 1, sizeof(cdr_codec_op));
+    if (codec->ops == NULL) {
+        PyMem_Free(codec);
+        return PyErr_NoMemory();
+    }
+
+    for (size_t i = 0; i < codec->num_ops; ++i) {
+        PyObject* py_op = PyList_GET_ITEM(list, (Py_ssize_t) i);
+        cdr_codec_op* op = &codec->ops[i];
+        uint32_t type, align;
+
+        if (!get_uint32_attr(py_op, "type", &type) ||
+            !get_uint32_attr(py_op, "size", &op->size) ||
+            !get_uint32_attr(py_op, "align", &align) ||
+            !get_uint32_attr(py_op, "count", &op->count) ||
+            !get_uint32_attr(py_op, "value", &op->value))
+            goto err;
+
+        op->type = (cdr_codec_op_type) type;
+        op->align = (uint8_t) align;
+
+        PyObject* code = PyObject_GetAttrString(py_op, "code");
+        if (code == NULL) goto err;
+        const char* code_str = PyUnicode_AsUTF8(code);
+        if (code_str == NULL) {
+            Py_DECREF(code);
+            goto err;
+        }
+        op->code = code_str[0];
+        Py_DECREF(code);
+
+        op->obj = PyObject_GetAttrString(py_op, "obj");
+        if (op->obj == NULL) goto err;
+    }
+
+    PyObject* capsule = PyCapsule_New(codec, CDR_CODEC_CAPSULE, cdr_codec_capsule_destructor);
+    if (capsule == NULL) goto err;
+    return capsule;
+
+err:
+    cdr_codec_free(codec);
+    return NULL;
+}
+
+PyObject* ddspy_codec_serialize(PyObject *self, PyObject *args)
+{
+    PyObject* capsule;
+    PyObject* value;
+    unsigned char flags;
+    int little_endian;
+    Py_ssize_t size_hint = 0;
+    cdr_codec_writer w;
+    (void)self;
+
+    // The optional size hint is an upper bound of the serialized size, see IDL.size_bound
+    if (!PyArg_ParseTuple(args, "OObp|n", &capsule, &value, &flags, &little_endian, &size_hint))
+        return NULL;
+
+    cdr_codec* codec = (cdr_codec*) PyCapsule_GetPointer(capsule, CDR_CODEC_CAPSULE);
+    if (codec == NULL) return NULL;
+
+    w.target = NULL;
+    w.size = size_hint > 256 ? (size_t) size_hint : 256;
+    w.buf = (uint8_t*) PyMem_Malloc(w.size);
+    if (w.buf == NULL) return PyErr_NoMemory();
+
+    w.buf[0] = 0;
+    w.buf[1] = flags;
+    w.buf[2] = 0;
+    w.buf[3] = 0;
+    w.pos = 4;
+    w.origin = 4;
+    w.align_max = codec->align_max;
+    w.swap = (little_endian != 0) != native_little_endian();
+
+    PyObject* result = NULL;
+    if (encode_op(codec, 0, &w, value) >= 0)
+        result = PyBytes_FromStringAndSize((const char*) w.buf, (Py_ssize_t) w.pos);
+
+    PyMem_Free(w.buf);
+    return result;
+}
+
+PyObject* ddspy_codec_serialize_into(PyObject *self, PyObject *args)
+{
+    PyObject* capsule;
+    PyObject* value;
+    PyObject* target;
+    unsigned char flags;
+    int little_endian;
+    Py_ssize_t size_hint = 0;
+    cdr_codec_writer w;
+    (void)self;
+
+    if (!PyArg_ParseTuple(args, "OObpO!|n", &capsule, &value, &flags, &little_endian, &PyByteArray_Type, &target,
+                          &size_hint))
+        return NULL;
+
+    cdr_codec* codec = (cdr_codec*) PyCapsule_GetPointer(capsule, CDR_CODEC_CAPSULE);
+    if (codec == NULL) return NULL;
+
+    w.target = target;
+    w.buf = (uint8_t*) PyByteArray_AS_STRING(target);
+    w.size = (size_t) PyByteArray_GET_SIZE(target);
+    w.pos = 0;
+    w.origin = 4;
+    w.align_max = codec->align_max;
+    w.swap = (little_endian != 0) != native_little_endian();
+
+    // Grow the bytearray once to the size hint instead of doubling it while encoding
+    if (size_hint > 0 && (size_t) size_hint > w.size && w_resize(&w, (size_t) size_hint) < 0)
+        return NULL;
+
+    const uint8_t header[4] = {0, flags, 0, 0};
+    if (w_bytes(&w, header, 4) < 0 || encode_op(codec, 0, &w, value) < 0)
+        return NULL;
+
+    // Pad with zeroes to a multiple of four bytes, as the writer expects
+    size_t end = ALIGN(w.pos, 4);
+    if (w_reserve(&w, end - w.pos) < 0)
+        return NULL;
+    memset(w.buf + w.pos, 0, end - w.pos);
+
+    return PyLong_FromSize_t(end);
+}
+
+PyObject* ddspy_codec_deserialize(PyObject *self, PyObject *args)
+{
+    PyObject* capsule;
+    Py_buffer data;
+    Py_ssize_t offset;
+    int little_endian;
+    cdr_codec_reader r;
+    (void)self;
+
+    if (!PyArg_ParseTuple(args, "Oy*np", &capsule, &data, &offset, &little_endian))
+        return NULL;
+
+    cdr_codec* codec = (cdr_codec*) PyCapsule_GetPointer(capsule, CDR_CODEC_CAPSULE);
+    if (codec == NULL || offset < 0 || offset > data.len) {
+        if (codec != NULL) PyErr_SetString(PyExc_ValueError, "Offset out of range.");
+        PyBuffer_Release(&data);
+        return NULL;
+    }
+
+    r.buf = (const uint8_t*) data.buf;
+    r.pos = (size_t) offset;
+    r.size = (size_t) data.len;
+    r.origin = (size_t) offset;
+    r.align_max = codec->align_max;
+    r.swap = (little_endian != 0) != native_little_endian();
+    r.source = data.obj;
+    r.view = NULL;
+
+    PyObject* result = NULL;
+    if (decode_op(codec, 0, &r, &result) < 0)
+        result = NULL;
+
+    Py_XDECREF(r.view);
+    PyBuffer_Release(&data);
+    return result;
+}
+
+PyObject* ddspy_codec_deserialize_fields(PyObject *self, PyObject *args)
+{
+    PyObject* capsule;
+    PyObject* fields;
+    Py_buffer data;
+    Py_ssize_t offset;
+    int little_endian;
+    cdr_codec_reader r;
+    (void)self;
+
+    if (!PyArg_ParseTuple(args, "Oy*npO", &capsule, &data, &offset, &little_endian, &fields))
+        return NULL;
+
+    cdr_codec* codec = (cdr_codec*) PyCapsule_GetPointer(capsule, CDR_CODEC_CAPSULE);
+    Py_ssize_t wanted = PyObject_Size(fields);
+    if (codec == NULL || wanted < 0 || offset < 0 || offset > data.len) {
+        if (codec != NULL && wanted >= 0) PyErr_SetString(PyExc_ValueError, "Offset out of range.");
+        PyBuffer_Release(&data);
+        return NULL;
+    }
+
+    r.buf = (const uint8_t*) data.buf;
+    r.pos = (size_t) offset;
+    r.size = (size_t) data.len;
+    r.origin = (size_t) offset;
+    r.align_max = codec->align_max;
+    r.swap = (little_endian != 0) != native_little_endian();
+    r.source = data.obj;
+    r.view = NULL;
+
+    PyObject* result = PyDict_New();
+    if (result == NULL) goto err;
+
+    // Only the members of the outermost struct are selected, an appendable struct is limited to its DHEADER
+    // so that members missing from an older version of the type fail and are left to the machines.
+    size_t i = 0;
+    if (codec->num_ops > 0 && codec->ops[0].type == CdrCodecOpAppendable) {
+        uint32_t len;
+        if (r_u32(&r, &len) < 0) goto err;
+        if (len > r.size - r.pos) {
+            r_underflow();
+            goto err;
+        }
+        r.size = r.pos + len;
+        i = 1;
+    }
+    if (i >= codec->num_ops || codec->ops[i].type != CdrCodecOpStruct) {
+        PyErr_SetString(PyExc_TypeError, "Only members of structs can be selected.");
+        goto err;
+    }
+
+    size_t next = i + 1;
+    for (uint32_t m = 0; m < codec->ops[i].count && PyDict_GET_SIZE(result) < wanted; ++m) {
+        if (next >= codec->num_ops || codec->ops[next].type != CdrCodecOpMember) {
+            PyErr_SetString(PyExc_ValueError, "Malformed CDR codec program.");
+            goto err;
+        }
+
+        PyObject* name = codec->ops[next].obj;
+        int selected = PySequence_Contains(fields, name);
+        if (selected < 0) goto err;
+
+        Py_ssize_t n;
+        if (selected) {
+            PyObject* member;
+            n = decode_op(codec, next + 1, &r, &member);
+            if (n < 0) goto err;
+            int ret = PyDict_SetItem(result, name, member);
+            Py_DECREF(member);
+            if (ret < 0) goto err;
+        } else {
+            n = skip_op(codec, next + 1, &r);
+            if (n < 0) goto err;
+        }
+        next = (size_t) n;
+    }
+
+    Py_XDECREF(r.view);
+    PyBuffer_Release(&data);
+    return result;
+
+err:
+    Py_XDECREF(result);
+    Py_XDECREF(r.view);
+    PyBuffer_Release(&data);
+    return NULL;
+}
@@ -0,0 +1,71 @@
+/*
+ * Copyright(c) 2021 to 2022 ZettaScale Technology and others
+ *
+ * This program and the accompanying materials are made available under the
+ * terms of the Eclipse Public License v. 2.0 which is available at
+ * http://www.eclipse.org/legal/epl-2.0, or the Eclipse Distribution License
+ * v. 1.0 which is available at
+ * http://www.eclipse.org/org/documents/edl-v10.php.
+ *
+ * SPDX-License-Identifier: EPL-2.0 OR BSD-3-Clause
+ */
+
+#ifndef CDR_CODEC_H
+#define CDR_CODEC_H
+
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+
+#include <stdbool.h>
+#include <stdint.h>
+#include <stdlib.h>
+
+// Keep in sync with cyclonedds/idl/_support.py:CdrCodecOpType
+typedef enum
+{
+    CdrCodecOpDone,
+    CdrCodecOpPrimitive,
+    CdrCodecOpChar,
+    CdrCodecOpString,
+    CdrCodecOpBytes,
+    CdrCodecOpByteArray,
+    CdrCodecOpPrimitiveArray,
+    CdrCodecOpPrimitiveSequence,
+    CdrCodecOpEnum,
+    CdrCodecOpBitMask,
+    CdrCodecOpStruct,
+    CdrCodecOpMember,
+    CdrCodecOpAppendable,
+    CdrCodecOpSequence,
+    CdrCodecOpArray,
+    CdrCodecOpOptional
+}
+cdr_codec_op_type;
+
+typedef struct cdr_codec_op_s
+{
+    cdr_codec_op_type type;
+    char code;
+    uint8_t align;
+    uint32_t size;
+    uint32_t count;
+    uint32_t value;
+    PyObject* obj;
+}
+cdr_codec_op;
+
+typedef struct cdr_codec_s
+{
+    uint32_t align_max;
+    size_t num_ops;
+    cdr_codec_op* ops;
+}
+cdr_codec;
+
+PyObject* ddspy_codec_create(PyObject *self, PyObject *args);
+PyObject* ddspy_codec_serialize(PyObject *self, PyObject *args);
+PyObject* ddspy_codec_serialize_into(PyObject *self, PyObject *args);
+PyObject* ddspy_codec_deserialize(PyObject *self, PyObject *args);
+PyObject* ddspy_codec_deserialize_fields(PyObject *self, PyObject *args);
+
+#endif // CDR_CODEC_H
@@ -67,24 +67,44 @@ cdr_key_vm_runner* cdr_key_vm_create_runner(cdr_key_vm* vm)
     if (runner == NULL) return NULL;
     size_t alloc_size = vm->initial_alloc_size < 20 ? 20 : (vm->initial_alloc_size + 4);
     runner->header = dds_alloc(alloc_size);
-    memset(runner->header, 0, alloc_size);
     if (runner->header == NULL) {
         dds_free(runner);
         return NULL;
     }
+    memset(runner->header, 0, alloc_size);
     runner->workspace = runner->header + 4;
     runner->workspace_size = alloc_size - 4;
+    runner->header_owned = true;
     runner->my_vm = vm;
     return runner;
 }
 
+void cdr_key_vm_init_runner(cdr_key_vm_runner* runner, cdr_key_vm* vm, uint8_t* buf, size_t size)
+{
+    // For running without allocations, typically with a buffer on the stack. The
+    // buffer must hold at least 20 bytes: the header and a 16 byte key.
+    assert(size >= 20);
+    runner->header = buf;
+    runner->workspace = buf + 4;
+    runner->workspace_size = size - 4;
+    runner->header_owned = false;
+    runner->my_vm = vm;
+}
+
 static void make_space_for(cdr_key_vm_runner* runner, size_t size) {
     // If you misconfigure things the following will wreak havoc
     if (runner->my_vm->final_size_is_static) return;
 
     if (runner->workspace_size < size) {
         size = ALIGN(size, 4);
-        runner->header = (uint8_t*) dds_realloc(runner->header, size + 4);
+        if (runner->header_owned) {
+            runner->header = (uint8_t*) dds_realloc(runner->header, size + 4);
+        } else {
+            uint8_t* header = (uint8_t*) dds_alloc(size + 4);
+            memcpy(header, runner->header, runner->workspace_size + 4);
+            runner->header = header;
+            runner->header_owned = true;
+        }
         runner->workspace = runner->header + 4;
         memset(runner->workspace + runner->workspace_size, 0, size - runner->workspace_size);
         runner->workspace_size = size;
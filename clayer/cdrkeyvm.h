@@ -67,10 +67,13 @@ typedef struct cdr_key_vm_runner_s
     uint8_t* header;
     uint8_t* workspace;
     size_t workspace_size;
+    // False while header is the buffer given to cdr_key_vm_init_runner, it is moved to the heap when it is too small
+    bool header_owned;
 }
 cdr_key_vm_runner;
 
 cdr_key_vm_runner* cdr_key_vm_create_runner(cdr_key_vm* vm);
+void cdr_key_vm_init_runner(cdr_key_vm_runner* runner, cdr_key_vm* vm, uint8_t* buf, size_t size);
 size_t cdr_key_vm_run(cdr_key_vm_runner* runner, const uint8_t* cdr_sample, const size_t cdr_sample_size);
 
 #endif // CDR_KEY_VM_H
@@ -0,0 +1,365 @@
+/*
+ * Copyright(c) 2021 to 2022 ZettaScale Technology and others
+ *
+ * This program and the accompanying materials are made available under the
+ * terms of the Eclipse Public License v. 2.0 which is available at
+ * http://www.eclipse.org/legal/epl-2.0, or the Eclipse Distribution License
+ * v. 1.0 which is available at
+ * http://www.eclipse.org/org/documents/edl-v10.php.
+ *
+ * SPDX-License-Identifier: EPL-2.0 OR BSD-3-Clause
+ */
+
+#include "cdrquery.h"
+#include <string.h>
+
+/// A query is a postfix program compiled from a cyclonedds.query expression. Field ops load a primitive
+/// member from a fixed offset in the serialized sample, constants push a value, compare and logical ops
+/// combine the top of the stack. The python side only compiles expressions on members at a fixed offset,
+/// everything else is evaluated in python on the deserialized sample.
+
+#define CDR_QUERY_CAPSULE "cyclonedds._clayer.cdr_query"
+#define CDR_QUERY_MAX_STACK 32
+
+static inline bool native_little_endian(void)
+{
+    const uint16_t one = 1;
+    return *((const uint8_t*) &one) == 1;
+}
+
+static uint8_t code_size(char code)
+{
+    switch (code) {
+    case 'b': case 'B': case '?':
+        return 1;
+    case 'h': case 'H':
+        return 2;
+    case 'i': case 'I': case 'f':
+        return 4;
+    case 'q': case 'Q': case 'd':
+        return 8;
+    default:
+        return 0;
+    }
+}
+
+static bool load_field(const cdr_query_op* op, const uint8_t* data, size_t size, bool v2, bool swap, cdr_query_value* out)
+{
+    const uint32_t offset = v2 ? op->offset_v2 : op->offset_v1;
+    uint8_t raw[8];
+
+    if (offset == CDR_QUERY_NO_OFFSET || (size_t) offset + op->size > size - 4)
+        return false;
+
+    if (swap) {
+        for (uint8_t i = 0; i < op->size; ++i)
+            raw[i] = data[4 + offset + op->size - 1 - i];
+    } else {
+        memcpy(raw, data + 4 + offset, op->size);
+    }
+
+    switch (op->code) {
+    case 'b': { int8_t x; memcpy(&x, raw, 1); out->kind = CdrQueryValueInt; out->v.i = x; break; }
+    case 'h': { int16_t x; memcpy(&x, raw, 2); out->kind = CdrQueryValueInt; out->v.i = x; break; }
+    case 'i': { int32_t x; memcpy(&x, raw, 4); out->kind = CdrQueryValueInt; out->v.i = x; break; }
+    case 'q': { int64_t x; memcpy(&x, raw, 8); out->kind = CdrQueryValueInt; out->v.i = x; break; }
+    case 'B': { uint8_t x; memcpy(&x, raw, 1); out->kind = CdrQueryValueUInt; out->v.u = x; break; }
+    case '?': { uint8_t x; memcpy(&x, raw, 1); out->kind = CdrQueryValueUInt; out->v.u = x != 0; break; }
+    case 'H': { uint16_t x; memcpy(&x, raw, 2); out->kind = CdrQueryValueUInt; out->v.u = x; break; }
+    case 'I': { uint32_t x; memcpy(&x, raw, 4); out->kind = CdrQueryValueUInt; out->v.u = x; break; }
+    case 'Q': { uint64_t x; memcpy(&x, raw, 8); out->kind = CdrQueryValueUInt; out->v.u = x; break; }
+    case 'f': { float x; memcpy(&x, raw, 4); out->kind = CdrQueryValueFloat; out->v.d = x; break; }
+    case 'd': { double x; memcpy(&x, raw, 8); out->kind = CdrQueryValueFloat; out->v.d = x; break; }
+    default:
+        return false;
+    }
+    return true;
+}
+
+static double as_double(const cdr_query_value* a)
+{
+    switch (a->kind) {
+    case CdrQueryValueInt: return (double) a->v.i;
+    case CdrQueryValueUInt: return (double) a->v.u;
+    default: return a->v.d;
+    }
+}
+
+static bool truthy(const cdr_query_value* a)
+{
+    switch (a->kind) {
+    case CdrQueryValueInt: return a->v.i != 0;
+    case CdrQueryValueUInt: return a->v.u != 0;
+    default: return a->v.d != 0.0;
+    }
+}
+
+static bool compare(cdr_query_compare cmp, const cdr_query_value* a, const cdr_query_value* b)
+{
+    // Three way comparison, NaN compares unordered to everything (like in python)
+    int order;
+
+    if (a->kind == CdrQueryValueFloat || b->kind == CdrQueryValueFloat) {
+        const double x = as_double(a), y = as_double(b);
+        if (x < y) order = -1;
+        else if (x > y) order = 1;
+        else if (x == y) order = 0;
+        else return cmp == CdrQueryCompareNe;
+    } else if (a->kind == b->kind) {
+        if (a->kind == CdrQueryValueInt)
+            order = (a->v.i > b->v.i) - (a->v.i < b->v.i);
+        else
+            order = (a->v.u > b->v.u) - (a->v.u < b->v.u);
+    } else if (a->kind == CdrQueryValueInt) {
+        order = (a->v.i < 0) ? -1 : (((uint64_t) a->v.i > b->v.u) - ((uint64_t) a->v.i < b->v.u));
+    } else {
+        order = (b->v.i < 0) ? 1 : ((a->v.u > (uint64_t) b->v.i) - (a->v.u < (uint64_t) b->v.i));
+    }
+
+    switch (cmp) {
+    case CdrQueryCompareEq: return order == 0;
+    case CdrQueryCompareNe: return order != 0;
+    case CdrQueryCompareLt: return order < 0;
+    case CdrQueryCompareLe: return order <= 0;
+    case CdrQueryCompareGt: return order > 0;
+    case CdrQueryCompareGe: return order >= 0;
+    }
+    return false;
+}
+
+static inline void set_bool(cdr_query_value* a, bool value)
+{
+    a->kind = CdrQueryValueInt;
+    a->v.i = value ? 1 : 0;
+}
+
+bool cdr_query_eval(const cdr_query* query, const uint8_t* data, size_t size)
+{
+    cdr_query_value stack[CDR_QUERY_MAX_STACK];
+    size_t sp = 0;
+    bool v2, swap;
+
+    if (data == NULL || size < 4 || data[0] != 0)
+        return false;
+
+    switch (data[1]) {
+    case 0: case 1:
+        v2 = false;
+        break;
+    case 6: case 7: case 8: case 9:
+        v2 = true;
+        break;
+    default:
+        // Parameter lists have no fixed offsets
+        return false;
+    }
+    swap = ((data[1] & 1) == 1) != native_little_endian();
+
+    // Stack depth was verified when the query was created
+    for (size_t i = 0; i < query->num_ops; ++i) {
+        const cdr_query_op* op = &query->ops[i];
+        switch (op->type) {
+        case CdrQueryOpField:
+            if (!load_field(op, data, size, v2, swap, &stack[sp]))
+                return false;
+            sp++;
+            break;
+        case CdrQueryOpConstant:
+            stack[sp++] = op->value;
+            break;
+        case CdrQueryOpCompare:
+            sp--;
+            set_bool(&stack[sp - 1], compare(op->compare, &stack[sp - 1], &stack[sp]));
+            break;
+        case CdrQueryOpAnd:
+            sp--;
+            set_bool(&stack[sp - 1], truthy(&stack[sp - 1]) && truthy(&stack[sp]));
+            break;
+        case CdrQueryOpOr:
+            sp--;
+            set_bool(&stack[sp - 1], truthy(&stack[sp - 1]) || truthy(&stack[sp]));
+            break;
+        case CdrQueryOpNot:
+            set_bool(&stack[sp - 1], !truthy(&stack[sp - 1]));
+            break;
+        case CdrQueryOpDone:
+            break;
+        }
+    }
+
+    return sp == 1 && truthy(&stack[0]);
+}
+
+
+/* Python bindings */
+
+static void cdr_query_free(cdr_query* query)
+{
+    PyMem_Free(query->ops);
+    PyMem_Free(query);
+}
+
+static void cdr_query_capsule_destructor(PyObject* capsule)
+{
+    cdr_query* query = (cdr_query*) PyCapsule_GetPointer(capsule, CDR_QUERY_CAPSULE);
+    if (query != NULL)
+        cdr_query_free(query);
+}
+
+cdr_query* ddspy_query_from_capsule(PyObject* capsule)
+{
+    return (cdr_query*) PyCapsule_GetPointer(capsule, CDR_QUERY_CAPSULE);
+}
+
+static bool get_uint32_attr(PyObject* obj, const char* name, uint32_t* value)
+{
+    PyObject* attr = PyObject_GetAttrString(obj, name);
+    if (attr == NULL) return false;
+    unsigned long v = PyLong_AsUnsignedLong(attr);
+    Py_DECREF(attr);
+    if (PyErr_Occurred()) return false;
+    if (v > UINT32_MAX) {
+        PyErr_SetString(PyExc_OverflowError, "CDR query op field out of range.");
+        return false;
+    }
+    *value = (uint32_t) v;
+    return true;
+}
+
+static bool get_value_attr(PyObject* obj, cdr_query_value* value)
+{
+    PyObject* attr = PyObject_GetAttrString(obj, "value");
+    if (attr == NULL) return false;
+
+    if (PyFloat_Check(attr)) {
+        value->kind = CdrQueryValueFloat;
+        value->v.d = PyFloat_AS_DOUBLE(attr);
+    } else {
+        int overflow;
+        long long v = PyLong_AsLongLongAndOverflow(attr, &overflow);
+        if (overflow > 0) {
+            value->kind = CdrQueryValueUInt;
+            value->v.u = (uint64_t) PyLong_AsUnsignedLongLong(attr);
+        } else if (overflow < 0) {
+            PyErr_SetString(PyExc_OverflowError, "CDR query constant out of range.");
+        } else {
+            value->kind = CdrQueryValueInt;
+            value->v.i = (int64_t) v;
+        }
+    }
+
+    Py_DECREF(attr);
+    return !PyErr_Occurred();
+}
+
+PyObject* ddspy_query_create(PyObject *self, PyObject *args)
+{
+    PyObject* list;
+    size_t depth = 0;
+    (void)self;
+
+    if (!PyArg_ParseTuple(args, "O!", &PyList_Type, &list))
+        return NULL;
+
+    cdr_query* query = (cdr_query*) PyMem_Malloc(sizeof(cdr_query));
+    if (query == NULL) return PyErr_NoMemory();
+
+    query->num_ops = (size_t) PyList_GET_SIZE(list);
+    query->ops = (cdr_query_op*) PyMem_Calloc(query->num_ops + 1, sizeof(cdr_query_op));
+    if (query->ops == NULL) {
+        PyMem_Free(query);
+        return PyErr_NoMemory();
+    }
+
+    for (size_t i = 0; i < query->num_ops; ++i) {
+        PyObject* py_op = PyList_GET_ITEM(list, (Py_ssize_t) i);
+        cdr_query_op* op = &query->ops[i];
+        uint32_t type, compare;
+
+        if (!get_uint32_attr(py_op, "type", &type) ||
+            !get_uint32_attr(py_op, "compare", &compare) ||
+            !get_uint32_attr(py_op, "offset_v1", &op->offset_v1) ||
+            !get_uint32_attr(py_op, "offset_v2", &op->offset_v2))
+            goto err;
+
+        op->type = (cdr_query_op_type) type;
+        op->compare = (cdr_query_compare) compare;
+
+        switch (op->type) {
+        case CdrQueryOpField: {
+            PyObject* code = PyObject_GetAttrString(py_op, "code");
+            if (code == NULL) goto err;
+            const char* code_str = PyUnicode_AsUTF8(code);
+            op->code = code_str ? code_str[0] : '\0';
+            Py_DECREF(code);
+            if (code_str == NULL) goto err;
+            op->size = code_size(op->code);
+            if (op->size == 0) {
+                PyErr_SetString(PyExc_ValueError, "Unsupported type code in CDR query.");
+                goto err;
+            }
+            depth++;
+            break;
+        }
+        case CdrQueryOpConstant:
+            if (!get_value_attr(py_op, &op->value)) goto err;
+            depth++;
+            break;
+        case CdrQueryOpCompare:
+            if (compare > CdrQueryCompareGe) {
+                PyErr_SetString(PyExc_ValueError, "Invalid comparison in CDR query.");
+                goto err;
+            }
+            /* fall through */
+        case CdrQueryOpAnd:
+        case CdrQueryOpOr:
+            if (depth < 2) goto err_malformed;
+            depth--;
+            break;
+        case CdrQueryOpNot:
+            if (depth < 1) goto err_malformed;
+            break;
+        default:
+            goto err_malformed;
+        }
+
+        if (depth > CDR_QUERY_MAX_STACK) {
+            PyErr_SetString(PyExc_ValueError, "CDR query is too deeply nested.");
+            goto err;
+        }
+    }
+
+    if (depth != 1) goto err_malformed;
+
+    PyObject* capsule = PyCapsule_New(query, CDR_QUERY_CAPSULE, cdr_query_capsule_destructor);
+    if (capsule == NULL) goto err;
+    return capsule;
+
+err_malformed:
+    PyErr_SetString(PyExc_ValueError, "Malformed CDR query.");
+err:
+    cdr_query_free(query);
+    return NULL;
+}
+
+PyObject* ddspy_query_evaluate(PyObject *self, PyObject *args)
+{
+    PyObject* capsule;
+    Py_buffer data;
+    bool result;
+    (void)self;
+
+    if (!PyArg_ParseTuple(args, "Oy*", &capsule, &data))
+        return NULL;
+
+    cdr_query* query = ddspy_query_from_capsule(capsule);
+    if (query == NULL) {
+        PyBuffer_Release(&data);
+        return NULL;
+    }
+
+    result = cdr_query_eval(query, (const uint8_t*) data.buf, (size_t) data.len);
+
+    PyBuffer_Release(&data);
+    return PyBool_FromLong(result);
+}
@@ -0,0 +1,100 @@
+/*
+ * Copyright(c) 2021 to 2022 ZettaScale Technology and others
+ *
+ * This program and the accompanying materials are made available under the
+ * terms of the Eclipse Public License v. 2.0 which is available at
+ * http://www.eclipse.org/legal/epl-2.0, or the Eclipse Distribution License
+ * v. 1.0 which is available at
+ * http://www.eclipse.org/org/documents/edl-v10.php.
+ *
+ * SPDX-License-Identifier: EPL-2.0 OR BSD-3-Clause
+ */
+
+#ifndef CDR_QUERY_H
+#define CDR_QUERY_H
+
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+
+#include <stdbool.h>
+#include <stdint.h>
+#include <stdlib.h>
+
+// Keep in sync with cyclonedds/query.py:CdrQueryOpType
+typedef enum
+{
+    CdrQueryOpDone,
+    CdrQueryOpField,
+    CdrQueryOpConstant,
+    CdrQueryOpCompare,
+    CdrQueryOpAnd,
+    CdrQueryOpOr,
+    CdrQueryOpNot
+}
+cdr_query_op_type;
+
+// Keep in sync with cyclonedds/query.py:CdrQueryCompare
+typedef enum
+{
+    CdrQueryCompareEq,
+    CdrQueryCompareNe,
+    CdrQueryCompareLt,
+    CdrQueryCompareLe,
+    CdrQueryCompareGt,
+    CdrQueryCompareGe
+}
+cdr_query_compare;
+
+typedef enum
+{
+    CdrQueryValueInt,
+    CdrQueryValueUInt,
+    CdrQueryValueFloat
+}
+cdr_query_value_kind;
+
+typedef struct cdr_query_value_s
+{
+    cdr_query_value_kind kind;
+    union {
+        int64_t i;
+        uint64_t u;
+        double d;
+    } v;
+}
+cdr_query_value;
+
+// Offsets do not include the encapsulation header, CDR_QUERY_NO_OFFSET marks
+// an encoding version the type cannot be received in.
+#define CDR_QUERY_NO_OFFSET UINT32_MAX
+
+typedef struct cdr_query_op_s
+{
+    cdr_query_op_type type;
+    char code;
+    uint8_t size;
+    cdr_query_compare compare;
+    uint32_t offset_v1;
+    uint32_t offset_v2;
+    cdr_query_value value;
+}
+cdr_query_op;
+
+typedef struct cdr_query_s
+{
+    size_t num_ops;
+    cdr_query_op* ops;
+}
+cdr_query;
+
+// Evaluate the query on a serialized sample (including the encapsulation header). Does not
+// touch any python objects so it can be called without holding the GIL. Samples that are
+// too short or in an encoding the query was not compiled for do not match.
+bool cdr_query_eval(const cdr_query* query, const uint8_t* data, size_t size);
+
+cdr_query* ddspy_query_from_capsule(PyObject* capsule);
+
+PyObject* ddspy_query_create(PyObject *self, PyObject *args);
+PyObject* ddspy_query_evaluate(PyObject *self, PyObject *args);
+
+#endif // CDR_QUERY_H
@@ -20,6 +20,7 @@
 #include "dds/ddsrt/string.h"
 #include "dds/ddsrt/mh3.h"
 #include "dds/ddsrt/md5.h"
+#include "dds/ddsrt/atomics.h"
 #include "dds/ddsi/ddsi_radmin.h"
 #include "dds/ddsi/ddsi_serdata.h"
 #include "dds/ddsi/ddsi_sertype.h"
@@ -28,6 +29,9 @@
 
 
 #include "cdrkeyvm.h"
+#include "cdrcodec.h"
+#include "cdrquery.h"
+#include "sampleinfo.h"
 #include "pysertype.h"
 #ifdef DDS_HAS_TYPE_DISCOVERY
 #include "typeser.h"
@@ -106,6 +110,56 @@ static cdr_key_vm* make_key_vm(PyObject* idl, bool v2)
 
     Py_DECREF(list);
 
+    if (vm->instructions == NULL) {
+        dds_free(vm);
+        if (!PyErr_Occurred()) PyErr_NoMemory();
+        return NULL;
+    }
+
+    return vm;
+}
+
+static void free_key_vm(cdr_key_vm* vm)
+{
+    dds_free(vm->instructions);
+    dds_free(vm);
+}
+
+// Key VMs for ddspy_calc_key(s) are built once per type and XCDR version and kept
+// in a capsule by the IDL object, see IDL.key_vm
+#define DDSPY_KEY_VM_CAPSULE "cyclonedds._clayer.key_vm"
+
+static void key_vm_capsule_destructor(PyObject* capsule)
+{
+    cdr_key_vm* vm = (cdr_key_vm*) PyCapsule_GetPointer(capsule, DDSPY_KEY_VM_CAPSULE);
+    if (vm != NULL) free_key_vm(vm);
+}
+
+static PyObject* ddspy_key_vm_create(PyObject *self, PyObject *args)
+{
+    PyObject* idl;
+    int v2;
+    (void)self;
+
+    if (!PyArg_ParseTuple(args, "Op", &idl, &v2))
+        return NULL;
+
+    cdr_key_vm* vm = make_key_vm(idl, (bool)v2);
+    if (vm == NULL) return NULL;
+
+    PyObject* capsule = PyCapsule_New(vm, DDSPY_KEY_VM_CAPSULE, key_vm_capsule_destructor);
+    if (capsule == NULL) free_key_vm(vm);
+    return capsule;
+}
+
+// Returns a new reference to the capsule in *capsule, which keeps the key VM alive
+static cdr_key_vm* cached_key_vm(PyObject* idl, bool v2, PyObject** capsule)
+{
+    *capsule = PyObject_CallMethod(idl, "key_vm", "O", v2 ? Py_True : Py_False);
+    if (*capsule == NULL) return NULL;
+
+    cdr_key_vm* vm = (cdr_key_vm*) PyCapsule_GetPointer(*capsule, DDSPY_KEY_VM_CAPSULE);
+    if (vm == NULL) Py_CLEAR(*capsule);
     return vm;
 }
 
@@ -135,9 +189,19 @@ typedef struct ddspy_sertype {
 
 } ddspy_sertype_t;
 
+// A Python buffer holding the data of a serdata, see serdata_from_sample
+typedef struct ddspy_pinned_sample {
+    Py_buffer view;
+    struct ddspy_pinned_sample* next;
+} ddspy_pinned_sample_t;
+
 // Python refcount: one ref for sample.
+// The data is allocated together with the serdata, directly behind it, unless it is pinned.
+// The key points into the data (data_is_key), to key_inline when it fits (that is, up to
+// a 16 byte key) or to a separate allocation.
 typedef struct ddspy_serdata {
     ddsi_serdata_t c_data;
+    ddspy_pinned_sample_t* pinned;
     void* data;
     size_t data_size;
     void* key;
@@ -146,14 +210,82 @@ typedef struct ddspy_serdata {
     bool key_populated;
     bool data_is_key;
     bool is_v2;
+    unsigned char key_inline[20];
 } ddspy_serdata_t;
 
+// Keys are computed in a buffer of this size on the stack, larger keys move to the heap
+#define DDSPY_KEY_SCRATCH_SIZE 132
+
 // Python refcount: one ref for sample.
+// When writing, pin is the buffer usample comes from if the serdata may keep it instead of copying it,
+// and key the key of the instance as returned by ddspy_calc_key if it is known already.
 typedef struct ddspy_sample_container {
     void* usample;
     size_t usample_size;
+    Py_buffer* pin;
+    const void* key;
+    size_t key_size;
 } ddspy_sample_container_t;
 
+// Written samples of at least this size that come in a read-only buffer are not copied into
+// the serdata, it keeps the buffer instead. Keep in sync with IDL.pin_size.
+#define DDSPY_PIN_MIN_SIZE 65536
+
+// Releasing a buffer needs the GIL, which a serdata may well be freed without (and taking it
+// there could deadlock against a Python thread calling into Cyclone). So pinned buffers of
+// freed serdatas are collected here. The interpreter releases them as a pending call, and
+// writes, disposes and unregisters release them too in case that could not be scheduled.
+static ddsrt_atomic_voidp_t released_pins = DDSRT_ATOMIC_VOIDP_INIT(NULL);
+
+static void release_pins(void);
+
+static int release_pins_pending(void* arg)
+{
+    (void)arg;
+    release_pins();
+    return 0;
+}
+
+static void release_pin(ddspy_pinned_sample_t* pinned)
+{
+    ddspy_pinned_sample_t* head;
+    do {
+        head = (ddspy_pinned_sample_t*) ddsrt_atomic_ldvoidp(&released_pins);
+        pinned->next = head;
+    } while (!ddsrt_atomic_casvoidp(&released_pins, head, pinned));
+
+    // Py_AddPendingCall needs neither the GIL nor a thread state. Once it is scheduled (the list
+    // was empty) everything pushed until it runs is released along with it.
+    if (head == NULL && Py_IsInitialized())
+        (void) Py_AddPendingCall(release_pins_pending, NULL);
+}
+
+// Must be called with the GIL held
+static void release_pins(void)
+{
+    ddspy_pinned_sample_t* pinned;
+    do {
+        pinned = (ddspy_pinned_sample_t*) ddsrt_atomic_ldvoidp(&released_pins);
+    } while (pinned != NULL && !ddsrt_atomic_casvoidp(&released_pins, pinned, NULL));
+
+    while (pinned != NULL) {
+        ddspy_pinned_sample_t* next = pinned->next;
+        PyBuffer_Release(&pinned->view);
+        dds_free(pinned);
+        pinned = next;
+    }
+}
+
+static void container_from_buffer(ddspy_sample_container_t* container, Py_buffer* sample_data, bool pin)
+{
+    container->usample = sample_data->buf;
+    container->usample_size = (size_t) sample_data->len;
+    pin = pin && sample_data->readonly && sample_data->len >= DDSPY_PIN_MIN_SIZE;
+    container->pin = pin ? sample_data : NULL;
+    container->key = NULL;
+    container->key_size = 0;
+}
+
 
 static inline ddspy_sertype_t* sertype(ddspy_serdata_t *this)
 {
@@ -177,10 +309,12 @@ static inline const ddspy_serdata_t* cserdata(const ddsi_serdata_t *this)
 
 static ddspy_serdata_t *ddspy_serdata_new(const struct ddsi_sertype* type, enum ddsi_serdata_kind kind, size_t data_size)
 {
-    ddspy_serdata_t *new = (ddspy_serdata_t*) dds_alloc(sizeof(struct ddspy_serdata));
+    // One allocation for both, sizeof is a multiple of the alignment of the struct so the data is aligned too
+    ddspy_serdata_t *new = (ddspy_serdata_t*) dds_alloc(sizeof(struct ddspy_serdata) + data_size);
     ddsi_serdata_init((ddsi_serdata_t*) new, type, kind);
 
-    new->data = dds_alloc(data_size);
+    new->pinned = NULL;
+    new->data = new + 1;
     new->data_size = data_size;
     new->key = NULL;
     new->key_size = 0;
@@ -225,7 +359,7 @@ static void ddspy_serdata_calc_hash(ddspy_serdata_t* this)
 static void ddspy_serdata_populate_key(ddspy_serdata_t* this)
 {
     if (sertype(this)->keyless) {
-        this->key = dds_alloc(20);
+        this->key = this->key_inline;
         this->key_size = 20;
         memset(this->key, 0, 20);
         memset(this->hash.value, 0, 16);
@@ -233,16 +367,36 @@ static void ddspy_serdata_populate_key(ddspy_serdata_t* this)
         return;
     }
 
-    cdr_key_vm_runner* runner = cdr_key_vm_create_runner(
-        this->is_v2 ? csertype(this)->v2_key_vm : csertype(this)->v0_key_vm
-    );
-    this->key_size = cdr_key_vm_run(runner, this->data, this->data_size);
+    uint8_t scratch[DDSPY_KEY_SCRATCH_SIZE];
+    cdr_key_vm_runner runner;
+    cdr_key_vm_init_runner(&runner, this->is_v2 ? csertype(this)->v2_key_vm : csertype(this)->v0_key_vm,
+                           scratch, sizeof(scratch));
+    this->key_size = cdr_key_vm_run(&runner, this->data, this->data_size);
     if (this->key_size < 20) this->key_size = 20;
 
-    this->key = runner->header;
+    if (this->key_size <= sizeof(this->key_inline)) {
+        memcpy(this->key_inline, runner.header, this->key_size);
+        this->key = this->key_inline;
+        if (runner.header_owned) dds_free(runner.header);
+    } else if (runner.header_owned) {
+        this->key = runner.header;
+    } else {
+        this->key = ddsrt_memdup(runner.header, this->key_size);
+    }
     this->key_populated = true;
 
-    dds_free(runner);
+    ddspy_serdata_calc_hash(this);
+}
+
+// Like ddspy_serdata_populate_key, but with a key computed before (see ddspy_calc_key), without the header
+static void ddspy_serdata_set_key(ddspy_serdata_t* this, const void* key, size_t key_size)
+{
+    this->key_size = key_size + 4 < 20 ? 20 : key_size + 4;
+    this->key = this->key_size <= sizeof(this->key_inline) ? this->key_inline : dds_alloc(this->key_size);
+    memset(this->key, 0, this->key_size);
+    memcpy(this->key, this->data, 4);
+    memcpy((char*) this->key + 4, key, key_size);
+    this->key_populated = true;
 
     ddspy_serdata_calc_hash(this);
 }
@@ -388,12 +542,30 @@ static ddsi_serdata_t *serdata_from_sample(
   const void* sample)
 {
     ddspy_sample_container_t *container = (ddspy_sample_container_t*) sample;
-
-    ddspy_serdata_t* d = ddspy_serdata_new(type, kind, container->usample_size);
-    memcpy((char*) d->data, container->usample, container->usample_size);
+    ddspy_pinned_sample_t* pinned = NULL;
+    ddspy_serdata_t* d;
+
+    if (kind == SDK_DATA && container->pin != NULL)
+        pinned = (ddspy_pinned_sample_t*) dds_alloc(sizeof(ddspy_pinned_sample_t));
+
+    if (pinned != NULL) {
+        // Take over the buffer from the writing thread, which then no longer releases it
+        d = ddspy_serdata_new(type, kind, 0);
+        pinned->view = *container->pin;
+        container->pin->obj = NULL;
+        d->pinned = pinned;
+        d->data = container->usample;
+        d->data_size = container->usample_size;
+    } else {
+        d = ddspy_serdata_new(type, kind, container->usample_size);
+        memcpy((char*) d->data, container->usample, container->usample_size);
+    }
 
     d->is_v2 = ((char*)d->data)[1] > 1;
-    ddspy_serdata_populate_key(d);
+    if (container->key != NULL && !sertype(d)->keyless)
+        ddspy_serdata_set_key(d, container->key, container->key_size);
+    else
+        ddspy_serdata_populate_key(d);
 
     assert(d->key != NULL);
     assert(d->data != NULL);
@@ -475,12 +647,10 @@ static ddsi_serdata_t *serdata_to_typeless(const ddsi_serdata_t* dcmn)
         return ddsi_serdata_ref(dcmn);
     } else {
         const ddspy_serdata_t *d = cserdata(dcmn);
-        ddspy_serdata_t* d_tl = (ddspy_serdata_t*) dds_alloc(sizeof(struct ddspy_serdata));
+        ddspy_serdata_t* d_tl = ddspy_serdata_new(dcmn->type, SDK_KEY, d->key_size);
         assert(d_tl);
-        ddsi_serdata_init((ddsi_serdata_t*) d_tl, dcmn->type, SDK_KEY);
-        d_tl->data = ddsrt_memdup(d->key, d->key_size);
+        memcpy(d_tl->data, d->key, d->key_size);
         d_tl->key = d_tl->data;
-        d_tl->data_size = d->key_size;
         d_tl->key_size = d->key_size;
         d_tl->key_populated = true;
         d_tl->data_is_key = true;
@@ -523,9 +693,10 @@ static void serdata_free(struct ddsi_serdata* dcmn)
     assert(cserdata(dcmn)->data_size != 0);
     assert(cserdata(dcmn)->key_size >= 20);
 
-    dds_free(serdata(dcmn)->data);
-    if (!serdata(dcmn)->data_is_key)
+    if (!serdata(dcmn)->data_is_key && serdata(dcmn)->key != serdata(dcmn)->key_inline)
         dds_free(serdata(dcmn)->key);
+    if (serdata(dcmn)->pinned != NULL)
+        release_pin(serdata(dcmn)->pinned);
     dds_free(dcmn);
 }
 
@@ -590,14 +761,8 @@ const struct ddsi_serdata_ops ddspy_serdata_ops = {
 static void sertype_free(struct ddsi_sertype* tpcmn)
 {
     struct ddspy_sertype* this = (struct ddspy_sertype*) tpcmn;
-    if (this->v0_key_vm != NULL) {
-        dds_free(this->v0_key_vm->instructions);
-        dds_free(this->v0_key_vm);
-    }
-    if (this->v2_key_vm != NULL) {
-        dds_free(this->v2_key_vm->instructions);
-        dds_free(this->v2_key_vm);
-    }
+    if (this->v0_key_vm != NULL) free_key_vm(this->v0_key_vm);
+    if (this->v2_key_vm != NULL) free_key_vm(this->v2_key_vm);
 #ifdef DDS_HAS_TYPE_DISCOVERY
     if (this->typeinfo_ser_sz) {
         dds_free(this->typeinfo_ser_data);
@@ -995,20 +1160,29 @@ ddspy_write(PyObject *self, PyObject *args)
     dds_entity_t writer;
     dds_return_t sts;
     Py_buffer sample_data;
+    Py_buffer key_data = { .buf = NULL, .obj = NULL };
     (void)self;
 
-    if (!PyArg_ParseTuple(args, "iy*", &writer, &sample_data))
+    if (!PyArg_ParseTuple(args, "iy*|y*", &writer, &sample_data, &key_data))
         return NULL;
 
     assert(PyBuffer_IsContiguous(&sample_data, 'C'));
 
-    container.usample = sample_data.buf;
+    release_pins();
     assert(sample_data.len >= 0);
-    container.usample_size = (size_t)sample_data.len;
+    container_from_buffer(&container, &sample_data, true);
+    // The key of the instance from an earlier ddspy_calc_key, saving the key VM run
+    if (key_data.buf != NULL) {
+        container.key = key_data.buf;
+        container.key_size = (size_t) key_data.len;
+    }
 
+    Py_BEGIN_ALLOW_THREADS
     sts = dds_write(writer, &container);
+    Py_END_ALLOW_THREADS
 
     PyBuffer_Release(&sample_data);
+    PyBuffer_Release(&key_data);
 
     return PyLong_FromLong((long) sts);
 }
@@ -1021,22 +1195,110 @@ ddspy_write_ts(PyObject *self, PyObject *args)
     dds_return_t sts;
     dds_time_t time;
     Py_buffer sample_data;
+    Py_buffer key_data = { .buf = NULL, .obj = NULL };
     (void)self;
 
-    if (!PyArg_ParseTuple(args, "iy*L", &writer, &sample_data, &time))
+    if (!PyArg_ParseTuple(args, "iy*L|y*", &writer, &sample_data, &time, &key_data))
         return NULL;
 
-    container.usample = sample_data.buf;
+    release_pins();
     assert(sample_data.len >= 0);
-    container.usample_size = (size_t)sample_data.len;
+    container_from_buffer(&container, &sample_data, true);
+    // The key of the instance from an earlier ddspy_calc_key, saving the key VM run
+    if (key_data.buf != NULL) {
+        container.key = key_data.buf;
+        container.key_size = (size_t) key_data.len;
+    }
 
+    Py_BEGIN_ALLOW_THREADS
     sts = dds_write_ts(writer, &container, time);
+    Py_END_ALLOW_THREADS
 
     PyBuffer_Release(&sample_data);
+    PyBuffer_Release(&key_data);
 
     return PyLong_FromLong((long) sts);
 }
 
+static PyObject *
+ddspy_write_many(PyObject *self, PyObject *args)
+{
+    ddspy_sample_container_t container;
+    dds_entity_t writer;
+    dds_return_t sts = 0;
+    PyObject* samples;
+    PyObject* timestamps;
+    Py_ssize_t count, acquired, written = 0;
+    Py_buffer* sample_data;
+    dds_time_t* times = NULL;
+    (void)self;
+
+    if (!PyArg_ParseTuple(args, "iO!O", &writer, &PyList_Type, &samples, &timestamps))
+        return NULL;
+
+    release_pins();
+    count = PyList_GET_SIZE(samples);
+    if (timestamps != Py_None && (!PyList_Check(timestamps) || PyList_GET_SIZE(timestamps) != count)) {
+        PyErr_SetString(PyExc_TypeError, "Timestamps must be None or a list with a timestamp for each sample.");
+        return NULL;
+    }
+
+    // Grab all buffers (and timestamps) up front: the writes happen without the GIL. The exports
+    // hold a reference to the sample buffers so mutating the list in the meantime is harmless.
+    sample_data = PyMem_Calloc(count > 0 ? (size_t)count : 1, sizeof(Py_buffer));
+    if (timestamps != Py_None)
+        times = PyMem_Calloc(count > 0 ? (size_t)count : 1, sizeof(dds_time_t));
+    if (sample_data == NULL || (timestamps != Py_None && times == NULL)) {
+        PyMem_Free(sample_data);
+        PyMem_Free(times);
+        return PyErr_NoMemory();
+    }
+
+    for (acquired = 0; acquired < count; ++acquired) {
+        if (PyObject_GetBuffer(PyList_GET_ITEM(samples, acquired), &sample_data[acquired], PyBUF_SIMPLE) < 0)
+            break;
+        if (times != NULL) {
+            times[acquired] = PyLong_AsLongLong(PyList_GET_ITEM(timestamps, acquired));
+            if (times[acquired] == -1 && PyErr_Occurred()) {
+                PyBuffer_Release(&sample_data[acquired]);
+                break;
+            }
+        }
+    }
+
+    if (acquired == count) {
+        Py_BEGIN_ALLOW_THREADS
+        for (written = 0; written < count; ++written) {
+            container_from_buffer(&container, &sample_data[written], true);
+
+            if (times != NULL)
+                sts = dds_write_ts(writer, &container, times[written]);
+            else
+                sts = dds_write(writer, &container);
+
+            if (sts < 0)
+                break;
+        }
+        // Push out anything held back by write batching so the batch leaves as a whole
+        if (written > 0) {
+            dds_return_t flush_sts = dds_write_flush(writer);
+            if (sts >= 0)
+                sts = flush_sts;
+        }
+        Py_END_ALLOW_THREADS
+    }
+
+    for (Py_ssize_t i = 0; i < acquired; ++i)
+        PyBuffer_Release(&sample_data[i]);
+    PyMem_Free(sample_data);
+    PyMem_Free(times);
+
+    if (acquired != count)
+        return NULL;
+
+    return Py_BuildValue("(nl)", written, (long) sts);
+}
+
 static PyObject *
 ddspy_dispose(PyObject *self, PyObject *args)
 {
@@ -1049,11 +1311,14 @@ ddspy_dispose(PyObject *self, PyObject *args)
     if (!PyArg_ParseTuple(args, "iy*", &writer, &sample_data))
         return NULL;
 
-    container.usample = sample_data.buf;
+    release_pins();
+
     assert(sample_data.len >= 0);
-    container.usample_size = (size_t)sample_data.len;
+    container_from_buffer(&container, &sample_data, false);
 
+    Py_BEGIN_ALLOW_THREADS
     sts = dds_dispose(writer, &container);
+    Py_END_ALLOW_THREADS
 
     PyBuffer_Release(&sample_data);
 
@@ -1073,11 +1338,14 @@ ddspy_dispose_ts(PyObject *self, PyObject *args)
     if (!PyArg_ParseTuple(args, "iy*L", &writer, &sample_data, &time))
         return NULL;
 
-    container.usample = sample_data.buf;
+    release_pins();
+
     assert(sample_data.len >= 0);
-    container.usample_size = (size_t)sample_data.len;
+    container_from_buffer(&container, &sample_data, false);
 
+    Py_BEGIN_ALLOW_THREADS
     sts = dds_dispose_ts(writer, &container, time);
+    Py_END_ALLOW_THREADS
 
     PyBuffer_Release(&sample_data);
 
@@ -1096,11 +1364,14 @@ ddspy_writedispose(PyObject *self, PyObject *args)
     if (!PyArg_ParseTuple(args, "iy*", &writer, &sample_data))
         return NULL;
 
-    container.usample = sample_data.buf;
+    release_pins();
+
     assert(sample_data.len >= 0);
-    container.usample_size = (size_t)sample_data.len;
+    container_from_buffer(&container, &sample_data, false);
 
+    Py_BEGIN_ALLOW_THREADS
     sts = dds_writedispose(writer, &container);
+    Py_END_ALLOW_THREADS
 
     PyBuffer_Release(&sample_data);
 
@@ -1120,11 +1391,14 @@ ddspy_writedispose_ts(PyObject *self, PyObject *args)
     if (!PyArg_ParseTuple(args, "iy*L", &writer, &sample_data, &time))
         return NULL;
 
-    container.usample = sample_data.buf;
+    release_pins();
+
     assert(sample_data.len >= 0);
-    container.usample_size = (size_t)sample_data.len;
+    container_from_buffer(&container, &sample_data, false);
 
+    Py_BEGIN_ALLOW_THREADS
     sts = dds_writedispose_ts(writer, &container, time);
+    Py_END_ALLOW_THREADS
 
     PyBuffer_Release(&sample_data);
 
@@ -1142,7 +1416,11 @@ ddspy_dispose_handle(PyObject *self, PyObject *args)
     if (!PyArg_ParseTuple(args, "iK", &writer, &handle))
         return NULL;
 
+    release_pins();
+
+    Py_BEGIN_ALLOW_THREADS
     sts = dds_dispose_ih(writer, handle);
+    Py_END_ALLOW_THREADS
 
     return PyLong_FromLong((long) sts);
 }
@@ -1159,34 +1437,15 @@ ddspy_dispose_handle_ts(PyObject *self, PyObject *args)
     if (!PyArg_ParseTuple(args, "iKL", &writer, &handle, &time))
         return NULL;
 
+    release_pins();
+
+    Py_BEGIN_ALLOW_THREADS
     sts = dds_dispose_ih_ts(writer, handle, time);
+    Py_END_ALLOW_THREADS
 
     return PyLong_FromLong((long) sts);
 }
 
-static PyObject * sampleinfo_descriptor;
-
-static PyObject* get_sampleinfo_pyobject(dds_sample_info_t *sampleinfo)
-{
-    PyObject* arguments = Py_BuildValue("IIIOLKKkkkkk",
-        sampleinfo->sample_state,
-        sampleinfo->view_state,
-        sampleinfo->instance_state,
-        (sampleinfo->valid_data > 0) ? Py_True : Py_False,
-        sampleinfo->source_timestamp,
-        sampleinfo->instance_handle,
-        sampleinfo->publication_handle,
-        sampleinfo->disposed_generation_count,
-        sampleinfo->no_writers_generation_count,
-        sampleinfo->sample_rank,
-        sampleinfo->generation_rank,
-        sampleinfo->absolute_generation_rank
-    );
-    PyObject *pysampleinfo = PyObject_CallObject(sampleinfo_descriptor, arguments);
-    Py_DECREF(arguments);
-    return pysampleinfo;
-}
-
 static inline uint32_t
 check_number_of_samples(long long n)
 {
@@ -1227,15 +1486,20 @@ ddspy_read(PyObject *self, PyObject *args)
         container[i].usample = NULL;
     }
 
+    Py_BEGIN_ALLOW_THREADS
     sts = dds_read(reader, (void**) rcontainer, info, Nu32, Nu32);
+    Py_END_ALLOW_THREADS
     if (sts < 0) {
+        dds_free(info);
+        dds_free(container);
+        dds_free(rcontainer);
         return PyLong_FromLong((long) sts);
     }
 
     PyObject* list = PyList_New(sts);
 
     for(int i = 0; i < (sts > N ? N : sts); ++i) {
-        PyObject* sampleinfo = get_sampleinfo_pyobject(&info[i]);
+        PyObject* sampleinfo = ddspy_sampleinfo_new(&info[i]);
         PyObject* item = Py_BuildValue("(y#O)", container[i].usample, container[i].usample_size, sampleinfo);
         PyList_SetItem(list, i, item); // steals ref
         Py_DECREF(sampleinfo);
@@ -1272,15 +1536,20 @@ ddspy_take(PyObject *self, PyObject *args)
         container[i].usample = NULL;
     }
 
+    Py_BEGIN_ALLOW_THREADS
     sts = dds_take(reader, (void**) rcontainer, info, Nu32, Nu32);
+    Py_END_ALLOW_THREADS
     if (sts < 0) {
+        dds_free(info);
+        dds_free(container);
+        dds_free(rcontainer);
         return PyLong_FromLong((long) sts);
     }
 
     PyObject* list = PyList_New(sts);
 
     for(int i = 0; i < (sts > N ? N : sts); ++i) {
-        PyObject* sampleinfo = get_sampleinfo_pyobject(&info[i]);
+        PyObject* sampleinfo = ddspy_sampleinfo_new(&info[i]);
         PyObject* item = Py_BuildValue("(y#O)", container[i].usample, container[i].usample_size, sampleinfo);
         PyList_SetItem(list, i, item); // steals ref
         Py_DECREF(sampleinfo);
@@ -1318,15 +1587,20 @@ ddspy_read_handle(PyObject *self, PyObject *args)
         container[i].usample = NULL;
     }
 
+    Py_BEGIN_ALLOW_THREADS
     sts = dds_read_instance(reader, (void**)rcontainer, info, Nu32, Nu32, handle);
+    Py_END_ALLOW_THREADS
     if (sts < 0) {
+        dds_free(info);
+        dds_free(container);
+        dds_free(rcontainer);
         return PyLong_FromLong((long) sts);
     }
 
     PyObject* list = PyList_New(sts);
 
     for(uint32_t i = 0; i < ((uint32_t)sts > Nu32 ? Nu32 : (uint32_t)sts); ++i) {
-        PyObject* sampleinfo = get_sampleinfo_pyobject(&info[i]);
+        PyObject* sampleinfo = ddspy_sampleinfo_new(&info[i]);
         PyObject* item = Py_BuildValue("(y#O)", container[i].usample, container[i].usample_size, sampleinfo);
         PyList_SetItem(list, i, item); // steals ref
         Py_DECREF(sampleinfo);
@@ -1364,15 +1638,20 @@ ddspy_take_handle(PyObject *self, PyObject *args)
         container[i].usample = NULL;
     }
 
+    Py_BEGIN_ALLOW_THREADS
     sts = dds_take_instance(reader, (void**) rcontainer, info, Nu32, Nu32, handle);
+    Py_END_ALLOW_THREADS
     if (sts < 0) {
+        dds_free(info);
+        dds_free(container);
+        dds_free(rcontainer);
         return PyLong_FromLong((long) sts);
     }
 
     PyObject* list = PyList_New(sts);
 
     for(uint32_t i = 0; i < ((uint32_t)sts > Nu32 ? Nu32 : (uint32_t)sts); ++i) {
-        PyObject* sampleinfo = get_sampleinfo_pyobject(&info[i]);
+        PyObject* sampleinfo = ddspy_sampleinfo_new(&info[i]);
         PyObject* item = Py_BuildValue("(y#O)", container[i].usample, container[i].usample_size, sampleinfo);
         PyList_SetItem(list, i, item); // steals ref
         Py_DECREF(sampleinfo);
@@ -1386,6 +1665,321 @@ ddspy_take_handle(PyObject *self, PyObject *args)
 }
 
 
+
+// Python refcount: holds one reference to the serdata, dropped on dealloc.
+typedef struct ddspy_serdata_loan {
+    PyObject_HEAD
+    ddsi_serdata_t* serdata;
+} ddspy_serdata_loan_t;
+
+static int serdata_loan_getbuffer(PyObject *self, Py_buffer *view, int flags)
+{
+    const ddspy_serdata_t* d = cserdata(((ddspy_serdata_loan_t*) self)->serdata);
+    return PyBuffer_FillInfo(view, self, d->data, (Py_ssize_t) d->data_size, 1, flags);
+}
+
+static void serdata_loan_dealloc(PyObject *self)
+{
+    ddsi_serdata_unref(((ddspy_serdata_loan_t*) self)->serdata);
+    Py_TYPE(self)->tp_free(self);
+}
+
+static PyBufferProcs serdata_loan_as_buffer = {
+    .bf_getbuffer = serdata_loan_getbuffer,
+    .bf_releasebuffer = NULL
+};
+
+static PyTypeObject ddspy_serdata_loan_type = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    .tp_name = "cyclonedds._clayer.SerdataLoan",
+    .tp_basicsize = sizeof(ddspy_serdata_loan_t),
+    .tp_itemsize = 0,
+    .tp_dealloc = serdata_loan_dealloc,
+    .tp_as_buffer = &serdata_loan_as_buffer,
+    .tp_flags = Py_TPFLAGS_DEFAULT,
+    .tp_doc = "Read-only view on the serialized data of a received sample, without copying it.",
+};
+
+static PyObject* serdata_loan_memoryview(ddsi_serdata_t* serdata)
+{
+    ddspy_serdata_loan_t* loan = PyObject_New(ddspy_serdata_loan_t, &ddspy_serdata_loan_type);
+    if (loan == NULL) {
+        ddsi_serdata_unref(serdata);
+        return NULL;
+    }
+    loan->serdata = serdata;
+
+    PyObject* view = PyMemoryView_FromObject((PyObject*) loan);
+    Py_DECREF(loan);
+    return view;
+}
+
+static PyObject *
+ddspy_readtake_loan(PyObject *args, bool take)
+{
+    uint32_t Nu32;
+    long long N;
+    dds_entity_t reader;
+    dds_return_t sts;
+    uint32_t mask;
+    PyObject* handlepy;
+    dds_instance_handle_t handle = DDS_HANDLE_NIL;
+
+    if (!PyArg_ParseTuple(args, "iLIO", &reader, &N, &mask, &handlepy))
+        return NULL;
+    if (handlepy != Py_None) {
+        handle = PyLong_AsUnsignedLongLong(handlepy);
+        if (PyErr_Occurred()) return NULL;
+    }
+    if (!(Nu32 = check_number_of_samples(N)))
+        return NULL;
+
+    dds_sample_info_t* info = dds_alloc(sizeof(dds_sample_info_t) * Nu32);
+    struct ddsi_serdata** rserdata = dds_alloc(sizeof(struct ddsi_serdata*) * Nu32);
+
+    if (!info || !rserdata) {
+        dds_free(info);
+        dds_free(rserdata);
+        return PyErr_NoMemory();
+    }
+
+    Py_BEGIN_ALLOW_THREADS
+    if (handle != DDS_HANDLE_NIL) {
+        if (take)
+            sts = dds_takecdr_instance(reader, rserdata, Nu32, info, handle, mask);
+        else
+            sts = dds_readcdr_instance(reader, rserdata, Nu32, info, handle, mask);
+    } else {
+        if (take)
+            sts = dds_takecdr(reader, rserdata, Nu32, info, mask);
+        else
+            sts = dds_readcdr(reader, rserdata, Nu32, info, mask);
+    }
+    Py_END_ALLOW_THREADS
+
+    if (sts < 0) {
+        dds_free(info);
+        dds_free(rserdata);
+        return PyLong_FromLong((long) sts);
+    }
+
+    PyObject* list = PyList_New(sts);
+    uint32_t i = 0;
+
+    // Every serdata reference we got is either handed to a loan object or dropped here
+    for (; list != NULL && i < (uint32_t)sts; ++i) {
+        PyObject* data = serdata_loan_memoryview(rserdata[i]);
+        PyObject* sampleinfo = data ? ddspy_sampleinfo_new(&info[i]) : NULL;
+        PyObject* item = sampleinfo ? PyTuple_Pack(2, data, sampleinfo) : NULL;
+        Py_XDECREF(data);
+        Py_XDECREF(sampleinfo);
+        if (item == NULL) {
+            Py_CLEAR(list);
+            ++i;
+            break;
+        }
+        PyList_SET_ITEM(list, i, item); // steals ref
+    }
+    for (; i < (uint32_t)sts; ++i)
+        ddsi_serdata_unref(rserdata[i]);
+
+    dds_free(info);
+    dds_free(rserdata);
+
+    return list;
+}
+
+static PyObject *
+ddspy_read_loan(PyObject *self, PyObject *args)
+{
+    (void)self;
+    return ddspy_readtake_loan(args, false);
+}
+
+static PyObject *
+ddspy_take_loan(PyObject *self, PyObject *args)
+{
+    (void)self;
+    return ddspy_readtake_loan(args, true);
+}
+
+
+/* Query condition filters
+ *
+ * The filter of dds_create_querycondition does not take an argument, so compiled queries are bound to one of
+ * a fixed set of filter functions that each evaluate the query in their own slot. The filters only look at the
+ * serialized sample and do not take the GIL. Slots are handed out and released while holding the GIL.
+ */
+
+#define DDSPY_QUERY_SLOTS 64
+#define DDSPY_QUERY_SLOT_CAPSULE "cyclonedds._clayer.query_slot"
+
+static cdr_query* query_slots[DDSPY_QUERY_SLOTS];
+static PyObject* query_slot_owners[DDSPY_QUERY_SLOTS];
+
+static inline bool query_slot_filter(int slot, const void* sample)
+{
+    const ddspy_sample_container_t* container = (const ddspy_sample_container_t*) sample;
+    const cdr_query* query = query_slots[slot];
+    return query != NULL && cdr_query_eval(query, (const uint8_t*) container->usample, container->usample_size);
+}
+
+#define QUERY_FILTER(p, k) \
+    static bool query_filter_##p##_##k(const void* sample) { return query_slot_filter(p * 8 + k, sample); }
+#define QUERY_FILTERS(p) \
+    QUERY_FILTER(p, 0) QUERY_FILTER(p, 1) QUERY_FILTER(p, 2) QUERY_FILTER(p, 3) \
+    QUERY_FILTER(p, 4) QUERY_FILTER(p, 5) QUERY_FILTER(p, 6) QUERY_FILTER(p, 7)
+#define QUERY_FILTER_REFS(p) \
+    query_filter_##p##_0, query_filter_##p##_1, query_filter_##p##_2, query_filter_##p##_3, \
+    query_filter_##p##_4, query_filter_##p##_5, query_filter_##p##_6, query_filter_##p##_7
+
+QUERY_FILTERS(0) QUERY_FILTERS(1) QUERY_FILTERS(2) QUERY_FILTERS(3)
+QUERY_FILTERS(4) QUERY_FILTERS(5) QUERY_FILTERS(6) QUERY_FILTERS(7)
+
+static dds_querycondition_filter_fn query_filters[DDSPY_QUERY_SLOTS] = {
+    QUERY_FILTER_REFS(0), QUERY_FILTER_REFS(1), QUERY_FILTER_REFS(2), QUERY_FILTER_REFS(3),
+    QUERY_FILTER_REFS(4), QUERY_FILTER_REFS(5), QUERY_FILTER_REFS(6), QUERY_FILTER_REFS(7)
+};
+
+static void query_slot_capsule_destructor(PyObject* capsule)
+{
+    cdr_query** slot = (cdr_query**) PyCapsule_GetPointer(capsule, DDSPY_QUERY_SLOT_CAPSULE);
+    if (slot == NULL) return;
+
+    ptrdiff_t i = slot - query_slots;
+    query_slots[i] = NULL;
+    Py_CLEAR(query_slot_owners[i]);
+}
+
+static PyObject *
+ddspy_query_bind(PyObject *self, PyObject *args)
+{
+    PyObject* query_capsule;
+    (void)self;
+
+    if (!PyArg_ParseTuple(args, "O", &query_capsule))
+        return NULL;
+
+    cdr_query* query = ddspy_query_from_capsule(query_capsule);
+    if (query == NULL)
+        return NULL;
+
+    for (int i = 0; i < DDSPY_QUERY_SLOTS; ++i) {
+        if (query_slot_owners[i] != NULL)
+            continue;
+
+        PyObject* slot = PyCapsule_New(&query_slots[i], DDSPY_QUERY_SLOT_CAPSULE, query_slot_capsule_destructor);
+        if (slot == NULL)
+            return NULL;
+
+        Py_INCREF(query_capsule);
+        query_slot_owners[i] = query_capsule;
+        query_slots[i] = query;
+        return Py_BuildValue("(NK)", slot, (unsigned long long) (uintptr_t) query_filters[i]);
+    }
+
+    // All slots are in use, the caller evaluates the query in python instead
+    Py_RETURN_NONE;
+}
+
+/* Content filtered topics
+ *
+ * Topic filters do take an argument, so the compiled query is passed directly. The caller keeps the query
+ * capsule alive for as long as the filter is set on the topic.
+ */
+
+static bool topic_query_filter(const void* sample, void* arg)
+{
+    const ddspy_sample_container_t* container = (const ddspy_sample_container_t*) sample;
+    return cdr_query_eval((const cdr_query*) arg, (const uint8_t*) container->usample, container->usample_size);
+}
+
+static PyObject *
+ddspy_topic_set_query_filter(PyObject *self, PyObject *args)
+{
+    dds_entity_t topic;
+    PyObject* query_capsule;
+    struct dds_topic_filter filter;
+    dds_return_t sts;
+    (void)self;
+
+    if (!PyArg_ParseTuple(args, "iO", &topic, &query_capsule))
+        return NULL;
+
+    if (query_capsule == Py_None) {
+        filter.mode = DDS_TOPIC_FILTER_NONE;
+        filter.f.sample_arg = NULL;
+        filter.arg = NULL;
+    } else {
+        cdr_query* query = ddspy_query_from_capsule(query_capsule);
+        if (query == NULL)
+            return NULL;
+        filter.mode = DDS_TOPIC_FILTER_SAMPLE_ARG;
+        filter.f.sample_arg = topic_query_filter;
+        filter.arg = query;
+    }
+
+    sts = dds_set_topic_filter_extended(topic, &filter);
+    return PyLong_FromLong((long) sts);
+}
+
+// Grab the buffers of a list of serialized samples up front so the calls into Cyclone can run without
+// the GIL. The exports hold a reference to the sample buffers so mutating the list meanwhile is harmless.
+static Py_buffer *
+acquire_sample_buffers(PyObject* samples, Py_ssize_t count)
+{
+    Py_buffer* sample_data = PyMem_Calloc(count > 0 ? (size_t)count : 1, sizeof(Py_buffer));
+    if (sample_data == NULL) {
+        PyErr_NoMemory();
+        return NULL;
+    }
+
+    for (Py_ssize_t i = 0; i < count; ++i) {
+        if (PyObject_GetBuffer(PyList_GET_ITEM(samples, i), &sample_data[i], PyBUF_SIMPLE) < 0) {
+            count = i;
+            goto err;
+        }
+        if (sample_data[i].len < 4) {
+            PyErr_SetString(PyExc_ValueError, "Serialized sample is too short to hold a header.");
+            count = i + 1;
+            goto err;
+        }
+    }
+    return sample_data;
+
+err:
+    for (Py_ssize_t i = 0; i < count; ++i)
+        PyBuffer_Release(&sample_data[i]);
+    PyMem_Free(sample_data);
+    return NULL;
+}
+
+static void
+release_sample_buffers(Py_buffer* sample_data, Py_ssize_t count)
+{
+    for (Py_ssize_t i = 0; i < count; ++i)
+        PyBuffer_Release(&sample_data[i]);
+    PyMem_Free(sample_data);
+}
+
+static PyObject *
+handles_to_list(const dds_instance_handle_t* handles, Py_ssize_t count)
+{
+    PyObject* list = PyList_New(count);
+    if (list == NULL)
+        return NULL;
+
+    for (Py_ssize_t i = 0; i < count; ++i) {
+        PyObject* handle = PyLong_FromUnsignedLongLong((unsigned long long) handles[i]);
+        if (handle == NULL) {
+            Py_DECREF(list);
+            return NULL;
+        }
+        PyList_SET_ITEM(list, i, handle);
+    }
+    return list;
+}
+
 static PyObject *
 ddspy_register_instance(PyObject *self, PyObject *args)
 {
@@ -1399,12 +1993,13 @@ ddspy_register_instance(PyObject *self, PyObject *args)
     if (!PyArg_ParseTuple(args, "iy*", &writer, &sample_data))
         return NULL;
 
-    container.usample = sample_data.buf;
     assert(sample_data.len >= 0);
     handle = 0;
-    container.usample_size = (size_t)sample_data.len;
+    container_from_buffer(&container, &sample_data, false);
 
+    Py_BEGIN_ALLOW_THREADS
     sts = dds_register_instance(writer, &handle, &container);
+    Py_END_ALLOW_THREADS
 
     PyBuffer_Release(&sample_data);
 
@@ -1415,6 +2010,51 @@ ddspy_register_instance(PyObject *self, PyObject *args)
 }
 
 
+static PyObject *
+ddspy_register_instances(PyObject *self, PyObject *args)
+{
+    dds_entity_t writer;
+    dds_return_t sts = 0;
+    ddspy_sample_container_t container;
+    PyObject* samples;
+    PyObject* list;
+    Py_ssize_t count, registered = 0;
+    Py_buffer* sample_data;
+    dds_instance_handle_t* handles;
+    (void)self;
+
+    if (!PyArg_ParseTuple(args, "iO!", &writer, &PyList_Type, &samples))
+        return NULL;
+
+    count = PyList_GET_SIZE(samples);
+    handles = PyMem_Calloc(count > 0 ? (size_t)count : 1, sizeof(dds_instance_handle_t));
+    if (handles == NULL)
+        return PyErr_NoMemory();
+
+    if ((sample_data = acquire_sample_buffers(samples, count)) == NULL) {
+        PyMem_Free(handles);
+        return NULL;
+    }
+
+    Py_BEGIN_ALLOW_THREADS
+    for (registered = 0; registered < count; ++registered) {
+        container_from_buffer(&container, &sample_data[registered], false);
+        sts = dds_register_instance(writer, &handles[registered], &container);
+        if (sts < 0)
+            break;
+    }
+    Py_END_ALLOW_THREADS
+
+    release_sample_buffers(sample_data, count);
+    list = handles_to_list(handles, registered);
+    PyMem_Free(handles);
+
+    if (list == NULL)
+        return NULL;
+    return Py_BuildValue("(Nl)", list, (long) sts);
+}
+
+
 static PyObject *
 ddspy_unregister_instance(PyObject *self, PyObject *args)
 {
@@ -1427,11 +2067,14 @@ ddspy_unregister_instance(PyObject *self, PyObject *args)
     if (!PyArg_ParseTuple(args, "iy*", &writer, &sample_data))
         return NULL;
 
-    container.usample = sample_data.buf;
+    release_pins();
+
     assert(sample_data.len >= 0);
-    container.usample_size = (size_t)sample_data.len;
+    container_from_buffer(&container, &sample_data, false);
 
+    Py_BEGIN_ALLOW_THREADS
     sts = dds_unregister_instance(writer, &container);
+    Py_END_ALLOW_THREADS
 
     PyBuffer_Release(&sample_data);
 
@@ -1450,7 +2093,11 @@ ddspy_unregister_instance_handle(PyObject *self, PyObject *args)
     if (!PyArg_ParseTuple(args, "iK", &writer, &handle))
         return NULL;
 
+    release_pins();
+
+    Py_BEGIN_ALLOW_THREADS
     sts = dds_unregister_instance_ih(writer, handle);
+    Py_END_ALLOW_THREADS
 
     return PyLong_FromLong((long) sts);
 }
@@ -1469,11 +2116,14 @@ ddspy_unregister_instance_ts(PyObject *self, PyObject *args)
     if (!PyArg_ParseTuple(args, "iy*L", &writer, &sample_data, &time))
         return NULL;
 
-    container.usample = sample_data.buf;
+    release_pins();
+
     assert(sample_data.len >= 0);
-    container.usample_size = (size_t)sample_data.len;
+    container_from_buffer(&container, &sample_data, false);
 
+    Py_BEGIN_ALLOW_THREADS
     sts = dds_unregister_instance_ts(writer, &container, time);
+    Py_END_ALLOW_THREADS
 
     PyBuffer_Release(&sample_data);
 
@@ -1493,7 +2143,11 @@ ddspy_unregister_instance_handle_ts(PyObject *self, PyObject *args)
     if (!PyArg_ParseTuple(args, "iKL", &writer, &handle, &time))
         return NULL;
 
+    release_pins();
+
+    Py_BEGIN_ALLOW_THREADS
     sts = dds_unregister_instance_ih_ts(writer, handle, time);
+    Py_END_ALLOW_THREADS
 
     return PyLong_FromLong((long) sts);
 }
@@ -1511,17 +2165,56 @@ ddspy_lookup_instance(PyObject *self, PyObject *args)
     if (!PyArg_ParseTuple(args, "iy*", &entity, &sample_data))
         return NULL;
 
-    container.usample = sample_data.buf;
     assert(sample_data.len >= 0);
-    container.usample_size = (size_t)sample_data.len;
+    container_from_buffer(&container, &sample_data, false);
 
+    Py_BEGIN_ALLOW_THREADS
     sts = dds_lookup_instance(entity, &container);
+    Py_END_ALLOW_THREADS
 
     PyBuffer_Release(&sample_data);
 
     return PyLong_FromUnsignedLongLong((unsigned long long) sts);
 }
 
+static PyObject *
+ddspy_lookup_instances(PyObject *self, PyObject *args)
+{
+    dds_entity_t entity;
+    ddspy_sample_container_t container;
+    PyObject* samples;
+    PyObject* list;
+    Py_ssize_t count;
+    Py_buffer* sample_data;
+    dds_instance_handle_t* handles;
+    (void)self;
+
+    if (!PyArg_ParseTuple(args, "iO!", &entity, &PyList_Type, &samples))
+        return NULL;
+
+    count = PyList_GET_SIZE(samples);
+    handles = PyMem_Calloc(count > 0 ? (size_t)count : 1, sizeof(dds_instance_handle_t));
+    if (handles == NULL)
+        return PyErr_NoMemory();
+
+    if ((sample_data = acquire_sample_buffers(samples, count)) == NULL) {
+        PyMem_Free(handles);
+        return NULL;
+    }
+
+    Py_BEGIN_ALLOW_THREADS
+    for (Py_ssize_t i = 0; i < count; ++i) {
+        container_from_buffer(&container, &sample_data[i], false);
+        handles[i] = dds_lookup_instance(entity, &container);
+    }
+    Py_END_ALLOW_THREADS
+
+    release_sample_buffers(sample_data, count);
+    list = handles_to_list(handles, count);
+    PyMem_Free(handles);
+    return list;
+}
+
 static PyObject *
 ddspy_read_next(PyObject *self, PyObject *args)
 {
@@ -1538,7 +2231,9 @@ ddspy_read_next(PyObject *self, PyObject *args)
 
     pt_container = &container;
 
+    Py_BEGIN_ALLOW_THREADS
     sts = dds_read_next(reader, (void**) &pt_container, &info);
+    Py_END_ALLOW_THREADS
     if (sts < 0) {
         return PyLong_FromLong((long) sts);
     }
@@ -1548,7 +2243,7 @@ ddspy_read_next(PyObject *self, PyObject *args)
         return Py_None;
     }
 
-    PyObject* sampleinfo = get_sampleinfo_pyobject(&info);
+    PyObject* sampleinfo = ddspy_sampleinfo_new(&info);
     PyObject* item = Py_BuildValue("(y#O)", container.usample, container.usample_size, sampleinfo);
     Py_DECREF(sampleinfo);
     dds_free(container.usample);
@@ -1572,7 +2267,9 @@ ddspy_take_next(PyObject *self, PyObject *args)
 
     pt_container = &container;
 
+    Py_BEGIN_ALLOW_THREADS
     sts = dds_take_next(reader, (void**) &pt_container, &info);
+    Py_END_ALLOW_THREADS
     if (sts < 0) {
         return PyLong_FromLong((long) sts);
     }
@@ -1582,7 +2279,7 @@ ddspy_take_next(PyObject *self, PyObject *args)
         return Py_None;
     }
 
-    PyObject* sampleinfo = get_sampleinfo_pyobject(&info);
+    PyObject* sampleinfo = ddspy_sampleinfo_new(&info);
     PyObject* item = Py_BuildValue("(y#O)", container.usample, container.usample_size, sampleinfo);
     Py_DECREF(sampleinfo);
     dds_free(container.usample);
@@ -1591,36 +2288,102 @@ ddspy_take_next(PyObject *self, PyObject *args)
 }
 
 
+// Runs the key VM on one serialized sample (with header) and returns the key as bytes. The
+// runner is reused between samples, so its workspace is cleared up to what the previous run used.
+static PyObject* run_key_vm(cdr_key_vm_runner* runner, PyObject* sample, size_t* used)
+{
+    Py_buffer sample_data;
+    if (PyObject_GetBuffer(sample, &sample_data, PyBUF_SIMPLE) < 0)
+        return NULL;
+    if (sample_data.len < 4) {
+        PyBuffer_Release(&sample_data);
+        PyErr_SetString(PyExc_ValueError, "Serialized sample is too short.");
+        return NULL;
+    }
+
+    memset(runner->header, 0, *used);
+    size_t enc = cdr_key_vm_run(runner, (const uint8_t*) sample_data.buf, (size_t)sample_data.len);
+    *used = enc;
+
+    PyBuffer_Release(&sample_data);
+
+    return Py_BuildValue("y#", (char*) runner->workspace, enc - 4);
+}
+
 static PyObject *
 ddspy_calc_key(PyObject *self, PyObject *args)
 {
     PyObject* idl;
-    Py_buffer sample_data;
+    PyObject* sample;
+    PyObject* capsule;
     int v2;
     (void)self;
 
-    if (!PyArg_ParseTuple(args, "Oy*p", &idl, &sample_data, &v2))
+    if (!PyArg_ParseTuple(args, "OOp", &idl, &sample, &v2))
         return NULL;
 
-    cdr_key_vm* vm = make_key_vm(idl, (bool)v2);
-
+    cdr_key_vm* vm = cached_key_vm(idl, (bool)v2, &capsule);
     if (vm == NULL) return NULL;
 
     cdr_key_vm_runner* runner = cdr_key_vm_create_runner(vm);
+    if (runner == NULL) {
+        Py_DECREF(capsule);
+        return PyErr_NoMemory();
+    }
 
-    size_t enc = cdr_key_vm_run(runner, (const uint8_t*) sample_data.buf, (size_t)sample_data.len);
-
-    PyBuffer_Release(&sample_data);
-
-    PyObject* returnv = Py_BuildValue("y#", (char*) runner->workspace, enc - 4);
+    size_t used = 0;
+    PyObject* returnv = run_key_vm(runner, sample, &used);
 
     dds_free(runner->header);
     dds_free(runner);
-    dds_free(vm->instructions);
-    dds_free(vm);
+    Py_DECREF(capsule);
     return returnv;
 }
 
+static PyObject *
+ddspy_calc_keys(PyObject *self, PyObject *args)
+{
+    PyObject* idl;
+    PyObject* samples;
+    PyObject* capsule;
+    int v2;
+    (void)self;
+
+    if (!PyArg_ParseTuple(args, "OOp", &idl, &samples, &v2))
+        return NULL;
+
+    PyObject* seq = PySequence_Fast(samples, "Expected a sequence of serialized samples.");
+    if (seq == NULL) return NULL;
+
+    cdr_key_vm* vm = cached_key_vm(idl, (bool)v2, &capsule);
+    if (vm == NULL) {
+        Py_DECREF(seq);
+        return NULL;
+    }
+
+    cdr_key_vm_runner* runner = cdr_key_vm_create_runner(vm);
+    Py_ssize_t len = PySequence_Fast_GET_SIZE(seq);
+    PyObject* keys = runner == NULL ? PyErr_NoMemory() : PyList_New(len);
+
+    size_t used = 0;
+    for (Py_ssize_t i = 0; keys != NULL && i < len; ++i) {
+        PyObject* key = run_key_vm(runner, PySequence_Fast_GET_ITEM(seq, i), &used);
+        if (key == NULL) {
+            Py_CLEAR(keys);
+            break;
+        }
+        PyList_SET_ITEM(keys, i, key);
+    }
+
+    if (runner != NULL) {
+        dds_free(runner->header);
+        dds_free(runner);
+    }
+    Py_DECREF(capsule);
+    Py_DECREF(seq);
+    return keys;
+}
+
 
 /* builtin topic */
 
@@ -1653,16 +2416,20 @@ ddspy_read_participant(PyObject *self, PyObject *args)
         rcontainer[i] = NULL;
     }
 
+    Py_BEGIN_ALLOW_THREADS
     sts = dds_read(reader, (void**) rcontainer, info, Nu32, Nu32);
+    Py_END_ALLOW_THREADS
 
     if (sts < 0) {
+        dds_free(info);
+        dds_free(rcontainer);
         return PyLong_FromLong((long) sts);
     }
 
     PyObject* list = PyList_New(sts);
 
     for(uint32_t i = 0; i < ((uint32_t)sts > Nu32 ? Nu32 : (uint32_t)sts); ++i) {
-        PyObject* sampleinfo = get_sampleinfo_pyobject(&info[i]);
+        PyObject* sampleinfo = ddspy_sampleinfo_new(&info[i]);
         if (PyErr_Occurred()) { return NULL; }
         PyObject* qos_p = PyLong_FromVoidPtr(rcontainer[i]->qos);
         if (PyErr_Occurred()) { return NULL; }
@@ -1707,15 +2474,19 @@ ddspy_take_participant(PyObject *self, PyObject *args)
         rcontainer[i] = NULL;
     }
 
+    Py_BEGIN_ALLOW_THREADS
     sts = dds_take(reader, (void**) rcontainer, info, Nu32, Nu32);
+    Py_END_ALLOW_THREADS
     if (sts < 0) {
+        dds_free(info);
+        dds_free(rcontainer);
         return PyLong_FromLong((long) sts);
     }
 
     PyObject* list = PyList_New(sts);
 
     for(uint32_t i = 0; i < ((uint32_t)sts > Nu32 ? Nu32 : (uint32_t)sts); ++i) {
-        PyObject* sampleinfo = get_sampleinfo_pyobject(&info[i]);
+        PyObject* sampleinfo = ddspy_sampleinfo_new(&info[i]);
         if (PyErr_Occurred()) { return NULL; }
         PyObject* qos_p = PyLong_FromVoidPtr(rcontainer[i]->qos);
         if (PyErr_Occurred()) { return NULL; }
@@ -1760,8 +2531,12 @@ ddspy_read_endpoint(PyObject *self, PyObject *args)
         rcontainer[i] = NULL;
     }
 
+    Py_BEGIN_ALLOW_THREADS
     sts = dds_read(reader, (void**) rcontainer, info, Nu32, Nu32);
+    Py_END_ALLOW_THREADS
     if (sts < 0) {
+        dds_free(info);
+        dds_free(rcontainer);
         return PyLong_FromLong((long) sts);
     }
 
@@ -1794,7 +2569,7 @@ ddspy_read_endpoint(PyObject *self, PyObject *args)
         Py_INCREF(type_id_bytes);
 #endif
 
-        PyObject* sampleinfo = get_sampleinfo_pyobject(&info[i]);
+        PyObject* sampleinfo = ddspy_sampleinfo_new(&info[i]);
         if (PyErr_Occurred()) { return NULL; }
         PyObject* qos_p = PyLong_FromVoidPtr(rcontainer[i]->qos);
         if (PyErr_Occurred()) { return NULL; }
@@ -1849,8 +2624,12 @@ ddspy_read_topic(PyObject *self, PyObject *args)
         rcontainer[i] = NULL;
     }
 
+    Py_BEGIN_ALLOW_THREADS
     sts = dds_read(reader, (void**) rcontainer, info, Nu32, Nu32);
+    Py_END_ALLOW_THREADS
     if (sts < 0) {
+        dds_free(info);
+        dds_free(rcontainer);
         return PyLong_FromLong((long) sts);
     }
 
@@ -1885,7 +2664,7 @@ ddspy_read_topic(PyObject *self, PyObject *args)
         Py_INCREF(type_id_bytes);
 #endif
 
-        PyObject* sampleinfo = get_sampleinfo_pyobject(&info[i]);
+        PyObject* sampleinfo = ddspy_sampleinfo_new(&info[i]);
         if (PyErr_Occurred()) { return NULL; }
         PyObject* qos_p = PyLong_FromVoidPtr(rcontainer[i]->qos);
         if (PyErr_Occurred()) { return NULL; }
@@ -1938,8 +2717,12 @@ ddspy_take_endpoint(PyObject *self, PyObject *args)
         rcontainer[i] = NULL;
     }
 
+    Py_BEGIN_ALLOW_THREADS
     sts = dds_take(reader, (void**) rcontainer, info, Nu32, Nu32);
+    Py_END_ALLOW_THREADS
     if (sts < 0) {
+        dds_free(info);
+        dds_free(rcontainer);
         return PyLong_FromLong((long) sts);
     }
 
@@ -1972,7 +2755,7 @@ ddspy_take_endpoint(PyObject *self, PyObject *args)
         Py_INCREF(type_id_bytes);
 #endif
 
-        PyObject* sampleinfo = get_sampleinfo_pyobject(&info[i]);
+        PyObject* sampleinfo = ddspy_sampleinfo_new(&info[i]);
         if (PyErr_Occurred()) {
             PyErr_Clear();
             PyErr_SetString(PyExc_Exception, "Sampleinfo errored.");
@@ -2053,8 +2836,12 @@ ddspy_take_topic(PyObject *self, PyObject *args)
         rcontainer[i] = NULL;
     }
 
+    Py_BEGIN_ALLOW_THREADS
     sts = dds_take(reader, (void**) rcontainer, info, Nu32, Nu32);
+    Py_END_ALLOW_THREADS
     if (sts < 0) {
+        dds_free(info);
+        dds_free(rcontainer);
         return PyLong_FromLong((long) sts);
     }
 
@@ -2089,7 +2876,7 @@ ddspy_take_topic(PyObject *self, PyObject *args)
         Py_INCREF(type_id_bytes);
 #endif
 
-        PyObject* sampleinfo = get_sampleinfo_pyobject(&info[i]);
+        PyObject* sampleinfo = ddspy_sampleinfo_new(&info[i]);
         if (PyErr_Occurred()) {
             PyErr_Clear();
             PyErr_SetString(PyExc_Exception, "Sampleinfo errored.");
@@ -2213,6 +3000,14 @@ PyMethodDef ddspy_funcs[] = {
 		(PyCFunction)ddspy_calc_key,
 		METH_VARARGS,
 		ddspy_docs},
+	{	"ddspy_calc_keys",
+		(PyCFunction)ddspy_calc_keys,
+		METH_VARARGS,
+		ddspy_docs},
+	{	"ddspy_key_vm_create",
+		(PyCFunction)ddspy_key_vm_create,
+		METH_VARARGS,
+		ddspy_docs},
     {	"ddspy_topic_create",
 		(PyCFunction)ddspy_topic_create,
 		METH_VARARGS,
@@ -2233,6 +3028,14 @@ PyMethodDef ddspy_funcs[] = {
 		(PyCFunction)ddspy_take_handle,
 		METH_VARARGS,
 		ddspy_docs},
+    {	"ddspy_read_loan",
+		(PyCFunction)ddspy_read_loan,
+		METH_VARARGS,
+		ddspy_docs},
+    {	"ddspy_take_loan",
+		(PyCFunction)ddspy_take_loan,
+		METH_VARARGS,
+		ddspy_docs},
     {	"ddspy_write",
 		(PyCFunction)ddspy_write,
 		METH_VARARGS,
@@ -2241,6 +3044,10 @@ PyMethodDef ddspy_funcs[] = {
 		(PyCFunction)ddspy_write_ts,
 		METH_VARARGS,
 		ddspy_docs},
+    {	"ddspy_write_many",
+		(PyCFunction)ddspy_write_many,
+		METH_VARARGS,
+		ddspy_docs},
     {	"ddspy_writedispose",
 		(PyCFunction)ddspy_writedispose,
 		METH_VARARGS,
@@ -2269,6 +3076,10 @@ PyMethodDef ddspy_funcs[] = {
 		(PyCFunction)ddspy_register_instance,
 		METH_VARARGS,
 		ddspy_docs},
+    {	"ddspy_register_instances",
+		(PyCFunction)ddspy_register_instances,
+		METH_VARARGS,
+		ddspy_docs},
     {	"ddspy_unregister_instance",
 		(PyCFunction)ddspy_unregister_instance,
 		METH_VARARGS,
@@ -2289,6 +3100,10 @@ PyMethodDef ddspy_funcs[] = {
         (PyCFunction)ddspy_lookup_instance,
         METH_VARARGS,
         ddspy_docs},
+    {   "ddspy_lookup_instances",
+        (PyCFunction)ddspy_lookup_instances,
+        METH_VARARGS,
+        ddspy_docs},
     {   "ddspy_read_next",
         (PyCFunction)ddspy_read_next,
         METH_VARARGS,
@@ -2321,6 +3136,46 @@ PyMethodDef ddspy_funcs[] = {
         (PyCFunction)ddspy_take_topic,
         METH_VARARGS,
         ddspy_docs},
+    {   "ddspy_codec_create",
+        (PyCFunction)ddspy_codec_create,
+        METH_VARARGS,
+        ddspy_docs},
+    {   "ddspy_codec_serialize",
+        (PyCFunction)ddspy_codec_serialize,
+        METH_VARARGS,
+        ddspy_docs},
+    {   "ddspy_codec_serialize_into",
+        (PyCFunction)ddspy_codec_serialize_into,
+        METH_VARARGS,
+        ddspy_docs},
+    {   "ddspy_codec_deserialize",
+        (PyCFunction)ddspy_codec_deserialize,
+        METH_VARARGS,
+        ddspy_docs},
+    {   "ddspy_codec_deserialize_fields",
+        (PyCFunction)ddspy_codec_deserialize_fields,
+        METH_VARARGS,
+        ddspy_docs},
+    {   "ddspy_query_create",
+        (PyCFunction)ddspy_query_create,
+        METH_VARARGS,
+        ddspy_docs},
+    {   "ddspy_query_evaluate",
+        (PyCFunction)ddspy_query_evaluate,
+        METH_VARARGS,
+        ddspy_docs},
+    {   "ddspy_query_bind",
+        (PyCFunction)ddspy_query_bind,
+        METH_VARARGS,
+        ddspy_docs},
+    {   "ddspy_topic_set_query_filter",
+        (PyCFunction)ddspy_topic_set_query_filter,
+        METH_VARARGS,
+        ddspy_docs},
+    {   "ddspy_sampleinfo_set_type",
+        (PyCFunction)ddspy_sampleinfo_set_type,
+        METH_O,
+        ddspy_docs},
 #ifdef DDS_HAS_TYPE_DISCOVERY
     {   "ddspy_get_typeobj",
         (PyCFunction)ddspy_get_typeobj,
@@ -2348,37 +3203,14 @@ PyModuleDef _clayer_mod = {
 
 
 PyMODINIT_FUNC PyInit__clayer(void) {
-    PyObject* import = PyImport_ImportModule("cyclonedds.internal");
-
-    if (PyErr_Occurred()) return NULL;
-    if (import == NULL) {
-        PyObject* msg = PyUnicode_FromString("Failed to import cyclonedds.internal to get SampleInfo cls.");
-        PyObject* name = PyUnicode_FromString("cyclonedds.internal");
-        PyObject* path = PyUnicode_FromString("cyclonedds.internal");
-        PyErr_SetImportError(msg, name, path);
-        Py_DECREF(msg);
-        Py_DECREF(name);
-        Py_DECREF(path);
-        return NULL;
-    }
-
-    sampleinfo_descriptor = PyObject_GetAttrString(import, "SampleInfo");
-
-    if (PyErr_Occurred()) return NULL;
-    if (sampleinfo_descriptor == NULL) {
-        PyObject* msg = PyUnicode_FromString("Failed to import cyclonedds.internal to get SampleInfo cls.");
-        PyObject* name = PyUnicode_FromString("cyclonedds.internal");
-        PyObject* path = PyUnicode_FromString("cyclonedds.internal");
-        PyErr_SetImportError(msg, name, path);
-        Py_DECREF(msg);
-        Py_DECREF(name);
-        Py_DECREF(path);
-        return NULL;
-    }
-    Py_DECREF(import);
+    if (PyType_Ready(&ddspy_sampleinfo_type) < 0) return NULL;
+    if (PyType_Ready(&ddspy_serdata_loan_type) < 0) return NULL;
 
     PyObject* module = PyModule_Create(&_clayer_mod);
 
+    Py_INCREF(&ddspy_sampleinfo_type);
+    PyModule_AddObject(module, "SampleInfo", (PyObject*) &ddspy_sampleinfo_type);
+
     PyModule_AddObject(module, "DDS_INFINITY", PyLong_FromLongLong(DDS_INFINITY));
     PyModule_AddObject(module, "UINT32_MAX", PyLong_FromUnsignedLong(UINT32_MAX));
 #ifdef DDS_HAS_TYPE_DISCOVERY
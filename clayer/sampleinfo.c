@@ -0,0 +1,347 @@
+/*
+ * Copyright(c) 2021 to 2022 ZettaScale Technology and others
+ *
+ * This program and the accompanying materials are made available under the
+ * terms of the Eclipse Public License v. 2.0 which is available at
+ * http://www.eclipse.org/legal/epl-2.0, or the Eclipse Distribution License
+ * v. 1.0 which is available at
+ * http://www.eclipse.org/org/documents/edl-v10.php.
+ *
+ * SPDX-License-Identifier: EPL-2.0 OR BSD-3-Clause
+ */
+
+#include "sampleinfo.h"
+
+typedef struct ddspy_sampleinfo {
+    PyObject_HEAD
+    dds_sample_info_t info;
+} ddspy_sampleinfo_t;
+
+typedef enum {
+    SampleInfoSampleState,
+    SampleInfoViewState,
+    SampleInfoInstanceState,
+    SampleInfoValidData,
+    SampleInfoSourceTimestamp,
+    SampleInfoInstanceHandle,
+    SampleInfoPublicationHandle,
+    SampleInfoDisposedGenerationCount,
+    SampleInfoNoWritersGenerationCount,
+    SampleInfoSampleRank,
+    SampleInfoGenerationRank,
+    SampleInfoAbsoluteGenerationRank,
+    SampleInfoNumFields
+} ddspy_sampleinfo_field_t;
+
+// In constructor (and so repr/pickle) order, matches the order of ddspy_sampleinfo_field_t
+static char* sampleinfo_field_names[] = {
+    "sample_state",
+    "view_state",
+    "instance_state",
+    "valid_data",
+    "source_timestamp",
+    "instance_handle",
+    "publication_handle",
+    "disposed_generation_count",
+    "no_writers_generation_count",
+    "sample_rank",
+    "generation_rank",
+    "absolute_generation_rank",
+    NULL
+};
+
+
+// Readers hand out instances of cyclonedds.internal.SampleInfo, the dataclass that subclasses this type
+static PyTypeObject* sampleinfo_instance_type = &ddspy_sampleinfo_type;
+
+PyObject* ddspy_sampleinfo_new(const dds_sample_info_t* info)
+{
+    PyTypeObject* type = sampleinfo_instance_type;
+    ddspy_sampleinfo_t* self = (ddspy_sampleinfo_t*) type->tp_alloc(type, 0);
+    if (self == NULL) return NULL;
+    self->info = *info;
+    return (PyObject*) self;
+}
+
+PyObject* ddspy_sampleinfo_set_type(PyObject* self, PyObject* type)
+{
+    (void)self;
+
+    if (!PyType_Check(type) || !PyType_IsSubtype((PyTypeObject*) type, &ddspy_sampleinfo_type)) {
+        PyErr_SetString(PyExc_TypeError, "Expected a subclass of SampleInfo.");
+        return NULL;
+    }
+
+    Py_INCREF(type);
+    PyTypeObject* old = sampleinfo_instance_type;
+    sampleinfo_instance_type = (PyTypeObject*) type;
+    if (old != &ddspy_sampleinfo_type)
+        Py_DECREF(old);
+    Py_RETURN_NONE;
+}
+
+static PyObject* sampleinfo_get(ddspy_sampleinfo_t* self, void* closure)
+{
+    const dds_sample_info_t* info = &self->info;
+
+    switch ((ddspy_sampleinfo_field_t) (intptr_t) closure) {
+    case SampleInfoSampleState:
+        return PyLong_FromUnsignedLong((unsigned long) info->sample_state);
+    case SampleInfoViewState:
+        return PyLong_FromUnsignedLong((unsigned long) info->view_state);
+    case SampleInfoInstanceState:
+        return PyLong_FromUnsignedLong((unsigned long) info->instance_state);
+    case SampleInfoValidData:
+        return PyBool_FromLong(info->valid_data);
+    case SampleInfoSourceTimestamp:
+        return PyLong_FromLongLong((long long) info->source_timestamp);
+    case SampleInfoInstanceHandle:
+        return PyLong_FromUnsignedLongLong((unsigned long long) info->instance_handle);
+    case SampleInfoPublicationHandle:
+        return PyLong_FromUnsignedLongLong((unsigned long long) info->publication_handle);
+    case SampleInfoDisposedGenerationCount:
+        return PyLong_FromUnsignedLong((unsigned long) info->disposed_generation_count);
+    case SampleInfoNoWritersGenerationCount:
+        return PyLong_FromUnsignedLong((unsigned long) info->no_writers_generation_count);
+    case SampleInfoSampleRank:
+        return PyLong_FromUnsignedLong((unsigned long) info->sample_rank);
+    case SampleInfoGenerationRank:
+        return PyLong_FromUnsignedLong((unsigned long) info->generation_rank);
+    case SampleInfoAbsoluteGenerationRank:
+        return PyLong_FromUnsignedLong((unsigned long) info->absolute_generation_rank);
+    default:
+        PyErr_SetString(PyExc_AttributeError, "Unknown SampleInfo field.");
+        return NULL;
+    }
+}
+
+static int sampleinfo_set(ddspy_sampleinfo_t* self, PyObject* value, void* closure)
+{
+    dds_sample_info_t* info = &self->info;
+    ddspy_sampleinfo_field_t field = (ddspy_sampleinfo_field_t) (intptr_t) closure;
+    unsigned long long u = 0;
+
+    if (value == NULL) {
+        PyErr_SetString(PyExc_AttributeError, "SampleInfo fields cannot be deleted.");
+        return -1;
+    }
+
+    if (field == SampleInfoValidData) {
+        int valid = PyObject_IsTrue(value);
+        if (valid < 0) return -1;
+        info->valid_data = valid != 0;
+        return 0;
+    } else if (field == SampleInfoSourceTimestamp) {
+        long long timestamp = PyLong_AsLongLong(value);
+        if (timestamp == -1 && PyErr_Occurred()) return -1;
+        info->source_timestamp = (dds_time_t) timestamp;
+        return 0;
+    }
+
+    u = PyLong_AsUnsignedLongLong(value);
+    if (u == (unsigned long long) -1 && PyErr_Occurred()) return -1;
+    if (field != SampleInfoInstanceHandle && field != SampleInfoPublicationHandle && u > UINT32_MAX) {
+        PyErr_SetString(PyExc_OverflowError, "SampleInfo field out of range.");
+        return -1;
+    }
+
+    switch (field) {
+    case SampleInfoSampleState:
+        info->sample_state = (dds_sample_state_t) u;
+        break;
+    case SampleInfoViewState:
+        info->view_state = (dds_view_state_t) u;
+        break;
+    case SampleInfoInstanceState:
+        info->instance_state = (dds_instance_state_t) u;
+        break;
+    case SampleInfoInstanceHandle:
+        info->instance_handle = (dds_instance_handle_t) u;
+        break;
+    case SampleInfoPublicationHandle:
+        info->publication_handle = (dds_instance_handle_t) u;
+        break;
+    case SampleInfoDisposedGenerationCount:
+        info->disposed_generation_count = (uint32_t) u;
+        break;
+    case SampleInfoNoWritersGenerationCount:
+        info->no_writers_generation_count = (uint32_t) u;
+        break;
+    case SampleInfoSampleRank:
+        info->sample_rank = (uint32_t) u;
+        break;
+    case SampleInfoGenerationRank:
+        info->generation_rank = (uint32_t) u;
+        break;
+    case SampleInfoAbsoluteGenerationRank:
+        info->absolute_generation_rank = (uint32_t) u;
+        break;
+    default:
+        PyErr_SetString(PyExc_AttributeError, "Unknown SampleInfo field.");
+        return -1;
+    }
+    return 0;
+}
+
+static PyObject* sampleinfo_as_tuple(ddspy_sampleinfo_t* self)
+{
+    PyObject* tuple = PyTuple_New(SampleInfoNumFields);
+    if (tuple == NULL) return NULL;
+
+    for (intptr_t i = 0; i < SampleInfoNumFields; ++i) {
+        PyObject* value = sampleinfo_get(self, (void*) i);
+        if (value == NULL) {
+            Py_DECREF(tuple);
+            return NULL;
+        }
+        PyTuple_SET_ITEM(tuple, i, value); // steals ref
+    }
+    return tuple;
+}
+
+static PyObject* sampleinfo_tp_new(PyTypeObject* type, PyObject* args, PyObject* kwargs)
+{
+    unsigned int sample_state, view_state, instance_state;
+    int valid_data;
+    long long source_timestamp;
+    unsigned long long instance_handle, publication_handle;
+    unsigned long disposed_generation_count, no_writers_generation_count;
+    unsigned long sample_rank, generation_rank, absolute_generation_rank;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "IIIpLKKkkkkk", sampleinfo_field_names,
+            &sample_state, &view_state, &instance_state, &valid_data, &source_timestamp,
+            &instance_handle, &publication_handle, &disposed_generation_count,
+            &no_writers_generation_count, &sample_rank, &generation_rank, &absolute_generation_rank))
+        return NULL;
+
+    ddspy_sampleinfo_t* self = (ddspy_sampleinfo_t*) type->tp_alloc(type, 0);
+    if (self == NULL) return NULL;
+
+    self->info.sample_state = (dds_sample_state_t) sample_state;
+    self->info.view_state = (dds_view_state_t) view_state;
+    self->info.instance_state = (dds_instance_state_t) instance_state;
+    self->info.valid_data = valid_data != 0;
+    self->info.source_timestamp = (dds_time_t) source_timestamp;
+    self->info.instance_handle = (dds_instance_handle_t) instance_handle;
+    self->info.publication_handle = (dds_instance_handle_t) publication_handle;
+    self->info.disposed_generation_count = (uint32_t) disposed_generation_count;
+    self->info.no_writers_generation_count = (uint32_t) no_writers_generation_count;
+    self->info.sample_rank = (uint32_t) sample_rank;
+    self->info.generation_rank = (uint32_t) generation_rank;
+    self->info.absolute_generation_rank = (uint32_t) absolute_generation_rank;
+
+    return (PyObject*) self;
+}
+
+static void sampleinfo_dealloc(PyObject* self)
+{
+    Py_TYPE(self)->tp_free(self);
+}
+
+static PyObject* sampleinfo_repr(ddspy_sampleinfo_t* self)
+{
+    PyObject* parts = PyList_New(SampleInfoNumFields);
+    if (parts == NULL) return NULL;
+
+    for (intptr_t i = 0; i < SampleInfoNumFields; ++i) {
+        PyObject* value = sampleinfo_get(self, (void*) i);
+        if (value == NULL) {
+            Py_DECREF(parts);
+            return NULL;
+        }
+        PyObject* part = PyUnicode_FromFormat("%s=%R", sampleinfo_field_names[i], value);
+        Py_DECREF(value);
+        if (part == NULL) {
+            Py_DECREF(parts);
+            return NULL;
+        }
+        PyList_SET_ITEM(parts, i, part); // steals ref
+    }
+
+    PyObject* separator = PyUnicode_FromString(", ");
+    PyObject* joined = separator ? PyUnicode_Join(separator, parts) : NULL;
+    Py_XDECREF(separator);
+    Py_DECREF(parts);
+    if (joined == NULL) return NULL;
+
+    PyObject* repr = PyUnicode_FromFormat("SampleInfo(%U)", joined);
+    Py_DECREF(joined);
+    return repr;
+}
+
+static PyObject* sampleinfo_richcompare(PyObject* a, PyObject* b, int op)
+{
+    if ((op != Py_EQ && op != Py_NE) || !PyObject_TypeCheck(b, &ddspy_sampleinfo_type)) {
+        Py_RETURN_NOTIMPLEMENTED;
+    }
+
+    PyObject* ta = sampleinfo_as_tuple((ddspy_sampleinfo_t*) a);
+    PyObject* tb = ta ? sampleinfo_as_tuple((ddspy_sampleinfo_t*) b) : NULL;
+    PyObject* result = tb ? PyObject_RichCompare(ta, tb, op) : NULL;
+    Py_XDECREF(ta);
+    Py_XDECREF(tb);
+    return result;
+}
+
+static PyObject* sampleinfo_reduce(ddspy_sampleinfo_t* self, PyObject* Py_UNUSED(ignored))
+{
+    PyObject* fields = sampleinfo_as_tuple(self);
+    if (fields == NULL) return NULL;
+    return Py_BuildValue("(ON)", (PyObject*) Py_TYPE(self), fields);
+}
+
+static PyMethodDef sampleinfo_methods[] = {
+    {"__reduce__", (PyCFunction) sampleinfo_reduce, METH_NOARGS, NULL},
+    {NULL, NULL, 0, NULL}
+};
+
+#define SAMPLEINFO_FIELD(name, field, doc) \
+    {name, (getter) sampleinfo_get, (setter) sampleinfo_set, doc, (void*) (intptr_t) field}
+
+static PyGetSetDef sampleinfo_getset[] = {
+    SAMPLEINFO_FIELD("sample_state", SampleInfoSampleState,
+        "Possible values: :class:`SampleState<cyclonedds.core.SampleState>`"),
+    SAMPLEINFO_FIELD("view_state", SampleInfoViewState,
+        "Possible values: :class:`ViewState<cyclonedds.core.ViewState>`"),
+    SAMPLEINFO_FIELD("instance_state", SampleInfoInstanceState,
+        "Possible values: :class:`InstanceState<cyclonedds.core.InstanceState>`"),
+    SAMPLEINFO_FIELD("valid_data", SampleInfoValidData,
+        "Whether the sample contains data or only carries a change of instance state"),
+    SAMPLEINFO_FIELD("source_timestamp", SampleInfoSourceTimestamp,
+        "The time (in unix nanoseconds) that the associated sample was written."),
+    SAMPLEINFO_FIELD("instance_handle", SampleInfoInstanceHandle,
+        "Handle to the data instance (if this is a keyed topic)"),
+    SAMPLEINFO_FIELD("publication_handle", SampleInfoPublicationHandle,
+        "Handle of the writer that wrote the sample"),
+    SAMPLEINFO_FIELD("disposed_generation_count", SampleInfoDisposedGenerationCount, NULL),
+    SAMPLEINFO_FIELD("no_writers_generation_count", SampleInfoNoWritersGenerationCount, NULL),
+    SAMPLEINFO_FIELD("sample_rank", SampleInfoSampleRank, NULL),
+    SAMPLEINFO_FIELD("generation_rank", SampleInfoGenerationRank, NULL),
+    SAMPLEINFO_FIELD("absolute_generation_rank", SampleInfoAbsoluteGenerationRank, NULL),
+    {NULL, NULL, NULL, NULL, NULL}
+};
+
+PyDoc_STRVAR(sampleinfo_doc,
+"SampleInfo(sample_state, view_state, instance_state, valid_data, source_timestamp, instance_handle,\n"
+"           publication_handle, disposed_generation_count, no_writers_generation_count, sample_rank,\n"
+"           generation_rank, absolute_generation_rank)\n"
+"--\n"
+"\n"
+"Contains information about the associated data value. The attributes are only\n"
+"converted to Python objects when they are accessed.");
+
+PyTypeObject ddspy_sampleinfo_type = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    .tp_name = "cyclonedds._clayer.SampleInfo",
+    .tp_basicsize = sizeof(ddspy_sampleinfo_t),
+    .tp_itemsize = 0,
+    .tp_dealloc = sampleinfo_dealloc,
+    .tp_repr = (reprfunc) sampleinfo_repr,
+    .tp_hash = PyObject_HashNotImplemented,
+    .tp_flags = Py_TPFLAGS_DEFAULT | Py_TPFLAGS_BASETYPE,
+    .tp_doc = sampleinfo_doc,
+    .tp_richcompare = sampleinfo_richcompare,
+    .tp_methods = sampleinfo_methods,
+    .tp_getset = sampleinfo_getset,
+    .tp_new = sampleinfo_tp_new,
+};
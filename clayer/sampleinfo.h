@@ -0,0 +1,30 @@
+/*
+ * Copyright(c) 2021 to 2022 ZettaScale Technology and others
+ *
+ * This program and the accompanying materials are made available under the
+ * terms of the Eclipse Public License v. 2.0 which is available at
+ * http://www.eclipse.org/legal/epl-2.0, or the Eclipse Distribution License
+ * v. 1.0 which is available at
+ * http://www.eclipse.org/org/documents/edl-v10.php.
+ *
+ * SPDX-License-Identifier: EPL-2.0 OR BSD-3-Clause
+ */
+
+#ifndef DDSPY_SAMPLEINFO_H
+#define DDSPY_SAMPLEINFO_H
+
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+
+#include "dds/dds.h"
+
+// Base of cyclonedds.internal.SampleInfo: keeps a copy of the dds_sample_info_t and
+// only converts fields to Python objects when they are accessed.
+extern PyTypeObject ddspy_sampleinfo_type;
+
+PyObject* ddspy_sampleinfo_new(const dds_sample_info_t* info);
+
+// Make ddspy_sampleinfo_new create instances of a subclass (METH_O)
+PyObject* ddspy_sampleinfo_set_type(PyObject* self, PyObject* type);
+
+#endif
@@ -10,12 +10,13 @@
  * SPDX-License-Identifier: EPL-2.0 OR BSD-3-Clause
 """
 
-from . import internal, util, qos, core, domain, topic, pub, sub, builtin, dynamic, idl
+from . import internal, util, qos, query, core, domain, topic, pub, sub, builtin, dynamic, idl
 
 __all__ = [
     "internal",
     "util",
     "qos",
+    "query",
     "core",
     "domain",
     "topic",
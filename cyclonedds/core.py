@@ -16,10 +16,13 @@ import asyncio
 import concurrent
 import ctypes as ct
 from weakref import WeakValueDictionary
-from typing import Any, Callable, Dict, Optional, List, TYPE_CHECKING
+from typing import Any, Callable, Dict, Iterable, Optional, List, TYPE_CHECKING
 
 from .internal import c_call, c_callable, dds_infinity, dds_c_t, DDS
 from .qos import Qos, Policy, _CQos
+from .query import Expression, compile_query
+
+from cyclonedds._clayer import ddspy_query_bind
 
 
 if TYPE_CHECKING:
@@ -799,6 +802,39 @@ _on_subscription_matched_fn = c_callable(
 )
 
 
+def _representation_version_2(entity: Entity) -> Optional[bool]:
+    # The XCDR version the data representation QoS of a reader or writer asks for, None lets the datatype decide
+    cqos = _CQos.cqos_create()
+    try:
+        if entity._get_qos(entity._ref, cqos) != 0:
+            return None
+        policy = _CQos._get_p_datarepresentation(cqos)
+    finally:
+        _CQos.cqos_destroy(cqos)
+
+    if policy is None or (policy.use_cdrv0_representation and policy.use_xcdrv2_representation):
+        return None
+    return policy.use_xcdrv2_representation
+
+
+def _serialize_samples(data_type: type, samples: Iterable[Any], use_version_2: Optional[bool]) -> List[bytes]:
+    # Not serialize_view: that reuses its buffer, while all samples have to stay around for a bulk call.
+    # Samples that were already serialized are taken as they are, all are zero padded to a multiple of four
+    # like serialize_view does, so the bulk calls hand Cyclone the same data as the calls for a single sample.
+    serialized = []
+    for sample in samples:
+        if isinstance(sample, (bytes, bytearray)):
+            ser = sample
+        elif isinstance(sample, memoryview):
+            ser = sample.tobytes()
+        elif isinstance(sample, data_type):
+            ser = sample.__idl__.serialize(sample, use_version_2=use_version_2)
+        else:
+            raise TypeError(f"{sample} is not of type {data_type}")
+        serialized.append(ser.ljust((len(ser) + 3) & ~3, b'\0'))
+    return serialized
+
+
 def _is_override(func):
     obj = func.__self__
     if type(obj) == Listener:
@@ -1546,19 +1582,43 @@ _querycondition_filter_fn = c_callable(ct.c_bool, [ct.c_void_p])
 class QueryCondition(_Condition):
     """Condition that triggers when new data is available to read according to the mask.
     Construct a mask using InstanceState, ViewState and SampleState. Add a filter function
-    that receives the sample and returns a boolean whether to accept or reject the sample.
+    that receives the sample and returns a boolean whether to accept or reject the sample,
+    or a :class:`query expression<cyclonedds.query.Expression>` on the members of the sample.
+
+    Expressions that only refer to primitive members at a fixed offset in the serialized data
+    are evaluated in C on the serialized sample, without deserializing it or taking the GIL.
+    Other expressions, and a filter function, are called from Python for every sample.
+
+    .. code-block:: python
+
+        QueryCondition(reader, mask, where=(Field("sensor_id") == 7) & (Field("value") > 3.0))
     """
 
     def __init__(
         self,
         reader: "cyclonedds.sub.DataReader",
         mask: int,
-        filter: Callable[[Any], bool],
+        filter: Optional[Callable[[Any], bool]] = None,
+        where: Optional[Expression] = None
     ) -> None:
         """Construct a QueryCondition."""
+        if (filter is None) == (where is None):
+            raise TypeError("A QueryCondition takes either a filter function or a where expression.")
+
         self.reader = reader
         self.mask = mask
-        self.filter = filter
+        self.filter = filter or where
+        self.where = where
+
+        if where is not None:
+            query = compile_query(where, reader._topic.data_type)
+            binding = ddspy_query_bind(query) if query is not None else None
+            if binding is not None:
+                # The slot keeps the compiled query bound to the C filter until this condition is gone
+                self._query_slot, address = binding
+                self._filter = _querycondition_filter_fn(address)
+                super().__init__(self._create_querycondition(reader._ref, mask, self._filter))
+                return
 
         def call(sample_pt):
             try:
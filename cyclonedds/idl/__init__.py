@@ -25,19 +25,24 @@ _TIE = TypeVar('_TIE', bound='IdlEnum')
 
 
 class IdlStruct(metaclass=IdlMeta):
+    # Subclasses created with slots=True have no instance __dict__ at all
+    __slots__ = ()
+
     def serialize(self, buffer: Optional[Buffer] = None, endianness: Optional[Endianness] = None, use_version_2: Optional[bool] = None) -> bytes:
         return self.__idl__.serialize(self, buffer=buffer, endianness=endianness, use_version_2=use_version_2)
 
     @classmethod
-    def deserialize(cls: Type[_TIS], data: bytes, has_header: bool = True, use_version_2: Optional[bool] = None) -> _TIS:
-        return cls.__idl__.deserialize(data, has_header=has_header, use_version_2=use_version_2)
+    def deserialize(cls: Type[_TIS], data: bytes, has_header: bool = True, use_version_2: Optional[bool] = None,
+                    fields: Optional[Sequence[str]] = None, lazy: bool = False) -> _TIS:
+        return cls.__idl__.deserialize(data, has_header=has_header, use_version_2=use_version_2, fields=fields,
+                                       lazy=lazy)
 
 
 def make_idl_struct(class_name: str, typename: str, fields: Dict[str, Any], *, dataclassify=True,
                     field_annotations: Optional[Dict[str, Dict[str, Any]]] = None,
-                    bases: Tuple[Type[IdlStruct], ...] = ()) -> Type[IdlStruct]:
+                    bases: Tuple[Type[IdlStruct], ...] = (), slots: bool = False) -> Type[IdlStruct]:
     bases = tuple(list(*bases) + [IdlStruct])
-    namespace = IdlMeta.__prepare__(class_name, bases, typename=typename)
+    namespace = IdlMeta.__prepare__(class_name, bases, typename=typename, slots=slots)
 
     for fieldname, _type in fields.items():
         namespace['__annotations__'][fieldname] = _type
@@ -45,7 +50,7 @@ def make_idl_struct(class_name: str, typename: str, fields: Dict[str, Any], *, d
     if field_annotations:
         namespace['__idl_field_annotations__'] = field_annotations
 
-    cls = IdlMeta(class_name, bases, namespace)
+    cls = IdlMeta(class_name, bases, namespace, slots=slots)
     if dataclassify:
         cls = _dataclasses.dataclass(cls)
     return cls
@@ -158,8 +163,10 @@ class IdlUnion(metaclass=IdlUnionMeta):
         return self.__idl__.serialize(self, buffer=buffer, endianness=endianness, use_version_2=use_version_2)
 
     @classmethod
-    def deserialize(cls: Type[_TIU], data: bytes, has_header: bool = True, use_version_2: Optional[bool] = None) -> _TIU:
-        return cls.__idl__.deserialize(data, has_header=has_header, use_version_2=use_version_2)
+    def deserialize(cls: Type[_TIU], data: bytes, has_header: bool = True, use_version_2: Optional[bool] = None,
+                    fields: Optional[Sequence[str]] = None, lazy: bool = False) -> _TIU:
+        return cls.__idl__.deserialize(data, has_header=has_header, use_version_2=use_version_2, fields=fields,
+                                       lazy=lazy)
 
 
 def make_idl_union(class_name: str, typename: str, fields: Dict[str, ValidUnionHolder],
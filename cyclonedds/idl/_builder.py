@@ -11,6 +11,7 @@
 """
 
 from enum import Enum, IntFlag, auto
+from functools import partial
 from inspect import isclass
 from typing import Tuple, Type, Union
 
@@ -20,10 +21,11 @@ from ._type_normalize import get_idl_annotations, get_idl_field_annotations, get
 from ._machinery import Machine, NoneMachine, PrimitiveMachine, StringMachine, BytesMachine, ByteArrayMachine, UnionMachine, \
     ArrayMachine, SequenceMachine, InstanceMachine, MappingMachine, EnumMachine, StructMachine, OptionalMachine, CharMachine, \
     PLCdrMutableStructMachine, DelimitedCdrAppendableStructMachine, MutableMember, DelimitedCdrAppendableUnionMachine, \
-    PlainCdrV2ArrayOfPrimitiveMachine, PlainCdrV2SequenceOfPrimitiveMachine, LenType, BitMaskMachine, BitBoundEnumMachine
+    PlainCdrV2ArrayOfPrimitiveMachine, PlainCdrV2SequenceOfPrimitiveMachine, LenType, BitMaskMachine, BitBoundEnumMachine, \
+    NdArrayOfPrimitiveMachine, NdSequenceOfPrimitiveMachine, StringSequenceMachine, BytesSequenceMachine
 
 from .types import array, bounded_str, sequence, _type_code_align_size_default_mapping, NoneType, char, typedef, uint8, \
-    case, default
+    case, default, ndarray, ndsequence
 
 
 class XCDRSupported(IntFlag):
@@ -37,6 +39,8 @@ class Builder:
         char: CharMachine,
         str: StringMachine,
         bytes: BytesMachine,
+        # Decoded without copying, as slices of the received data
+        memoryview: partial(BytesMachine, as_view=True),
         bytearray: ByteArrayMachine,
         NoneType: NoneMachine,
         None: NoneMachine
@@ -106,6 +110,49 @@ class Builder:
         return XCDRSupported.SupportsBoth
 
 
+    @classmethod
+    def _sequence_machine(cls, submachine, maxlen=None, add_size_header=False):
+        if type(submachine) is StringMachine:
+            return StringSequenceMachine(submachine, maxlen=maxlen, add_size_header=add_size_header)
+        elif type(submachine) is BytesMachine:
+            return BytesSequenceMachine(submachine, maxlen=maxlen, add_size_header=add_size_header)
+        return SequenceMachine(submachine, maxlen=maxlen, add_size_header=add_size_header)
+
+    @classmethod
+    def _array_machine(cls, _type, add_size_header, use_version_2):
+        submachine = cls._machine_for_type(_type.subtype, add_size_header, use_version_2)
+
+        if isinstance(submachine, PrimitiveMachine):
+            if submachine.type == uint8:
+                return ByteArrayMachine(_type.length)
+
+            return PlainCdrV2ArrayOfPrimitiveMachine(submachine.type, _type.length)
+
+        asubmachine = submachine
+        while isinstance(asubmachine, ArrayMachine):
+            asubmachine.add_size_header = False
+            asubmachine = asubmachine.submachine
+
+        if isinstance(asubmachine, (ByteArrayMachine, PlainCdrV2ArrayOfPrimitiveMachine, CharMachine)):
+            add_size_header = False
+
+        return ArrayMachine(
+            submachine,
+            size=_type.length,
+            add_size_header=add_size_header
+        )
+
+    @classmethod
+    def _nd_machine(cls, _type, add_size_header, use_version_2):
+        submachine = cls._machine_for_type(_type.subtype, add_size_header, use_version_2)
+
+        if not isinstance(submachine, PrimitiveMachine):
+            raise TypeError(f"{_type} must have a primitive element type.")
+
+        if isinstance(_type, ndarray):
+            return NdArrayOfPrimitiveMachine(submachine.type, _type.length)
+        return NdSequenceOfPrimitiveMachine(submachine.type, max_length=_type.max_length)
+
     @classmethod
     def _machine_for_type(cls, _type, add_size_header, use_version_2):
         if _type in cls.easy_types:
@@ -123,7 +170,7 @@ class Builder:
         elif isclass(_type) and (issubclass(_type, IdlBitmask)):
             return BitMaskMachine(_type, get_idl_annotations(_type)["bit_bound"])
         elif get_origin(_type) == list:
-            return SequenceMachine(
+            return cls._sequence_machine(
                 cls._machine_for_type(get_args(_type)[0], add_size_header, use_version_2),
                 add_size_header=add_size_header
             )
@@ -134,28 +181,10 @@ class Builder:
             )
         elif isinstance(_type, typedef):
             return cls._machine_for_type(_type.subtype, add_size_header, use_version_2)
+        elif isinstance(_type, (ndarray, ndsequence)):
+            return cls._nd_machine(_type, add_size_header, use_version_2)
         elif isinstance(_type, array):
-            submachine = cls._machine_for_type(_type.subtype, add_size_header, use_version_2)
-
-            if isinstance(submachine, PrimitiveMachine):
-                if submachine.type == uint8:
-                    return ByteArrayMachine(_type.length)
-
-                return PlainCdrV2ArrayOfPrimitiveMachine(submachine.type, _type.length)
-
-            asubmachine = submachine
-            while isinstance(asubmachine, ArrayMachine):
-                asubmachine.add_size_header = False
-                asubmachine = asubmachine.submachine
-
-            if isinstance(asubmachine, (ByteArrayMachine, PlainCdrV2ArrayOfPrimitiveMachine, CharMachine)):
-                add_size_header = False
-
-            return ArrayMachine(
-                submachine,
-                size=_type.length,
-                add_size_header=add_size_header
-            )
+            return cls._array_machine(_type, add_size_header, use_version_2)
         elif isinstance(_type, sequence):
             submachine = cls._machine_for_type(_type.subtype, add_size_header, use_version_2)
 
@@ -165,7 +194,7 @@ class Builder:
             if isinstance(submachine, (CharMachine)):
                 add_size_header = False
 
-            return SequenceMachine(
+            return cls._sequence_machine(
                 submachine,
                 maxlen=_type.max_length,
                 add_size_header=add_size_header
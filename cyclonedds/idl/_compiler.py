@@ -0,0 +1,375 @@
+"""
+ * Copyright(c) 2021 to 2022 ZettaScale Technology and others
+ *
+ * This program and the accompanying materials are made available under the
+ * terms of the Eclipse Public License v. 2.0 which is available at
+ * http://www.eclipse.org/legal/epl-2.0, or the Eclipse Distribution License
+ * v. 1.0 which is available at
+ * http://www.eclipse.org/org/documents/edl-v10.php.
+ *
+ * SPDX-License-Identifier: EPL-2.0 OR BSD-3-Clause
+"""
+
+import struct
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ._machinery import Machine, PrimitiveMachine, CharMachine, StringMachine, ByteArrayMachine, EnumMachine, \
+    BitBoundEnumMachine, BitMaskMachine, PlainCdrV2ArrayOfPrimitiveMachine, StructMachine, InstanceMachine
+
+
+class CompiledMachine:
+    """Flattened serializer/deserializer generated from a StructMachine tree.
+
+    Runs of consecutive fixed-size members (including nested final structs) are merged
+    into a single struct.Struct per endianness and per alignment phase, so a run is
+    encoded with a single pack_into and decoded with a single unpack_from. Members
+    that are not fixed-size delegate to their original machine.
+    """
+    def __init__(self, machine: Machine, serialize: Callable, deserialize: Callable, source: str):
+        self.machine = machine
+        self.serialize = serialize
+        self.deserialize = deserialize
+        self.source = source
+
+
+def _enum_value(value):
+    return value if type(value) == int else value.value
+
+
+def _enum_decode(enum, value):
+    try:
+        return enum(value)
+    except ValueError:
+        return value
+
+
+def _byte_array(value, size):
+    if len(value) != size:
+        raise Exception("Incorrectly sized array.")
+    return value
+
+
+class _Fixed:
+    """A member with a static size, expressed as struct entries (code, alignment, size, items)."""
+    def __init__(self, entries, pack, unpack):
+        self.entries: List[Tuple[str, int, int, int]] = entries
+        # pack(expr) -> list of argument expressions for pack_into
+        self.pack: Callable[[str], List[str]] = pack
+        # unpack(index) -> (expression using tuple 't', number of items consumed)
+        self.unpack: Callable[[int], Tuple[str, int]] = unpack
+
+
+class _Compiler:
+    def __init__(self, machine: StructMachine, use_version_2: bool):
+        self.machine = machine
+        self.align_max = 4 if use_version_2 else 8
+        self.use_version_2 = use_version_2
+        self.namespace: Dict[str, Any] = {
+            "_enum_value": _enum_value,
+            "_enum_decode": _enum_decode,
+            "_byte_array": _byte_array,
+            "_u32": {"<": struct.Struct("<I"), ">": struct.Struct(">I")}
+        }
+        self.counter = 0
+
+    def constant(self, value: Any) -> str:
+        name = f"_c{self.counter}"
+        self.counter += 1
+        self.namespace[name] = value
+        return name
+
+    def fixed(self, machine: Machine, seen: Tuple[type, ...]) -> Optional[_Fixed]:
+        if isinstance(machine, PrimitiveMachine):
+            return _Fixed(
+                [(machine.code, machine.alignment, machine.size, 1)],
+                lambda e: [e],
+                lambda i: (f"t[{i}]", 1)
+            )
+        elif isinstance(machine, CharMachine):
+            return _Fixed(
+                [('b', 1, 1, 1)],
+                lambda e: [f"ord({e})"],
+                lambda i: (f"chr(t[{i}])", 1)
+            )
+        elif isinstance(machine, EnumMachine):
+            enum = self.constant(machine.enum)
+            return _Fixed(
+                [('I', 4, 4, 1)],
+                lambda e: [f"_enum_value({e})"],
+                lambda i: (f"_enum_decode({enum}, t[{i}])", 1)
+            )
+        elif isinstance(machine, BitBoundEnumMachine):
+            enum = self.constant(machine.enum)
+            return _Fixed(
+                [(machine.code, machine.alignment, machine.size, 1)],
+                lambda e: [f"_enum_value({e})"],
+                lambda i: (f"_enum_decode({enum}, t[{i}])", 1)
+            )
+        elif isinstance(machine, BitMaskMachine):
+            mask = self.constant(machine.type)
+            return _Fixed(
+                [(machine.code, machine.alignment, machine.size, 1)],
+                lambda e: [f"{e}.as_mask()"],
+                lambda i: (f"{mask}.from_mask(t[{i}])", 1)
+            )
+        elif isinstance(machine, ByteArrayMachine):
+            size = machine.size
+            return _Fixed(
+                [(f"{size}s", 1, size, 1)],
+                lambda e: [f"_byte_array({e}, {size})"],
+                lambda i: (f"t[{i}]", 1)
+            )
+        elif type(machine) is PlainCdrV2ArrayOfPrimitiveMachine:
+            length = machine.length
+            return _Fixed(
+                [(machine.code, machine.alignment, machine.size, length)],
+                lambda e: [f"*{e}"],
+                lambda i: (f"list(t[{i}:{i + length}])", length)
+            )
+        elif isinstance(machine, InstanceMachine):
+            if machine.type in seen:
+                return None
+            idl = machine.type.__idl__
+            if idl.v0_machine is None:
+                idl.populate()
+            target = idl.v2_machine if self.use_version_2 else idl.v0_machine
+            if type(target) is not StructMachine:
+                return None
+            return self.fixed_struct(target, seen + (machine.type,))
+        return None
+
+    def fixed_struct(self, machine: StructMachine, seen: Tuple[type, ...]) -> Optional[_Fixed]:
+        members = []
+        for name, member_machine in machine.members_machines.items():
+            fixed = self.fixed(member_machine, seen)
+            if fixed is None:
+                return None
+            members.append((name, fixed))
+
+        cls = self.constant(machine.type)
+
+        def pack(e):
+            return sum((fixed.pack(f"{e}.{name}") for name, fixed in members), [])
+
+        def unpack(i):
+            start = i
+            args = []
+            for name, fixed in members:
+                expr, used = fixed.unpack(i)
+                args.append(f"{name}={expr}")
+                i += used
+            return f"{cls}({', '.join(args)})", i - start
+
+        return _Fixed(sum((fixed.entries for _, fixed in members), []), pack, unpack)
+
+    def run_structs(self, entries: List[Tuple[str, int, int, int]]) -> Tuple[str, int]:
+        # One struct per endianness and per possible start phase relative to the alignment
+        # origin, with the padding baked in as pad bytes.
+        phases = min(self.align_max, max(min(e[1], self.align_max) for e in entries))
+        variants = {}
+        for endian in "<>":
+            structs = []
+            for phase in range(phases):
+                fmt = endian
+                pos = phase
+                for code, alignment, size, _ in entries:
+                    alignment = min(alignment, self.align_max)
+                    padding = (alignment - pos % alignment) % alignment
+                    if padding:
+                        fmt += f"{padding}x"
+                    fmt += code
+                    pos += padding + size
+                structs.append(struct.Struct(fmt))
+            variants[endian] = tuple(structs)
+        return self.constant(variants), phases
+
+    def compile(self) -> CompiledMachine:
+        # Split the members into runs of fixed size members and standalone variable members
+        groups: List[Tuple[str, Any]] = []
+        for name, member_machine in self.machine.members_machines.items():
+            fixed = self.fixed(member_machine, (self.machine.type,))
+            if fixed is not None:
+                if groups and groups[-1][0] == "run":
+                    groups[-1][1].append((name, fixed))
+                else:
+                    groups.append(("run", [(name, fixed)]))
+            elif isinstance(member_machine, StringMachine):
+                groups.append(("string", (name, member_machine)))
+            else:
+                groups.append(("machine", (name, member_machine)))
+
+        ser = [
+            "def serialize(buffer, v):",
+            "    e = buffer._endian",
+            "    off = buffer._align_offset",
+            "    pos = buffer._pos",
+            "    b = buffer._bytes",
+        ]
+        deser = [
+            "def deserialize(buffer):",
+            "    e = buffer._endian",
+            "    off = buffer._align_offset",
+            "    pos = buffer._pos",
+            "    b = buffer._bytes",
+        ]
+        results = []
+
+        for kind, content in groups:
+            if kind == "run":
+                entries = sum((fixed.entries for _, fixed in content), [])
+                structs, phases = self.run_structs(entries)
+                select = f"{structs}[e][(pos - off) & {phases - 1}]" if phases > 1 else f"{structs}[e][0]"
+                args = sum((fixed.pack(f"v.{name}") for name, fixed in content), [])
+                ser += [
+                    f"    s = {select}",
+                    "    if pos + s.size > buffer._size:",
+                    "        buffer._pos = pos",
+                    "        buffer.ensure_size(s.size)",
+                    "        b = buffer._bytes",
+                    f"    s.pack_into(b, pos, {', '.join(args)})",
+                    "    pos += s.size",
+                ]
+                deser += [
+                    f"    s = {select}",
+                    "    t = s.unpack_from(b, pos)",
+                    "    pos += s.size",
+                ]
+                i = 0
+                for name, fixed in content:
+                    expr, used = fixed.unpack(i)
+                    i += used
+                    deser.append(f"    m{len(results)} = {expr}")
+                    results.append(name)
+            elif kind == "string":
+                name, machine = content
+                if machine.bound:
+                    ser += [
+                        f"    if len(v.{name}) > {machine.bound}:",
+                        "        raise Exception(\"String longer than bound.\")",
+                    ]
+                ser += [
+                    f"    x = v.{name}.encode('utf-8')",
+                    "    n = len(x)",
+                    "    pos = ((pos - off + 3) & ~3) + off",
+                    "    if pos + n + 5 > buffer._size:",
+                    "        buffer._pos = pos",
+                    "        buffer.ensure_size(n + 5)",
+                    "        b = buffer._bytes",
+                    "    _u32[e].pack_into(b, pos, n + 1)",
+                    "    b[pos + 4:pos + 4 + n] = x",
+                    "    b[pos + 4 + n] = 0",
+                    "    pos += n + 5",
+                ]
+                deser += [
+                    "    pos = ((pos - off + 3) & ~3) + off",
+                    "    n = _u32[e].unpack_from(b, pos)[0]",
+                    f"    m{len(results)} = str(b[pos + 4:pos + 3 + n], 'utf-8')",
+                    "    pos += 4 + n",
+                ]
+                results.append(name)
+            else:
+                name, machine = content
+                m = self.constant(machine)
+                ser += [
+                    "    buffer._pos = pos",
+                    f"    {m}.serialize(buffer, v.{name})",
+                    "    pos = buffer._pos",
+                    "    b = buffer._bytes",
+                ]
+                deser += [
+                    "    buffer._pos = pos",
+                    f"    m{len(results)} = {m}.deserialize(buffer)",
+                    "    pos = buffer._pos",
+                ]
+                results.append(name)
+
+        cls = self.constant(self.machine.type)
+        ser.append("    buffer._pos = pos")
+        deser += [
+            "    buffer._pos = pos",
+            f"    return {cls}({', '.join(f'{name}=m{i}' for i, name in enumerate(results))})"
+        ]
+
+        source = "\n".join(ser) + "\n\n\n" + "\n".join(deser) + "\n"
+        namespace = dict(self.namespace)
+        exec(compile(source, f"<cyclonedds compiled {self.machine.type.__name__}>", "exec"), namespace)
+        return CompiledMachine(self.machine, namespace["serialize"], namespace["deserialize"], source)
+
+
+class PlainMachine:
+    """Serializer/deserializer for a final struct where every member (recursively) has a fixed size.
+
+    The whole sample, including the four byte encapsulation header and all padding, is one struct.Struct
+    per endianness, so a sample is encoded with a single pack and decoded with a single unpack_from
+    followed by the construction of the dataclass. The encoders take and return complete serialized
+    samples rather than working on a Buffer.
+    """
+    def __init__(self, machine: Machine, size: int, serialize: Callable, serialize_into: Callable,
+                 deserialize: Callable, source: str):
+        self.machine = machine
+        self.size = size
+        self.serialize = serialize
+        self.serialize_into = serialize_into
+        self.deserialize = deserialize
+        self.source = source
+
+
+def compile_plain(machine: Machine, use_version_2: bool, xcdrv2_head: int) -> Optional[PlainMachine]:
+    """Compile a final struct with only fixed size members into a PlainMachine. Returns None for all
+       other machines."""
+    if type(machine) is not StructMachine:
+        return None
+
+    compiler = _Compiler(machine, use_version_2)
+    fixed = compiler.fixed_struct(machine, (machine.type,))
+    if fixed is None:
+        return None
+
+    # The alignment origin is right after the header, padding is relative to that
+    fmt, pos = "2s2x", 0
+    for code, alignment, size, _ in fixed.entries:
+        alignment = min(alignment, compiler.align_max)
+        padding = (alignment - pos % alignment) % alignment
+        if padding:
+            fmt += f"{padding}x"
+        fmt += code
+        pos += padding + size
+    exact = {e: struct.Struct(e + fmt) for e in "<>"}
+    padded = {e: struct.Struct(e + fmt + f"{-(pos + 4) % 4}x") for e in "<>"}
+
+    flags = xcdrv2_head if use_version_2 else 0
+    header = compiler.constant({"<": bytes([0, flags | 1]), ">": bytes([0, flags])})
+    exact_name, padded_name = compiler.constant(exact), compiler.constant(padded)
+    args = ", ".join([f"{header}[e]"] + fixed.pack("v"))
+    construct, _ = fixed.unpack(1)
+
+    source = "\n".join([
+        "def serialize(v, e):",
+        f"    return {exact_name}[e].pack({args})",
+        "",
+        "",
+        "def serialize_into(b, v, e):",
+        f"    s = {padded_name}[e]",
+        "    if len(b) < s.size:",
+        "        b.extend(bytes(s.size - len(b)))",
+        f"    s.pack_into(b, 0, {args})",
+        "    return s.size",
+        "",
+        "",
+        "def deserialize(data, e):",
+        f"    t = {exact_name}[e].unpack_from(data, 0)",
+        f"    return {construct}",
+        ""
+    ])
+    namespace = dict(compiler.namespace)
+    exec(compile(source, f"<cyclonedds plain {machine.type.__name__}>", "exec"), namespace)
+    return PlainMachine(machine, pos + 4, namespace["serialize"], namespace["serialize_into"],
+                        namespace["deserialize"], source)
+
+
+def compile_machine(machine: Machine, use_version_2: bool) -> Optional[CompiledMachine]:
+    """Compile a top-level machine into a CompiledMachine. Returns None for machines that are not compiled,
+       these (appendable, mutable, unions) keep using the machine tree."""
+    if type(machine) is not StructMachine:
+        return None
+    return _Compiler(machine, use_version_2).compile()
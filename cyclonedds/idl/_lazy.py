@@ -0,0 +1,213 @@
+"""
+ * Copyright(c) 2021 to 2022 ZettaScale Technology and others
+ *
+ * This program and the accompanying materials are made available under the
+ * terms of the Eclipse Public License v. 2.0 which is available at
+ * http://www.eclipse.org/legal/epl-2.0, or the Eclipse Distribution License
+ * v. 1.0 which is available at
+ * http://www.eclipse.org/org/documents/edl-v10.php.
+ *
+ * SPDX-License-Identifier: EPL-2.0 OR BSD-3-Clause
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from ._support import Buffer
+from ._machinery import Machine, PrimitiveMachine, CharMachine, EnumMachine, BitBoundEnumMachine, BitMaskMachine, \
+    ByteArrayMachine, ArrayMachine, PlainCdrV2ArrayOfPrimitiveMachine, StructMachine, \
+    DelimitedCdrAppendableStructMachine, PLCdrMutableStructMachine, MustUnderstandFailure
+
+
+_missing = object()
+
+
+def _fixed_size(machine: Machine) -> Optional[Tuple[int, int]]:
+    """Alignment and size of members that always take the same number of bytes"""
+    if isinstance(machine, (PrimitiveMachine, BitBoundEnumMachine, BitMaskMachine, PlainCdrV2ArrayOfPrimitiveMachine)):
+        return machine.alignment, machine.size
+    elif isinstance(machine, EnumMachine):
+        return 4, 4
+    elif isinstance(machine, CharMachine):
+        return 1, 1
+    elif isinstance(machine, ByteArrayMachine):
+        return 1, machine.size
+    elif isinstance(machine, ArrayMachine) and not machine.add_size_header:
+        sub = _fixed_size(machine.submachine)
+        if sub is not None and sub[1] % sub[0] == 0:
+            return sub[0], sub[1] * machine.size
+    return None
+
+
+class LazySample:
+    """Base of the lazy view types generated per struct, see ``deserialize(data, lazy=True)``.
+
+    A view keeps the serialized sample and decodes a member on first access, after which the value is
+    cached. The start of every member is kept in an offset table: for a prefix of fixed size members it
+    is computed once per type, the start of later members is found by skipping over the members before
+    them the first time one of them is accessed.
+    """
+
+    __slots__ = ("_buffer", "_offsets", "_values", "_end", "_present", "sample_info")
+
+    _datatype: type
+    _names: Tuple[str, ...]
+    _static: Dict[Tuple[int, int, int], List[Optional[int]]]
+    _machine_v0: Machine
+    _machine_v2: Machine
+
+    def __init__(self, buffer: Buffer, use_version_2: bool) -> None:
+        self._buffer = buffer
+        self._values: List[Any] = [_missing] * len(self._names)
+        self._end: Optional[int] = None
+        self._present: Optional[Dict[str, Tuple[int, int]]] = None
+        self.sample_info = None
+
+        machine = self._machine_v2 if use_version_2 else self._machine_v0
+        if isinstance(machine, PLCdrMutableStructMachine):
+            buffer.align(4)
+            self._end = buffer.read('I', 4) + buffer.tell()
+            self._offsets: List[Optional[int]] = [buffer.tell()]
+            return
+
+        if isinstance(machine, DelimitedCdrAppendableStructMachine):
+            buffer.align(4)
+            self._end = buffer.read('I', 4) + buffer.tell()
+
+        key = (use_version_2, buffer.tell(), buffer._align_offset)
+        static = self._static.get(key)
+        if static is None:
+            static = self._static[key] = self._static_offsets(machine, buffer)
+        self._offsets = static + [None] * (len(self._names) + 1 - len(static))
+
+    @classmethod
+    def _static_offsets(cls, machine: Machine, buffer: Buffer) -> List[Optional[int]]:
+        pos = buffer.tell()
+        offsets: List[Optional[int]] = [pos]
+        for member_machine in cls._member_machines(machine):
+            fixed = _fixed_size(member_machine)
+            if fixed is None:
+                break
+            alignment = min(fixed[0], buffer._align_max)
+            pos = ((pos - buffer._align_offset + alignment - 1) & ~(alignment - 1)) + buffer._align_offset + fixed[1]
+            offsets.append(pos)
+        return offsets
+
+    @staticmethod
+    def _member_machines(machine: Machine) -> List[Machine]:
+        if isinstance(machine, StructMachine):
+            return list(machine.members_machines.values())
+        elif isinstance(machine, DelimitedCdrAppendableStructMachine):
+            return list(machine.member_machines.values())
+        return [m.machine for m in machine.mutablemembers]
+
+    def _get(self, index: int) -> Any:
+        value = self._values[index]
+        if value is _missing:
+            value = self._values[index] = self._decode(index)
+        return value
+
+    def _decode(self, index: int) -> Any:
+        buffer = self._buffer
+        machine = self._machine_v2 if buffer._align_max == 4 else self._machine_v0
+
+        if isinstance(machine, PLCdrMutableStructMachine):
+            return self._decode_mutable(machine, index)
+
+        machines = self._member_machines(machine)
+        offsets = self._offsets
+        start = index
+        while offsets[start] is None:
+            start -= 1
+
+        buffer.seek(offsets[start])
+        for i in range(start, index):
+            if self._end is not None and buffer.tell() >= self._end:
+                break
+            machines[i].skip(buffer)
+            offsets[i + 1] = buffer.tell()
+
+        if self._end is not None and buffer.tell() >= self._end:
+            # Not in the data sent by an older version of an appendable type
+            return machines[index].default_initialize()
+
+        value = machines[index].deserialize(buffer)
+        offsets[index + 1] = buffer.tell()
+        return value
+
+    def _decode_mutable(self, machine: PLCdrMutableStructMachine, index: int) -> Any:
+        buffer = self._buffer
+        if self._present is None:
+            # Find where every member starts by walking the EMHEADERs once
+            self._present = {}
+            buffer.seek(self._offsets[0])
+            while buffer.tell() < self._end:
+                buffer.align(4)
+                header = buffer.read('I', 4)
+                lc = (header >> 28) & 0x7
+                member = machine.mutmem_by_id.get(header & 0x0fffffff)
+                mpos = buffer.tell()
+                if member is not None:
+                    self._present[member.name] = (mpos, lc)
+                elif header >> 31:
+                    raise MustUnderstandFailure()
+                if lc < 4:
+                    buffer.seek(mpos + 2 ** lc)
+                else:
+                    size = buffer.read('I', 4)
+                    buffer.seek(mpos + 4 + size * (4 if lc == 6 else 8 if lc == 7 else 1))
+
+        member = machine.mutablemembers[index]
+        if member.name not in self._present:
+            return None if member.optional else member.machine.default_initialize()
+
+        pos, lc = self._present[member.name]
+        buffer.seek(pos + 4 if lc == 4 else pos)
+        return member.machine.deserialize(buffer)
+
+    def materialize(self) -> Any:
+        """Decode all members that were not accessed yet and return a regular instance of the struct."""
+        sample = self._datatype(**{name: self._get(i) for i, name in enumerate(self._names)})
+        if self.sample_info is not None:
+            sample.sample_info = self.sample_info
+        return sample
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, LazySample):
+            other = other.materialize()
+        return self.materialize() == other
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({', '.join(f'{n}={self._get(i)!r}' for i, n in enumerate(self._names))})"
+
+
+def _member_property(index: int, name: str) -> property:
+    return property(lambda self: self._get(index), doc=f"The {name} member, decoded on first access.")
+
+
+def lazy_type(datatype: type, machine_v0: Machine, machine_v2: Machine) -> type:
+    """Generate the lazy view type of a struct."""
+    machine = machine_v2 or machine_v0
+    if isinstance(machine, StructMachine):
+        names = tuple(machine.members_machines)
+    elif isinstance(machine, DelimitedCdrAppendableStructMachine):
+        names = tuple(machine.member_machines)
+    elif isinstance(machine, PLCdrMutableStructMachine):
+        names = tuple(m.name for m in machine.mutablemembers)
+    else:
+        raise TypeError(f"Only structs can be decoded lazily, {datatype.__name__} is not a struct.")
+
+    namespace: Dict[str, Any] = {
+        "__slots__": (),
+        "__doc__": f"Lazily decoded view of a {datatype.__name__} sample.",
+        "_datatype": datatype,
+        "_names": names,
+        "_static": {},
+        "_machine_v0": machine_v0,
+        "_machine_v2": machine_v2,
+    }
+    for index, name in enumerate(names):
+        namespace[name] = _member_property(index, name)
+
+    return type(f"Lazy{datatype.__name__}", (LazySample,), namespace)
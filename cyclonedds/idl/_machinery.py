@@ -10,12 +10,15 @@
  * SPDX-License-Identifier: EPL-2.0 OR BSD-3-Clause
 """
 
+import struct
 from math import log2
+from typing import Tuple
+from array import array as pyarray
 from enum import Enum
 from dataclasses import dataclass
 
 from .types import _type_code_align_size_default_mapping
-from ._support import Buffer, CdrKeyVmOp, CdrKeyVMOpType, KeyScanner
+from ._support import Buffer, Endianness, CdrKeyVmOp, CdrKeyVMOpType, CdrCodecOp, CdrCodecOpType, KeyScanner
 from . import types as types
 
 
@@ -30,16 +33,63 @@ class Machine:
     def deserialize(self, buffer):
         pass
 
+    def skip(self, buffer):
+        """Move the buffer past a value without constructing it"""
+        self.deserialize(buffer)
+
+    def max_size(self):
+        """Upper bound of the encoded size of any value, alignment padding included, None if unbounded"""
+        return None
+
+    def size_bound(self, value):
+        """Cheap upper bound of the encoded size of value, alignment padding included"""
+        return self.max_size()
+
     def key_scan(self) -> KeyScanner:
         pass
 
     def cdr_key_machine_op(self, skip):
         pass
 
+    def cdr_codec_machine_op(self):
+        raise NotImplementedError()
+
+    def plain_layout(self):
+        """Struct code, alignment and shape of a member with a fixed size and plain layout"""
+        raise NotImplementedError()
+
     def default_initialize(self):
         pass
 
 
+def _members_max_size(machines):
+    size = 0
+    for machine in machines:
+        msize = machine.max_size()
+        if msize is None:
+            return None
+        size += msize
+    return size
+
+
+def _members_size_bound(members_machines, value):
+    return sum(machine.size_bound(getattr(value, member)) for member, machine in members_machines.items())
+
+
+def _union_max_size(discriminator, labels_submachines, default):
+    cases = list(labels_submachines.values()) + ([default] if default else [])
+    sizes = [machine.max_size() for machine in cases]
+    if None in sizes:
+        return None
+    return discriminator.max_size() + max(sizes, default=0)
+
+
+def _union_size_bound(discriminator, labels_submachines, default, union):
+    discr, value = union.get()
+    machine = default if discr is None else labels_submachines.get(discr, default)
+    return discriminator.max_size() + (machine.size_bound(value) if machine else 0)
+
+
 class NoneMachine(Machine):
     def __init__(self):
         self.alignment = 1
@@ -50,6 +100,12 @@ class NoneMachine(Machine):
     def deserialize(self, buffer):
         pass
 
+    def skip(self, buffer):
+        pass
+
+    def max_size(self):
+        return 0
+
     def key_scan(self) -> KeyScanner:
         return KeyScanner()
 
@@ -73,6 +129,13 @@ class PrimitiveMachine(Machine):
         buffer.align(self.alignment)
         return buffer.read(self.code, self.size)
 
+    def skip(self, buffer):
+        buffer.align(self.alignment)
+        buffer.seek(buffer.tell() + self.size)
+
+    def max_size(self):
+        return self.alignment - 1 + self.size
+
     def key_scan(self) -> KeyScanner:
         return KeyScanner.simple(self.alignment, self.size)
 
@@ -84,6 +147,12 @@ class PrimitiveMachine(Machine):
             stream += [CdrKeyVmOp(CdrKeyVMOpType.ByteSwap, skip, align=self.size)]
         return stream
 
+    def cdr_codec_machine_op(self):
+        return [CdrCodecOp(CdrCodecOpType.Primitive, align=self.alignment, code=self.code)]
+
+    def plain_layout(self):
+        return self.code, self.alignment, ()
+
     def default_initialize(self):
         return self.default
 
@@ -98,9 +167,18 @@ class CharMachine(Machine):
     def deserialize(self, buffer):
         return chr(buffer.read('b', 1))
 
+    def skip(self, buffer):
+        buffer.seek(buffer.tell() + 1)
+
+    def max_size(self):
+        return 1
+
     def cdr_key_machine_op(self, skip):
         return [CdrKeyVmOp(CdrKeyVMOpType.StreamStatic, skip, 1, align=1)]
 
+    def cdr_codec_machine_op(self):
+        return [CdrCodecOp(CdrCodecOpType.Char)]
+
     def default_initialize(self):
         return '\0'
 
@@ -129,6 +207,19 @@ class StringMachine(Machine):
         buffer.read('b', 1)
         return bytes.decode('utf-8')
 
+    def skip(self, buffer):
+        buffer.align(4)
+        numbytes = buffer.read('I', 4)
+        buffer.seek(buffer.tell() + numbytes)
+
+    def max_size(self):
+        # Padding, length, up to four bytes per character in UTF-8 and the terminator
+        return 8 + 4 * self.bound if self.bound else None
+
+    def size_bound(self, value):
+        # isascii() does not look at the characters, str knows whether it is ASCII
+        return 8 + (len(value) if value.isascii() else 4 * len(value))
+
     def key_scan(self) -> KeyScanner:
         if self.bound:
             return KeyScanner.with_bound(4, self.bound + 4)
@@ -138,14 +229,19 @@ class StringMachine(Machine):
     def cdr_key_machine_op(self, skip):
         return [CdrKeyVmOp(CdrKeyVMOpType.Stream4ByteSize, skip, 1, align=1)]
 
+    def cdr_codec_machine_op(self):
+        return [CdrCodecOp(CdrCodecOpType.String, count=self.bound or 0)]
+
     def default_initialize(self):
         return ""
 
 
 class BytesMachine(Machine):
-    def __init__(self, bound=None):
+    def __init__(self, bound=None, as_view=False):
         self.alignment = 4
         self.bound = bound
+        # Decode to memoryview slices of the received data instead of bytes copies
+        self.as_view = as_view
 
     def serialize(self, buffer, value, for_key=False):
         if self.bound and len(value) > self.bound:
@@ -157,7 +253,18 @@ class BytesMachine(Machine):
     def deserialize(self, buffer):
         buffer.align(4)
         numbytes = buffer.read('I', 4)
-        return buffer.read_bytes(numbytes)
+        return buffer.read_view(numbytes) if self.as_view else buffer.read_bytes(numbytes)
+
+    def skip(self, buffer):
+        buffer.align(4)
+        numbytes = buffer.read('I', 4)
+        buffer.seek(buffer.tell() + numbytes)
+
+    def max_size(self):
+        return 7 + self.bound if self.bound else None
+
+    def size_bound(self, value):
+        return 7 + len(value)
 
     def key_scan(self) -> KeyScanner:
         if self.bound:
@@ -168,8 +275,11 @@ class BytesMachine(Machine):
     def cdr_key_machine_op(self, skip):
         return [CdrKeyVmOp(CdrKeyVMOpType.Stream4ByteSize, skip, 1, align=1)]
 
+    def cdr_codec_machine_op(self):
+        return [CdrCodecOp(CdrCodecOpType.Bytes, value=int(self.as_view), count=self.bound or 0)]
+
     def default_initialize(self):
-        return bytes(0)
+        return memoryview(bytes(0)) if self.as_view else bytes(0)
 
 
 class ByteArrayMachine(Machine):
@@ -186,12 +296,24 @@ class ByteArrayMachine(Machine):
     def deserialize(self, buffer):
         return buffer.read_bytes(self.size)
 
+    def skip(self, buffer):
+        buffer.seek(buffer.tell() + self.size)
+
+    def max_size(self):
+        return self.size
+
     def key_scan(self) -> KeyScanner:
         return KeyScanner.simple(1, self.size)
 
     def cdr_key_machine_op(self, skip):
         return [CdrKeyVmOp(CdrKeyVMOpType.StreamStatic, skip, self.size, align=1)]
 
+    def cdr_codec_machine_op(self):
+        return [CdrCodecOp(CdrCodecOpType.ByteArray, count=self.size)]
+
+    def plain_layout(self):
+        return 'B', 1, (self.size,)
+
     def default_initialize(self):
         return bytearray(self.size)
 
@@ -233,6 +355,27 @@ class ArrayMachine(Machine):
 
         return v
 
+    def skip(self, buffer):
+        if self.add_size_header:
+            buffer.align(4)
+            size = buffer.read('I', 4)
+            buffer.seek(buffer.tell() + size)
+        else:
+            for _i in range(self.size):
+                self.submachine.skip(buffer)
+
+    def max_size(self):
+        size = self.submachine.max_size()
+        if size is None:
+            return None
+        return (7 if self.add_size_header else 0) + self.size * size
+
+    def size_bound(self, value):
+        size = self.max_size()
+        if size is not None:
+            return size
+        return (7 if self.add_size_header else 0) + sum(map(self.submachine.size_bound, value))
+
     def key_scan(self) -> KeyScanner:
         scan = KeyScanner()
         scan.increase_by_multiplied_subresult(self.submachine.key_scan(), self.size)
@@ -248,6 +391,24 @@ class ArrayMachine(Machine):
             [CdrKeyVmOp(CdrKeyVMOpType.RepeatStatic, skip, self.size, value=len(subops) + 2)] + \
             subops + [CdrKeyVmOp(CdrKeyVMOpType.EndRepeat, skip, len(subops))]
 
+    def cdr_codec_machine_op(self):
+        if type(self.submachine) is PrimitiveMachine and not self.add_size_header:
+            return [CdrCodecOp(
+                CdrCodecOpType.PrimitiveArray, count=self.size,
+                align=self.submachine.alignment, code=self.submachine.code
+            )]
+
+        subops = self.submachine.cdr_codec_machine_op()
+        return [CdrCodecOp(CdrCodecOpType.Array, size=len(subops), count=self.size, value=int(self.add_size_header))] + \
+            subops
+
+    def plain_layout(self):
+        if self.add_size_header:
+            raise NotImplementedError()
+
+        code, alignment, shape = self.submachine.plain_layout()
+        return code, alignment, (self.size,) + shape
+
     def default_initialize(self):
         return [self.submachine.default_initialize() for i in range(self.size)]
 
@@ -295,6 +456,30 @@ class SequenceMachine(Machine):
 
         return v
 
+    def skip(self, buffer):
+        buffer.align(4)
+
+        if self.add_size_header:
+            size = buffer.read('I', 4)
+            buffer.seek(buffer.tell() + size)
+            return
+
+        num = buffer.read('I', 4)
+        for _i in range(num):
+            self.submachine.skip(buffer)
+
+    def max_size(self):
+        size = self.submachine.max_size()
+        if self.maxlen is None or size is None:
+            return None
+        return (11 if self.add_size_header else 7) + self.maxlen * size
+
+    def size_bound(self, value):
+        size = self.submachine.max_size()
+        if size is not None:
+            return (11 if self.add_size_header else 7) + len(value) * size
+        return (11 if self.add_size_header else 7) + sum(map(self.submachine.size_bound, value))
+
     def key_scan(self) -> KeyScanner:
         if not self.maxlen:
             return KeyScanner.infinity()
@@ -320,6 +505,18 @@ class SequenceMachine(Machine):
             [CdrKeyVmOp(CdrKeyVMOpType.Repeat4ByteSize, skip, value=len(subops) + 2)] + \
             subops + [CdrKeyVmOp(CdrKeyVMOpType.EndRepeat, skip, len(subops))]
 
+    def cdr_codec_machine_op(self):
+        if type(self.submachine) is PrimitiveMachine and not self.add_size_header:
+            return [CdrCodecOp(
+                CdrCodecOpType.PrimitiveSequence, count=self.maxlen or 0,
+                align=self.submachine.alignment, code=self.submachine.code
+            )]
+
+        subops = self.submachine.cdr_codec_machine_op()
+        return [CdrCodecOp(
+            CdrCodecOpType.Sequence, size=len(subops), count=self.maxlen or 0, value=int(self.add_size_header)
+        )] + subops
+
     def default_initialize(self):
         return []
 
@@ -375,6 +572,20 @@ class UnionMachine(Machine):
 
         return self.type(discriminator=label, value=contents)
 
+    def skip(self, buffer):
+        label = self.discriminator.deserialize(buffer)
+
+        if label in self.labels_submachines:
+            self.labels_submachines[label].skip(buffer)
+        elif self.default:
+            self.default.skip(buffer)
+
+    def max_size(self):
+        return _union_max_size(self.discriminator, self.labels_submachines, self.default)
+
+    def size_bound(self, union):
+        return _union_size_bound(self.discriminator, self.labels_submachines, self.default, union)
+
     def key_scan(self) -> KeyScanner:
         dscan = self.discriminator.key_scan()
         if self.discriminator_is_key:
@@ -460,6 +671,18 @@ class MappingMachine(Machine):
 
         return ret
 
+    def skip(self, buffer):
+        buffer.align(4)
+        num = buffer.read('I', 4)
+
+        for _i in range(num):
+            self.key_machine.skip(buffer)
+            self.value_machine.skip(buffer)
+
+    def size_bound(self, values):
+        return 7 + sum(map(self.key_machine.size_bound, values.keys())) + \
+            sum(map(self.value_machine.size_bound, values.values()))
+
     def key_scan(self) -> KeyScanner:
         return KeyScanner.infinity()
 
@@ -495,6 +718,31 @@ class StructMachine(Machine):
             valuedict[member] = machine.deserialize(buffer)
         return self.type(**valuedict)
 
+    def skip(self, buffer):
+        for machine in self.members_machines.values():
+            machine.skip(buffer)
+
+    def max_size(self):
+        return _members_max_size(self.members_machines.values())
+
+    def size_bound(self, value):
+        return _members_size_bound(self.members_machines, value)
+
+    def deserialize_fields(self, buffer, fields):
+        """Deserialize only the named members into a dict, skipping over the others"""
+        valuedict = {}
+        remaining = len(fields)
+        for member, machine in self.members_machines.items():
+            if member in fields:
+                valuedict[member] = machine.deserialize(buffer)
+                remaining -= 1
+                if not remaining:
+                    # Nothing after this member is needed
+                    break
+            else:
+                machine.skip(buffer)
+        return valuedict
+
     def key_scan(self) -> KeyScanner:
         scan = KeyScanner()
 
@@ -514,6 +762,12 @@ class StructMachine(Machine):
             []
         )
 
+    def cdr_codec_machine_op(self):
+        ops = [CdrCodecOp(CdrCodecOpType.Struct, count=len(self.members_machines), obj=self.type)]
+        for name, m in self.members_machines.items():
+            ops += [CdrCodecOp(CdrCodecOpType.Member, obj=name)] + m.cdr_codec_machine_op()
+        return ops
+
     def default_initialize(self):
         valuedict = {}
         for member, machine in self.members_machines.items():
@@ -545,12 +799,30 @@ class InstanceMachine(Machine):
         else:
             return self.type.__idl__.v0_machine.deserialize(buffer)
 
+    def skip(self, buffer):
+        if self.type.__idl__.v0_machine is None:
+            self.type.__idl__.populate()
+
+        if self.use_version_2:
+            self.type.__idl__.v2_machine.skip(buffer)
+        else:
+            self.type.__idl__.v0_machine.skip(buffer)
+
+    def max_size(self):
+        return self.type.__idl__.max_size(use_version_2=self.use_version_2)
+
+    def size_bound(self, value):
+        return self.type.__idl__.size_bound(value, use_version_2=self.use_version_2)
+
     def key_scan(self):
         return self.type.__idl__.key_scan(use_version_2=self.use_version_2)
 
     def cdr_key_machine_op(self, skip):
         return self.type.__idl__.cdr_key_machine(skip, use_version_2=self.use_version_2)
 
+    def cdr_codec_machine_op(self):
+        return self.type.__idl__.cdr_codec_machine(use_version_2=self.use_version_2)
+
     def default_initialize(self):
         if self.type.__idl__.v0_machine is None:
             self.type.__idl__.populate()
@@ -582,6 +854,13 @@ class EnumMachine(Machine):
         except ValueError:
             return v
 
+    def skip(self, buffer):
+        buffer.align(self.alignment)
+        buffer.seek(buffer.tell() + self.size)
+
+    def max_size(self):
+        return self.alignment - 1 + self.size
+
     def key_scan(self) -> KeyScanner:
         return KeyScanner.simple(4, 4)
 
@@ -591,6 +870,9 @@ class EnumMachine(Machine):
             stream += [CdrKeyVmOp(CdrKeyVMOpType.ByteSwap, skip, align=4)]
         return stream
 
+    def cdr_codec_machine_op(self):
+        return [CdrCodecOp(CdrCodecOpType.Enum, align=4, code='I', obj=self.enum)]
+
     def default_initialize(self):
         return self.enum.__idl_enum_default_value__
 
@@ -618,6 +900,13 @@ class BitBoundEnumMachine(Machine):
         except ValueError:
             return v
 
+    def skip(self, buffer):
+        buffer.align(self.alignment)
+        buffer.seek(buffer.tell() + self.size)
+
+    def max_size(self):
+        return self.alignment - 1 + self.size
+
     def key_scan(self) -> KeyScanner:
         return KeyScanner.simple(self.alignment, self.size)
 
@@ -627,6 +916,9 @@ class BitBoundEnumMachine(Machine):
             stream += [CdrKeyVmOp(CdrKeyVMOpType.ByteSwap, skip, align=self.alignment)]
         return stream
 
+    def cdr_codec_machine_op(self):
+        return [CdrCodecOp(CdrCodecOpType.Enum, align=self.alignment, code=self.code, obj=self.enum)]
+
     def default_initialize(self):
         return self.enum.__idl_enum_default_value__
 
@@ -648,6 +940,17 @@ class OptionalMachine(Machine):
             return self.submachine.deserialize(buffer)
         return None
 
+    def skip(self, buffer):
+        if buffer.read('?', 1):
+            self.submachine.skip(buffer)
+
+    def max_size(self):
+        size = self.submachine.max_size()
+        return None if size is None else 1 + size
+
+    def size_bound(self, value):
+        return 1 if value is None else 1 + self.submachine.size_bound(value)
+
     def key_scan(self) -> KeyScanner:
         scan = KeyScanner.simple(1, 1)
         scan.increase_by_multiplied_subresult(self.submachine.key_scan(), 1)
@@ -657,6 +960,10 @@ class OptionalMachine(Machine):
         subops = self.submachine.cdr_key_machine_op(skip)
         return [CdrKeyVmOp(CdrKeyVMOpType.Optional, skip, len(subops) + 1, align=1)] + subops
 
+    def cdr_codec_machine_op(self):
+        subops = self.submachine.cdr_codec_machine_op()
+        return [CdrCodecOp(CdrCodecOpType.Optional, size=len(subops))] + subops
+
     def default_initialize(self):
         return None
 
@@ -679,6 +986,13 @@ class PlainCdrV2ArrayOfPrimitiveMachine(Machine):
         buffer.align(self.alignment)
         return list(buffer.read_multi(self.code, self.size))
 
+    def skip(self, buffer):
+        buffer.align(self.alignment)
+        buffer.seek(buffer.tell() + self.size)
+
+    def max_size(self):
+        return self.alignment - 1 + self.size
+
     def key_scan(self) -> KeyScanner:
         return KeyScanner.simple(self.alignment, self.size)
 
@@ -688,10 +1002,121 @@ class PlainCdrV2ArrayOfPrimitiveMachine(Machine):
             stream += [CdrKeyVmOp(CdrKeyVMOpType.ByteSwap, skip, align=self.alignment)]
         return stream
 
+    def cdr_codec_machine_op(self):
+        return [CdrCodecOp(
+            CdrCodecOpType.PrimitiveArray, count=self.length, align=self.alignment,
+            code=types._type_code_align_size_default_mapping[self.subtype][0]
+        )]
+
+    def plain_layout(self):
+        return types._type_code_align_size_default_mapping[self.subtype][0], self.alignment, (self.length,)
+
     def default_initialize(self):
         return self.default.copy()
 
 
+class _LengthPrefixedSequenceMachine(SequenceMachine):
+    """Sequence of strings or bytes, encoded and decoded in a single loop over the elements instead
+    of one element machine call (with its own aligns, reads and writes) per element."""
+    _u32 = {"<": struct.Struct("<I"), ">": struct.Struct(">I")}
+    # What follows the data of an element: the terminator (if any) and the padding up to the next
+    # length, indexed by the length of the data modulo 4
+    _tails: Tuple[bytes, ...]
+    _terminator: bytes
+    _too_long: str
+
+    def __init__(self, submachine, maxlen=None, add_size_header=False):
+        super().__init__(submachine, maxlen=maxlen, add_size_header=add_size_header)
+        self.bound = submachine.bound
+
+    def _encode(self, value):
+        return value
+
+    def _decode(self, view):
+        return bytes(view)
+
+    def serialize(self, buffer, value, for_key=False):
+        if self.maxlen is not None:
+            assert len(value) <= self.maxlen
+        if self.bound and any(len(v) > self.bound for v in value):
+            raise Exception(self._too_long)
+
+        buffer.align(4)
+
+        if self.add_size_header:
+            buffer.write('I', 4, 0)
+            hpos = buffer.tell()
+
+        pack = self._u32[buffer._endian].pack
+        tails, extra = self._tails, len(self._terminator)
+        parts = [pack(len(value))]
+        for v in value:
+            v = self._encode(v)
+            parts += (pack(len(v) + extra), v, tails[len(v) & 3])
+        if value:
+            # No padding after the last element
+            parts[-1] = self._terminator
+        buffer.write_bytes(b"".join(parts))
+
+        if self.add_size_header:
+            mpos = buffer.tell()
+            buffer.seek(hpos - 4)
+            buffer.write('I', 4, mpos - hpos)
+            buffer.seek(mpos)
+
+    def deserialize(self, buffer):
+        buffer.align(4)
+
+        if self.add_size_header:
+            size = buffer.read('I', 4)
+            mpos = buffer.tell()
+
+        num = buffer.read('I', 4)
+        unpack = self._u32[buffer._endian].unpack_from
+        off, pos, end = buffer._align_offset, buffer.tell(), len(buffer._bytes)
+        extra = len(self._terminator)
+        result = []
+        with memoryview(buffer._bytes) as view:
+            for _ in range(num):
+                pos = ((pos - off + 3) & ~3) + off
+                n = unpack(view, pos)[0]
+                if pos + 4 + n > end:
+                    raise Exception("Buffer is too short for the sequence.")
+                result.append(self._decode(view[pos + 4:pos + 4 + n - extra]))
+                pos += 4 + n
+        buffer.seek(pos)
+
+        if self.add_size_header:
+            buffer.seek(mpos + size)
+
+        return result
+
+
+class StringSequenceMachine(_LengthPrefixedSequenceMachine):
+    _tails = (b"\0\0\0\0", b"\0\0\0", b"\0\0", b"\0")
+    _terminator = b"\0"
+    _too_long = "String longer than bound."
+
+    def _encode(self, value):
+        return value.encode('utf-8')
+
+    def _decode(self, view):
+        return str(view, 'utf-8')
+
+
+class BytesSequenceMachine(_LengthPrefixedSequenceMachine):
+    _tails = (b"", b"\0\0\0", b"\0\0", b"\0")
+    _terminator = b""
+    _too_long = "Bytes longer than bound."
+
+    def __init__(self, submachine, maxlen=None, add_size_header=False):
+        super().__init__(submachine, maxlen=maxlen, add_size_header=add_size_header)
+        self.as_view = submachine.as_view
+
+    def _decode(self, view):
+        return view if self.as_view else bytes(view)
+
+
 class PlainCdrV2SequenceOfPrimitiveMachine(Machine):
     def __init__(self, type, max_length=None):
         self.code, self.alignment, self.size, _ = types._type_code_align_size_default_mapping[type]
@@ -701,7 +1126,10 @@ class PlainCdrV2SequenceOfPrimitiveMachine(Machine):
         assert self.max_length is None or len(value) <= self.max_length
         buffer.align(4)
         buffer.write('I', 4, len(value))
-        if value:
+        if self.code == 'B' and isinstance(value, (bytes, bytearray, memoryview)):
+            # An octet sequence given as bytes is written as is
+            buffer.write_bytes(value)
+        elif value:
             buffer.align(self.alignment)
             buffer.write_multi(f"{len(value)}{self.code}", self.size * len(value), *value)
 
@@ -714,6 +1142,21 @@ class PlainCdrV2SequenceOfPrimitiveMachine(Machine):
         else:
             return []
 
+    def skip(self, buffer):
+        buffer.align(4)
+        length = buffer.read('I', 4)
+        if length:
+            buffer.align(self.alignment)
+            buffer.seek(buffer.tell() + self.size * length)
+
+    def max_size(self):
+        if self.max_length is None:
+            return None
+        return 7 + self.alignment - 1 + self.size * self.max_length
+
+    def size_bound(self, value):
+        return 7 + self.alignment - 1 + self.size * len(value)
+
     def key_scan(self) -> KeyScanner:
         if not self.max_length:
             return KeyScanner.infinity()
@@ -737,10 +1180,125 @@ class PlainCdrV2SequenceOfPrimitiveMachine(Machine):
             stream += [CdrKeyVmOp(CdrKeyVMOpType.ByteSwap, skip, align=self.size)]
         return stream
 
+    def cdr_codec_machine_op(self):
+        return [CdrCodecOp(CdrCodecOpType.PrimitiveSequence, count=self.max_length or 0, align=self.alignment, code=self.code)]
+
     def default_initialize(self):
         return []
 
 
+_numpy = None
+
+
+class _NdArrayCodec:
+    """Moves primitives between a buffer and a numpy.ndarray, or an array.array when
+    NumPy is not available, copying the data once without per-element Python objects."""
+
+    def __init__(self, type):
+        global _numpy
+        if _numpy is None:
+            try:
+                import numpy
+                _numpy = numpy
+            except ImportError:
+                _numpy = False
+
+        self.code, _, self.size, _ = types._type_code_align_size_default_mapping[type]
+        if not _numpy and self.code == '?':
+            # array.array has no booleans
+            self.code = 'B'
+
+    def write(self, buffer, value, length):
+        nbytes = length * self.size
+        buffer.ensure_size(nbytes)
+        if _numpy:
+            # Converts straight into the buffer
+            _numpy.frombuffer(buffer._bytes, dtype=buffer._endian + self.code, count=length, offset=buffer._pos)[:] = value
+        else:
+            swap = buffer.endianness != Endianness.native() and self.size > 1
+            if swap or not isinstance(value, pyarray) or value.typecode != self.code:
+                value = pyarray(self.code, value)
+            if swap:
+                value.byteswap()
+            assert len(value) == length
+            buffer._bytes[buffer._pos:buffer._pos + nbytes] = value
+        buffer._pos += nbytes
+
+    def read(self, buffer, length):
+        nbytes = length * self.size
+        if buffer._pos + nbytes > len(buffer._bytes):
+            raise Exception("Buffer is too short for the array of primitives")
+        if _numpy:
+            value = _numpy.frombuffer(
+                buffer._bytes, dtype=buffer._endian + self.code, count=length, offset=buffer._pos
+            ).astype(self.code)
+        else:
+            value = pyarray(self.code)
+            value.frombytes(memoryview(buffer._bytes)[buffer._pos:buffer._pos + nbytes])
+            if buffer.endianness != Endianness.native() and self.size > 1:
+                value.byteswap()
+        buffer._pos += nbytes
+        return value
+
+    def zeros(self, length):
+        if _numpy:
+            return _numpy.zeros(length, dtype=self.code)
+        return pyarray(self.code, bytes(length * self.size))
+
+
+class NdArrayOfPrimitiveMachine(PlainCdrV2ArrayOfPrimitiveMachine):
+    """Same wire format as PlainCdrV2ArrayOfPrimitiveMachine, represented as an ndarray"""
+    def __init__(self, type, length):
+        super().__init__(type, length)
+        self.ndcodec = _NdArrayCodec(type)
+
+    def serialize(self, buffer, value, for_key=False):
+        assert len(value) == self.length
+        buffer.align(self.alignment)
+        self.ndcodec.write(buffer, value, self.length)
+
+    def deserialize(self, buffer):
+        buffer.align(self.alignment)
+        return self.ndcodec.read(buffer, self.length)
+
+    def cdr_codec_machine_op(self):
+        # The native codec produces lists
+        raise NotImplementedError()
+
+    def default_initialize(self):
+        return self.ndcodec.zeros(self.length)
+
+
+class NdSequenceOfPrimitiveMachine(PlainCdrV2SequenceOfPrimitiveMachine):
+    """Same wire format as PlainCdrV2SequenceOfPrimitiveMachine, represented as an ndarray"""
+    def __init__(self, type, max_length=None):
+        super().__init__(type, max_length)
+        self.ndcodec = _NdArrayCodec(type)
+
+    def serialize(self, buffer, value, for_key=False):
+        length = len(value)
+        assert self.max_length is None or length <= self.max_length
+        buffer.align(4)
+        buffer.write('I', 4, length)
+        if length:
+            buffer.align(self.alignment)
+            self.ndcodec.write(buffer, value, length)
+
+    def deserialize(self, buffer):
+        buffer.align(4)
+        length = buffer.read('I', 4)
+        if length:
+            buffer.align(self.alignment)
+        return self.ndcodec.read(buffer, length)
+
+    def cdr_codec_machine_op(self):
+        # The native codec produces lists
+        raise NotImplementedError()
+
+    def default_initialize(self):
+        return self.ndcodec.zeros(0)
+
+
 class DelimitedCdrAppendableStructMachine(Machine):
     def __init__(self, type, member_machines, keylist):
         self.alignment = 4
@@ -793,6 +1351,42 @@ class DelimitedCdrAppendableStructMachine(Machine):
         buffer.seek(hpos + size)
         return self.type(**data)
 
+    def skip(self, buffer):
+        buffer.align(4)
+        size = buffer.read('I', 4)
+        buffer.seek(buffer.tell() + size)
+
+    def max_size(self):
+        size = _members_max_size(self.member_machines.values())
+        return None if size is None else 7 + size
+
+    def size_bound(self, value):
+        return 7 + _members_size_bound(self.member_machines, value)
+
+    def deserialize_fields(self, buffer, fields):
+        """Deserialize only the named members into a dict, skipping over the others"""
+        buffer.align(4)
+        size = buffer.read('I', 4)
+        hpos = buffer.tell()
+
+        data = {}
+        for member, machine in self.member_machines.items():
+            if member not in fields:
+                if buffer.tell() - hpos < size:
+                    machine.skip(buffer)
+                continue
+
+            if buffer.tell() - hpos < size:
+                data[member] = machine.deserialize(buffer)
+            else:
+                data[member] = machine.default_initialize()
+
+            if buffer.tell() - hpos > size:
+                raise Exception("Struct was not contained inside header indicated size, stream corrupt.")
+
+        buffer.seek(hpos + size)
+        return data
+
     def key_scan(self) -> KeyScanner:
         scan = KeyScanner()
 
@@ -822,6 +1416,15 @@ class DelimitedCdrAppendableStructMachine(Machine):
             members + \
             [CdrKeyVmOp(CdrKeyVMOpType.AppendableJumpToEnd, False)]
 
+    def cdr_codec_machine_op(self):
+        ops = [
+            CdrCodecOp(CdrCodecOpType.Appendable),
+            CdrCodecOp(CdrCodecOpType.Struct, count=len(self.member_machines), obj=self.type)
+        ]
+        for name, m in self.member_machines.items():
+            ops += [CdrCodecOp(CdrCodecOpType.Member, obj=name)] + m.cdr_codec_machine_op()
+        return ops
+
     def default_initialize(self):
         valuedict = {}
         for member, machine in self.member_machines.items():
@@ -907,6 +1510,18 @@ class DelimitedCdrAppendableUnionMachine(Machine):
         buffer.seek(hpos + size)
         return self.type(discriminator=label, value=contents)
 
+    def skip(self, buffer):
+        buffer.align(4)
+        size = buffer.read('I', 4)
+        buffer.seek(buffer.tell() + size)
+
+    def max_size(self):
+        size = _union_max_size(self.discriminator, self.labels_submachines, self.default)
+        return None if size is None else 7 + size
+
+    def size_bound(self, union):
+        return 7 + _union_size_bound(self.discriminator, self.labels_submachines, self.default, union)
+
     def key_scan(self) -> KeyScanner:
         dscan = self.discriminator.key_scan()
         if self.discriminator_is_key:
@@ -1014,6 +1629,39 @@ class PLCdrMutableStructMachine(Machine):
             m.name: None for m in mutablemembers
         }
 
+        # Serialization plan, one step per member: name, optional, EMHEADER, whether a NEXTINT follows the
+        # EMHEADER and the machine. Consecutive primitives that are not optional are merged into a single step
+        # with a names tuple, with all their EMHEADERs and values (and the padding between them) in one
+        # struct code. XCDR2 aligns to at most 4, so there is never padding between an EMHEADER and its value.
+        self.plan = []
+        # Decoding dispatches on the complete EMHEADER as written by this machine: name, struct code and size
+        # of a primitive value, whether a NEXTINT follows and the machine. The first member of a merged step
+        # also has the struct code, size, names and EMHEADERs of that step to decode it in one go.
+        self.by_header = {}
+        for m in mutablemembers:
+            nextint = m.lentype == LenType.NextIntLen
+            if isinstance(m.machine, PrimitiveMachine) and m.lentype.value < LenType.NextIntLen.value:
+                self.by_header[m.header] = (m.name, m.machine.code, m.machine.size, nextint, m.machine, None)
+                if not m.optional:
+                    if self.plan and len(self.plan[-1]) == 4:
+                        names, headers, code, size = self.plan.pop()
+                        code += f"{-size % 4}x" if size % 4 else ""
+                        size += -size % 4
+                    else:
+                        names, headers, code, size = (), (), "", 0
+                    self.plan.append((
+                        names + (m.name,), headers + (m.header,), code + 'I' + m.machine.code, size + 4 + m.machine.size
+                    ))
+                    continue
+            else:
+                self.by_header[m.header] = (m.name, None, 0, nextint, m.machine, None)
+            self.plan.append((m.name, m.optional, m.header, nextint, m.machine))
+
+        for step in self.plan:
+            if len(step) == 4 and len(step[0]) > 1:
+                names, headers, code, size = step
+                self.by_header[headers[0]] = self.by_header[headers[0]][:5] + ((code, size, names, headers),)
+
     def serialize(self, buffer, value, for_key=False):
         if not for_key:
             # write dummy header
@@ -1030,26 +1678,33 @@ class PLCdrMutableStructMachine(Machine):
         else:
             # write member data
             dpos = buffer.tell()
-            for mutablemember in self.mutablemembers:
-                member_value = getattr(value, mutablemember.name)
-
-                if mutablemember.optional and member_value is None:
+            for step in self.plan:
+                buffer.align(4)
+                if len(step) == 4:
+                    names, headers, code, size = step
+                    values = []
+                    for header, name in zip(headers, names):
+                        values += (header, getattr(value, name))
+                    buffer.write_multi(code, size, *values)
                     continue
 
-                buffer.align(4)
-                buffer.write('I', 4, mutablemember.header)
+                name, optional, header, nextint, machine = step
+                member_value = getattr(value, name)
 
-                mpos = buffer.tell()
-                if mutablemember.lentype == LenType.NextIntLen:
-                    buffer.write('I', 4, 0)
-
-                mutablemember.machine.serialize(buffer, member_value)
+                if optional and member_value is None:
+                    continue
 
-                if mutablemember.lentype == LenType.NextIntLen:
+                if nextint:
+                    buffer.write_multi('II', 8, header, 0)
+                    mpos = buffer.tell() - 4
+                    machine.serialize(buffer, member_value)
                     ampos = buffer.tell()
                     buffer.seek(mpos)
                     buffer.write('I', 4, ampos - mpos - 4)
                     buffer.seek(ampos)
+                else:
+                    buffer.write('I', 4, header)
+                    machine.serialize(buffer, member_value)
 
         if not for_key:
             fpos = buffer.tell()
@@ -1060,26 +1715,53 @@ class PLCdrMutableStructMachine(Machine):
             buffer.seek(fpos)
 
     def deserialize(self, buffer):
+        return self.type(**self.deserialize_fields(buffer, None))
+
+    def deserialize_fields(self, buffer, fields):
+        """Deserialize only the named members (all members if fields is None) into a dict,
+        skipping over the others"""
         # read header
         buffer.align(4)
         struct_size = buffer.read('I', 4)
         hpos = buffer.tell()
 
-        data = self.init_map.copy()
+        data = self.init_map.copy() if fields is None else dict.fromkeys(fields)
+        by_header = self.by_header
         while buffer.tell() - hpos < struct_size:
             buffer.align(4)
             header = buffer.read('I', 4)
+
+            entry = by_header.get(header)
+            if entry is not None and entry[0] in data:
+                name, code, size, nextint, machine, run = entry
+                if run is not None and fields is None and buffer.tell() - 4 + run[1] <= hpos + struct_size:
+                    # Expect the members that this machine writes after this one
+                    buffer.seek(buffer.tell() - 4)
+                    values = buffer.read_multi(run[0], run[1])
+                    if values[0::2] == run[3]:
+                        data.update(zip(run[2], values[1::2]))
+                        continue
+                    buffer.seek(buffer.tell() - run[1] + 4)
+                if code is not None:
+                    data[name] = buffer.read(code, size)
+                else:
+                    if nextint:
+                        buffer.seek(buffer.tell() + 4)
+                    data[name] = machine.deserialize(buffer)
+                continue
+
+            # Another writer may have used other flags or length codes, decode those the long way
             must_understand = ((header >> 31) & 1) > 0
             lc = (header >> 28) & 0x7
             memberid = header & 0x0fffffff
             mutmem = self.mutmem_by_id.get(memberid)
 
-            if mutmem:
+            if mutmem and (fields is None or mutmem.name in fields):
                 if lc == 4:
                     buffer.read('I', 4)
                 data[mutmem.name] = mutmem.machine.deserialize(buffer)
             else:
-                if must_understand:
+                if not mutmem and must_understand:
                     # Got a member that we don't know and marked as must understand: failure
                     raise MustUnderstandFailure()
                 mpos = buffer.tell()
@@ -1094,11 +1776,31 @@ class PLCdrMutableStructMachine(Machine):
                     buffer.seek(mpos + size + 4)
 
         for mutmem in self.mutablemembers:
-            if data[mutmem.name] is None and not mutmem.optional:
+            if mutmem.name in data and data[mutmem.name] is None and not mutmem.optional:
                 data[mutmem.name] = mutmem.machine.default_initialize()
 
         buffer.seek(hpos + struct_size)
-        return self.type(**data)
+        return data
+
+    def skip(self, buffer):
+        buffer.align(4)
+        struct_size = buffer.read('I', 4)
+        buffer.seek(buffer.tell() + struct_size)
+
+    def max_size(self):
+        # Every member has padding and an EMHEADER, possibly followed by a NEXTINT
+        size = _members_max_size(m.machine for m in self.mutablemembers)
+        if size is None:
+            return None
+        return 7 + size + sum(11 if m.lentype == LenType.NextIntLen else 7 for m in self.mutablemembers)
+
+    def size_bound(self, value):
+        size = 7
+        for m in self.mutablemembers:
+            member_value = getattr(value, m.name)
+            if not m.optional or member_value is not None:
+                size += (11 if m.lentype == LenType.NextIntLen else 7) + m.machine.size_bound(member_value)
+        return size
 
     def key_scan(self) -> KeyScanner:
         scan = KeyScanner()
@@ -1161,6 +1863,13 @@ class BitMaskMachine(Machine):
         buffer.align(self.alignment)
         return self.type.from_mask(buffer.read(self.code, self.size))
 
+    def skip(self, buffer):
+        buffer.align(self.alignment)
+        buffer.seek(buffer.tell() + self.size)
+
+    def max_size(self):
+        return self.alignment - 1 + self.size
+
     def key_scan(self) -> KeyScanner:
         return KeyScanner.simple(self.alignment, self.size)
 
@@ -1172,5 +1881,8 @@ class BitMaskMachine(Machine):
             stream += [CdrKeyVmOp(CdrKeyVMOpType.ByteSwap, skip, align=self.size)]
         return stream
 
+    def cdr_codec_machine_op(self):
+        return [CdrCodecOp(CdrCodecOpType.BitMask, align=self.alignment, code=self.code, obj=self.type)]
+
     def default_initialize(self):
         return self.default
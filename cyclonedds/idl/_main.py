@@ -10,17 +10,24 @@
  * SPDX-License-Identifier: EPL-2.0 OR BSD-3-Clause
 """
 
-from typing import Optional, cast, Any, ClassVar, Mapping, Dict, Tuple, TYPE_CHECKING
+import os
+import threading
+import dataclasses
+from typing import Optional, cast, Any, ClassVar, List, Mapping, Dict, Sequence, Tuple, TYPE_CHECKING
 from collections import deque
 from enum import EnumMeta, Enum
 from inspect import isclass
-from struct import unpack
+from struct import unpack, calcsize
 from hashlib import md5
 
 from ._support import Buffer, Endianness, CdrKeyVmNamedJumpOp, KeyScanner, KeyScanResult
 from ._type_helper import get_origin, get_args, Annotated
 from ._type_normalize import get_idl_annotations, get_idl_field_annotations, get_extended_type_hints
-from ._machinery import Machine
+from ._machinery import Machine, StructMachine, DelimitedCdrAppendableStructMachine, InstanceMachine, PrimitiveMachine, \
+    EnumMachine
+from ._compiler import CompiledMachine, PlainMachine, compile_machine, compile_plain
+from . import _native
+from . import _lazy
 
 from . import types
 
@@ -49,75 +56,174 @@ class IDLNamespaceScope:
             cls.current = None
 
 
+# Serializes populate() across threads. Reentrant: populating a type populates the types it contains.
+_populate_lock = threading.RLock()
+
+
+class Projection:
+    """Some of the members of a sample, as returned when deserializing with ``fields``.
+    The selected members and the sample_info are attributes, like on the full sample."""
+
+    __slots__ = ("sample_info",)
+
+    def __init__(self, **members: Any) -> None:
+        self.sample_info = None
+        for name, value in members.items():
+            setattr(self, name, value)
+
+    def __eq__(self, other: Any) -> bool:
+        return type(self) is type(other) and all(getattr(self, f) == getattr(other, f) for f in self.__slots__)
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({', '.join(f'{f}={getattr(self, f)!r}' for f in self.__slots__)})"
+
+
 class IDL:
+    """Type support for one IdlStruct/IdlUnion.
+
+    Thread safety: populate() is guarded by a lock and the serialization buffer and recursion
+    guards are kept per thread, so serialize/serialize_view/deserialize/key may be called
+    concurrently for the same type from any number of threads.
+    """
+
+    # When set, populate() also generates a flattened serializer/deserializer per XCDR version,
+    # see cyclonedds.idl._compiler. Types that cannot be compiled keep using the machines.
+    compile_machines: ClassVar[bool] = 'CYCLONEDDS_PYTHON_COMPILE_MACHINES' in os.environ
+    # When set and the C extension is available, populate() also flattens the machines into an op list
+    # that is (de)serialized natively, see clayer/cdrcodec.c. Any error falls back to the machines.
+    native_codec: ClassVar[bool] = 'CYCLONEDDS_PYTHON_NO_NATIVE_CODEC' not in os.environ
+    # Samples from serialize_view of at least this size are kept by the DataWriter without copying them,
+    # keep in sync with DDSPY_PIN_MIN_SIZE in clayer/pysertype.c.
+    pin_size: ClassVar[int] = 65536
+
     def __init__(self, datatype):
         self._populated: bool = False
-        self.buffer: Buffer = Buffer()
+        self._populating: bool = False
+        self._local = threading.local()
         self.datatype: type = datatype
         self.keyless: bool = None
         self.v0_machine: Machine = None
         self.v2_machine: Machine = None
+        self.v0_compiled: Optional[CompiledMachine] = None
+        self.v2_compiled: Optional[CompiledMachine] = None
+        self.v0_plain: Optional[PlainMachine] = None
+        self.v2_plain: Optional[PlainMachine] = None
+        self.v0_native: Optional[Any] = None
+        self.v2_native: Optional[Any] = None
         self.v0_key_max_size: int = None
         self.v2_key_max_size: int = None
         self.version_support: XCDRSupported = None
 
         self.idl_transformed_typename: str = self.datatype.__idl_typename__.replace(".", "::")
-        self.re_entrancy_protection: bool = False
         self._xt_data: Tuple[TypeInformation, TypeMapping] = (None, None)
         self._xt_bytedata: Tuple[Optional[bytes], Optional[bytes]] = (None, None)
         self.member_ids: Dict[str, int] = None
+        self._projections: Dict[Tuple[str, ...], type] = {}
+        self._lazy_type: Optional[type] = None
+        self._max_sizes: Dict[bool, Optional[int]] = {}
+        self._last_sizes: Dict[bool, int] = {}
+        self._key_vms: Dict[bool, Any] = {}
+
+    @property
+    def buffer(self) -> Buffer:
+        # One serialization buffer per thread
+        try:
+            return self._local.buffer
+        except AttributeError:
+            self._local.buffer = Buffer()
+            return self._local.buffer
+
+    @property
+    def re_entrancy_protection(self) -> bool:
+        return getattr(self._local, "re_entrancy_protection", False)
+
+    @re_entrancy_protection.setter
+    def re_entrancy_protection(self, value: bool) -> None:
+        self._local.re_entrancy_protection = value
 
     def populate(self):
         if not self._populated:
-            self._populated = True
-            annotations = get_idl_annotations(self.datatype)
-            field_annotations = get_idl_field_annotations(self.datatype)
-
-            a = annotations.get('extensibility', 'final')
-            if a == 'appendable':
-                self.xcdrv2_head = 0x08
-            elif a == 'mutable':
-                self.xcdrv2_head = 0x0a
-            else:
-                self.xcdrv2_head = 0x06
+            with _populate_lock:
+                if self._populated or self._populating:
+                    # Populated by another thread while we waited, or re-entered from a (recursive) member type
+                    return
+
+                self._populating = True
+                try:
+                    self._populate()
+                    # Only publish once everything is in place, readers check this without taking the lock
+                    self._populated = True
+                finally:
+                    self._populating = False
+
+    def _populate(self):
+        annotations = get_idl_annotations(self.datatype)
+        field_annotations = get_idl_field_annotations(self.datatype)
+
+        a = annotations.get('extensibility', 'final')
+        if a == 'appendable':
+            self.xcdrv2_head = 0x08
+        elif a == 'mutable':
+            self.xcdrv2_head = 0x0a
+        else:
+            self.xcdrv2_head = 0x06
 
-            if self.member_ids is None:
-                ids = {}
-                is_hash_id = annotations.get("autoid", "sequential") == "hash"
-                idc = 0
+        if self.member_ids is None:
+            ids = {}
+            is_hash_id = annotations.get("autoid", "sequential") == "hash"
+            idc = 0
 
-                for name, _ in get_extended_type_hints(self.datatype).items():
-                    f_annot = field_annotations.get(name, {})
+            for name, _ in get_extended_type_hints(self.datatype).items():
+                f_annot = field_annotations.get(name, {})
 
-                    if "id" in f_annot:
-                        mid = f_annot["id"]
-                    elif "hash_id" in f_annot or is_hash_id:
-                        # compute 4 byte hash, interpret as little endian 32 bit integer and zero out top four bits
-                        mid = unpack("<I", md5(f_annot.get("hash_id", "") or name.encode()).digest()[:4])[0] & 0x0FFFFFFF
-                    else:
-                        mid = idc
+                if "id" in f_annot:
+                    mid = f_annot["id"]
+                elif "hash_id" in f_annot or is_hash_id:
+                    # compute 4 byte hash, interpret as little endian 32 bit integer and zero out top four bits
+                    mid = unpack("<I", md5(f_annot.get("hash_id", "") or name.encode()).digest()[:4])[0] & 0x0FFFFFFF
+                else:
+                    mid = idc
 
-                    idc = mid + 1
-                    ids[name] = mid
+                idc = mid + 1
+                ids[name] = mid
 
-                self.member_ids = ids
+            self.member_ids = ids
 
-            from ._builder import Builder
-            self.v0_machine, self.v2_machine, self.keyless, self.version_support = Builder.build_machines(self.datatype)
+        from ._builder import Builder
+        self.v0_machine, self.v2_machine, self.keyless, self.version_support = Builder.build_machines(self.datatype)
 
+        if self.version_support.SupportsBasic & self.version_support:
+            self.v0_keyresult: KeyScanner = self.v0_machine.key_scan()
+            if self.v0_keyresult.rtype != KeyScanResult.PossiblyInfinite and self.v0_keyresult.size <= 16:
+                self.v0_key_max_size = self.v0_keyresult.size
+            else:
+                self.v0_key_max_size = 17  # or bigger ;)
+
+        if self.version_support.SupportsV2 & self.version_support:
+            self.v2_keyresult: KeyScanner = self.v2_machine.key_scan()
+            if self.v2_keyresult.rtype != KeyScanResult.PossiblyInfinite and self.v2_keyresult.size <= 16:
+                self.v2_key_max_size = self.v2_keyresult.size
+            else:
+                self.v2_key_max_size = 17  # or bigger ;)
+
+        if self.compile_machines:
             if self.version_support.SupportsBasic & self.version_support:
-                self.v0_keyresult: KeyScanner = self.v0_machine.key_scan()
-                if self.v0_keyresult.rtype != KeyScanResult.PossiblyInfinite and self.v0_keyresult.size <= 16:
-                    self.v0_key_max_size = self.v0_keyresult.size
-                else:
-                    self.v0_key_max_size = 17  # or bigger ;)
+                self.v0_compiled = compile_machine(self.v0_machine, False)
+            if self.version_support.SupportsV2 & self.version_support:
+                self.v2_compiled = compile_machine(self.v2_machine, True)
+
+        if self.version_support.SupportsBasic & self.version_support:
+            self.v0_plain = compile_plain(self.v0_machine, False, self.xcdrv2_head)
+        if self.version_support.SupportsV2 & self.version_support:
+            self.v2_plain = compile_plain(self.v2_machine, True, self.xcdrv2_head)
 
+        if self.native_codec:
+            if self.version_support.SupportsBasic & self.version_support:
+                self.v0_native = _native.create_codec(self, False)
             if self.version_support.SupportsV2 & self.version_support:
-                self.v2_keyresult: KeyScanner = self.v2_machine.key_scan()
-                if self.v2_keyresult.rtype != KeyScanResult.PossiblyInfinite and self.v2_keyresult.size <= 16:
-                    self.v2_key_max_size = self.v2_keyresult.size
-                else:
-                    self.v2_key_max_size = 17  # or bigger ;)
+                self.v2_native = _native.create_codec(self, True)
 
     def serialize(self, object, use_version_2: bool = None, buffer=None, endianness=None) -> bytes:
         if not self._populated:
@@ -131,8 +237,115 @@ class IDL:
                 raise Exception("Cannot encode this type with version 0, contains xcdrv2-type structures")
             use_version_2 = True
 
+        plain = self.v2_plain if use_version_2 else self.v0_plain
+        if plain is not None and buffer is None:
+            try:
+                return plain.serialize(object, '<' if (endianness or Endianness.native()) == Endianness.Little else '>')
+            except Exception:
+                pass
+
+        native = self.v2_native if use_version_2 else self.v0_native
+        if native is not None and buffer is None:
+            little = (endianness or Endianness.native()) == Endianness.Little
+            try:
+                data = _native.serialize(
+                    native, object, (1 if little else 0) | (self.xcdrv2_head if use_version_2 else 0), little,
+                    self._size_hint(object, use_version_2)
+                )
+                self._last_sizes[use_version_2] = len(data) - 4
+                return data
+            except Exception:
+                # Let the machines handle (and describe) anything the native codec does not
+                pass
+
         ibuffer = buffer or self.buffer
+        self._serialize_into(ibuffer, object, use_version_2, endianness)
+        return ibuffer.asbytes()
+
+    def serialize_view(self, object, use_version_2: bool = None, endianness=None) -> memoryview:
+        """Serialize into the internal buffer of this IDL instance and return a view on it, zero padded
+           to a multiple of four bytes as expected by the DataWriter. No intermediate copies are made,
+           the view is only valid until the next serialization of this type on the calling thread.
+           Samples of at least pin_size bytes are the exception: the calling thread moves on to a new
+           buffer and the (read-only) view stays valid, so the DataWriter can keep it without a copy."""
+        if not self._populated:
+            self.populate()
+
+        if self.version_support.SupportsBasic & self.version_support:
+            use_version_2 = False if use_version_2 is None else use_version_2
+        else:
+            # version 0 not supported
+            if use_version_2 is not None and not use_version_2:
+                raise Exception("Cannot encode this type with version 0, contains xcdrv2-type structures")
+            use_version_2 = True
+
+        ibuffer = self.buffer
+
+        plain = self.v2_plain if use_version_2 else self.v0_plain
+        if plain is not None:
+            try:
+                end = plain.serialize_into(
+                    ibuffer._bytes, object, '<' if (endianness or Endianness.native()) == Endianness.Little else '>'
+                )
+            except Exception:
+                end = None
+            # Like the native codec below, a failed pack may have written part of the sample
+            ibuffer._size = len(ibuffer._bytes)
+            ibuffer._dirty = None
+            if end is not None:
+                return self._hand_off(memoryview(ibuffer._bytes)[:end])
+
+        native = self.v2_native if use_version_2 else self.v0_native
+        if native is not None:
+            little = (endianness or Endianness.native()) == Endianness.Little
+            try:
+                end = _native.serialize_into(
+                    native, object, (1 if little else 0) | (self.xcdrv2_head if use_version_2 else 0), little,
+                    ibuffer._bytes, self._size_hint(object, use_version_2)
+                )
+            except Exception:
+                end = None
+            # The native codec may have grown the bytearray, it writes all padding itself so it does
+            # not zero_out beforehand and leaves the contents of the buffer unknown.
+            ibuffer._size = len(ibuffer._bytes)
+            ibuffer._dirty = None
+            if end is not None:
+                self._last_sizes[use_version_2] = end - 4
+                return self._hand_off(memoryview(ibuffer._bytes)[:end])
+
+        self._serialize_into(ibuffer, object, use_version_2, endianness)
+        return self._hand_off(ibuffer.asview(4))
+
+    def _hand_off(self, view: memoryview) -> memoryview:
+        if len(view) < self.pin_size:
+            return view
+        # The view gets the buffer to itself
+        del self._local.buffer
+        return view.toreadonly()
+
+    def _size_hint(self, object, use_version_2: bool) -> int:
+        # Room for the header, the sample and the padding to four bytes, so that the serializers allocate
+        # their buffer once instead of doubling it while writing. Bounding a sample with members of variable
+        # size takes about as long as the native codec takes to serialize it, so only the first sample of
+        # such a type is bounded, the ones after it start out with the size of the sample before them.
+        try:
+            size = self._max_sizes[use_version_2]
+        except KeyError:
+            size = self.max_size(use_version_2)
+
+        if size is None:
+            size = self._last_sizes.get(use_version_2)
+        if size is None:
+            try:
+                size = (self.v2_machine if use_version_2 else self.v0_machine).size_bound(object)
+            except Exception:
+                # The serializers report what is wrong with the sample
+                return 0
+        return size + 7
+
+    def _serialize_into(self, ibuffer: Buffer, object, use_version_2: bool, endianness) -> None:
         ibuffer.seek(0)
+        ibuffer.reserve(self._size_hint(object, use_version_2))
         ibuffer.zero_out()
         ibuffer.set_align_offset(0)
         ibuffer.set_endianness(endianness or Endianness.native())
@@ -151,17 +364,39 @@ class IDL:
 
         ibuffer.set_align_offset(4)
 
+        compiled = self.v2_compiled if use_version_2 else self.v0_compiled
+        if compiled is not None:
+            try:
+                compiled.serialize(ibuffer, object)
+                ibuffer.mark_dirty()
+                self._last_sizes[use_version_2] = ibuffer.tell() - 4
+                return
+            except Exception:
+                # Let the machines produce the (descriptive) error
+                ibuffer.zero_out(4)
+                ibuffer.seek(4)
+
         if use_version_2:
             self.v2_machine.serialize(ibuffer, object)
         else:
             self.v0_machine.serialize(ibuffer, object)
 
-        return ibuffer.asbytes()
+        ibuffer.mark_dirty()
+        self._last_sizes[use_version_2] = ibuffer.tell() - 4
 
-    def deserialize(self, data, has_header=True, use_version_2: bool = None) -> object:
+    def deserialize(self, data, has_header=True, use_version_2: bool = None, fields: Sequence[str] = None,
+                    lazy: bool = False) -> object:
         if not self._populated:
             self.populate()
 
+        record = view = None
+        if fields is not None:
+            if lazy:
+                raise ValueError("Selecting fields and lazy decoding cannot be combined.")
+            record = self.projection(fields)
+        elif lazy:
+            view = self.lazy_type()
+
         if has_header and use_version_2 is not None:
             raise Exception("Considered programmer error to set a version of xcdr to use if a header is present in the data.")
         elif not has_header and self.version_support.SupportsBasic & self.version_support:
@@ -172,7 +407,59 @@ class IDL:
                 raise Exception("Cannot encode this type with version 0, contains xcdrv2-type structures")
             use_version_2 = True
 
-        buffer = Buffer(data, align_offset=4 if has_header else 0) if not isinstance(data, Buffer) else data
+        if not lazy and not isinstance(data, Buffer):
+            if has_header and fields is None:
+                sample = self._deserialize_plain(data)
+                if sample is not None:
+                    return sample
+
+            sample = self._deserialize_native(data, has_header, use_version_2, record)
+            if sample is not None:
+                return sample
+
+        return self._deserialize_machine(data, has_header, use_version_2, record, view)
+
+    def _deserialize_plain(self, data) -> Optional[object]:
+        # The whole sample at once, None if it is not a plain sample
+        if (self.v0_plain is None and self.v2_plain is None) or len(data) < 4:
+            return None
+
+        plain = self.v2_plain if data[1] > 1 else self.v0_plain
+        if plain is not None:
+            try:
+                return plain.deserialize(data, '<' if data[1] & 1 else '>')
+            except Exception:
+                pass
+        return None
+
+    def _deserialize_native(self, data, has_header: bool, use_version_2: bool, record: Optional[type]) -> Optional[object]:
+        # Decoded by the native codec, None if it is not available or fails (the machines produce the error)
+        if self.v0_native is None and self.v2_native is None:
+            return None
+
+        native, little = None, Endianness.native() == Endianness.Little
+        if not has_header:
+            native = self.v2_native if use_version_2 else self.v0_native
+        elif len(data) >= 4:
+            little = (data[1] & 1) > 0
+            native = self.v2_native if data[1] > 1 else self.v0_native
+        if native is not None:
+            offset = 4 if has_header else 0
+            try:
+                if record is not None:
+                    return record(**_native.deserialize_fields(native, data, offset, little, record.__slots__))
+                return _native.deserialize(native, data, offset, little)
+            except Exception:
+                pass
+        return None
+
+    def _deserialize_machine(self, data, has_header: bool, use_version_2: bool, record: Optional[type],
+                             view: Optional[type]) -> object:
+        if not isinstance(data, Buffer):
+            # Decoding only reads, so wrap the data instead of copying it
+            buffer = Buffer(data, align_offset=4 if has_header else 0, readonly=True)
+        else:
+            buffer = data
 
         if has_header and buffer.tell() == 0:
             buffer.read('b', 1)
@@ -183,22 +470,58 @@ class IDL:
                 buffer.set_endianness(Endianness.Big)
             buffer.read('b', 1)
             buffer.read('b', 1)
-            if v > 1:
-                buffer._align_max = 4
-                machine = self.v2_machine
-            else:
-                buffer._align_max = 8
-                machine = self.v0_machine
+            use_version_2 = v > 1
+
+        if use_version_2:
+            buffer._align_max = 4
+            machine = self.v2_compiled or self.v2_machine
         else:
-            if use_version_2:
-                buffer._align_max = 4
-                machine = self.v2_machine
-            else:
-                buffer._align_max = 8
-                machine = self.v0_machine
+            buffer._align_max = 8
+            machine = self.v0_compiled or self.v0_machine
+
+        if record is not None:
+            # The compiled machines construct the whole sample, skipping members needs the machines
+            machine = self.v2_machine if use_version_2 else self.v0_machine
+            return record(**machine.deserialize_fields(buffer, record.__slots__))
+        elif view is not None:
+            return view(buffer, use_version_2)
 
         return machine.deserialize(buffer)
 
+    def lazy_type(self) -> type:
+        """The view type that decodes members on first access, see :func:`deserialize`."""
+        if self._lazy_type is None:
+            if not self._populated:
+                self.populate()
+            self._lazy_type = _lazy.lazy_type(self.datatype, self.v0_machine, self.v2_machine)
+        return self._lazy_type
+
+    def projection(self, fields: Sequence[str]) -> type:
+        """The record type that holds the given members of a sample, see :func:`deserialize`."""
+        fields = tuple(fields)
+        try:
+            return self._projections[fields]
+        except KeyError:
+            pass
+
+        if not self._populated:
+            self.populate()
+
+        machine = self.v2_machine or self.v0_machine
+        if not hasattr(machine, "deserialize_fields"):
+            raise TypeError(f"Only members of structs can be selected, {self.datatype.__name__} is not a struct.")
+
+        members = get_extended_type_hints(self.datatype)
+        for field in fields:
+            if field not in members:
+                raise ValueError(f"{self.datatype.__name__} has no member {field}.")
+        if not fields or len(set(fields)) != len(fields):
+            raise ValueError("Select at least one member, each member at most once.")
+
+        record = type(f"{self.datatype.__name__}Fields", (Projection,), {"__slots__": fields})
+        self._projections[fields] = record
+        return record
+
     def key(self, object, use_version_2: bool = None) -> bytes:
         if not self._populated:
             self.populate()
@@ -214,18 +537,20 @@ class IDL:
         if self.keyless:
             return b''
 
-        self.buffer.seek(0)
-        self.buffer.zero_out()
-        self.buffer.set_align_offset(0)
-        self.buffer.set_endianness(Endianness.Big)
-        self.buffer._align_max = 4 if use_version_2 else 8
+        buffer = self.buffer
+        buffer.seek(0)
+        buffer.zero_out()
+        buffer.set_align_offset(0)
+        buffer.set_endianness(Endianness.Big)
+        buffer._align_max = 4 if use_version_2 else 8
 
         if use_version_2:
-            self.v2_machine.serialize(self.buffer, object, for_key=True)
+            self.v2_machine.serialize(buffer, object, for_key=True)
         else:
-            self.v0_machine.serialize(self.buffer, object, for_key=True)
+            self.v0_machine.serialize(buffer, object, for_key=True)
 
-        return self.buffer.asbytes()
+        buffer.mark_dirty()
+        return buffer.asbytes()
 
     def keyhash(self, object, use_version_2: bool = None) -> bytes:
         if not self._populated:
@@ -278,6 +603,147 @@ class IDL:
 
         return ops
 
+    def key_vm(self, use_version_2: bool) -> Any:
+        """The native key VM of the type, built on first use and then reused by every ddspy_calc_key(s) call."""
+        try:
+            return self._key_vms[use_version_2]
+        except KeyError:
+            pass
+
+        vm = _native.create_key_vm(self, use_version_2)
+        self._key_vms[use_version_2] = vm
+        return vm
+
+    def cdr_codec_machine(self, use_version_2: bool = None):
+        if self.re_entrancy_protection:
+            # Recursive types are not supported by the native codec
+            raise NotImplementedError()
+
+        if not self._populated:
+            self.populate()
+
+        if self.version_support.SupportsBasic & self.version_support:
+            use_version_2 = False if use_version_2 is None else use_version_2
+        else:
+            # version 0 not supported
+            if use_version_2 is not None and not use_version_2:
+                raise Exception("Cannot encode this type with version 0, contains xcdrv2-type structures")
+            use_version_2 = True
+
+        self.re_entrancy_protection = True
+
+        try:
+            if use_version_2:
+                return self.v2_machine.cdr_codec_machine_op()
+            else:
+                return self.v0_machine.cdr_codec_machine_op()
+        finally:
+            self.re_entrancy_protection = False
+
+    def plain_layout(self, use_version_2: bool = False) -> Optional[Tuple[List[Tuple[str, str, int, Tuple[int, ...]]], int]]:
+        """The (name, struct code, offset, shape) of every member and the size of the serialized data (without
+           header) if this is a final struct where every member has a fixed size and plain layout, None otherwise."""
+        if not self._populated:
+            self.populate()
+
+        machine = self.v2_machine if use_version_2 else self.v0_machine
+        if type(machine) is not StructMachine:
+            return None
+
+        align_max = 4 if use_version_2 else 8
+        fields, offset = [], 0
+        try:
+            for name, member_machine in machine.members_machines.items():
+                code, alignment, shape = member_machine.plain_layout()
+                alignment = min(alignment, align_max)
+                offset = (offset + alignment - 1) & ~(alignment - 1)
+                fields.append((name, code, offset, shape))
+                count = 1
+                for dim in shape:
+                    count *= dim
+                offset += calcsize(code) * count
+        except NotImplementedError:
+            return None
+
+        return fields, offset
+
+    def member_offset(self, path: Sequence[str], use_version_2: bool = False) -> Optional[Tuple[str, int]]:
+        """The struct code and offset (without header) of the primitive or enum member at 'path' (member names,
+           descending into nested structs) if it is at the same offset in every sample, None otherwise."""
+        if not self._populated:
+            self.populate()
+
+        machine = self.v2_machine if use_version_2 else self.v0_machine
+        return self._member_path_offset(machine, path, 0, use_version_2) if path else None
+
+    @staticmethod
+    def _nested_machine(machine: InstanceMachine, use_version_2: bool) -> Machine:
+        idl = machine.type.__idl__
+        if not idl._populated:
+            idl.populate()
+        return idl.v2_machine if use_version_2 else idl.v0_machine
+
+    @classmethod
+    def _member_extent(cls, machine: Machine, offset: int, use_version_2: bool) -> Optional[Tuple[str, int, int]]:
+        # Struct code, (aligned) offset and offset past the end of a member with a fixed size
+        if isinstance(machine, InstanceMachine):
+            nested = cls._nested_machine(machine, use_version_2)
+            if type(nested) is not StructMachine:
+                # A delimited struct may be longer on the wire when the writer has an evolved type,
+                # nothing after it is at a fixed offset
+                return None
+            end = cls._member_path_offset(nested, (), offset, use_version_2)
+            return None if end is None else ('', offset, end[1])
+        if isinstance(machine, EnumMachine):
+            code, alignment, shape = 'I', 4, ()
+        else:
+            try:
+                code, alignment, shape = machine.plain_layout()
+            except NotImplementedError:
+                return None
+        alignment = min(alignment, 4 if use_version_2 else 8)
+        offset = (offset + alignment - 1) & ~(alignment - 1)
+        count = 1
+        for dim in shape:
+            count *= dim
+        return code, offset, offset + calcsize(code) * count
+
+    @classmethod
+    def _member_path_offset(cls, machine: Machine, path: Sequence[str], offset: int,
+                            use_version_2: bool) -> Optional[Tuple[str, int]]:
+        # With an empty path: the offset past the end of the struct
+        if type(machine) is DelimitedCdrAppendableStructMachine:
+            members = machine.member_machines
+            offset = ((offset + 3) & ~3) + 4
+        elif type(machine) is StructMachine:
+            members = machine.members_machines
+        else:
+            return None
+
+        if path and path[0] not in members:
+            return None
+
+        for name, member_machine in members.items():
+            if path and name == path[0]:
+                break
+            extent = cls._member_extent(member_machine, offset, use_version_2)
+            if extent is None:
+                return None
+            offset = extent[2]
+        else:
+            return '', offset
+
+        if len(path) > 1:
+            if not isinstance(member_machine, InstanceMachine):
+                return None
+            return cls._member_path_offset(cls._nested_machine(member_machine, use_version_2), path[1:], offset,
+                                           use_version_2)
+
+        if not isinstance(member_machine, (PrimitiveMachine, EnumMachine)):
+            return None
+        extent = cls._member_extent(member_machine, offset, use_version_2)
+        return None if extent is None else (extent[0], extent[1])
+
     def key_scan(self, use_version_2: bool = None):
         if self.re_entrancy_protection:
             # If we get here then there is a recursion in the type
@@ -306,6 +772,38 @@ class IDL:
 
         return scan
 
+    def max_size(self, use_version_2: bool = False) -> Optional[int]:
+        """Upper bound of the serialized size of any sample excluding the encapsulation header, None if
+           the size is unbounded. Computed once per XCDR version."""
+        if self.re_entrancy_protection:
+            # Recursive types are unbounded
+            return None
+
+        if not self._populated:
+            self.populate()
+
+        try:
+            return self._max_sizes[use_version_2]
+        except KeyError:
+            pass
+
+        self.re_entrancy_protection = True
+        try:
+            size = (self.v2_machine if use_version_2 else self.v0_machine).max_size()
+        finally:
+            self.re_entrancy_protection = False
+
+        self._max_sizes[use_version_2] = size
+        return size
+
+    def size_bound(self, object, use_version_2: bool = False) -> int:
+        """Cheap upper bound of the serialized size of a sample excluding the encapsulation header, used to
+           allocate the serialization buffer once instead of growing it while serializing."""
+        size = self.max_size(use_version_2)
+        if size is not None:
+            return size
+        return (self.v2_machine if use_version_2 else self.v0_machine).size_bound(object)
+
     def get_member_id(self, member: str) -> int:
         return self.member_ids.get(member, -1) if self.member_ids else -1
 
@@ -314,12 +812,16 @@ class IDL:
             self.populate()
 
         if self._xt_data[0] is None:
-            from ._xt_builder import XTBuilder
-            self._xt_data = XTBuilder.process_type(self.datatype)
-            self._xt_bytedata = (
-                self._xt_data[0].serialize(endianness=Endianness.Little, use_version_2=True)[4:],
-                self._xt_data[1].serialize(endianness=Endianness.Little, use_version_2=True)[4:]
-            )
+            with _populate_lock:
+                if self._xt_data[0] is None:
+                    from ._xt_builder import XTBuilder
+                    xt_data = XTBuilder.process_type(self.datatype)
+                    self._xt_bytedata = (
+                        xt_data[0].serialize(endianness=Endianness.Little, use_version_2=True)[4:],
+                        xt_data[1].serialize(endianness=Endianness.Little, use_version_2=True)[4:]
+                    )
+                    # Set last, readers check _xt_data without taking the lock
+                    self._xt_data = xt_data
 
     def get_type_info(self) -> 'TypeInformation':
         if self._xt_data[0] is None:
@@ -366,9 +868,46 @@ class IdlMeta(type):
         IDLNamespaceScope.enter(namespace)
         return namespace
 
-    def __new__(metacls, name, bases, namespace, **kwds):
+    def __new__(metacls, name, bases, namespace, slots=False, **kwds):
         IDLNamespaceScope.exit()
-        new_cls = super().__new__(metacls, name, bases, dict(**namespace))
+        namespace = dict(**namespace)
+
+        # Members stored in the __slots__ of a base, their defaults only exist as dataclass fields of that base
+        slotted: Dict[str, Any] = {}
+        for base in bases:
+            slotted.update(getattr(base, "__idl_slots__", {}))
+        for member in namespace["__annotations__"]:
+            if member in slotted and member not in namespace:
+                for base in bases:
+                    f = getattr(base, "__dataclass_fields__", {}).get(member)
+                    if f is not None and f.default is not dataclasses.MISSING:
+                        namespace[member] = f.default
+                    elif f is not None and f.default_factory is not dataclasses.MISSING:
+                        namespace[member] = dataclasses.field(default_factory=f.default_factory)
+
+        if slots:
+            # Members of IdlMeta bases are stored by those bases already
+            inherited = set()
+            for base in bases:
+                if isinstance(base, IdlMeta):
+                    inherited.update(base.__annotations__)
+            members = [member for member in namespace["__annotations__"] if member not in inherited]
+            # A class variable with the same name as a slot is not allowed, the defaults are put back
+            # once the slots exist, see _IdlSlotsMeta.
+            defaults = {member: namespace.pop(member) for member in members if member in namespace}
+            reserved = any("sample_info" in getattr(c, "__slots__", ()) for base in bases for c in base.__mro__)
+            namespace["__slots__"] = tuple(members) + (() if reserved else ("sample_info",))
+
+        if slotted or slots:
+            metacls = _slots_metaclass(metacls)
+        new_cls = super().__new__(metacls, name, bases, namespace)
+
+        if slots:
+            slotted.update((member, new_cls.__dict__[member]) for member in members)
+            for member, default in defaults.items():
+                type.__setattr__(new_cls, member, default)
+        if slotted:
+            type.__setattr__(new_cls, "__idl_slots__", slotted)
 
         if "__idl_typename__" not in namespace:
             new_cls.__idl_typename__ = name
@@ -383,6 +922,32 @@ class IdlMeta(type):
         return f"{cls.__name__}(IdlStruct, idl_typename='{cls.__idl_typename__}')"
 
 
+class _IdlSlotsMeta(type):
+    # Mixed into the metaclass of classes with members in __slots__. Their defaults are class variables that
+    # hide the slot descriptors, the dataclass decorator picks them up and sets __dataclass_fields__ once it
+    # has, then the slots are made visible again. The defaults live on in __init__.
+    def __setattr__(cls, name, value):
+        super().__setattr__(name, value)
+        if name == "__dataclass_fields__":
+            for member, descriptor in cls.__dict__["__idl_slots__"].items():
+                if descriptor.__objclass__ is cls:
+                    if cls.__dict__.get(member) is not descriptor:
+                        type.__setattr__(cls, member, descriptor)
+                elif member in cls.__dict__:
+                    type.__delattr__(cls, member)
+
+
+_slots_metaclasses: Dict[type, type] = {}
+
+
+def _slots_metaclass(metacls: type) -> type:
+    if issubclass(metacls, _IdlSlotsMeta):
+        return metacls
+    if metacls not in _slots_metaclasses:
+        _slots_metaclasses[metacls] = type(metacls.__name__, (_IdlSlotsMeta, metacls), {"__module__": metacls.__module__})
+    return _slots_metaclasses[metacls]
+
+
 def _union_default_finder(_type, cases):
     if isclass(_type) and issubclass(_type, Enum):
         # non-optimal for sure, but should be used rarely
@@ -0,0 +1,70 @@
+"""
+ * Copyright(c) 2021 to 2022 ZettaScale Technology and others
+ *
+ * This program and the accompanying materials are made available under the
+ * terms of the Eclipse Public License v. 2.0 which is available at
+ * http://www.eclipse.org/legal/epl-2.0, or the Eclipse Distribution License
+ * v. 1.0 which is available at
+ * http://www.eclipse.org/org/documents/edl-v10.php.
+ *
+ * SPDX-License-Identifier: EPL-2.0 OR BSD-3-Clause
+"""
+
+from typing import Any, Callable, Optional, TYPE_CHECKING
+
+
+if TYPE_CHECKING:
+    from ._main import IDL
+
+
+# The native codec lives in the C extension (clayer/cdrcodec.c). The idl package is usable
+# without the extension (and without the Cyclone library), so it is loaded on first use and
+# all functionality silently degrades to the machines when it is not available.
+_loaded: bool = False
+_create: Optional[Callable] = None
+serialize: Optional[Callable] = None
+serialize_into: Optional[Callable] = None
+deserialize: Optional[Callable] = None
+deserialize_fields: Optional[Callable] = None
+_create_key_vm: Optional[Callable] = None
+
+
+def _load() -> bool:
+    global _loaded, _create, serialize, serialize_into, deserialize, deserialize_fields, _create_key_vm
+
+    if not _loaded:
+        _loaded = True
+        try:
+            from cyclonedds import _clayer
+            _create = _clayer.ddspy_codec_create
+            serialize = _clayer.ddspy_codec_serialize
+            serialize_into = _clayer.ddspy_codec_serialize_into
+            deserialize = _clayer.ddspy_codec_deserialize
+            deserialize_fields = _clayer.ddspy_codec_deserialize_fields
+            _create_key_vm = _clayer.ddspy_key_vm_create
+        except Exception:
+            _create = None
+
+    return _create is not None
+
+
+def create_codec(idl: 'IDL', use_version_2: bool) -> Optional[Any]:
+    """Flatten the machine tree of a type into a native codec, None if the type contains
+       constructs the codec does not handle (unions, mappings, mutable or recursive types)."""
+    if not _load():
+        return None
+
+    try:
+        ops = idl.cdr_codec_machine(use_version_2)
+    except NotImplementedError:
+        return None
+
+    return _create(ops, 4 if use_version_2 else 8)
+
+
+def create_key_vm(idl: 'IDL', use_version_2: bool) -> Optional[Any]:
+    """Compile the key machine of a type into a native key VM, None without the C extension."""
+    if not _load():
+        return None
+
+    return _create_key_vm(idl, use_version_2)
@@ -15,7 +15,7 @@ import struct
 
 from dataclasses import dataclass, field
 from enum import IntEnum, Enum, auto
-from typing import Any, List, Optional, Tuple
+from typing import Any, ClassVar, List, Optional, Tuple, Union
 
 
 class CdrKeyVMOpType(IntEnum):
@@ -55,6 +55,37 @@ class CdrKeyVmNamedJumpOp(CdrKeyVmOp):
     jumpto: str = ""
 
 
+# Keep in sync with clayer/cdrcodec.h:cdr_codec_op_type
+class CdrCodecOpType(IntEnum):
+    Done = 0
+    Primitive = 1
+    Char = 2
+    String = 3
+    Bytes = 4
+    ByteArray = 5
+    PrimitiveArray = 6
+    PrimitiveSequence = 7
+    Enum = 8
+    BitMask = 9
+    Struct = 10
+    Member = 11
+    Appendable = 12
+    Sequence = 13
+    Array = 14
+    Optional = 15
+
+
+@dataclass
+class CdrCodecOp:
+    type: CdrCodecOpType
+    size: int = 0
+    align: int = 0
+    value: int = 0
+    count: int = 0
+    code: str = ""
+    obj: Any = None
+
+
 class Endianness(Enum):
     Little = auto()
     Big = auto()
@@ -65,10 +96,22 @@ class Endianness(Enum):
 
 
 class Buffer:
-    def __init__(self, _bytes: Optional[bytes] = None, align_offset: int = 0, align_max: int = 8) -> None:
-        self._bytes: bytearray = bytearray(_bytes) if _bytes else bytearray(512)
+    # Shared source of zeroes for zero_out, grown on demand
+    _zeroes: ClassVar[memoryview] = memoryview(bytes(512))
+
+    def __init__(self, _bytes: Optional[bytes] = None, align_offset: int = 0, align_max: int = 8,
+                 readonly: bool = False) -> None:
+        self._bytes: Union[bytearray, memoryview]
+        if readonly and _bytes is not None:
+            # Decode straight from the caller's data (bytes, a loan, an mmap) instead of copying it
+            view = memoryview(_bytes)
+            self._bytes = view if view.format == 'B' and view.ndim == 1 else view.cast('B')
+        else:
+            self._bytes = bytearray(_bytes) if _bytes else bytearray(512)
         self._pos: int = 0
         self._size: int = len(self._bytes)
+        # Bytes at and beyond _dirty are known to be zero, None when that is unknown
+        self._dirty: Optional[int] = None
         self._align_offset: int = align_offset
         self._align_max: int = align_max
         self.set_endianness(Endianness.native())
@@ -80,10 +123,20 @@ class Buffer:
         else:
             self._endian = ">"
 
-    def zero_out(self) -> None:
-        # As per testing (https://stackoverflow.com/questions/19671145)
-        # Quickest way to zero is to re-alloc..
-        self._bytes = bytearray(self._size)
+    def zero_out(self, start: int = 0) -> None:
+        # Zero in place, only up to where the previous user of the buffer wrote. Not reallocating
+        # keeps the buffer (and views on it) stable and avoids allocation churn per sample.
+        end = self._size if self._dirty is None else min(self._dirty, self._size)
+        if end > start:
+            if end - start > len(Buffer._zeroes):
+                Buffer._zeroes = memoryview(bytes(end - start))
+            self._bytes[start:end] = Buffer._zeroes[:end - start]
+        # Until the user marks the end of its data everything may be written
+        self._dirty = None
+
+    def mark_dirty(self, end: Optional[int] = None) -> None:
+        """Record that nothing beyond 'end' (default: the current position) was written since the last zero_out."""
+        self._dirty = self._pos if end is None else end
 
     def set_align_offset(self, offset: int) -> None:
         self._align_offset = offset
@@ -104,6 +157,16 @@ class Buffer:
             self._bytes = bytearray(self._size)
             self._bytes[0:old_size] = old_bytes
 
+    def reserve(self, size: int) -> None:
+        """Grow to at least 'size' bytes in a single allocation, ahead of writing data of known (maximum) size.
+        Only the bytes before the current position are kept."""
+        if size > self._size:
+            old_bytes = self._bytes
+            self._size = size
+            self._bytes = bytearray(size)
+            self._bytes[0:self._pos] = old_bytes[0:self._pos]
+            self._dirty = self._pos if self._dirty is None else min(self._dirty, self._pos)
+
     def align(self, alignment: int) -> 'Buffer':
         alignment = min(alignment, self._align_max)
         self._pos = ((self._pos - self._align_offset + alignment - 1) & ~(alignment - 1)) + self._align_offset
@@ -133,6 +196,14 @@ class Buffer:
         self._pos += length
         return b
 
+    def read_view(self, length: int) -> memoryview:
+        """Like read_bytes, but a view on the underlying data. Only valid as long as that data is not modified."""
+        v = memoryview(self._bytes)[self._pos:self._pos + length]
+        if len(v) != length:
+            raise IndexError("Read beyond end of buffer.")
+        self._pos += length
+        return v
+
     def read(self, pack: str, size: int) -> Any:
         v = struct.unpack_from(self._endian + pack, buffer=self._bytes, offset=self._pos)
         self._pos += size
@@ -146,6 +217,14 @@ class Buffer:
     def asbytes(self) -> bytes:
         return bytes(self._bytes[0:self._pos])
 
+    def asview(self, pad: int = 1) -> memoryview:
+        """A view on the written bytes, zero padded to a multiple of 'pad'. Only valid until the buffer is reused."""
+        end = (self._pos + pad - 1) & ~(pad - 1)
+        if end != self._pos:
+            self.ensure_size(end - self._pos)
+            self._bytes[self._pos:end] = Buffer._zeroes[:end - self._pos]
+        return memoryview(self._bytes)[:end]
+
 
 class KeyScanResult(Enum):
     FixedSize = 1
@@ -89,6 +89,45 @@ class sequence:
     __str__ = __repr__
 
 
+class ndarray(array):
+    """An :class:`array` of a primitive type that is represented in Python by a ``numpy.ndarray``,
+    or by an ``array.array`` when NumPy is not installed. The data is encoded and decoded with a
+    single copy instead of one Python object per element. The wire format is that of an ``array``.
+    Booleans are represented as unsigned bytes by ``array.array``."""
+
+    def __repr__(self) -> str:
+        return f"ndarray[{_type_repr(self.subtype)}, {self.length}]"
+
+    def __eq__(self, o: object) -> bool:
+        return isinstance(o, ndarray) and super().__eq__(o)
+
+    def __hash__(self) -> int:
+        return super().__hash__() ^ 1
+
+    __str__ = __repr__
+
+
+class ndsequence(sequence):
+    """A :class:`sequence` of a primitive type that is represented in Python by a ``numpy.ndarray``,
+    or by an ``array.array`` when NumPy is not installed. The data is encoded and decoded with a
+    single copy instead of one Python object per element. The wire format is that of a ``sequence``.
+    Booleans are represented as unsigned bytes by ``array.array``."""
+
+    def __repr__(self) -> str:
+        if self.max_length:
+            return f"ndsequence[{_type_repr(self.subtype)}, {self.max_length}]"
+        else:
+            return f"ndsequence[{_type_repr(self.subtype)}]"
+
+    def __eq__(self, o: object) -> bool:
+        return isinstance(o, ndsequence) and super().__eq__(o)
+
+    def __hash__(self) -> int:
+        return super().__hash__() ^ 1
+
+    __str__ = __repr__
+
+
 class typedef:
     @classmethod
     def __class_getitem__(cls, tup):
@@ -17,7 +17,7 @@ import platform
 import ctypes as ct
 from ctypes.util import find_library
 from functools import wraps
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 
 if 'CYCLONEDDS_PYTHON_NO_IMPORT_LIBS' not in os.environ:
@@ -240,42 +240,10 @@ class DDS:
         self._ref = reference
 
 
-@dataclass
-class SampleInfo:
-    """
-    Contains information about the associated data value
-
-    Attributes
-    ----------
-    sample_state:
-        Possible values: :class:`SampleState<cyclonedds.core.SampleState>`
-    view_state:
-        Possible values: :class:`ViewState<cyclonedds.core.ViewState>`
-    instance_state:
-        Possible values: :class:`InstanceState<cyclonedds.core.InstanceState>`
-    source_timestamp:
-        The time (in unix nanoseconds) that the associated sample was written.
-    instance_handle:
-        Handle to the data instance (if this is a keyed topic)
-    """
-    sample_state: int
-    view_state: int
-    instance_state: int
-    valid_data: bool
-    source_timestamp: int
-    instance_handle: int
-    publication_handle: int
-    disposed_generation_count: int
-    no_writers_generation_count: int
-    sample_rank: int
-    generation_rank: int
-    absolute_generation_rank: int
-
-
 @dataclass
 class InvalidSample:
     key: bytes
-    sample_info: SampleInfo
+    sample_info: 'SampleInfo'
 
 
 class dds_c_t:  # noqa N801
@@ -393,6 +361,47 @@ class dds_c_t:  # noqa N801
 
 import cyclonedds._clayer as _clayer  # noqa E402
 
+
+# The storage is implemented in C (clayer/sampleinfo.c): a copy of the dds_sample_info_t whose fields
+# are only converted to Python objects on access, since most users never look at most of them. This
+# subclass makes it a dataclass again, for dataclasses.fields, asdict and replace.
+@dataclass(init=False, repr=False, eq=False)
+class SampleInfo(_clayer.SampleInfo):
+    """
+    Contains information about the associated data value
+
+    Attributes
+    ----------
+    sample_state:
+        Possible values: :class:`SampleState<cyclonedds.core.SampleState>`
+    view_state:
+        Possible values: :class:`ViewState<cyclonedds.core.ViewState>`
+    instance_state:
+        Possible values: :class:`InstanceState<cyclonedds.core.InstanceState>`
+    source_timestamp:
+        The time (in unix nanoseconds) that the associated sample was written.
+    instance_handle:
+        Handle to the data instance (if this is a keyed topic)
+    """
+    __slots__ = ()
+
+    # The field() class variables are removed by the dataclass decorator, leaving the C attributes visible
+    sample_state: int = field()
+    view_state: int = field()
+    instance_state: int = field()
+    valid_data: bool = field()
+    source_timestamp: int = field()
+    instance_handle: int = field()
+    publication_handle: int = field()
+    disposed_generation_count: int = field()
+    no_writers_generation_count: int = field()
+    sample_rank: int = field()
+    generation_rank: int = field()
+    absolute_generation_rank: int = field()
+
+
+_clayer.ddspy_sampleinfo_set_type(SampleInfo)
+
 dds_infinity: int = _clayer.DDS_INFINITY
 uint32_max: int = _clayer.UINT32_MAX
 feature_type_discovery = _clayer.HAS_TYPE_DISCOVERY
@@ -10,18 +10,21 @@
  * SPDX-License-Identifier: EPL-2.0 OR BSD-3-Clause
 """
 
-from typing import Optional, Union, Generic, TypeVar, TYPE_CHECKING
+import sys
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Union, Generic, TypeVar, TYPE_CHECKING
 
 from .internal import c_call, dds_c_t
-from .core import Entity, DDSException, Listener
+from .core import Entity, DDSException, Listener, _representation_version_2, _serialize_samples
 from .domain import DomainParticipant
 from .topic import Topic
 from .qos import _CQos, Qos, LimitedScopeQos, PublisherQos, DataWriterQos
 
-from cyclonedds._clayer import ddspy_write, ddspy_write_ts, ddspy_dispose, ddspy_writedispose, ddspy_writedispose_ts, \
-    ddspy_dispose_handle, ddspy_dispose_handle_ts, ddspy_register_instance, ddspy_unregister_instance,   \
+from cyclonedds._clayer import ddspy_write, ddspy_write_ts, ddspy_write_many, ddspy_dispose, ddspy_writedispose, \
+    ddspy_writedispose_ts, ddspy_dispose_handle, ddspy_dispose_handle_ts, ddspy_register_instance, ddspy_unregister_instance, \
     ddspy_unregister_instance_handle, ddspy_unregister_instance_ts, ddspy_unregister_instance_handle_ts, \
-    ddspy_lookup_instance, ddspy_dispose_ts
+    ddspy_lookup_instance, ddspy_dispose_ts, ddspy_calc_key, ddspy_calc_keys, ddspy_register_instances, \
+    ddspy_lookup_instances
 
 
 if TYPE_CHECKING:
@@ -115,11 +118,33 @@ class Publisher(Entity):
 _T = TypeVar('_T')
 
 class DataWriter(Entity, Generic[_T]):
+    # Check that the cached key of an instance handle passed to write matches the sample (python -X dev)
+    _check_instance_handles: bool = sys.flags.dev_mode
+
     def __init__(self,
                  publisher_or_participant: Union[DomainParticipant, Publisher],
                  topic: Topic[_T],
                  qos: Optional[Qos] = None,
-                 listener: Optional[Listener] = None):
+                 listener: Optional[Listener] = None,
+                 instance_cache_size: int = 4096):
+        """
+        Parameters
+        ----------
+        publisher_or_participant: cyclonedds.pub.Publisher, cyclonedds.domain.DomainParticipant
+            The publisher to which this writer will be added. If you supply a DomainParticipant a publisher
+            will be created for you.
+        topic: cyclonedds.topic.Topic
+            The topic to write to.
+        qos: cyclonedds.core.Qos, optional = None
+            Optionally supply a Qos.
+        listener: cyclonedds.core.Listener = None
+            Optionally supply a Listener.
+        instance_cache_size: int = 4096
+            The number of instance handles (from :func:`register_instance` and :func:`lookup_instance`)
+            for which the key is remembered, the least recently used is dropped first. Writing with such a
+            handle does not extract the key from the sample again. Disposing or unregistering an instance
+            drops its key. Use 0 to disable.
+        """
         if not isinstance(publisher_or_participant, (DomainParticipant, Publisher)):
             raise TypeError(f"{publisher_or_participant} is not a cyclonedds.domain.DomainParticipant"
                             " or cyclonedds.pub.Publisher.")
@@ -151,24 +176,16 @@ class DataWriter(Entity, Generic[_T]):
         self._topic = topic
         self.data_type = topic.data_type
         self._keepalive_entities = [self.publisher, self.topic]
-
-        cqos = _CQos.cqos_create()
-        ret = self._get_qos(self._ref, cqos)
-        if ret == 0:
-            data_repr_policy = _CQos._get_p_datarepresentation(cqos)
-            if data_repr_policy is None or (data_repr_policy.use_cdrv0_representation and data_repr_policy.use_xcdrv2_representation):
-                self._use_version_2 = None  # Use whatever is native to the datatype
-            elif data_repr_policy.use_xcdrv2_representation:
-                self._use_version_2 = True
-            else:
-                self._use_version_2 = False
-        _CQos.cqos_destroy(cqos)
+        # Instance handle to the key of the instance as computed by the key VM, most recently used last
+        self._instance_keys: 'OrderedDict[int, bytes]' = OrderedDict()
+        self._instance_cache_size = instance_cache_size
+        self._use_version_2 = _representation_version_2(self)
 
     @property
     def topic(self) -> Topic[_T]:
         return self._topic
 
-    def write(self, sample: _T, timestamp: Optional[int] = None):
+    def write(self, sample: _T, timestamp: Optional[int] = None, handle: Optional[int] = None):
         """
         Parameters
         ----------
@@ -176,21 +193,71 @@ class DataWriter(Entity, Generic[_T]):
             The sample to write
         timestamp
             The sample's source_timestamp (in nanoseconds since the UNIX Epoch)
+        handle
+            The instance handle of the sample, received from :func:`register_instance` or
+            :func:`lookup_instance`. If the key of that instance is cached (see the instance_cache_size
+            of the DataWriter) it is not extracted from the sample again. The handle must belong to the
+            instance of the sample: the sample ends up in the instance of the handle regardless. In Python
+            development mode (``python -X dev``) that is checked, at the cost of extracting the key anyway.
+
+        Raises
+        ------
+        ValueError
+            In development mode, if the handle belongs to another instance than the sample.
         """
         if not isinstance(sample, self.data_type):
             raise TypeError(f"{sample} is not of type {self.data_type}")
 
-        ser = sample.serialize(use_version_2=self._use_version_2)
-        ser = ser.ljust((len(ser) + 4 - 1) & ~(4 - 1), b'\0')
+        ser = sample.__idl__.serialize_view(sample, use_version_2=self._use_version_2)
+        key = self._cached_key(handle) if handle is not None else None
+        if key is not None and self._check_instance_handles and \
+                key != ddspy_calc_key(sample.__idl__, ser, ser[1] > 1):
+            raise ValueError(f"Instance handle {handle} does not belong to the instance of {sample}")
 
         if timestamp is not None:
-            ret = ddspy_write_ts(self._ref, ser, timestamp)
+            ret = ddspy_write_ts(self._ref, ser, timestamp) if key is None else ddspy_write_ts(self._ref, ser, timestamp, key)
         else:
-            ret = ddspy_write(self._ref, ser)
+            ret = ddspy_write(self._ref, ser) if key is None else ddspy_write(self._ref, ser, key)
 
         if ret < 0:
             raise DDSException(ret, f"Occurred while writing sample in {repr(self)}")
 
+    def write_many(self, samples: Iterable[_T], timestamps: Optional[Iterable[int]] = None):
+        """
+        Write a batch of samples. All samples are serialized first and then handed to Cyclone DDS
+        in a single call, which saves a lot of per-sample overhead when writing many samples. If the
+        writer uses write batching the batch is flushed at the end.
+
+        Parameters
+        ----------
+        samples
+            The samples to write
+        timestamps
+            The samples' source_timestamps (in nanoseconds since the UNIX Epoch), one per sample
+
+        Raises
+        ------
+        DDSException
+            If writing one of the samples failed, the samples before it have been written.
+        """
+        serialized = []
+        for sample in samples:
+            if not isinstance(sample, self.data_type):
+                raise TypeError(f"{sample} is not of type {self.data_type}")
+
+            ser = sample.__idl__.serialize(sample, use_version_2=self._use_version_2)
+            serialized.append(ser.ljust((len(ser) + 3) & ~3, b'\0'))
+
+        if timestamps is not None:
+            timestamps = list(timestamps)
+            if len(timestamps) != len(serialized):
+                raise ValueError(f"Got {len(timestamps)} timestamps for {len(serialized)} samples")
+
+        written, ret = ddspy_write_many(self._ref, serialized, timestamps)
+
+        if ret < 0:
+            raise DDSException(ret, f"Occurred while writing sample {written} of {len(serialized)} in {repr(self)}")
+
     def write_dispose(self, sample: _T, timestamp: Optional[int] = None):
         """
         Similar to :func:`write` but also marks the sample for disposal by setting its
@@ -203,8 +270,8 @@ class DataWriter(Entity, Generic[_T]):
         timestamp
             The sample's source_timestamp (in nanoseconds since the UNIX Epoch)
         """
-        ser = sample.serialize(use_version_2=self._use_version_2)
-        ser = ser.ljust((len(ser) + 4 - 1) & ~(4 - 1), b'\0')
+        ser = sample.__idl__.serialize_view(sample, use_version_2=self._use_version_2)
+        self._forget_instance(ser)
 
         if timestamp is not None:
             ret = ddspy_writedispose_ts(self._ref, ser, timestamp)
@@ -226,8 +293,8 @@ class DataWriter(Entity, Generic[_T]):
         timestamp
             The sample's source_timestamp (in nanoseconds since the UNIX Epoch)
         """
-        ser = sample.serialize(use_version_2=self._use_version_2)
-        ser = ser.ljust((len(ser) + 4 - 1) & ~(4 - 1), b'\0')
+        ser = sample.__idl__.serialize_view(sample, use_version_2=self._use_version_2)
+        self._forget_instance(ser)
 
         if timestamp is not None:
             ret = ddspy_dispose_ts(self._ref, ser, timestamp)
@@ -249,6 +316,7 @@ class DataWriter(Entity, Generic[_T]):
         timestamp
             The instance's source_timestamp (in nanoseconds since the UNIX Epoch)
         """
+        self._instance_keys.pop(handle, None)
         if timestamp is not None:
             ret = ddspy_dispose_handle_ts(self._ref, handle, timestamp)
         else:
@@ -258,14 +326,44 @@ class DataWriter(Entity, Generic[_T]):
             raise DDSException(ret, f"Occurred while disposing in {repr(self)}")
 
     def register_instance(self, sample: _T) -> int:
-        ser = sample.serialize(use_version_2=self._use_version_2)
-        ser = ser.ljust((len(ser) + 4 - 1) & ~(4 - 1), b'\0')
+        ser = sample.__idl__.serialize_view(sample, use_version_2=self._use_version_2)
 
         ret = ddspy_register_instance(self._ref, ser)
         if ret < 0:
             raise DDSException(ret, f"Occurred while registering instance in {repr(self)}")
+        self._cache_key(ret, sample, ser)
         return ret
 
+    def register_instances(self, samples: Iterable[Union[_T, bytes]]) -> List[int]:
+        """
+        Register a batch of instances. All samples are serialized first and then registered in a single
+        call into Cyclone DDS, see :func:`write_many`.
+
+        Parameters
+        ----------
+        samples
+            The samples to register. Samples that were already serialized (e.g. by
+            :func:`serialize<cyclonedds.idl.IdlStruct.serialize>`) can be passed as bytes.
+
+        Returns
+        -------
+        List[int]
+            The instance handles, in the order of the samples.
+
+        Raises
+        ------
+        DDSException
+            If registering one of the samples failed, the samples before it have been registered.
+        """
+        serialized = _serialize_samples(self.data_type, samples, self._use_version_2)
+
+        handles, ret = ddspy_register_instances(self._ref, serialized)
+        if ret < 0:
+            raise DDSException(ret, f"Occurred while registering instance {len(handles)} of {len(serialized)}"
+                                    f" in {repr(self)}")
+        self._cache_keys(handles, serialized)
+        return handles
+
     def unregister_instance(self, sample: _T, timestamp: Optional[int] = None):
         """
         Parameters
@@ -275,8 +373,8 @@ class DataWriter(Entity, Generic[_T]):
         timestamp
             The timestamp used at registration (in nanoseconds since the UNIX Epoch)
         """
-        ser = sample.serialize(use_version_2=self._use_version_2)
-        ser = ser.ljust((len(ser) + 4 - 1) & ~(4 - 1), b'\0')
+        ser = sample.__idl__.serialize_view(sample, use_version_2=self._use_version_2)
+        self._forget_instance(ser)
 
         if timestamp is not None:
             ret = ddspy_unregister_instance_ts(self._ref, ser, timestamp)
@@ -295,6 +393,7 @@ class DataWriter(Entity, Generic[_T]):
         timestamp
             The timestamp used at registration (in nanoseconds since the UNIX Epoch)
         """
+        self._instance_keys.pop(handle, None)
         if timestamp is not None:
             ret = ddspy_unregister_instance_handle_ts(self._ref, handle, timestamp)
         else:
@@ -326,16 +425,62 @@ class DataWriter(Entity, Generic[_T]):
         """
         This operation takes a sample and returns an instance handle to be used for subsequent operations.
         """
-        ser = sample.serialize(use_version_2=self._use_version_2)
-        ser = ser.ljust((len(ser) + 4 - 1) & ~(4 - 1), b'\0')
+        ser = sample.__idl__.serialize_view(sample, use_version_2=self._use_version_2)
 
         ret = ddspy_lookup_instance(self._ref, ser)
         if ret < 0:
             raise DDSException(ret, f"Occurred while lookup up instance from {repr(self)}")
         if ret == 0:
             return None
+        self._cache_key(ret, sample, ser)
         return ret
 
+    def lookup_instances(self, samples: Iterable[Union[_T, bytes]]) -> List[Optional[int]]:
+        """
+        Like :func:`lookup_instance` for a batch of samples, with a single call into Cyclone DDS.
+        Samples that were already serialized can be passed as bytes.
+        """
+        serialized = _serialize_samples(self.data_type, samples, self._use_version_2)
+
+        handles = [handle or None for handle in ddspy_lookup_instances(self._ref, serialized)]
+        self._cache_keys(handles, serialized)
+        return handles
+
+    def _cache_keys(self, handles: List[Optional[int]], serialized: List[bytes]) -> None:
+        idl = self.data_type.__idl__
+        if self._instance_cache_size <= 0 or idl.keyless:
+            return
+        # Only the last ones would survive in the cache anyway, compute their keys in one go per XCDR version
+        todo = {False: ([], []), True: ([], [])}
+        for handle, ser in list(zip(handles, serialized))[-self._instance_cache_size:]:
+            if handle and handle not in self._instance_keys:
+                todo[ser[1] > 1][0].append(handle)
+                todo[ser[1] > 1][1].append(ser)
+        for v2, (todo_handles, todo_serialized) in todo.items():
+            if todo_handles:
+                self._instance_keys.update(zip(todo_handles, ddspy_calc_keys(idl, todo_serialized, v2)))
+        while len(self._instance_keys) > self._instance_cache_size:
+            self._instance_keys.popitem(last=False)
+
+    def _cache_key(self, handle: int, sample: _T, ser: memoryview) -> None:
+        if self._instance_cache_size <= 0 or handle in self._instance_keys or sample.__idl__.keyless:
+            return
+        self._instance_keys[handle] = ddspy_calc_key(sample.__idl__, ser, ser[1] > 1)
+        while len(self._instance_keys) > self._instance_cache_size:
+            self._instance_keys.popitem(last=False)
+
+    def _forget_instance(self, ser: memoryview) -> None:
+        # Disposing or unregistering by sample, the key cached for its handle (if any) goes
+        if self._instance_keys:
+            self._instance_keys.pop(ddspy_lookup_instance(self._ref, ser), None)
+
+    def _cached_key(self, handle: int) -> Optional[bytes]:
+        try:
+            self._instance_keys.move_to_end(handle)
+            return self._instance_keys[handle]
+        except KeyError:
+            return None
+
     @c_call("dds_create_writer")
     def _create_writer(self, publisher: dds_c_t.entity, topic: dds_c_t.entity, qos: dds_c_t.qos_p,
                        listener: dds_c_t.listener_p) -> dds_c_t.entity:
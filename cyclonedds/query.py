@@ -0,0 +1,489 @@
+"""
+ * Copyright(c) 2021 to 2022 ZettaScale Technology and others
+ *
+ * This program and the accompanying materials are made available under the
+ * terms of the Eclipse Public License v. 2.0 which is available at
+ * http://www.eclipse.org/legal/epl-2.0, or the Eclipse Distribution License
+ * v. 1.0 which is available at
+ * http://www.eclipse.org/org/documents/edl-v10.php.
+ *
+ * SPDX-License-Identifier: EPL-2.0 OR BSD-3-Clause
+"""
+
+import re
+from dataclasses import dataclass
+from enum import Enum, IntEnum
+from inspect import isclass
+from typing import Any, List, Optional, Sequence, Tuple, Type, Union
+
+from cyclonedds.idl._type_helper import Annotated, get_origin, get_args
+from cyclonedds.idl._type_normalize import get_extended_type_hints
+from cyclonedds.idl.types import typedef
+from cyclonedds._clayer import ddspy_query_create
+
+
+# Keep in sync with clayer/cdrquery.h:cdr_query_op_type
+class CdrQueryOpType(IntEnum):
+    Done = 0
+    Field = 1
+    Constant = 2
+    Compare = 3
+    And = 4
+    Or = 5
+    Not = 6
+
+
+# Keep in sync with clayer/cdrquery.h:cdr_query_compare
+class CdrQueryCompare(IntEnum):
+    Eq = 0
+    Ne = 1
+    Lt = 2
+    Le = 3
+    Gt = 4
+    Ge = 5
+
+
+_no_offset = 0xFFFFFFFF
+
+
+@dataclass
+class CdrQueryOp:
+    type: CdrQueryOpType
+    code: str = ""
+    offset_v1: int = _no_offset
+    offset_v2: int = _no_offset
+    compare: CdrQueryCompare = CdrQueryCompare.Eq
+    value: Union[int, float] = 0
+
+
+class _NotCompilable(Exception):
+    pass
+
+
+class Expression:
+    """A query on the members of a sample, built from :class:`Field` objects and constants with the
+    comparison operators and combined with ``&`` (and), ``|`` (or) and ``~`` (not). Calling an expression
+    with a sample evaluates it in Python.
+    """
+
+    def __eq__(self, other: Any) -> 'Expression':  # type: ignore[override]
+        return _Comparison(CdrQueryCompare.Eq, self, _operand(other))
+
+    def __ne__(self, other: Any) -> 'Expression':  # type: ignore[override]
+        return _Comparison(CdrQueryCompare.Ne, self, _operand(other))
+
+    def __lt__(self, other: Any) -> 'Expression':
+        return _Comparison(CdrQueryCompare.Lt, self, _operand(other))
+
+    def __le__(self, other: Any) -> 'Expression':
+        return _Comparison(CdrQueryCompare.Le, self, _operand(other))
+
+    def __gt__(self, other: Any) -> 'Expression':
+        return _Comparison(CdrQueryCompare.Gt, self, _operand(other))
+
+    def __ge__(self, other: Any) -> 'Expression':
+        return _Comparison(CdrQueryCompare.Ge, self, _operand(other))
+
+    def __and__(self, other: Any) -> 'Expression':
+        return _Logical(CdrQueryOpType.And, self, _operand(other))
+
+    def __rand__(self, other: Any) -> 'Expression':
+        return _Logical(CdrQueryOpType.And, _operand(other), self)
+
+    def __or__(self, other: Any) -> 'Expression':
+        return _Logical(CdrQueryOpType.Or, self, _operand(other))
+
+    def __ror__(self, other: Any) -> 'Expression':
+        return _Logical(CdrQueryOpType.Or, _operand(other), self)
+
+    def __invert__(self) -> 'Expression':
+        return _Not(self)
+
+    def __bool__(self) -> bool:
+        raise TypeError("Combine query expressions with &, | and ~ instead of and, or and not.")
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __call__(self, sample: Any) -> bool:
+        return bool(self._value(sample))
+
+    def _value(self, sample: Any) -> Any:
+        raise NotImplementedError()
+
+    def _ops(self, datatype: Type, ops: List[CdrQueryOp]) -> None:
+        raise NotImplementedError()
+
+
+class Field(Expression):
+    """A member of the sample, use dots to refer to members of nested structs: ``Field("position.x")``.
+    Enum members compare by their value.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.path = tuple(name.split("."))
+
+    def __repr__(self) -> str:
+        return f"Field({self.name!r})"
+
+    def _value(self, sample: Any) -> Any:
+        for name in self.path:
+            sample = getattr(sample, name)
+        return sample.value if isinstance(sample, Enum) else sample
+
+    def _ops(self, datatype: Type, ops: List[CdrQueryOp]) -> None:
+        idl = datatype.__idl__
+        v1 = v2 = None
+        if idl.version_support is None:
+            idl.populate()
+        if idl.version_support.SupportsBasic & idl.version_support:
+            v1 = idl.member_offset(self.path, use_version_2=False)
+            if v1 is None:
+                raise _NotCompilable()
+        if idl.version_support.SupportsV2 & idl.version_support:
+            v2 = idl.member_offset(self.path, use_version_2=True)
+            if v2 is None:
+                raise _NotCompilable()
+
+        ops.append(CdrQueryOp(
+            CdrQueryOpType.Field,
+            code=(v1 or v2)[0],
+            offset_v1=v1[1] if v1 else _no_offset,
+            offset_v2=v2[1] if v2 else _no_offset
+        ))
+
+
+class _Constant(Expression):
+    def __init__(self, value: Any) -> None:
+        self.value = value.value if isinstance(value, Enum) else value
+
+    def __repr__(self) -> str:
+        return repr(self.value)
+
+    def _value(self, sample: Any) -> Any:
+        return self.value
+
+    def _ops(self, datatype: Type, ops: List[CdrQueryOp]) -> None:
+        if type(self.value) not in (bool, int, float):
+            raise _NotCompilable()
+        if type(self.value) == int and not -(1 << 63) <= self.value < (1 << 64):
+            raise _NotCompilable()
+        ops.append(CdrQueryOp(CdrQueryOpType.Constant, value=self.value if type(self.value) == float else int(self.value)))
+
+
+class _Comparison(Expression):
+    _symbols = {
+        CdrQueryCompare.Eq: "==", CdrQueryCompare.Ne: "!=", CdrQueryCompare.Lt: "<",
+        CdrQueryCompare.Le: "<=", CdrQueryCompare.Gt: ">", CdrQueryCompare.Ge: ">="
+    }
+    _functions = {
+        CdrQueryCompare.Eq: lambda a, b: a == b, CdrQueryCompare.Ne: lambda a, b: a != b,
+        CdrQueryCompare.Lt: lambda a, b: a < b, CdrQueryCompare.Le: lambda a, b: a <= b,
+        CdrQueryCompare.Gt: lambda a, b: a > b, CdrQueryCompare.Ge: lambda a, b: a >= b
+    }
+
+    def __init__(self, compare: CdrQueryCompare, left: Expression, right: Expression) -> None:
+        self.compare = compare
+        self.left = left
+        self.right = right
+
+    def __repr__(self) -> str:
+        return f"({self.left!r} {self._symbols[self.compare]} {self.right!r})"
+
+    def _value(self, sample: Any) -> Any:
+        return self._functions[self.compare](self.left._value(sample), self.right._value(sample))
+
+    def _ops(self, datatype: Type, ops: List[CdrQueryOp]) -> None:
+        self.left._ops(datatype, ops)
+        self.right._ops(datatype, ops)
+        ops.append(CdrQueryOp(CdrQueryOpType.Compare, compare=self.compare))
+
+
+class _Logical(Expression):
+    def __init__(self, type: CdrQueryOpType, left: Expression, right: Expression) -> None:
+        self.type = type
+        self.left = left
+        self.right = right
+
+    def __repr__(self) -> str:
+        return f"({self.left!r} {'&' if self.type == CdrQueryOpType.And else '|'} {self.right!r})"
+
+    def _value(self, sample: Any) -> Any:
+        if self.type == CdrQueryOpType.And:
+            return bool(self.left._value(sample)) and bool(self.right._value(sample))
+        return bool(self.left._value(sample)) or bool(self.right._value(sample))
+
+    def _ops(self, datatype: Type, ops: List[CdrQueryOp]) -> None:
+        self.left._ops(datatype, ops)
+        self.right._ops(datatype, ops)
+        ops.append(CdrQueryOp(self.type))
+
+
+class _Not(Expression):
+    def __init__(self, operand: Expression) -> None:
+        self.operand = operand
+
+    def __repr__(self) -> str:
+        return f"~{self.operand!r}"
+
+    def _value(self, sample: Any) -> Any:
+        return not self.operand._value(sample)
+
+    def _ops(self, datatype: Type, ops: List[CdrQueryOp]) -> None:
+        self.operand._ops(datatype, ops)
+        ops.append(CdrQueryOp(CdrQueryOpType.Not))
+
+
+class _Like(Expression):
+    def __init__(self, operand: Expression, pattern: str) -> None:
+        self.operand = operand
+        self.pattern = pattern
+        self.regex = re.compile("".join(
+            ".*" if c == "%" else "." if c == "_" else re.escape(c) for c in pattern
+        ), re.DOTALL)
+
+    def __repr__(self) -> str:
+        return f"({self.operand!r} LIKE {self.pattern!r})"
+
+    def _value(self, sample: Any) -> Any:
+        value = self.operand._value(sample)
+        return isinstance(value, str) and self.regex.fullmatch(value) is not None
+
+    def _ops(self, datatype: Type, ops: List[CdrQueryOp]) -> None:
+        raise _NotCompilable()
+
+
+def _operand(value: Any) -> Expression:
+    return value if isinstance(value, Expression) else _Constant(value)
+
+
+def compile_query(expression: Expression, datatype: Type) -> Optional[Any]:
+    """Compile the expression into a program that is evaluated on serialized samples of the datatype
+    in C, None if it refers to members that are not at a fixed offset in the serialized data or uses
+    constants other than numbers."""
+    ops: List[CdrQueryOp] = []
+    try:
+        expression._ops(datatype, ops)
+    except _NotCompilable:
+        return None
+    return ddspy_query_create(ops)
+
+
+def _member_type(datatype: Type, path: Sequence[str]) -> Any:
+    mtype = datatype
+    for i, name in enumerate(path):
+        if isclass(mtype) and hasattr(mtype, "__idl__") and not issubclass(mtype, Enum):
+            hints = get_extended_type_hints(mtype)
+        else:
+            hints = {}
+        if name not in hints:
+            raise ValueError(f"{datatype.__name__} has no member {'.'.join(path[:i + 1])}.")
+        mtype = hints[name]
+        while get_origin(mtype) == Annotated and isinstance(get_args(mtype)[1], typedef):
+            mtype = get_args(mtype)[1].subtype
+    return mtype
+
+
+class _Name:
+    """An identifier in an SQL expression that is not a member, which can still be the name of an enum value."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+
+class _SqlParser:
+    _tokens = re.compile(r"""
+        \s*(?:
+            (?P<number>0[xX][0-9a-fA-F]+|(?:\d+\.\d*|\.\d+|\d+)(?:[eE][+-]?\d+)?)
+          | '(?P<string>[^']*)'
+          | %(?P<parameter>\d+)
+          | (?P<name>[A-Za-z_][A-Za-z0-9_]*(?:\.[A-Za-z_][A-Za-z0-9_]*)*)
+          | (?P<symbol><>|!=|<=|>=|=|<|>|\(|\)|-|\+)
+        )""", re.VERBOSE)
+    _keywords = {"AND", "OR", "NOT", "BETWEEN", "LIKE", "TRUE", "FALSE"}
+    _compares = {
+        "=": CdrQueryCompare.Eq, "<>": CdrQueryCompare.Ne, "!=": CdrQueryCompare.Ne, "<": CdrQueryCompare.Lt,
+        "<=": CdrQueryCompare.Le, ">": CdrQueryCompare.Gt, ">=": CdrQueryCompare.Ge
+    }
+
+    def __init__(self, text: str, parameters: Sequence[Any], datatype: Optional[Type]) -> None:
+        self.text = text
+        self.parameters = parameters
+        self.datatype = datatype
+        self.tokens: List[Tuple[str, Any]] = []
+        self.pos = 0
+
+        end = 0
+        text = text.rstrip()
+        while end < len(text):
+            match = self._tokens.match(text, end)
+            if match is None:
+                raise ValueError(f"Unexpected character {text[end:].lstrip()[0]!r} in filter expression {self.text!r}.")
+            end = match.end()
+            kind = match.lastgroup
+            value = match.group(kind)
+            if kind == "name" and value.upper() in self._keywords:
+                kind, value = "keyword", value.upper()
+            self.tokens.append((kind, value))
+
+    def error(self, expected: str) -> ValueError:
+        if self.pos < len(self.tokens):
+            found = repr(self.tokens[self.pos][1])
+        else:
+            found = "end of expression"
+        return ValueError(f"Expected {expected} but found {found} in filter expression {self.text!r}.")
+
+    def peek(self, kind: str, value: Optional[str] = None) -> bool:
+        if self.pos >= len(self.tokens):
+            return False
+        return self.tokens[self.pos][0] == kind and (value is None or self.tokens[self.pos][1] == value)
+
+    def accept(self, kind: str, value: Optional[str] = None) -> bool:
+        if self.peek(kind, value):
+            self.pos += 1
+            return True
+        return False
+
+    def expect(self, kind: str, value: str) -> None:
+        if not self.accept(kind, value):
+            raise self.error(repr(value))
+
+    def parse(self) -> Expression:
+        expression = self.condition()
+        if self.pos != len(self.tokens):
+            raise self.error("end of expression")
+        return expression
+
+    def condition(self) -> Expression:
+        expression = self.conjunction()
+        while self.accept("keyword", "OR"):
+            expression = expression | self.conjunction()
+        return expression
+
+    def conjunction(self) -> Expression:
+        expression = self.negation()
+        while self.accept("keyword", "AND"):
+            expression = expression & self.negation()
+        return expression
+
+    def negation(self) -> Expression:
+        if self.accept("keyword", "NOT"):
+            return ~self.negation()
+        if self.accept("symbol", "("):
+            expression = self.condition()
+            self.expect("symbol", ")")
+            return expression
+        return self.predicate()
+
+    def predicate(self) -> Expression:
+        left = self.operand()
+        negate = self.accept("keyword", "NOT")
+
+        if self.accept("keyword", "BETWEEN"):
+            low = self.operand()
+            self.expect("keyword", "AND")
+            high = self.operand()
+            left, low = self.resolve(left, low)
+            left, high = self.resolve(left, high)
+            expression = (left >= low) & (left <= high)
+        elif self.accept("keyword", "LIKE"):
+            pattern = self.operand()
+            if not isinstance(pattern, _Constant) or not isinstance(pattern.value, str):
+                raise ValueError(f"LIKE takes a string pattern in filter expression {self.text!r}.")
+            expression = _Like(self.resolve(left, pattern)[0], pattern.value)
+        elif negate:
+            raise self.error("BETWEEN or LIKE")
+        elif self.peek("symbol") and self.tokens[self.pos][1] in self._compares:
+            compare = self._compares[self.tokens[self.pos][1]]
+            self.pos += 1
+            left, right = self.resolve(left, self.operand())
+            expression = _Comparison(compare, left, right)
+        else:
+            raise self.error("a comparison")
+
+        return ~expression if negate else expression
+
+    def operand(self) -> Union[Expression, _Name]:
+        if self.pos >= len(self.tokens):
+            raise self.error("a field or value")
+        kind, value = self.tokens[self.pos]
+        self.pos += 1
+
+        if kind == "symbol" and value in "-+" and self.peek("number"):
+            number = self.operand()
+            return _Constant(-number.value) if value == "-" else number  # type: ignore
+        elif kind == "number":
+            if value[:2] in ("0x", "0X"):
+                return _Constant(int(value, 16))
+            return _Constant(float(value) if any(c in value for c in ".eE") else int(value))
+        elif kind == "string":
+            return _Constant(value)
+        elif kind == "keyword" and value in ("TRUE", "FALSE"):
+            return _Constant(value == "TRUE")
+        elif kind == "parameter":
+            return self.parameter(int(value))
+        elif kind == "name":
+            return self.field(value)
+        self.pos -= 1
+        raise self.error("a field or value")
+
+    def parameter(self, index: int) -> Union[Expression, _Name]:
+        if index >= len(self.parameters):
+            raise ValueError(f"Filter expression {self.text!r} refers to parameter %{index} but only "
+                             f"{len(self.parameters)} parameters were given.")
+        value = self.parameters[index]
+        if not isinstance(value, str):
+            return _Constant(value)
+
+        # Parameters given as strings are SQL literals, like in the DDS API
+        parser = _SqlParser(value, (), None)
+        if len(parser.tokens) == 1 and parser.tokens[0][0] == "name":
+            return _Name(value)
+        operand = parser.operand()
+        if parser.pos != len(parser.tokens) or not isinstance(operand, _Constant):
+            raise ValueError(f"Parameter %{index} ({value!r}) of filter expression {self.text!r} is not a literal.")
+        return operand
+
+    def field(self, name: str) -> Union[Expression, _Name]:
+        if self.datatype is None:
+            return Field(name)
+        try:
+            _member_type(self.datatype, name.split("."))
+        except ValueError:
+            return _Name(name)
+        return Field(name)
+
+    def resolve(self, left: Union[Expression, _Name], right: Union[Expression, _Name]) -> Tuple[Expression, Expression]:
+        """Turn names of enum values into constants, which is only possible when compared to an enum member."""
+        return self.resolve_name(left, right), self.resolve_name(right, left)
+
+    def resolve_name(self, operand: Union[Expression, _Name], other: Union[Expression, _Name]) -> Expression:
+        if not isinstance(operand, _Name):
+            return operand
+
+        if self.datatype is None:
+            raise ValueError(f"{operand.name} in filter expression {self.text!r} can only be resolved with a datatype.")
+
+        if isinstance(other, Field):
+            mtype = _member_type(self.datatype, other.path)
+            if isclass(mtype) and issubclass(mtype, Enum) and operand.name in mtype.__members__:
+                return _Constant(mtype[operand.name])
+        raise ValueError(f"{self.datatype.__name__} has no member {operand.name} in filter expression {self.text!r}.")
+
+
+def from_sql(expression: str, parameters: Sequence[Any] = (), datatype: Optional[Type] = None) -> Expression:
+    """Parse a filter expression in the DDS-SQL subset of content filtered topics and query conditions into a
+    query :class:`Expression`.
+
+    The expression compares members with ``=``, ``<>``, ``<``, ``<=``, ``>``, ``>=``, ``BETWEEN`` and ``LIKE``,
+    combined with ``AND``, ``OR``, ``NOT`` and parentheses. Values are numbers, ``'strings'``, ``TRUE``,
+    ``FALSE``, names of enum values and parameters ``%0``, ``%1``, ... that refer to the ``parameters``.
+    Parameters given as a string are parsed as a literal, any other parameter is used as is.
+
+    When the datatype is given the members are checked against it and a ValueError is raised for unknown
+    members, as well as for any syntax error.
+    """
+    return _SqlParser(expression, parameters, datatype).parse()
+
+
+__all__ = ["Expression", "Field", "compile_query", "from_sql"]
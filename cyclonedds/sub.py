@@ -12,16 +12,18 @@
 
 import asyncio
 import concurrent.futures
-from typing import AsyncGenerator, List, Optional, TypeVar, Union, Generator, Generic, TYPE_CHECKING
+from typing import AsyncGenerator, Dict, Iterable, List, Optional, Sequence, TypeVar, Union, Generator, Generic, TYPE_CHECKING
 
-from .core import Entity, Listener, DDSException, WaitSet, ReadCondition, SampleState, InstanceState, ViewState
+from .core import Entity, Listener, DDSException, WaitSet, ReadCondition, SampleState, InstanceState, ViewState, \
+    _representation_version_2, _serialize_samples
 from .domain import DomainParticipant
 from .topic import Topic
 from .internal import c_call, dds_c_t, InvalidSample
 from .qos import _CQos, Qos, LimitedScopeQos, SubscriberQos, DataReaderQos
 from .util import duration
 
-from cyclonedds._clayer import ddspy_read, ddspy_take, ddspy_read_handle, ddspy_take_handle, ddspy_lookup_instance
+from cyclonedds._clayer import ddspy_read, ddspy_take, ddspy_read_handle, ddspy_take_handle, ddspy_lookup_instance, \
+    ddspy_lookup_instances, ddspy_read_loan, ddspy_take_loan
 
 
 if TYPE_CHECKING:
@@ -79,6 +81,7 @@ class Subscriber(Entity):
 
 
 _T = TypeVar('_T')
+_any_state = SampleState.Any | ViewState.Any | InstanceState.Any
 
 class DataReader(Entity, Generic[_T]):
     """Subscribe to a topic and read/take the data published to it.
@@ -142,12 +145,14 @@ class DataReader(Entity, Generic[_T]):
         self._topic_ref = topic._ref
         self._next_condition = None
         self._keepalive_entities = [self.subscriber, topic]
+        self._use_version_2 = _representation_version_2(self)
 
     @property
     def topic(self) -> Topic[_T]:
         return self._topic
 
-    def read(self, N: int = 1, condition: Entity = None, instance_handle: int = None) -> List[_T]:
+    def read(self, N: int = 1, condition: Entity = None, instance_handle: int = None,
+             fields: Optional[Sequence[str]] = None, lazy: bool = False) -> List[_T]:
         """Read a maximum of N samples, non-blocking. Optionally use a read/query-condition to select which samples
         you are interested in.
 
@@ -160,16 +165,26 @@ class DataReader(Entity, Generic[_T]):
             The maximum number of samples to read.
         condition: cyclonedds.core.ReadCondition, cyclonedds.core.QueryCondition, optional
             Only read samples that satisfy the supplied condition.
+        fields: Sequence[str], optional
+            Only decode these members and return records with just those members (and the sample_info)
+            instead of full samples. The other members are skipped over without being decoded.
+        lazy: bool
+            Return views that keep the received data and decode a member the first time it is accessed,
+            see :meth:`IdlStruct.deserialize<cyclonedds.idl.IdlStruct.deserialize>`.
 
         Raises
         ------
         DDSException
             If any error code is returned by the DDS API it is converted into an exception.
         """
-        if instance_handle is not None:
-            ret = ddspy_read_handle(condition._ref if condition else self._ref, N, instance_handle)
+        if condition is None or isinstance(condition, ReadCondition):
+            # Deserialize straight from the received data, the loan path does not evaluate query filters though
+            mask = condition.mask if condition else _any_state
+            ret = ddspy_read_loan(condition._ref if condition else self._ref, N, mask, instance_handle)
+        elif instance_handle is not None:
+            ret = ddspy_read_handle(condition._ref, N, instance_handle)
         else:
-            ret = ddspy_read(condition._ref if condition else self._ref, N)
+            ret = ddspy_read(condition._ref, N)
 
         if type(ret) == int:
             raise DDSException(ret, f"Occurred while reading data in {repr(self)}")
@@ -177,13 +192,14 @@ class DataReader(Entity, Generic[_T]):
         samples = []
         for (data, info) in ret:
             if info.valid_data:
-                samples.append(self._topic.data_type.deserialize(data))
+                samples.append(self._topic.data_type.deserialize(data, fields=fields, lazy=lazy))
                 samples[-1].sample_info = info
             else:
-                samples.append(InvalidSample(data, info))
+                samples.append(InvalidSample(bytes(data), info))
         return samples
 
-    def take(self, N: int = 1, condition: Entity = None, instance_handle: int = None) -> List[_T]:
+    def take(self, N: int = 1, condition: Entity = None, instance_handle: int = None,
+             fields: Optional[Sequence[str]] = None, lazy: bool = False) -> List[_T]:
         """Take a maximum of N samples, non-blocking. Optionally use a read/query-condition to select which samples
         you are interested in.
 
@@ -196,16 +212,26 @@ class DataReader(Entity, Generic[_T]):
             The maximum number of samples to read.
         condition: cyclonedds.core.ReadCondition, cyclonedds.core.QueryCondition, optional
             Only take samples that satisfy the supplied condition.
+        fields: Sequence[str], optional
+            Only decode these members and return records with just those members (and the sample_info)
+            instead of full samples. The other members are skipped over without being decoded.
+        lazy: bool
+            Return views that keep the received data and decode a member the first time it is accessed,
+            see :meth:`IdlStruct.deserialize<cyclonedds.idl.IdlStruct.deserialize>`.
 
         Raises
         ------
         DDSException
             If any error code is returned by the DDS API it is converted into an exception.
         """
-        if instance_handle is not None:
-            ret = ddspy_take_handle(condition._ref if condition else self._ref, N, instance_handle)
+        if condition is None or isinstance(condition, ReadCondition):
+            # Deserialize straight from the received data, the loan path does not evaluate query filters though
+            mask = condition.mask if condition else _any_state
+            ret = ddspy_take_loan(condition._ref if condition else self._ref, N, mask, instance_handle)
+        elif instance_handle is not None:
+            ret = ddspy_take_handle(condition._ref, N, instance_handle)
         else:
-            ret = ddspy_take(condition._ref if condition else self._ref, N)
+            ret = ddspy_take(condition._ref, N)
 
         if type(ret) == int:
             raise DDSException(ret, f"Occurred while taking data in {repr(self)}")
@@ -213,12 +239,109 @@ class DataReader(Entity, Generic[_T]):
         samples = []
         for (data, info) in ret:
             if info.valid_data:
-                samples.append(self._topic.data_type.deserialize(data))
+                samples.append(self._topic.data_type.deserialize(data, fields=fields, lazy=lazy))
                 samples[-1].sample_info = info
             else:
-                samples.append(InvalidSample(data, info))
+                samples.append(InvalidSample(bytes(data), info))
         return samples
 
+    def take_columns(self, N: int = 1, condition: Entity = None, instance_handle: int = None) -> Dict[str, 'numpy.ndarray']:
+        """Take a maximum of N samples like :func:`take`, but return them as columns: a dict with a NumPy array
+        for every member of the datatype, plus ``source_timestamp`` and ``instance_handle`` arrays from the sample
+        infos. Samples without data (instance state changes) are taken but not returned.
+
+        This decodes all samples in one go and only works for datatypes with a fixed size, plain layout: final
+        structs with members that are primitives or (nested) arrays of primitives, in every data representation
+        the reader accepts. Samples that nevertheless arrive in another encoding are decoded one by one.
+        It requires NumPy.
+
+        Parameters
+        ----------
+        N: int
+            The maximum number of samples to take.
+        condition: cyclonedds.core.ReadCondition, cyclonedds.core.QueryCondition, optional
+            Only take samples that satisfy the supplied condition.
+
+        Raises
+        ------
+        TypeError
+            If the datatype does not have a plain layout in a data representation the reader accepts, this is
+            checked before anything is taken.
+        DDSException
+            If any error code is returned by the DDS API it is converted into an exception.
+        """
+        import numpy as np
+
+        idl = self._topic.data_type.__idl__
+        # Check before taking: what would not fit the columns must stay in the reader cache
+        versions = (False, True) if self._use_version_2 is None else (self._use_version_2,)
+        layouts = {version: idl.plain_layout(use_version_2=version) for version in versions}
+        if any(layout is None for layout in layouts.values()):
+            raise TypeError(f"{self._topic.data_type} does not have a plain layout in the data representation of "
+                            f"{repr(self)}, cannot take it as columns.")
+
+        if condition is None or isinstance(condition, ReadCondition):
+            mask = condition.mask if condition else _any_state
+            ret = ddspy_take_loan(condition._ref if condition else self._ref, N, mask, instance_handle)
+        elif instance_handle is not None:
+            ret = ddspy_take_handle(condition._ref, N, instance_handle)
+        else:
+            ret = ddspy_take(condition._ref, N)
+
+        if type(ret) == int:
+            raise DDSException(ret, f"Occurred while taking data in {repr(self)}")
+
+        ret = [(data, info) for (data, info) in ret if info.valid_data]
+
+        columns = {
+            name: np.empty((len(ret),) + shape, dtype=np.dtype(code))
+            for (name, code, _, shape) in layouts[versions[0]][0]
+        }
+
+        # Group by the second header byte (encoding version and endianness), for the common case of a single
+        # group every column is filled by one vectorized copy out of a single structured array.
+        groups: Dict[int, List[int]] = {}
+        for i, (data, _) in enumerate(ret):
+            groups.setdefault(data[1] if len(data) >= 4 else -1, []).append(i)
+
+        for encoding, indices in groups.items():
+            layout = None
+            if encoding in (0, 1, 6, 7):
+                version = encoding > 1
+                layout = layouts[version] if version in layouts else idl.plain_layout(use_version_2=version)
+            if layout is None:
+                # Behind a DHEADER or in a parameter list the members are at other offsets than the dtype
+                # describes, the samples are taken already so decode them one by one instead of dropping them
+                for i in indices:
+                    sample = self._topic.data_type.deserialize(ret[i][0])
+                    for name in columns:
+                        columns[name][i] = getattr(sample, name)
+                continue
+
+            fields, size = layout
+            order = '<' if encoding & 1 else '>'
+            dtype = np.dtype({
+                'names': [name for (name, _, _, _) in fields],
+                'formats': [(order + code, shape) for (_, code, _, shape) in fields],
+                'offsets': [offset for (_, _, offset, _) in fields],
+                'itemsize': size
+            })
+
+            payloads = [ret[i][0][4:4 + size] for i in indices]
+            if any(len(payload) != size for payload in payloads):
+                raise DDSException(DDSException.DDS_RETCODE_BAD_PARAMETER, f"Received malformed data in {repr(self)}")
+
+            array = np.frombuffer(b"".join(payloads), dtype=dtype)
+            target = slice(None) if len(groups) == 1 else indices
+            for name in dtype.names:
+                columns[name][target] = array[name]
+
+        columns["source_timestamp"] = np.fromiter(
+            (info.source_timestamp for (_, info) in ret), dtype=np.int64, count=len(ret))
+        columns["instance_handle"] = np.fromiter(
+            (info.instance_handle for (_, info) in ret), dtype=np.uint64, count=len(ret))
+        return columns
+
     def read_next(self) -> Optional[_T]:
         """Shortcut method to read exactly one sample or return None.
 
@@ -371,13 +494,21 @@ class DataReader(Entity, Generic[_T]):
         raise DDSException(ret, f"Occured while waiting for historical data in {repr(self)}")
 
     def lookup_instance(self, sample: _T) -> Optional[int]:
-        ret = ddspy_lookup_instance(self._ref, sample.serialize())
+        ret = ddspy_lookup_instance(self._ref, sample.__idl__.serialize_view(sample, use_version_2=self._use_version_2))
         if ret < 0:
             raise DDSException(ret, f"Occurred while lookup up instance from {repr(self)}")
         if ret == 0:
             return None
         return ret
 
+    def lookup_instances(self, samples: Iterable[Union[_T, bytes]]) -> List[Optional[int]]:
+        """
+        Like :func:`lookup_instance` for a batch of samples, with a single call into Cyclone DDS.
+        Samples that were already serialized can be passed as bytes.
+        """
+        serialized = _serialize_samples(self._topic.data_type, samples, self._use_version_2)
+        return [handle or None for handle in ddspy_lookup_instances(self._ref, serialized)]
+
     @c_call("dds_create_reader")
     def _create_reader(self, subscriber: dds_c_t.entity, topic: dds_c_t.entity, qos: dds_c_t.qos_p,
                        listener: dds_c_t.listener_p) -> dds_c_t.entity:
@@ -11,14 +11,15 @@
 """
 
 import ctypes as ct
-from typing import Union, AnyStr, Optional, Generic, Type, TypeVar, TYPE_CHECKING
+from typing import Any, Union, AnyStr, List, Optional, Generic, Sequence, Type, TypeVar, TYPE_CHECKING
 
-from .internal import c_call, dds_c_t
+from .internal import c_call, c_callable, dds_c_t
 from .core import Entity, DDSException, Listener
 from .qos import _CQos, Qos, LimitedScopeQos, TopicQos
+from .query import compile_query, from_sql
 from .idl import IdlStruct, IdlUnion
 
-from cyclonedds._clayer import ddspy_topic_create
+from cyclonedds._clayer import ddspy_topic_create, ddspy_topic_set_query_filter
 
 
 if TYPE_CHECKING:
@@ -99,3 +100,91 @@ class Topic(Entity, Generic[_S]):
     @c_call("dds_get_type_name")
     def _get_type_name(self, topic: dds_c_t.entity, name: ct.c_char_p, size: ct.c_size_t) -> dds_c_t.returnv:
         pass
+
+
+_topic_filter_arg_fn = c_callable(ct.c_bool, [ct.c_void_p, ct.c_void_p])
+
+
+class ContentFilteredTopic(Topic[_S]):
+    """A Topic that only delivers the samples that match a filter expression to its readers.
+
+    The expression is written in the DDS-SQL subset described in :func:`cyclonedds.query.from_sql` and is
+    checked against the members of the datatype. Readers created on this topic drop the samples that do not
+    match in the DDS layer. Expressions that only compare primitive or enum members at a fixed offset in the
+    serialized data are evaluated in C on the serialized sample, so rejected samples are never deserialized
+    and do not take the GIL. Any other expression is evaluated in Python on the deserialized sample.
+
+    .. code-block:: python
+
+        topic = Topic(participant, "Sensors", Sensor)
+        hot = ContentFilteredTopic(topic, "sensor_id = %0 AND value > %1", ["7", "3.0"])
+        reader = DataReader(participant, hot)
+    """
+
+    def __init__(
+            self,
+            topic: Topic[_S],
+            filter_expression: str,
+            expression_parameters: Optional[Sequence[Any]] = None,
+            listener: Optional[Listener] = None):
+        if not isinstance(topic, Topic):
+            raise TypeError(f"{topic} is not a cyclonedds.topic.Topic.")
+
+        self.related_topic = topic
+        self.filter_expression = filter_expression
+        self._parse(expression_parameters or [])
+
+        # Cyclone has no separate content filtered topic entity, the filter is set on a new topic entity
+        # for the same topic that readers of the content filtered topic are created on.
+        super().__init__(topic.participant, topic.name, topic.data_type, qos=topic.get_qos(), listener=listener)
+        self._keepalive_entities.append(topic)
+        # The installed filter and the one it replaced, see _install_filter
+        self._filters: List[Any] = []
+        self._install_filter()
+
+    def get_expression_parameters(self) -> Sequence[Any]:
+        return self._expression_parameters
+
+    def set_expression_parameters(self, expression_parameters: Sequence[Any]) -> None:
+        """Change the parameters of the filter expression, samples received from then on are filtered
+        with the new parameters."""
+        self._parse(expression_parameters)
+        self._install_filter()
+
+    expression_parameters = property(get_expression_parameters, set_expression_parameters)
+
+    def _parse(self, expression_parameters: Sequence[Any]) -> None:
+        self.where = from_sql(self.filter_expression, expression_parameters, self.related_topic.data_type)
+        self._expression_parameters = list(expression_parameters)
+
+    def _install_filter(self) -> None:
+        # Replacing the filter does not wait for receive threads that are still evaluating the old one, so
+        # the replaced filter is only freed when the next one replaces it: any evaluation of it started before
+        # the filter it was replaced by was installed, and has long finished by then.
+        query = compile_query(self.where, self.data_type)
+        if query is not None:
+            ret = ddspy_topic_set_query_filter(self._ref, query)
+            if ret < 0:
+                raise DDSException(ret, f"Occurred while setting the filter of {repr(self)}")
+            self._filters = self._filters[-1:] + [query]
+            return
+
+        where = self.where
+        data_type = self.data_type
+
+        def call(sample_pt, arg):
+            try:
+                sample_info = ct.cast(sample_pt, ct.POINTER(dds_c_t.sample_buffer))[0]
+                array_type = ct.c_ubyte * sample_info.len
+                array = ct.cast(sample_info.buf, ct.POINTER(array_type))
+                return where(data_type.deserialize(bytes(array.contents[:])))
+            except Exception:  # Block any python exception from going into C
+                return False
+
+        callback = _topic_filter_arg_fn(call)
+        self._set_topic_filter_and_arg(self._ref, callback, None)
+        self._filters = self._filters[-1:] + [callback]
+
+    @c_call("dds_set_topic_filter_and_arg")
+    def _set_topic_filter_and_arg(self, topic: dds_c_t.entity, filter: _topic_filter_arg_fn, arg: ct.c_void_p) -> None:
+        pass
@@ -141,9 +141,10 @@ struct idlpy_ctx_s
     char* basepath;
     char* idl_file;
     char* pyroot;
+    bool slots;
 };
 
-idlpy_ctx idlpy_ctx_new(const char *path, const char* idl_file, const char *pyroot)
+idlpy_ctx idlpy_ctx_new(const char *path, const char* idl_file, const char *pyroot, bool slots)
 {
     idlpy_ctx ctx = (idlpy_ctx)malloc(sizeof(struct idlpy_ctx_s));
     if (ctx == NULL) return NULL;
@@ -184,6 +185,7 @@ idlpy_ctx idlpy_ctx_new(const char *path, const char* idl_file, const char *pyro
     ctx->root_module = NULL;
     ctx->toplevel_module = NULL;
     ctx->entity = NULL;
+    ctx->slots = slots;
 
     if (ctx->basepath == NULL) {
         free(ctx);
@@ -971,6 +973,11 @@ const char* idlpy_ctx_get_pyroot(idlpy_ctx ctx)
     return ctx->pyroot;
 }
 
+bool idlpy_ctx_get_slots(idlpy_ctx ctx)
+{
+    return ctx->slots;
+}
+
 
 static idlpy_modules_t* create_modules()
 {
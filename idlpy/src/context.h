@@ -18,7 +18,7 @@
 
 typedef struct idlpy_ctx_s *idlpy_ctx;
 
-idlpy_ctx     idlpy_ctx_new(const char* path, const char* idl_file, const char* pyroot);
+idlpy_ctx     idlpy_ctx_new(const char* path, const char* idl_file, const char* pyroot, bool slots);
 void          idlpy_ctx_free(idlpy_ctx ctx);
 idl_retcode_t idlpy_ctx_write_all(idlpy_ctx ctx);
 
@@ -37,6 +37,7 @@ void          idlpy_ctx_printf(idlpy_ctx ctx, const char *fmt, ...);
 
 void          idlpy_ctx_report_error(idlpy_ctx ctx, const char* error);
 const char*   idlpy_ctx_get_pyroot(idlpy_ctx ctx);
+bool          idlpy_ctx_get_slots(idlpy_ctx ctx);
 
 void          idlpy_ctx_emit_field(idlpy_ctx octx);
 bool          idlpy_ctx_did_emit_field(idlpy_ctx octx);
@@ -28,6 +28,7 @@
 
 
 const char* prefix_root_module = NULL;
+int generate_slots = 0;
 
 idl_retcode_t
 generate(const idl_pstate_t *pstate, const idlc_generator_config_t *config)
@@ -55,7 +56,7 @@ generate(const idl_pstate_t *pstate, const idlc_generator_config_t *config)
     if (!(basename = idl_strndup(file, ext ? (size_t)(ext-file) : strlen(file))))
         goto err;
 
-    ctx = idlpy_ctx_new("./", basename, prefix_root_module);
+    ctx = idlpy_ctx_new("./", basename, prefix_root_module, generate_slots != 0);
 
     // Enter root
     if (idlpy_ctx_enter_module(ctx, "") != IDL_VISIT_REVISIT) {
@@ -86,6 +87,11 @@ static const idlc_option_t *opts[] = {
         'p', "py-root-prefix", "path.to.submodule",
         "Prefix all idl modules with a python path as root module. Handy if you want to include idl types as submodule in your project."
     },
+    &(idlc_option_t) {
+        IDLC_FLAG, {.flag = &generate_slots},
+        'p', "py-slots", "",
+        "Generate structs with __slots__ instead of an instance __dict__, which makes samples smaller and faster to create."
+    },
     NULL
 };
 
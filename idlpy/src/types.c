@@ -347,7 +347,8 @@ emit_struct(
         idlpy_ctx_enter_entity(ctx, name);
         struct_decoration(ctx, node);
         char *fullname = idl_full_typename(node);
-        idlpy_ctx_printf(ctx, "class %s(%s, typename=\"%s\"):", name, inherit_from != NULL ? inherit_from : "idl.IdlStruct", fullname);
+        idlpy_ctx_printf(ctx, "class %s(%s, typename=\"%s\"%s):", name, inherit_from != NULL ? inherit_from : "idl.IdlStruct", fullname,
+                         idlpy_ctx_get_slots(ctx) ? ", slots=True" : "");
         free(fullname);
         ret = IDL_VISIT_REVISIT;
     }
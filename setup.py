@@ -52,7 +52,10 @@ if "BUILDING_SDIST" not in os.environ:
     ext_modules = [
         Extension('cyclonedds._clayer', [
                 'clayer/cdrkeyvm.c',
+                'clayer/cdrcodec.c',
+                'clayer/cdrquery.c',
                 'clayer/pysertype.c',
+                'clayer/sampleinfo.c',
                 'clayer/typeser.c'
             ],
             include_dirs=[
@@ -158,6 +161,9 @@ setup(
         "docs": [
             "Sphinx>=4.0.0",
             "piccolo_theme>=0.12.0"
+        ],
+        "numpy": [
+            "numpy"
         ]
     },
     zip_safe=False
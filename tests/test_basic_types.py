@@ -1,7 +1,7 @@
 import pytest
 import support_modules.test_classes as tc
 
-from cyclonedds._clayer import ddspy_calc_key
+from cyclonedds._clayer import ddspy_calc_key, ddspy_calc_keys
 
 
 single_test_data = [
@@ -30,6 +30,31 @@ def test_simple_datatypes(_type, values):
         assert _type.__idl__.key(v1) == ddspy_calc_key(_type.__idl__, b, (_type.__idl__.version_support.SupportsV2 & _type.__idl__.version_support) > 0)
 
 
+@pytest.mark.parametrize("_type,values", single_test_data)
+def test_calc_keys(_type, values):
+    idl = _type.__idl__
+    v2 = (idl.version_support.SupportsV2 & idl.version_support) > 0
+    # Longer keys followed by shorter ones, the key VM and its workspace are reused
+    samples = [_type(value=value) for value in values + values[::-1]]
+    assert ddspy_calc_keys(idl, [s.serialize() for s in samples], v2) == [idl.key(s) for s in samples]
+    assert idl.key_vm(v2) is idl.key_vm(v2)
+
+
+@pytest.mark.parametrize("use_version_2", [False, True])
+@pytest.mark.parametrize("length", [0, 11, 12, 13, 119, 120, 121, 127, 128, 129, 140, 1000, 100_000])
+def test_calc_key_long(length, use_version_2):
+    # Around and beyond the inline key of a serdata and the scratch buffer the key VM runs in
+    idl = tc.SingleString.__idl__
+    sample, short = tc.SingleString(value="k" * length), tc.SingleString(value="s")
+    data, short_data = sample.serialize(use_version_2=use_version_2), short.serialize(use_version_2=use_version_2)
+    key = idl.key(sample, use_version_2)
+
+    assert len(key) >= 4 + length + 1
+    assert ddspy_calc_key(idl, data, use_version_2) == key
+    assert ddspy_calc_keys(idl, [data, short_data, data], use_version_2) == [key, idl.key(short, use_version_2), key]
+    assert idl.keyhash(sample, use_version_2) == idl.keyhash(tc.SingleString.deserialize(data), use_version_2)
+
+
 def test_all_primitives():
     v1 = tc.AllPrimitives()
     b = v1.serialize()
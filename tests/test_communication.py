@@ -1,8 +1,23 @@
 import pytest
+import pickle
+import dataclasses
+import struct
+from types import SimpleNamespace
 
-from cyclonedds.core import Entity, DDSStatus
+from cyclonedds.core import DDSException, Entity, DDSStatus, SampleState, ViewState, InstanceState
+from cyclonedds.internal import SampleInfo, InvalidSample
+from cyclonedds.topic import Topic
+from cyclonedds.pub import DataWriter
+from cyclonedds.sub import DataReader
+from cyclonedds.idl._support import Endianness
+import cyclonedds.sub
 
-from support_modules.testtopics import Message
+from dataclasses import dataclass
+from cyclonedds.idl import IdlStruct
+from cyclonedds.idl.annotations import appendable
+import cyclonedds.idl.types as types
+
+from support_modules.testtopics import Message, MessageKeyed
 
 
 def test_communication_basic_read(common_setup):
@@ -35,6 +50,89 @@ def test_communication_order(common_setup):
     assert result[1] == msg2
 
 
+def test_communication_sample_info(common_setup):
+    common_setup.dw.write(Message(message="Hi!"), timestamp=1_000_000_000)
+    info = common_setup.dr.read()[0].sample_info
+
+    assert isinstance(info, SampleInfo)
+    assert info.sample_state == SampleState.NotRead
+    assert info.view_state == ViewState.New
+    assert info.instance_state == InstanceState.Alive
+    assert info.valid_data
+    assert info.source_timestamp == 1_000_000_000
+    assert info.publication_handle == common_setup.dw.instance_handle
+
+    assert pickle.loads(pickle.dumps(info)) == info
+    assert common_setup.dr.read()[0].sample_info.sample_state == SampleState.Read
+    assert common_setup.dr.read()[0].sample_info != info
+
+
+def test_communication_sample_info_dataclass(common_setup):
+    common_setup.dw.write(Message(message="Hi!"))
+    info = common_setup.dr.read()[0].sample_info
+
+    fields = dataclasses.asdict(info)
+    assert list(fields) == [f.name for f in dataclasses.fields(SampleInfo)]
+    assert SampleInfo(**fields) == info
+
+    other = dataclasses.replace(info, instance_handle=12345)
+    assert other.instance_handle == 12345 and other.valid_data and other != info
+
+    other.valid_data = False
+    other.sample_rank = 3
+    assert not other.valid_data and other.sample_rank == 3
+    with pytest.raises(AttributeError):
+        other.unknown = 1
+
+
+def test_communication_large_sample(common_setup):
+    msg = Message(message="x" * 5_000_000)
+    common_setup.dw.write(msg)
+    assert common_setup.dr.read()[0] == msg
+    assert common_setup.dr.take()[0] == msg
+    assert common_setup.dr.read() == []
+
+
+def test_communication_invalid_sample(common_setup):
+    tp = Topic(common_setup.dp, "MessageKeyed", MessageKeyed)
+    dw = DataWriter(common_setup.pub, tp, qos=common_setup.qos)
+    dr = DataReader(common_setup.sub, tp, qos=common_setup.qos)
+
+    msg = MessageKeyed(user_id=1, message="Hi!")
+    dw.write(msg)
+    assert dr.take() == [msg]
+
+    dw.dispose(msg)
+    result = dr.take()
+
+    assert len(result) == 1
+    assert isinstance(result[0], InvalidSample) and type(result[0].key) == bytes
+    assert result[0].sample_info.instance_state == InstanceState.NotAliveDisposed
+
+
+def test_communication_write_many(common_setup):
+    msgs = [Message(message=f"Hi{i}!") for i in range(5)]
+    common_setup.dw.write_many(msgs)
+    result = common_setup.dr.read(N=10)
+
+    assert result == msgs
+
+
+def test_communication_write_many_timestamps(common_setup):
+    msgs = [Message(message="Hi1!"), Message(message="Hi2!")]
+    common_setup.dw.write_many(msgs, timestamps=[1_000_000_000, 2_000_000_000])
+    result = common_setup.dr.read(N=2)
+
+    assert result == msgs
+    assert [r.sample_info.source_timestamp for r in result] == [1_000_000_000, 2_000_000_000]
+
+    with pytest.raises(ValueError):
+        common_setup.dw.write_many(msgs, timestamps=[1_000_000_000])
+    with pytest.raises(TypeError):
+        common_setup.dw.write_many([msgs[0], "Hi3!"])
+    assert len(common_setup.dr.read(N=10)) == 2
+
+
 def test_communication_read_nodestroys(common_setup):
     msg = Message(message="Hi!")
     common_setup.dw.write(msg)
@@ -70,3 +168,97 @@ def test_communication_status_mask(common_setup):
 
     status = common_setup.dr.take_status()
     assert (status & DDSStatus.SubscriptionMatched) > 0
+
+
+@dataclass
+class Measurement(IdlStruct, typename="Measurement"):
+    sensor: types.uint8
+    value: types.float64
+    position: types.array[types.float32, 3]
+
+
+def test_communication_take_columns(common_setup):
+    np = pytest.importorskip("numpy")
+
+    tp = Topic(common_setup.dp, "Measurement", Measurement)
+    dw = DataWriter(common_setup.pub, tp, qos=common_setup.qos)
+    dr = DataReader(common_setup.sub, tp, qos=common_setup.qos)
+
+    dw.write_many(
+        [Measurement(sensor=i, value=i * 0.5, position=[i, -i, 0.0]) for i in range(4)],
+        timestamps=[1_000_000_000 + i for i in range(4)]
+    )
+    columns = dr.take_columns(N=10)
+
+    assert columns["sensor"].tolist() == [0, 1, 2, 3]
+    assert columns["value"].tolist() == [0.0, 0.5, 1.0, 1.5]
+    assert columns["position"].shape == (4, 3)
+    assert columns["position"][3].tolist() == [3.0, -3.0, 0.0]
+    assert columns["source_timestamp"].tolist() == [1_000_000_000 + i for i in range(4)]
+    assert dr.read() == []
+
+    assert all(len(column) == 0 for column in dr.take_columns(N=10).values())
+
+    with pytest.raises(TypeError):
+        common_setup.dr.take_columns()
+
+
+@dataclass
+@appendable
+class AppendableMeasurement(IdlStruct, typename="AppendableMeasurement"):
+    sensor: types.uint8
+    value: types.float64
+
+
+def test_communication_take_columns_representation(common_setup):
+    pytest.importorskip("numpy")
+
+    tp = Topic(common_setup.dp, "AppendableMeasurement", AppendableMeasurement)
+    dw = DataWriter(common_setup.pub, tp, qos=common_setup.qos)
+    dr = DataReader(common_setup.sub, tp, qos=common_setup.qos)
+
+    # Over XCDR2 the members are behind a DHEADER, refused before anything is taken
+    dw.write(AppendableMeasurement(sensor=1, value=0.5))
+    with pytest.raises(TypeError):
+        dr.take_columns()
+    assert dr.read() == [AppendableMeasurement(sensor=1, value=0.5)]
+
+
+def test_communication_take_columns_not_plain(common_setup, monkeypatch):
+    pytest.importorskip("numpy")
+
+    tp = Topic(common_setup.dp, "Measurement", Measurement)
+    dr = DataReader(common_setup.sub, tp, qos=common_setup.qos)
+
+    data = Measurement(sensor=1, value=0.5, position=[1.0, 2.0, 3.0]).serialize(
+        use_version_2=True, endianness=Endianness.Little)
+    info = SimpleNamespace(valid_data=True, source_timestamp=0, instance_handle=1)
+
+    # Samples in an encoding the columns cannot be copied from are decoded one by one, not dropped
+    delimited = bytes([0, 0x09, 0, 0]) + data[4:]
+    monkeypatch.setattr(cyclonedds.sub, "ddspy_take_loan", lambda *args: [(data, info), (delimited, info)])
+    columns = dr.take_columns()
+    assert columns["sensor"].tolist() == [1, 1]
+    assert columns["position"].tolist() == [[1.0, 2.0, 3.0]] * 2
+
+    monkeypatch.setattr(cyclonedds.sub, "ddspy_take_loan", lambda *args: [(data[:8], info)])
+    with pytest.raises(DDSException):
+        dr.take_columns()
+
+
+def test_communication_take_fields(common_setup):
+    tp = Topic(common_setup.dp, "Measurement", Measurement)
+    dw = DataWriter(common_setup.pub, tp, qos=common_setup.qos)
+    dr = DataReader(common_setup.sub, tp, qos=common_setup.qos)
+
+    dw.write(Measurement(sensor=1, value=0.5, position=[1.0, 2.0, 3.0]))
+    dw.write(Measurement(sensor=2, value=1.5, position=[4.0, 5.0, 6.0]))
+
+    result = dr.read(N=2, fields=["value"])
+    assert [r.value for r in result] == [0.5, 1.5]
+    assert not hasattr(result[0], "sensor")
+
+    result = dr.take(N=2, fields=["sensor", "value"])
+    assert [(r.sensor, r.value) for r in result] == [(1, 0.5), (2, 1.5)]
+    assert result[0].sample_info.valid_data
+    assert dr.read() == []
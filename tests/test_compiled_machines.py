@@ -0,0 +1,207 @@
+import pytest
+
+from dataclasses import dataclass
+
+from cyclonedds.idl import IdlStruct, IdlEnum, IdlBitmask, IdlUnion
+from cyclonedds.idl._main import IDL
+from cyclonedds.idl._support import Buffer, Endianness
+from cyclonedds.idl.annotations import key, appendable
+import cyclonedds.idl.types as tp
+
+
+class Color(IdlEnum):
+    Red = 0
+    Green = 1
+    Blue = 2
+
+
+@dataclass
+class Flags(IdlBitmask):
+    A: bool
+    B: bool
+
+
+@dataclass
+class Point(IdlStruct):
+    x: tp.float64
+    y: tp.float32
+    z: tp.int8
+
+
+class Choice(IdlUnion, discriminator=tp.int16):
+    a: tp.case[1, tp.int32]
+    b: tp.case[2, str]
+
+
+@dataclass
+class Telemetry(IdlStruct):
+    id: tp.uint8
+    key("id")
+    stamp: tp.int64
+    c: tp.char
+    color: Color
+    flags: Flags
+    name: str
+    bounded: tp.bounded_str[5]
+    p: Point
+    arr: tp.array[tp.int16, 3]
+    raw: tp.array[tp.uint8, 3]
+    seq: tp.sequence[tp.uint16]
+    points: tp.sequence[Point]
+    choice: Choice
+    trailing: tp.uint16
+
+
+@dataclass
+@appendable
+class Extensible(IdlStruct):
+    a: tp.int32
+
+
+def machine_bytes(machine, value, endianness, use_version_2):
+    buffer = Buffer()
+    buffer.set_endianness(endianness)
+    buffer._align_max = 4 if use_version_2 else 8
+    machine.serialize(buffer, value)
+    return buffer.asbytes()
+
+
+def compiled_bytes(compiled, value, endianness, use_version_2):
+    buffer = Buffer(b"\xff" * 16)
+    buffer.set_endianness(endianness)
+    buffer._align_max = 4 if use_version_2 else 8
+    compiled.serialize(buffer, value)
+    return buffer.asbytes()
+
+
+sample = Telemetry(
+    id=3, stamp=-12345678901, c='q', color=Color.Blue, flags=Flags(A=False, B=True), name="telemetry",
+    bounded="abc", p=Point(1.5, -2.0, 7), arr=[1, -2, 3], raw=b"xyz", seq=[1, 2, 3, 4, 5],
+    points=[Point(1.0, 2.0, 3), Point(4.0, 5.0, 6)], choice=Choice(b="hello"), trailing=0xabcd
+)
+
+
+@pytest.fixture
+def compiling(monkeypatch):
+    monkeypatch.setattr(IDL, "compile_machines", True)
+
+
+@pytest.mark.parametrize("endianness", [Endianness.Little, Endianness.Big])
+@pytest.mark.parametrize("use_version_2", [False, True])
+def test_compiled_matches_machine(compiling, endianness, use_version_2):
+    idl = IDL(Telemetry)
+    idl.populate()
+
+    machine = idl.v2_machine if use_version_2 else idl.v0_machine
+    compiled = idl.v2_compiled if use_version_2 else idl.v0_compiled
+    assert compiled is not None
+
+    data = compiled_bytes(compiled, sample, endianness, use_version_2)
+    assert data == machine_bytes(machine, sample, endianness, use_version_2)
+
+    buffer = Buffer(data)
+    buffer.set_endianness(endianness)
+    buffer._align_max = 4 if use_version_2 else 8
+    assert compiled.deserialize(buffer) == sample
+    assert buffer.tell() == len(data)
+
+
+def test_compiled_roundtrip_through_idl(compiling):
+    idl = IDL(Telemetry)
+    Telemetry.__idl__, original = idl, Telemetry.__idl__
+    try:
+        data = sample.serialize()
+        assert Telemetry.deserialize(data) == sample
+        assert data == original.serialize(sample)
+    finally:
+        Telemetry.__idl__ = original
+
+
+def test_compiled_errors_come_from_machines(compiling):
+    idl = IDL(Telemetry)
+    idl.populate()
+
+    with pytest.raises(Exception, match="Failed to encode member bounded"):
+        idl.serialize(Telemetry(**{**sample.__dict__, "bounded": "too long"}))
+
+    with pytest.raises(Exception, match="Failed to encode member raw"):
+        idl.serialize(Telemetry(**{**sample.__dict__, "raw": b"x"}))
+
+
+def test_not_compiled_falls_back(compiling):
+    idl = IDL(Extensible)
+    idl.populate()
+    assert idl.v2_compiled is None
+    assert idl.deserialize(idl.serialize(Extensible(a=5))) == Extensible(a=5)
+
+
+@dataclass
+class Imu(IdlStruct):
+    id: tp.uint8
+    key("id")
+    stamp: tp.int64
+    c: tp.char
+    color: Color
+    flags: Flags
+    acc: Point
+    arr: tp.array[tp.int16, 3]
+    raw: tp.array[tp.uint8, 3]
+    temp: tp.float32
+
+
+imu = Imu(
+    id=7, stamp=-5, c='x', color=Color.Green, flags=Flags(A=True, B=False), acc=Point(0.5, -1.0, 3),
+    arr=[1, 2, -3], raw=b"abc", temp=20.5
+)
+
+
+@pytest.mark.parametrize("endianness", [Endianness.Little, Endianness.Big])
+@pytest.mark.parametrize("use_version_2", [False, True])
+def test_plain_matches_machine(endianness, use_version_2):
+    idl = IDL(Imu)
+    idl.populate()
+    plain = idl.v2_plain if use_version_2 else idl.v0_plain
+    assert plain is not None
+
+    idl.v0_plain = idl.v2_plain = idl.v0_native = idl.v2_native = None
+    expected = idl.serialize(imu, use_version_2=use_version_2, endianness=endianness)
+    expected_view = bytes(idl.serialize_view(imu, use_version_2=use_version_2, endianness=endianness))
+
+    e = '<' if endianness == Endianness.Little else '>'
+    assert plain.serialize(imu, e) == expected
+    assert plain.size == len(expected)
+    assert plain.deserialize(expected, e) == imu
+
+    data = bytearray(b"\xff" * 2)
+    end = plain.serialize_into(data, imu, e)
+    assert bytes(data[:end]) == expected_view
+
+
+def test_plain_through_idl():
+    idl = IDL(Imu)
+    Imu.__idl__, original = idl, Imu.__idl__
+    try:
+        for use_version_2 in (False, True):
+            data = imu.serialize(use_version_2=use_version_2)
+            assert Imu.deserialize(data) == imu
+            assert Imu.deserialize(memoryview(data + b"\0\0")) == imu
+            assert bytes(idl.serialize_view(imu, use_version_2=use_version_2)).startswith(data)
+    finally:
+        Imu.__idl__ = original
+
+
+def test_plain_errors_come_from_machines():
+    idl = IDL(Imu)
+    idl.populate()
+
+    with pytest.raises(Exception, match="Failed to encode member raw"):
+        idl.serialize(Imu(**{**imu.__dict__, "raw": b"x"}))
+    with pytest.raises(Exception):
+        idl.deserialize(imu.serialize()[:10])
+
+
+def test_not_plain():
+    for datatype in (Telemetry, Extensible):
+        idl = IDL(datatype)
+        idl.populate()
+        assert idl.v0_plain is None and idl.v2_plain is None
@@ -8,7 +8,7 @@ from cyclonedds.qos import Qos, Policy
 from cyclonedds.core import DDSException
 
 
-from support_modules.testtopics import XMessage, Message
+from support_modules.testtopics import XMessage, Message, MessageKeyed
 
 
 def test_data_representation_writer_v0_match():
@@ -51,6 +51,26 @@ def test_data_representation_writer_v2_match():
     assert dr.read_next() == msg
 
 
+def test_data_representation_lookup_instances_v2():
+    qos = Qos(Policy.DataRepresentation(use_xcdrv2_representation=True))
+
+    dp = DomainParticipant(0)
+    tp = Topic(dp, "MessageKeyed", MessageKeyed)
+    dr = DataReader(dp, tp, qos=qos)
+    dw = DataWriter(dp, tp, qos=qos)
+
+    assert dr._use_version_2 == True
+
+    msgs = [MessageKeyed(user_id=i, message="Hello") for i in range(10)]
+    dw.write_many(msgs)
+    dr.read(N=10)
+
+    handles = dr.lookup_instances(msgs)
+    assert None not in handles
+    assert handles == [dr.lookup_instance(m) for m in msgs]
+    assert handles == dr.lookup_instances([m.serialize(use_version_2=True) for m in msgs])
+
+
 def test_data_representation_writer_v0_v2_unmatch():
     qosv0 = Qos(Policy.DataRepresentation(use_cdrv0_representation=True))
     qosv2 = Qos(Policy.DataRepresentation(use_xcdrv2_representation=True))
@@ -1,8 +1,10 @@
 import pytest
 
 from dataclasses import dataclass
+from typing import Optional
 
 from cyclonedds.idl import IdlStruct, IdlBitmask, IdlUnion, IdlEnum
+from cyclonedds.idl.annotations import appendable, mutable
 from cyclonedds.idl._support import Buffer, Endianness
 import cyclonedds.idl._machinery as mc
 import cyclonedds.idl.types as tp
@@ -214,3 +216,235 @@ def test_all_machine_serializers():
 
 
 
+
+
+@dataclass
+class Padded(IdlStruct):
+    a: str
+    b: tp.uint64
+    c: tp.uint8
+
+
+@pytest.mark.parametrize("native_codec", [False, True])
+def test_serialize_view_reuses_buffer(monkeypatch, native_codec):
+    from cyclonedds.idl._main import IDL
+    monkeypatch.setattr(IDL, "native_codec", native_codec)
+    idl = IDL(Padded)
+
+    def padded(data):
+        return data.ljust((len(data) + 4 - 1) & ~(4 - 1), b'\0')
+
+    # Going from a long sample to a short one must not leave stale bytes in the padding
+    for sample in [Padded("a" * 1000, 2**64 - 1, 0xff), Padded("bb", 1, 2), Padded("", 0, 0), Padded("ccc", 3, 3)]:
+        view = idl.serialize_view(sample)
+        assert view.obj is idl.buffer._bytes
+        assert bytes(view) == padded(idl.serialize(sample, buffer=Buffer()))
+        assert idl.deserialize(bytes(view)) == sample
+        view.release()
+
+    assert Padded.deserialize(idl.serialize(Padded("ccc", 3, 3))) == Padded("ccc", 3, 3)
+
+
+@pytest.mark.parametrize("native_codec", [False, True])
+def test_serialize_view_hands_off_large_samples(monkeypatch, native_codec):
+    from cyclonedds.idl._main import IDL
+    monkeypatch.setattr(IDL, "native_codec", native_codec)
+    idl = IDL(Padded)
+
+    # A large sample keeps its buffer, so the DataWriter can hold on to it without copying
+    large = idl.serialize_view(Padded("a" * IDL.pin_size, 1, 2))
+    data = bytes(large)
+    assert large.readonly
+    for sample in [Padded("a" * IDL.pin_size, 3, 4), Padded("bb", 5, 6)]:
+        view = idl.serialize_view(sample)
+        assert idl.deserialize(bytes(view)) == sample
+    assert not view.readonly and view.obj is idl.buffer._bytes
+    assert bytes(large) == data
+
+
+def test_concurrent_serialization():
+    import sys
+    from concurrent.futures import ThreadPoolExecutor
+    from cyclonedds.idl._main import IDL
+    idl = IDL(Padded)
+
+    def worker(n):
+        # The first calls race on populate(), the rest on the serialization buffer
+        for i in range(200):
+            sample = Padded("x" * ((n * 7 + i) % 50), n, i % 256)
+            assert idl.deserialize(idl.serialize(sample)) == sample
+            assert idl.deserialize(bytes(idl.serialize_view(sample))) == sample
+        return True
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            assert all(executor.map(worker, range(16)))
+    finally:
+        sys.setswitchinterval(interval)
+
+
+@pytest.mark.parametrize("add_size_header", [False, True])
+@pytest.mark.parametrize("endianness", [Endianness.Little, Endianness.Big])
+@pytest.mark.parametrize("machines,values", [
+    ((mc.StringSequenceMachine, mc.StringMachine), ["", "a", "ab", "abc", "abcd", "été", "x" * 37]),
+    ((mc.BytesSequenceMachine, mc.BytesMachine), [b"", b"a", b"ab", b"abc", b"abcd", bytearray(b"xyz"), bytes(37)]),
+])
+def test_length_prefixed_sequence_machines(machines, values, endianness, add_size_header):
+    bulk, element = machines
+
+    for count in range(len(values) + 1):
+        value = values[:count]
+        encoded = []
+        for machine in (bulk(element(), add_size_header=add_size_header),
+                        mc.SequenceMachine(element(), add_size_header=add_size_header)):
+            b = Buffer(align_offset=4)
+            b.set_endianness(endianness)
+            b.seek(5)
+            machine.serialize(b, value)
+            b.write('b', 1, 7)
+            encoded.append(b.asbytes())
+        assert encoded[0] == encoded[1]
+
+        b = Buffer(encoded[0], align_offset=4)
+        b.set_endianness(endianness)
+        b.seek(5)
+        expected = [bytes(v) if isinstance(v, bytearray) else v for v in value]
+        assert bulk(element(), add_size_header=add_size_header).deserialize(b) == expected
+        assert b.read('b', 1) == 7
+
+
+def test_length_prefixed_sequence_errors():
+    with pytest.raises(Exception, match="String longer than bound"):
+        mc.StringSequenceMachine(mc.StringMachine(bound=2)).serialize(Buffer(), ["ab", "abc"])
+    with pytest.raises(Exception, match="Bytes longer than bound"):
+        mc.BytesSequenceMachine(mc.BytesMachine(bound=2)).serialize(Buffer(), [b"abc"])
+    with pytest.raises(Exception):
+        mc.StringSequenceMachine(mc.StringMachine()).deserialize(Buffer(b"\x01\x00\x00\x00\x09\x00\x00\x00abc"))
+
+
+def test_octet_sequence_from_bytes():
+    m = mc.PlainCdrV2SequenceOfPrimitiveMachine(tp.uint8)
+    for value in (b"\x01\x02\x03", bytearray(b"\x01\x02\x03"), memoryview(b"\x01\x02\x03"), [1, 2, 3]):
+        b = Buffer()
+        b.set_endianness(Endianness.Little)
+        m.serialize(b, value)
+        assert b.asbytes() == b"\x03\x00\x00\x00\x01\x02\x03"
+
+
+@dataclass
+class Sized(IdlStruct):
+    a: tp.uint8
+    b: tp.float64
+    c: tp.array[tp.int16, 3]
+    d: tp.bounded_str[5]
+    e: tp.sequence[C, 4]
+    f: D
+    g: A
+    h: B
+
+
+@dataclass
+class Unsized(IdlStruct):
+    name: str
+    values: tp.sequence[tp.float64]
+    nested: tp.sequence[Padded]
+    blob: tp.sequence[tp.uint8]
+    table: tp.sequence[tp.sequence[str]]
+    sized: tp.sequence[Sized]
+
+
+@dataclass
+@appendable
+class AppendableUnsized(IdlStruct):
+    a: tp.uint8
+    unsized: Unsized
+    opt: Optional[str]
+    choice: D
+
+
+@dataclass
+@mutable
+class MutableUnsized(IdlStruct):
+    a: tp.uint8
+    inner: AppendableUnsized
+    opt: Optional[tp.int64]
+    name: str
+
+
+sized = Sized(1, 2.0, [3, 4, 5], "\u00e9\u00e9\u00e9\u00e9\u00e9", [C(1, 2)] * 4, D(A=7), A.V2, B(V1=True, V2=False))
+unsized = Unsized(
+    "\u2603" * 20, [1.0] * 1000, [Padded("x" * 50, 1, 2)] * 10, [1] * 333, [["a", "bc"], [], ["\u00e9"]], [sized] * 3
+)
+empty = Unsized("", [], [], [], [], [])
+
+
+@pytest.mark.parametrize("use_version_2", [False, True])
+@pytest.mark.parametrize("sample", [
+    sized, Sized(0, 0.0, [0, 0, 0], "", [], D(B=1), A.V1, B(V1=False, V2=False)), unsized, empty,
+    AppendableUnsized(1, unsized, "opt", D(A=2)), AppendableUnsized(1, empty, None, D(B=3)),
+    MutableUnsized(1, AppendableUnsized(1, unsized, "opt", D(A=2)), 3, "name"),
+    MutableUnsized(1, AppendableUnsized(1, empty, None, D(B=3)), None, ""),
+])
+def test_size_bounds(sample, use_version_2):
+    idl = type(sample).__idl__
+    use_version_2 = use_version_2 or isinstance(sample, (AppendableUnsized, MutableUnsized))
+    size = len(sample.serialize(use_version_2=use_version_2)) - 4
+
+    assert size <= idl.size_bound(sample, use_version_2)
+    if isinstance(sample, Sized):
+        assert size <= idl.max_size(use_version_2)
+    else:
+        assert idl.max_size(use_version_2) is None
+
+
+def test_serialize_allocates_once(monkeypatch):
+    from cyclonedds.idl._main import IDL
+    idl = IDL(Unsized)
+    grown = []
+    ensure_size = Buffer.ensure_size
+
+    def recording_ensure_size(self, size):
+        before = self._bytes
+        ensure_size(self, size)
+        if self._bytes is not before:
+            grown.append(self._size)
+
+    monkeypatch.setattr(Buffer, "ensure_size", recording_ensure_size)
+    # The first sample is bounded, the ones after it start out with the size of the previous one
+    for sample in [unsized, unsized, empty]:
+        assert idl.deserialize(idl.serialize(sample, buffer=Buffer())) == sample
+        assert not grown
+
+
+@dataclass
+class Blobs(IdlStruct):
+    name: str
+    blob: memoryview
+    chunks: tp.sequence[memoryview]
+    copied: bytes
+
+
+def test_bytes_as_memoryview():
+    sample = Blobs("blobs", memoryview(b"\1\2\3"), [memoryview(b"ab"), memoryview(b"")], b"cd")
+    data = sample.serialize()
+    decoded = Blobs.deserialize(data)
+
+    assert decoded == sample
+    assert type(decoded.blob) is memoryview and decoded.blob.obj is data
+    assert all(chunk.obj is data for chunk in decoded.chunks)
+    assert type(decoded.copied) is bytes
+    assert Blobs.deserialize(data, lazy=True).blob == b"\1\2\3"
+    assert Blobs.deserialize(data, fields=["blob"]).blob.obj is data
+
+
+def test_readonly_buffer():
+    data = bytearray(b"\4\0\0\0abcd")
+    buffer = Buffer(data, readonly=True)
+    assert buffer.read('I', 4) == 4
+    view = buffer.read_view(4)
+    data[4:8] = b"wxyz"
+    assert view == b"wxyz"
+    with pytest.raises(IndexError):
+        buffer.read_view(1)
@@ -0,0 +1,131 @@
+import pytest
+
+from dataclasses import dataclass
+from typing import Optional
+
+from cyclonedds.idl import IdlStruct, IdlUnion
+from cyclonedds.idl._support import Endianness
+from cyclonedds.idl.annotations import key, appendable, mutable
+import cyclonedds.idl.types as tp
+
+
+@dataclass
+class Inner(IdlStruct):
+    a: tp.int16
+    b: str
+
+
+class Choice(IdlUnion, discriminator=tp.int16):
+    a: tp.case[1, tp.int32]
+    b: tp.case[2, str]
+
+
+@dataclass
+class Frame(IdlStruct):
+    id: tp.uint8
+    key("id")
+    c: tp.char
+    scale: tp.float64
+    raw: tp.array[tp.uint8, 3]
+    grid: tp.array[tp.array[tp.int32, 2], 2]
+    name: str
+    inner: Inner
+    payload: tp.sequence[tp.uint16]
+    choice: Choice
+    stamp: tp.int64
+
+
+@dataclass
+@appendable
+class AppendableFrame(IdlStruct):
+    id: tp.uint8
+    stamp: tp.int64
+    inners: tp.sequence[Inner]
+    opt: Optional[tp.int32]
+    count: tp.uint32
+
+
+@dataclass
+@mutable
+class MutableFrame(IdlStruct):
+    id: tp.uint8
+    key("id")
+    name: str
+    inners: tp.sequence[Inner]
+    opt: Optional[str]
+    stamp: tp.int64
+
+
+frame = Frame(
+    id=3, c='q', scale=0.25, raw=b"xyz", grid=[[1, 2], [3, 4]], name="frame", inner=Inner(-1, "inner"),
+    payload=list(range(100)), choice=Choice(b="choice"), stamp=-12345678901
+)
+appendable_frame = AppendableFrame(id=4, stamp=99, inners=[Inner(1, "x"), Inner(2, "yy")], opt=7, count=2**31)
+mutable_frame = MutableFrame(id=5, name="mutable", inners=[Inner(3, "z")], opt=None, stamp=-1)
+
+
+@pytest.mark.parametrize("endianness", [Endianness.Little, Endianness.Big])
+@pytest.mark.parametrize("use_version_2", [False, True])
+def test_lazy_final(endianness, use_version_2):
+    data = frame.serialize(use_version_2=use_version_2, endianness=endianness)
+    members = list(frame.__dataclass_fields__)
+
+    for member in members:
+        assert getattr(Frame.deserialize(data, lazy=True), member) == getattr(frame, member)
+
+    view = Frame.deserialize(data, lazy=True)
+    for member in reversed(members):
+        assert getattr(view, member) == getattr(frame, member)
+    assert view == frame
+    assert view.materialize() == frame
+
+
+@pytest.mark.parametrize("value", [appendable_frame, mutable_frame])
+@pytest.mark.parametrize("endianness", [Endianness.Little, Endianness.Big])
+def test_lazy_version_2(value, endianness):
+    data = value.serialize(endianness=endianness)
+    members = list(value.__dataclass_fields__)
+
+    for member in members:
+        assert getattr(type(value).deserialize(data, lazy=True), member) == getattr(value, member)
+
+    view = type(value).deserialize(data, lazy=True)
+    assert (view.stamp, view.id) == (value.stamp, value.id)
+    assert view.materialize() == value
+
+
+def test_lazy_caches_members():
+    view = Frame.deserialize(frame.serialize(), lazy=True)
+
+    assert view.payload is view.payload
+    assert view.inner is view.inner
+    assert view.materialize().inner is view.inner
+
+
+def test_lazy_view():
+    view = Frame.deserialize(frame.serialize(), lazy=True)
+
+    assert type(view).__name__ == "LazyFrame"
+    assert type(view) is type(Frame.deserialize(frame.serialize(), lazy=True))
+    assert view.sample_info is None
+    assert repr(view) == repr(frame).replace("Frame(", "LazyFrame(", 1)
+    with pytest.raises(AttributeError):
+        view.name = "frame"
+
+
+def test_lazy_appendable_evolution():
+    @dataclass
+    @appendable
+    class Shorter(IdlStruct, typename="AppendableFrame"):
+        id: tp.uint8
+        stamp: tp.int64
+
+    view = AppendableFrame.deserialize(Shorter(id=9, stamp=10).serialize(), lazy=True)
+    assert (view.count, view.id, view.inners, view.stamp) == (0, 9, [], 10)
+
+
+def test_lazy_invalid():
+    with pytest.raises(ValueError):
+        Frame.deserialize(frame.serialize(), fields=["id"], lazy=True)
+    with pytest.raises(TypeError):
+        Choice.deserialize(Choice(a=1).serialize(), lazy=True)
@@ -0,0 +1,97 @@
+import pytest
+import struct
+
+from dataclasses import dataclass
+from typing import Optional
+
+from cyclonedds.idl import IdlStruct
+from cyclonedds.idl._support import Endianness
+from cyclonedds.idl.annotations import mutable, key
+import cyclonedds.idl.types as tp
+
+
+@dataclass
+@mutable
+class Odometry(IdlStruct):
+    id: tp.int32
+    key("id")
+    valid: bool
+    x: tp.float64
+    frame: str
+    heading: Optional[tp.int16]
+    level: tp.int8
+    stamp: tp.uint64
+
+
+def emheader(lc, memberid):
+    return (lc << 28) | memberid
+
+
+def encode(e, members):
+    # members: (EMHEADER, struct code or None for a string, value)
+    body = b""
+    for header, code, value in members:
+        body += b"\0" * (-len(body) % 4)
+        if code is None:
+            raw = value.encode() + b"\0"
+            body += struct.pack(e + "III", header, len(raw) + 4, len(raw)) + raw
+        else:
+            body += struct.pack(e + "I" + code, header, *(value if isinstance(value, tuple) else (value,)))
+    return bytes([0, 0x0b if e == "<" else 0x0a, 0, 0]) + struct.pack(e + "I", len(body)) + body
+
+
+sample = Odometry(id=-5, valid=True, x=1.5, frame="map", heading=None, level=-2, stamp=2**40)
+members = [
+    (emheader(2, 0), "i", -5),
+    (emheader(0, 1), "?", True),
+    (emheader(3, 2), "d", 1.5),
+    (emheader(4, 3), None, "map"),
+    (emheader(0, 5), "b", -2),
+    (emheader(3, 6), "Q", 2**40),
+]
+
+
+@pytest.mark.parametrize("endianness", [Endianness.Little, Endianness.Big])
+def test_mutable_encoding(endianness):
+    e = "<" if endianness == Endianness.Little else ">"
+    data = encode(e, members)
+
+    assert sample.serialize(endianness=endianness) == data
+    assert Odometry.deserialize(data) == sample
+
+
+def test_mutable_optional_present():
+    value = Odometry(id=1, valid=False, x=0.0, frame="", heading=-7, level=0, stamp=0)
+    data = encode("<", [
+        (emheader(2, 0), "i", 1), (emheader(0, 1), "?", False), (emheader(3, 2), "d", 0.0), (emheader(4, 3), None, ""),
+        (emheader(1, 4), "h", -7), (emheader(0, 5), "b", 0), (emheader(3, 6), "Q", 0),
+    ])
+
+    assert value.serialize(endianness=Endianness.Little) == data
+    assert Odometry.deserialize(data) == value
+
+
+def test_mutable_other_writer():
+    # Members in another order, with an unknown member and a primitive written with a NEXTINT
+    data = encode("<", [
+        (emheader(3, 6), "Q", 2**40),
+        (emheader(3, 2), "d", 1.5),
+        (emheader(2, 99), "I", 12345),
+        (emheader(4, 0), "Ii", (4, -5)),
+        (emheader(4, 3), None, "map"),
+        (emheader(0, 1), "?", True),
+    ])
+    assert Odometry.deserialize(data) == Odometry(id=-5, valid=True, x=1.5, frame="map", heading=None, level=0,
+                                                  stamp=2**40)
+
+
+def test_mutable_must_understand():
+    data = encode("<", [(emheader(2, 0), "i", 1), ((1 << 31) | emheader(2, 99), "I", 1)])
+    with pytest.raises(Exception):
+        Odometry.deserialize(data)
+
+
+def test_mutable_truncated_run():
+    # A writer that stops after the first members of a run of primitives
+    data = encode("<", members[:2])
+    assert Odometry.deserialize(data) == Odometry(id=-5, valid=True, x=0.0, frame="", heading=None, level=0, stamp=0)
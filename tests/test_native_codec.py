@@ -0,0 +1,192 @@
+import pytest
+
+from dataclasses import dataclass
+from typing import Optional
+
+from cyclonedds.idl import IdlStruct, IdlEnum, IdlBitmask, IdlUnion
+from cyclonedds.idl._main import IDL
+from cyclonedds.idl._support import Endianness
+from cyclonedds.idl.annotations import key, appendable, bit_bound
+from cyclonedds.idl import _native
+import cyclonedds.idl.types as tp
+
+
+pytestmark = pytest.mark.skipif(not _native._load(), reason="Native codec not available")
+
+
+class Color(IdlEnum):
+    Red = 0
+    Green = 1
+    Blue = 2
+
+
+@bit_bound(8)
+class SmallColor(IdlEnum):
+    Cyan = 0
+    Magenta = 1
+
+
+@dataclass
+class Flags(IdlBitmask):
+    A: bool
+    B: bool
+
+
+@dataclass
+class Point(IdlStruct):
+    x: tp.float64
+    y: tp.float32
+    z: tp.int8
+
+
+@dataclass
+@appendable
+class Label(IdlStruct):
+    text: str
+    weight: tp.int16
+
+
+@dataclass
+class Everything(IdlStruct):
+    id: tp.uint8
+    key("id")
+    stamp: tp.int64
+    big: tp.uint64
+    ok: bool
+    c: tp.char
+    color: Color
+    small: SmallColor
+    flags: Flags
+    name: str
+    bounded: tp.bounded_str[5]
+    blob: bytes
+    p: Point
+    arr: tp.array[tp.int16, 3]
+    raw: tp.array[tp.uint8, 3]
+    seq: tp.sequence[tp.uint16]
+    dseq: tp.sequence[tp.float64, 4]
+    points: tp.sequence[Point]
+    grid: tp.array[tp.array[tp.int32, 2], 2]
+    names: tp.sequence[str]
+    trailing: tp.uint16
+
+
+@dataclass
+@appendable
+class Labelled(IdlStruct):
+    label: Label
+    labels: tp.array[Label, 2]
+    points: tp.sequence[Point]
+    more: tp.sequence[Label, 3]
+
+
+@dataclass
+class WithOptional(IdlStruct):
+    a: Optional[tp.int32]
+    b: Optional[str]
+    c: Optional[Point]
+
+
+class Choice(IdlUnion, discriminator=tp.int16):
+    a: tp.case[1, tp.int32]
+    b: tp.case[2, str]
+
+
+@dataclass
+class WithUnion(IdlStruct):
+    choice: Choice
+
+
+@dataclass
+@appendable
+class Version1(IdlStruct, typename="Versioned"):
+    a: tp.int32
+
+
+@dataclass
+@appendable
+class Version2(IdlStruct, typename="Versioned"):
+    a: tp.int32
+    b: str
+
+
+sample = Everything(
+    id=3, stamp=-12345678901, big=2**64 - 1, ok=True, c='q', color=Color.Blue, small=SmallColor.Magenta,
+    flags=Flags(A=False, B=True), name="everything", bounded="abc", blob=b"\x00\x01\x02\x03\x04", p=Point(1.5, -2.0, 7),
+    arr=[1, -2, 3], raw=b"xyz", seq=[1, 2, 3, 4, 5], dseq=[0.5, 1.5],
+    points=[Point(1.0, 2.0, 3), Point(4.0, 5.0, 6)], grid=[[1, 2], [3, 4]], names=["a", "", "ccc"],
+    trailing=0xabcd
+)
+
+
+def machine_serialize(idl, value, **kwargs):
+    native = idl.v0_native, idl.v2_native
+    idl.v0_native, idl.v2_native = None, None
+    try:
+        return idl.serialize(value, **kwargs)
+    finally:
+        idl.v0_native, idl.v2_native = native
+
+
+@pytest.mark.parametrize("endianness", [Endianness.Little, Endianness.Big])
+@pytest.mark.parametrize("use_version_2", [False, True])
+def test_native_matches_machine(endianness, use_version_2):
+    idl = IDL(Everything)
+    idl.populate()
+    assert idl.v0_native is not None and idl.v2_native is not None
+
+    data = idl.serialize(sample, use_version_2=use_version_2, endianness=endianness)
+    assert data == machine_serialize(idl, sample, use_version_2=use_version_2, endianness=endianness)
+    native = idl.v2_native if use_version_2 else idl.v0_native
+    assert _native.deserialize(native, data, 4, endianness == Endianness.Little) == sample
+    assert idl.deserialize(data) == sample
+
+
+@pytest.mark.parametrize("value", [
+    Labelled(label=Label("label", -3), labels=[Label("x", 1), Label("yy", 2)], points=[Point(1.0, 2.0, 3)], more=[]),
+    Labelled(label=Label("", 0), labels=[Label("", 1), Label("z", 2)], points=[], more=[Label("q", 9)]),
+    WithOptional(a=None, b=None, c=None),
+    WithOptional(a=5, b="optional", c=Point(1.0, 2.0, 3))
+])
+def test_native_version_2(value):
+    idl = IDL(type(value))
+    idl.populate()
+    assert idl.v2_native is not None
+
+    data = idl.serialize(value)
+    assert data == machine_serialize(idl, value)
+    assert idl.deserialize(data) == value
+
+
+def test_native_not_available_for_unions():
+    idl = IDL(WithUnion)
+    idl.populate()
+    assert idl.v0_native is None and idl.v2_native is None
+
+    value = WithUnion(choice=Choice(b="hello"))
+    assert idl.deserialize(idl.serialize(value)) == value
+
+
+def test_native_errors_come_from_machines():
+    idl = IDL(Everything)
+    idl.populate()
+
+    with pytest.raises(Exception, match="Failed to encode member bounded"):
+        idl.serialize(Everything(**{**sample.__dict__, "bounded": "too long"}))
+
+    with pytest.raises(Exception, match="Failed to encode member id"):
+        idl.serialize(Everything(**{**sample.__dict__, "id": 256}))
+
+
+def test_native_appendable_evolution():
+    # Data from an older version of the type lacks members, the machines default initialize them
+    assert Version2.deserialize(Version1(a=7).serialize()) == Version2(a=7, b="")
+    assert Version1.deserialize(Version2(a=7, b="newer").serialize()) == Version1(a=7)
+
+
+def test_native_disabled(monkeypatch):
+    monkeypatch.setattr(IDL, "native_codec", False)
+    idl = IDL(Everything)
+    idl.populate()
+    assert idl.v0_native is None and idl.v2_native is None
+    assert idl.deserialize(idl.serialize(sample)) == sample
@@ -0,0 +1,118 @@
+import pytest
+
+from array import array as pyarray
+from dataclasses import dataclass
+
+from cyclonedds.idl import IdlStruct
+from cyclonedds.idl._support import Endianness
+from cyclonedds.idl.annotations import key
+from cyclonedds.idl import _machinery
+import cyclonedds.idl.types as tp
+
+
+@dataclass
+class Samples(IdlStruct):
+    id: tp.uint8
+    key("id")
+    coords: tp.ndarray[tp.float32, 3]
+    values: tp.ndsequence[tp.int16]
+    flags: tp.ndsequence[bool, 8]
+    wide: tp.ndsequence[tp.float64]
+
+
+@dataclass
+class ListSamples(IdlStruct):
+    id: tp.uint8
+    key("id")
+    coords: tp.array[tp.float32, 3]
+    values: tp.sequence[tp.int16]
+    flags: tp.sequence[bool, 8]
+    wide: tp.sequence[tp.float64]
+
+
+@dataclass
+class KeyedByArray(IdlStruct):
+    position: tp.ndarray[tp.int32, 2]
+    key("position")
+
+
+def test_ndarray_annotation_equality():
+    assert tp.ndarray[int, 3] == tp.ndarray[int, 3]
+    assert tp.ndarray[int, 3] != tp.array[int, 3]
+    assert tp.array[int, 3] != tp.ndarray[int, 3]
+    assert tp.ndsequence[int] != tp.sequence[int]
+    assert repr(tp.ndsequence[tp.int16, 5].__metadata__[0]) == "ndsequence[int16, 5]"
+
+
+def test_ndarray_non_primitive():
+    @dataclass
+    class Bad(IdlStruct):
+        names: tp.ndsequence[str]
+
+    with pytest.raises(TypeError):
+        Bad.__idl__.populate()
+
+
+@pytest.mark.parametrize("endianness", [Endianness.Little, Endianness.Big])
+def test_ndarray_numpy_roundtrip(endianness):
+    np = pytest.importorskip("numpy")
+
+    v = Samples(
+        id=3,
+        coords=np.array([1.0, 2.5, -3.0], dtype=np.float32),
+        values=np.arange(-5, 5, dtype=np.int16),
+        flags=np.array([True, False, True]),
+        wide=[0.5, 1.5]
+    )
+    data = v.serialize(endianness=endianness)
+    assert data == ListSamples(
+        id=3, coords=[1.0, 2.5, -3.0], values=list(range(-5, 5)), flags=[True, False, True], wide=[0.5, 1.5]
+    ).serialize(endianness=endianness)
+
+    v2 = Samples.deserialize(data)
+    assert isinstance(v2.coords, np.ndarray) and v2.coords.dtype == np.float32
+    assert v2.coords.dtype.isnative and v2.coords.flags.writeable
+    assert np.array_equal(v2.coords, v.coords)
+    assert np.array_equal(v2.values, v.values)
+    assert np.array_equal(v2.flags, v.flags)
+    assert np.array_equal(v2.wide, v.wide)
+    assert v2.values.dtype == np.int16 and v2.flags.dtype == np.bool_
+
+
+def test_ndarray_numpy_default_and_key():
+    np = pytest.importorskip("numpy")
+
+    machine = _machinery.NdSequenceOfPrimitiveMachine(tp.float64)
+    assert isinstance(machine.default_initialize(), np.ndarray) and len(machine.default_initialize()) == 0
+    machine = _machinery.NdArrayOfPrimitiveMachine(tp.int32, 4)
+    assert np.array_equal(machine.default_initialize(), np.zeros(4, dtype=np.int32))
+
+    a = KeyedByArray(position=np.array([1, 2], dtype=np.int32))
+    b = KeyedByArray(position=np.array([1, 2], dtype=np.int32))
+    assert a.__idl__.key(a) == b.__idl__.key(b)
+
+
+@pytest.mark.parametrize("endianness", [Endianness.Little, Endianness.Big])
+def test_ndarray_without_numpy(monkeypatch, endianness):
+    monkeypatch.setattr(_machinery, "_numpy", False)
+
+    @dataclass
+    class Fallback(IdlStruct):
+        id: tp.uint8
+        key("id")
+        coords: tp.ndarray[tp.float32, 3]
+        values: tp.ndsequence[tp.int16]
+        flags: tp.ndsequence[bool, 8]
+        wide: tp.ndsequence[tp.float64]
+
+    v = Fallback(id=3, coords=[1.0, 2.5, -3.0], values=pyarray('h', range(-5, 5)), flags=[True, False, True], wide=[])
+    data = v.serialize(endianness=endianness)
+    assert data == ListSamples(
+        id=3, coords=[1.0, 2.5, -3.0], values=list(range(-5, 5)), flags=[True, False, True], wide=[]
+    ).serialize(endianness=endianness)
+
+    v2 = Fallback.deserialize(data)
+    assert v2.coords == pyarray('f', [1.0, 2.5, -3.0])
+    assert v2.values == pyarray('h', range(-5, 5))
+    assert v2.flags == pyarray('B', [1, 0, 1])
+    assert v2.wide == pyarray('d')
@@ -0,0 +1,201 @@
+import pytest
+
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from cyclonedds.idl import IdlStruct, IdlEnum, IdlBitmask, IdlUnion
+from cyclonedds.idl._main import IDL
+from cyclonedds.idl._support import Endianness
+from cyclonedds.idl import _native
+from cyclonedds.idl.annotations import key, appendable, mutable
+import cyclonedds.idl.types as tp
+
+
+class Color(IdlEnum):
+    Red = 0
+    Green = 1
+    Blue = 2
+
+
+@dataclass
+class Flags(IdlBitmask):
+    A: bool
+    B: bool
+
+
+@dataclass
+class Point(IdlStruct):
+    x: tp.float64
+    y: tp.float32
+    z: tp.int8
+
+
+@dataclass
+@appendable
+class Label(IdlStruct):
+    text: str
+    weight: tp.int16
+
+
+class Choice(IdlUnion, discriminator=tp.int16):
+    a: tp.case[1, tp.int32]
+    b: tp.case[2, str]
+
+
+@dataclass
+class Status(IdlStruct):
+    id: tp.uint8
+    key("id")
+    c: tp.char
+    color: Color
+    flags: Flags
+    name: str
+    blob: bytes
+    p: Point
+    arr: tp.array[tp.int16, 3]
+    raw: tp.array[tp.uint8, 3]
+    seq: tp.sequence[tp.uint16]
+    points: tp.sequence[Point]
+    grid: tp.array[tp.array[tp.int32, 2], 2]
+    names: tp.sequence[str]
+    choice: Choice
+    table: Dict[tp.int32, str]
+    stamp: tp.int64
+
+
+@dataclass
+@appendable
+class AppendableStatus(IdlStruct):
+    id: tp.uint8
+    labels: tp.sequence[Label]
+    payload: tp.sequence[tp.uint8]
+    label: Label
+    opt: Optional[tp.int32]
+    stamp: tp.int64
+
+
+@dataclass
+class PlainStatus(IdlStruct):
+    id: tp.uint8
+    c: tp.char
+    color: Color
+    flags: Flags
+    name: str
+    blob: bytes
+    p: Point
+    raw: tp.array[tp.uint8, 3]
+    seq: tp.sequence[tp.uint16]
+    points: tp.sequence[Point]
+    grid: tp.array[tp.array[tp.int32, 2], 2]
+    names: tp.sequence[str]
+    stamp: tp.int64
+
+
+@dataclass
+@mutable
+class MutableStatus(IdlStruct):
+    id: tp.uint8
+    key("id")
+    labels: tp.sequence[Label]
+    payload: tp.sequence[tp.uint8]
+    opt: Optional[str]
+    stamp: tp.int64
+
+
+status = Status(
+    id=3, c='q', color=Color.Blue, flags=Flags(A=False, B=True), name="status", blob=b"\x00\x01\x02",
+    p=Point(1.5, -2.0, 7), arr=[1, -2, 3], raw=b"xyz", seq=[1, 2, 3, 4, 5],
+    points=[Point(1.0, 2.0, 3), Point(4.0, 5.0, 6)], grid=[[1, 2], [3, 4]], names=["a", "", "ccc"],
+    choice=Choice(b="choice"), table={1: "one", -2: "two"}, stamp=-12345678901
+)
+appendable_status = AppendableStatus(
+    id=4, labels=[Label("x", 1), Label("yy", 2)], payload=list(range(200)), label=Label("z", 3), opt=7, stamp=99
+)
+plain_status = PlainStatus(
+    id=6, c='p', color=Color.Green, flags=Flags(A=True, B=False), name="plain", blob=b"\xff", p=Point(0.5, 1.0, -1),
+    raw=b"abc", seq=[7, 8, 9], points=[Point(1.0, 2.0, 3)], grid=[[5, 6], [7, 8]], names=["x", "yy"], stamp=2**40
+)
+mutable_status = MutableStatus(id=5, labels=[Label("a", 1)], payload=[1, 2, 3], opt=None, stamp=-1)
+
+
+@pytest.mark.parametrize("endianness", [Endianness.Little, Endianness.Big])
+@pytest.mark.parametrize("use_version_2", [False, True])
+def test_projection_final(endianness, use_version_2):
+    data = status.serialize(use_version_2=use_version_2, endianness=endianness)
+    members = list(status.__dataclass_fields__)
+
+    for first, last in zip(members, reversed(members)):
+        record = Status.deserialize(data, fields=[first])
+        assert getattr(record, first) == getattr(status, first)
+        record = Status.deserialize(data, fields=[first] if first == last else [first, last])
+        assert (getattr(record, first), getattr(record, last)) == (getattr(status, first), getattr(status, last))
+
+
+@pytest.mark.parametrize("value", [appendable_status, mutable_status])
+@pytest.mark.parametrize("endianness", [Endianness.Little, Endianness.Big])
+def test_projection_version_2(value, endianness):
+    data = value.serialize(endianness=endianness)
+    members = list(value.__dataclass_fields__)
+
+    for member in members:
+        assert getattr(type(value).deserialize(data, fields=[member]), member) == getattr(value, member)
+
+    record = type(value).deserialize(data, fields=["stamp", "id"])
+    assert (record.id, record.stamp) == (value.id, value.stamp)
+
+
+@pytest.mark.skipif(not _native._load(), reason="Native codec not available")
+@pytest.mark.parametrize("endianness", [Endianness.Little, Endianness.Big])
+@pytest.mark.parametrize("use_version_2", [False, True])
+def test_projection_native(endianness, use_version_2):
+    idl = IDL(PlainStatus)
+    idl.populate()
+    native = idl.v2_native if use_version_2 else idl.v0_native
+    assert native is not None
+
+    data = plain_status.serialize(use_version_2=use_version_2, endianness=endianness)
+    members = list(plain_status.__dataclass_fields__)
+    little = endianness == Endianness.Little
+
+    for first, last in zip(members, reversed(members)):
+        fields = (first,) if first == last else (first, last)
+        expected = {f: getattr(plain_status, f) for f in fields}
+        assert _native.deserialize_fields(native, data, 4, little, fields) == expected
+        assert idl.deserialize(data, fields=fields) == idl.projection(fields)(**expected)
+
+
+def test_projection_record():
+    data = status.serialize()
+    record = Status.deserialize(data, fields=["id", "stamp"])
+
+    assert type(record) is type(Status.deserialize(data, fields=["id", "stamp"]))
+    assert record == Status.deserialize(data, fields=["id", "stamp"])
+    assert record != Status.deserialize(data, fields=["stamp", "id"])
+    assert repr(record) == "StatusFields(id=3, stamp=-12345678901)"
+    assert record.sample_info is None
+    assert not hasattr(record, "name")
+    with pytest.raises(AttributeError):
+        record.name = "status"
+
+
+def test_projection_appendable_evolution():
+    @dataclass
+    @appendable
+    class Shorter(IdlStruct, typename="AppendableStatus"):
+        id: tp.uint8
+
+    record = AppendableStatus.deserialize(Shorter(id=9).serialize(), fields=["id", "stamp"])
+    assert (record.id, record.stamp) == (9, 0)
+
+
+def test_projection_invalid():
+    data = status.serialize()
+
+    with pytest.raises(ValueError):
+        Status.deserialize(data, fields=["nonexistent"])
+    with pytest.raises(ValueError):
+        Status.deserialize(data, fields=[])
+    with pytest.raises(ValueError):
+        Status.deserialize(data, fields=["id", "id"])
+    with pytest.raises(TypeError):
+        Choice.deserialize(Choice(a=1).serialize(), fields=["a"])
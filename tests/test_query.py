@@ -0,0 +1,232 @@
+import pytest
+import random
+import struct
+
+from dataclasses import dataclass
+
+from cyclonedds.idl import IdlStruct, IdlEnum
+from cyclonedds.idl._support import Endianness
+from cyclonedds.idl.annotations import appendable, key
+from cyclonedds.query import Field, compile_query, from_sql
+import cyclonedds.idl.types as tp
+
+from cyclonedds._clayer import ddspy_query_evaluate
+
+
+class Mode(IdlEnum):
+    Off = 0
+    Standby = 1
+    On = 2
+
+
+@dataclass
+class Position(IdlStruct):
+    x: tp.float32
+    y: tp.float64
+
+
+@dataclass
+class Sensor(IdlStruct):
+    sensor_id: tp.int32
+    key("sensor_id")
+    flag: bool
+    small: tp.int8
+    big: tp.uint64
+    mode: Mode
+    position: Position
+    value: tp.float64
+    name: str
+    after_name: tp.int16
+
+
+@appendable
+@dataclass
+class AppendableSensor(IdlStruct):
+    sensor_id: tp.int16
+    values: tp.array[tp.float64, 2]
+    value: tp.float32
+
+
+@appendable
+@dataclass
+class Calibration(IdlStruct, typename="Calibration"):
+    offset: tp.int32
+
+
+@dataclass
+class CalibratedSensor(IdlStruct, typename="CalibratedSensor"):
+    calibration: Calibration
+    value: tp.int32
+
+
+# The same types as seen by a writer with a later version of Calibration
+@appendable
+@dataclass
+class CalibrationV2(IdlStruct, typename="Calibration"):
+    offset: tp.int32
+    scale: tp.float64
+
+
+@dataclass
+class CalibratedSensorV2(IdlStruct, typename="CalibratedSensor"):
+    calibration: CalibrationV2
+    value: tp.int32
+
+
+def random_sensor(rnd):
+    return Sensor(
+        sensor_id=rnd.randint(0, 10),
+        flag=rnd.random() < 0.5,
+        small=rnd.randint(-128, 127),
+        big=rnd.choice([0, 1, 2 ** 63, 2 ** 64 - 1]),
+        mode=rnd.choice(list(Mode)),
+        position=Position(
+            x=struct.unpack('f', struct.pack('f', rnd.uniform(-2, 2)))[0],
+            y=rnd.choice([-1.0, 0.0, 1.0, float("nan")])
+        ),
+        value=rnd.uniform(-10, 10),
+        name="sensor",
+        after_name=rnd.randint(-3, 3)
+    )
+
+
+queries = [
+    (Field("sensor_id") == 7) & (Field("value") > 3.0),
+    (Field("sensor_id") >= 3) | ~Field("flag"),
+    (Field("small") < 0) & (Field("small") != -128),
+    Field("big") > 2 ** 62,
+    Field("big") == 2 ** 64 - 1,
+    Field("big") > -1,
+    Field("mode") == Mode.On,
+    (Field("mode") != 0) & (Field("position.x") < 0.5),
+    Field("position.y") == Field("position.y"),
+    Field("position.y") < 1,
+    Field("flag") == True,  # noqa: E712
+    Field("value") >= Field("position.x"),
+]
+
+
+@pytest.mark.parametrize("query", queries, ids=repr)
+@pytest.mark.parametrize("use_version_2", [False, True])
+@pytest.mark.parametrize("endianness", [Endianness.Little, Endianness.Big])
+def test_query_matches_python(query, use_version_2, endianness):
+    compiled = compile_query(query, Sensor)
+    assert compiled is not None
+
+    rnd = random.Random(repr(query))
+    for _ in range(200):
+        sample = random_sensor(rnd)
+        data = sample.serialize(use_version_2=use_version_2, endianness=endianness)
+        assert ddspy_query_evaluate(compiled, data) == query(sample)
+
+
+@pytest.mark.parametrize("endianness", [Endianness.Little, Endianness.Big])
+def test_query_appendable(endianness):
+    query = (Field("sensor_id") == 3) & (Field("value") < 1.5)
+    compiled = compile_query(query, AppendableSensor)
+    assert compiled is not None
+
+    for sensor_id, value in [(3, 1.0), (3, 2.0), (4, 1.0)]:
+        sample = AppendableSensor(sensor_id=sensor_id, values=[0.0, 1.0], value=value)
+        data = sample.serialize(endianness=endianness)
+        assert ddspy_query_evaluate(compiled, data) == query(sample) == (sensor_id == 3 and value < 1.5)
+
+
+def test_query_not_compilable():
+    assert compile_query(Field("name") == "sensor", Sensor) is None
+    assert compile_query(Field("after_name") == 1, Sensor) is None
+    assert compile_query(Field("position") == 1, Sensor) is None
+    assert compile_query((Field("sensor_id") == 1) & (Field("after_name") == 1), Sensor) is None
+
+    sample = Sensor(1, True, 0, 0, Mode.Off, Position(0.0, 0.0), 0.0, "sensor", 1)
+    assert ((Field("sensor_id") == 1) & (Field("after_name") == 1))(sample)
+    assert (Field("name") == "sensor")(sample)
+
+
+@pytest.mark.parametrize("endianness", [Endianness.Little, Endianness.Big])
+def test_query_after_nested_appendable(endianness):
+    # The nested struct is longer in data from the evolved writer, so only its own members are at a fixed offset
+    assert compile_query(Field("value") == 5, CalibratedSensor) is None
+
+    query = Field("calibration.offset") == -2
+    compiled = compile_query(query, CalibratedSensor)
+    assert compiled is not None
+
+    for sample in [CalibratedSensor(Calibration(-2), 5), CalibratedSensorV2(CalibrationV2(-2, 1.5), 5),
+                   CalibratedSensorV2(CalibrationV2(3, -2.0), 5)]:
+        data = sample.serialize(use_version_2=True, endianness=endianness)
+        received = CalibratedSensor.deserialize(data)
+        assert received.value == 5
+        assert ddspy_query_evaluate(compiled, data) == query(received) == (sample.calibration.offset == -2)
+        assert (Field("value") == 5)(received)
+
+
+def test_query_malformed_data():
+    compiled = compile_query(Field("value") > 0, Sensor)
+    data = random_sensor(random.Random(1)).serialize()
+
+    assert not ddspy_query_evaluate(compiled, b"")
+    assert not ddspy_query_evaluate(compiled, data[:12])
+    assert not ddspy_query_evaluate(compiled, b"\x00\x0b" + data[2:])
+
+
+def test_query_no_truth_value():
+    with pytest.raises(TypeError):
+        (Field("a") == 1) and (Field("b") == 2)
+
+
+sql_queries = [
+    ("sensor_id = 7 AND value > 3.0", (), (Field("sensor_id") == 7) & (Field("value") > 3.0)),
+    ("sensor_id >= %0 OR NOT flag = TRUE", ["3"], (Field("sensor_id") >= 3) | ~(Field("flag") == True)),  # noqa: E712
+    ("(small < 0) and small <> -128", (), (Field("small") < 0) & (Field("small") != -128)),
+    ("big > 0x4000000000000000", (), Field("big") > 2 ** 62),
+    ("mode = On", (), Field("mode") == Mode.On),
+    ("mode != %0 AND position.x < %1", ["Off", 0.5], (Field("mode") != 0) & (Field("position.x") < 0.5)),
+    ("value BETWEEN -2.5 AND %0", [2.5], (Field("value") >= -2.5) & (Field("value") <= 2.5)),
+    ("after_name NOT BETWEEN -1 AND 1", (), ~((Field("after_name") >= -1) & (Field("after_name") <= 1))),
+    ("value >= position.x", (), Field("value") >= Field("position.x")),
+]
+
+
+@pytest.mark.parametrize("text,parameters,query", sql_queries, ids=[q[0] for q in sql_queries])
+def test_query_from_sql(text, parameters, query):
+    parsed = from_sql(text, parameters, Sensor)
+    assert repr(parsed) == repr(query)
+
+    rnd = random.Random(text)
+    for _ in range(50):
+        sample = random_sensor(rnd)
+        assert parsed(sample) == query(sample)
+
+
+def test_query_from_sql_strings():
+    sample = Sensor(1, True, 0, 0, Mode.Off, Position(0.0, 0.0), 0.0, "sensor", 1)
+
+    assert from_sql("name = 'sensor'", (), Sensor)(sample)
+    assert from_sql("name = %0", ["'sensor'"], Sensor)(sample)
+    assert from_sql("name LIKE 'sen%'", (), Sensor)(sample)
+    assert from_sql("name LIKE 's_n_o_'", (), Sensor)(sample)
+    assert not from_sql("name LIKE 'sen'", (), Sensor)(sample)
+    assert from_sql("name NOT LIKE '%.%'", (), Sensor)(sample)
+    assert compile_query(from_sql("name LIKE 'sen%'", (), Sensor), Sensor) is None
+
+
+@pytest.mark.parametrize("text,parameters", [
+    ("sensor = 7", ()),
+    ("position.z > 1", ()),
+    ("mode = Unknown", ()),
+    ("sensor_id = On", ()),
+    ("sensor_id = %1", ["1"]),
+    ("sensor_id = %0", ["1 OR 1"]),
+    ("sensor_id = ", ()),
+    ("sensor_id = 7 AND", ()),
+    ("(sensor_id = 7", ()),
+    ("sensor_id = 7)", ()),
+    ("sensor_id NOT = 7", ()),
+    ("sensor_id", ()),
+    ("name LIKE 7", ()),
+    ("sensor_id = 7 ;", ()),
+])
+def test_query_from_sql_invalid(text, parameters):
+    with pytest.raises(ValueError):
+        from_sql(text, parameters, Sensor)
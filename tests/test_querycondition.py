@@ -1,6 +1,15 @@
 import pytest
 
+from dataclasses import dataclass
+
 from cyclonedds.core import Entity, QueryCondition, SampleState, InstanceState, ViewState
+from cyclonedds.idl import IdlStruct
+from cyclonedds.idl.annotations import key
+from cyclonedds.idl.types import int32, float64, uint16
+from cyclonedds.pub import DataWriter
+from cyclonedds.query import Field
+from cyclonedds.sub import DataReader
+from cyclonedds.topic import Topic
 from cyclonedds.util import isgoodentity
 
 from support_modules.testtopics import Message
@@ -58,3 +67,38 @@ def test_querycondition_read(common_setup):
     received = common_setup.dr.read(condition=qc)
 
     assert len(received) == 1 and received[0] == messages[5]
+
+
+@dataclass
+class Reading(IdlStruct, typename="Reading"):
+    sensor_id: int32
+    key("sensor_id")
+    value: float64
+    label: str
+    count: uint16
+
+
+@pytest.mark.parametrize("where,expected", [
+    ((Field("sensor_id") == 7) & (Field("value") > 3.0), [(7, 3.5), (7, 4.0)]),
+    (~(Field("sensor_id") < 7) & (Field("value") <= 1.0), [(7, 0.5), (8, 1.0)]),
+    (Field("label") == "seven", [(7, 0.5), (7, 3.5), (7, 4.0)]),
+    ((Field("count") > 1) | (Field("sensor_id") == 8), [(7, 4.0), (8, 1.0)]),
+])
+def test_querycondition_where(common_setup, where, expected):
+    tp = Topic(common_setup.dp, "Reading", Reading)
+    dw = DataWriter(common_setup.pub, tp, qos=common_setup.qos)
+    dr = DataReader(common_setup.sub, tp, qos=common_setup.qos)
+    qc = QueryCondition(dr, SampleState.Any | ViewState.Any | InstanceState.Any, where=where)
+
+    for (sensor_id, value, count) in [(7, 0.5, 0), (6, 9.0, 0), (7, 3.5, 1), (7, 4.0, 2), (8, 1.0, 0)]:
+        dw.write(Reading(sensor_id=sensor_id, value=value, label="seven" if sensor_id == 7 else "other", count=count))
+
+    received = dr.read(N=10, condition=qc)
+    assert sorted((r.sensor_id, r.value) for r in received) == expected
+
+
+def test_querycondition_filter_or_where(common_setup):
+    with pytest.raises(TypeError):
+        QueryCondition(common_setup.dr, SampleState.Any)
+    with pytest.raises(TypeError):
+        QueryCondition(common_setup.dr, SampleState.Any, lambda x: True, where=Field("message") == "")
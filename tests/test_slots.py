@@ -0,0 +1,93 @@
+import pickle
+import pytest
+
+from dataclasses import dataclass, field, replace
+
+from cyclonedds.idl import IdlStruct, make_idl_struct
+from cyclonedds.idl.annotations import key, appendable
+import cyclonedds.idl.types as tp
+
+
+@dataclass
+class Reading(IdlStruct, slots=True):
+    sensor: tp.int32
+    key("sensor")
+    value: tp.float64 = 1.5
+    tags: tp.sequence[str] = field(default_factory=list)
+
+
+@dataclass
+@appendable
+class ExtendedReading(Reading, slots=True):
+    unit: str = "m"
+
+
+@dataclass
+class UnslottedReading(Reading):
+    extra: tp.int8 = 0
+
+
+@dataclass(frozen=True)
+class Frozen(IdlStruct, slots=True):
+    a: tp.int16 = 3
+
+
+def test_slots_layout():
+    v = Reading(1)
+
+    assert Reading.__slots__ == ("sensor", "value", "tags", "sample_info")
+    assert ExtendedReading.__slots__ == ("unit",)
+    assert not hasattr(v, "__dict__")
+    with pytest.raises(AttributeError):
+        v.other = 1
+
+    v.sample_info = "info"
+    assert v.sample_info == "info"
+
+    w = UnslottedReading(1)
+    w.value = 2.5
+    assert w.value == 2.5 and "value" not in w.__dict__
+
+
+def test_slots_dataclass():
+    assert Reading(1) == Reading(sensor=1, value=1.5, tags=[])
+    assert Reading(1).tags is not Reading(1).tags
+    assert replace(Reading(1), value=2.0) == Reading(1, 2.0)
+    assert ExtendedReading(2, unit="s") == ExtendedReading(2, 1.5, [], "s")
+    assert Frozen() == Frozen(3)
+    assert UnslottedReading(3) == UnslottedReading(3, 1.5, [], 0)
+    assert pickle.loads(pickle.dumps(Reading(1, tags=["a"]))) == Reading(1, tags=["a"])
+
+
+@pytest.mark.parametrize("value", [Reading(4, -1.0, ["x", "yz"]), ExtendedReading(5, unit="K"), Frozen(7),
+                                   UnslottedReading(6, extra=-1)])
+def test_slots_roundtrip(value):
+    assert type(value).deserialize(value.serialize()) == value
+    assert type(value).deserialize(value.serialize(), lazy=True).materialize() == value
+
+
+def test_slots_keys():
+    assert not Reading.__idl__.keyless
+    assert Reading.__idl__.key(Reading(4)) == Reading.__idl__.key(Reading(4, 2.0))
+
+
+def test_slots_make_idl_struct():
+    cls = make_idl_struct("Dynamic", "Dynamic", {"a": tp.int8, "b": str}, slots=True)
+
+    assert not hasattr(cls(1, "b"), "__dict__")
+    assert cls.deserialize(cls(1, "b").serialize()) == cls(1, "b")
+
+
+def test_slots_class_attributes():
+    class Plain(IdlStruct, slots=True):
+        a: tp.int32 = 5
+        b: tp.sequence[tp.int8] = field(default_factory=list)
+
+    assert Plain.a == 5
+    assert isinstance(Reading.value, type(Reading.sensor)) and Reading.__dataclass_fields__["value"].default == 1.5
+    assert UnslottedReading.value is Reading.value
+
+    # Only classes with slots get the metaclass that looks after them
+    assert type(Reading) is not type(IdlStruct) and isinstance(Reading, type(IdlStruct))
+    assert type(UnslottedReading) is type(Reading)
+    assert type(make_idl_struct("NoSlots", "NoSlots", {"a": tp.int8})) is type(IdlStruct)
@@ -1,8 +1,16 @@
 import pytest
+import threading
+
+from dataclasses import dataclass
 
 from cyclonedds.core import Entity
 from cyclonedds.domain import DomainParticipant
-from cyclonedds.topic import Topic
+from cyclonedds.idl import IdlStruct
+from cyclonedds.idl.annotations import key
+from cyclonedds.idl.types import int32, float64
+from cyclonedds.pub import DataWriter
+from cyclonedds.sub import DataReader
+from cyclonedds.topic import Topic, ContentFilteredTopic
 from cyclonedds.util import isgoodentity
 
 from support_modules.testtopics import Message
@@ -26,3 +34,88 @@ def test_get_type_name():
     tp = Topic(dp, 'MessageTopic', Message)
 
     assert tp.typename == tp.get_type_name() == 'Message'
+
+
+@dataclass
+class Reading(IdlStruct, typename="Reading"):
+    sensor_id: int32
+    key("sensor_id")
+    value: float64
+    label: str
+
+
+@pytest.mark.parametrize("expression,parameters,expected", [
+    ("sensor_id = 7 AND value > %0", ["3.0"], [(7, 3.5), (7, 4.0)]),
+    ("NOT sensor_id < 7 AND value <= 1.0", [], [(7, 0.5), (8, 1.0)]),
+    ("label LIKE 'sev%'", [], [(7, 0.5), (7, 3.5), (7, 4.0)]),
+])
+def test_content_filtered_topic(common_setup, expression, parameters, expected):
+    tp = Topic(common_setup.dp, "Reading", Reading)
+    cft = ContentFilteredTopic(tp, expression, parameters)
+    assert isgoodentity(cft)
+    assert cft.name == tp.name and cft.related_topic is tp
+
+    dw = DataWriter(common_setup.pub, tp, qos=common_setup.qos)
+    dr = DataReader(common_setup.sub, cft, qos=common_setup.qos)
+    dr_all = DataReader(common_setup.sub, tp, qos=common_setup.qos)
+
+    for (sensor_id, value) in [(7, 0.5), (6, 9.0), (7, 3.5), (7, 4.0), (8, 1.0)]:
+        dw.write(Reading(sensor_id=sensor_id, value=value, label="seven" if sensor_id == 7 else "other"))
+
+    assert sorted((r.sensor_id, r.value) for r in dr.read(N=10)) == expected
+    assert len(dr_all.read(N=10)) == 5
+
+
+def test_content_filtered_topic_parameters(common_setup):
+    tp = Topic(common_setup.dp, "Reading", Reading)
+    cft = ContentFilteredTopic(tp, "sensor_id = %0", ["7"])
+    dw = DataWriter(common_setup.pub, tp, qos=common_setup.qos)
+    dr = DataReader(common_setup.sub, cft, qos=common_setup.qos)
+
+    dw.write(Reading(sensor_id=7, value=1.0, label=""))
+    dw.write(Reading(sensor_id=8, value=1.0, label=""))
+    cft.expression_parameters = ["8"]
+    dw.write(Reading(sensor_id=7, value=2.0, label=""))
+    dw.write(Reading(sensor_id=8, value=2.0, label=""))
+
+    assert cft.expression_parameters == ["8"]
+    assert sorted((r.sensor_id, r.value) for r in dr.read(N=10)) == [(7, 1.0), (8, 2.0)]
+
+
+@pytest.mark.parametrize("expression,literal", [("sensor_id = %0", "{}"), ("label LIKE %0", "'{}%'")])
+def test_content_filtered_topic_keeps_filters(common_setup, expression, literal):
+    # Compiled and Python filters: a receive thread may still be evaluating a filter that was just replaced
+    tp = Topic(common_setup.dp, "Reading", Reading)
+    cft = ContentFilteredTopic(tp, expression, [literal.format(7)])
+    dw = DataWriter(common_setup.pub, tp, qos=common_setup.qos)
+    dr = DataReader(common_setup.sub, cft, qos=common_setup.qos)
+    first = cft._filters[-1]
+
+    stop = threading.Event()
+
+    def write():
+        while not stop.is_set():
+            dw.write(Reading(sensor_id=7, value=1.0, label="7"))
+
+    thread = threading.Thread(target=write)
+    thread.start()
+    try:
+        for i in range(200):
+            cft.expression_parameters = [literal.format(i % 2 + 7)]
+    finally:
+        stop.set()
+        thread.join()
+
+    # Only the installed filter and the one it replaced are kept
+    assert len(cft._filters) == 2 and all(f is not first for f in cft._filters)
+    dr.take(N=10)
+
+
+def test_content_filtered_topic_invalid(common_setup):
+    tp = Topic(common_setup.dp, "Reading", Reading)
+    with pytest.raises(ValueError):
+        ContentFilteredTopic(tp, "sensor = 7")
+    with pytest.raises(ValueError):
+        ContentFilteredTopic(tp, "sensor_id = %0")
+    with pytest.raises(TypeError):
+        ContentFilteredTopic(Reading, "sensor_id = 7")
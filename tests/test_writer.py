@@ -1,12 +1,16 @@
 import pytest
+import time
 
-from cyclonedds.core import DDSException
+from cyclonedds.core import DDSException, _serialize_samples
 from cyclonedds.domain import DomainParticipant
 from cyclonedds.topic import Topic
 from cyclonedds.pub import Publisher, DataWriter
+from cyclonedds.sub import DataReader
 from cyclonedds.util import duration, isgoodentity
+from cyclonedds.qos import Qos, Policy
 
 from support_modules.testtopics import Message, MessageKeyed
+import support_modules.test_classes as tc
 
 
 def test_initialize_writer():
@@ -60,6 +64,166 @@ def test_writer_instance_handle():
     dw.unregister_instance_handle(handle)
 
 
+def test_writer_write_with_handle():
+    dp = DomainParticipant(0)
+    tp = Topic(dp, "MessageKeyed", MessageKeyed)
+    dr = DataReader(dp, tp)
+    dw = DataWriter(dp, tp, instance_cache_size=1)
+
+    msg1 = MessageKeyed(user_id=1, message="Hello")
+    msg2 = MessageKeyed(user_id=2, message="World")
+
+    # The second registration drops the key of the first handle from the cache
+    handle1 = dw.register_instance(msg1)
+    handle2 = dw.register_instance(msg2)
+    dw.write(msg1, handle=handle1)
+    dw.write(msg2, handle=handle2)
+    dw.write(msg2, handle=handle2, timestamp=1)
+
+    # The reader keeps the last sample per instance
+    samples = dr.take(N=10)
+    assert sorted(samples, key=lambda s: s.user_id) == [msg1, msg2]
+    assert {s.sample_info.instance_handle for s in samples if s.user_id == 2} == {handle2}
+    assert dw.lookup_instance(msg2) == handle2
+
+
+def test_writer_write_with_wrong_handle(monkeypatch):
+    dp = DomainParticipant(0)
+    tp = Topic(dp, "MessageKeyed", MessageKeyed)
+    dw = DataWriter(dp, tp)
+
+    msg1 = MessageKeyed(user_id=1, message="Hello")
+    msg2 = MessageKeyed(user_id=2, message="World")
+    handle1 = dw.register_instance(msg1)
+
+    monkeypatch.setattr(DataWriter, "_check_instance_handles", True)
+    dw.write(msg1, handle=handle1)
+    with pytest.raises(ValueError):
+        dw.write(msg2, handle=handle1)
+
+
+@pytest.mark.parametrize("drop", [
+    lambda dw, msg, handle: dw.dispose(msg),
+    lambda dw, msg, handle: dw.dispose(msg, timestamp=1),
+    lambda dw, msg, handle: dw.write_dispose(msg),
+    lambda dw, msg, handle: dw.dispose_instance_handle(handle),
+    lambda dw, msg, handle: dw.dispose_instance_handle(handle, timestamp=1),
+    lambda dw, msg, handle: dw.unregister_instance(msg),
+    lambda dw, msg, handle: dw.unregister_instance(msg, timestamp=1),
+    lambda dw, msg, handle: dw.unregister_instance_handle(handle),
+])
+def test_writer_instance_cache_evicted(drop):
+    dp = DomainParticipant(0)
+    tp = Topic(dp, "MessageKeyed", MessageKeyed)
+    dw = DataWriter(dp, tp)
+
+    msg1 = MessageKeyed(user_id=1, message="Hello")
+    msg2 = MessageKeyed(user_id=2, message="World")
+    handle1, handle2 = dw.register_instances([msg1, msg2])
+    assert dw._cached_key(handle1) is not None
+
+    drop(dw, msg1, handle1)
+    assert dw._cached_key(handle1) is None
+    assert dw._cached_key(handle2) is not None
+
+
+def test_writer_register_instances():
+    dp = DomainParticipant(0)
+    tp = Topic(dp, "MessageKeyed", MessageKeyed)
+    dr = DataReader(dp, tp)
+    dw = DataWriter(dp, tp)
+
+    msgs = [MessageKeyed(user_id=i, message="Hello") for i in range(100)]
+    unknown = MessageKeyed(user_id=1000, message="Hello")
+
+    # Already serialized samples are accepted as well
+    handles = dw.register_instances(msgs[:50] + [m.serialize() for m in msgs[50:]])
+    assert handles == [dw.lookup_instance(m) for m in msgs]
+    assert dw.lookup_instances(msgs + [unknown]) == handles + [None]
+    assert dw.register_instances([]) == []
+
+    dw.write(msgs[7], handle=handles[7])
+    assert dr.take(N=10) == [msgs[7]]
+    assert dr.lookup_instances([msgs[7].serialize(), unknown]) == [dr.lookup_instance(msgs[7]), None]
+
+    with pytest.raises(TypeError):
+        dw.register_instances([Message(message="Hello")])
+
+
+def test_writer_serialize_samples_padded():
+    msg = MessageKeyed(user_id=1, message="Hello")
+    ser = msg.serialize()
+    assert len(ser) % 4 != 0
+
+    # Serialized by the bulk calls or by the caller, the data handed to Cyclone is the same as for a single sample
+    view = msg.__idl__.serialize_view(msg)
+    assert _serialize_samples(MessageKeyed, [msg, ser, bytearray(ser), memoryview(ser)], None) == [bytes(view)] * 4
+
+
+@pytest.mark.parametrize("use_xcdrv2", [False, True])
+@pytest.mark.parametrize("_type,values", [
+    (tc.SingleInt, [0, 1, -1, 2**40]),
+    (tc.SingleString, ["k" * n for n in (0, 12, 13, 120, 128, 129, 140, 1000, 100_000)]),
+])
+def test_writer_instance_keys(_type, values, use_xcdrv2):
+    # Fixed (keyhash is the key) and unbounded (keyhash is an MD5 of it) keys, inline, on the stack and on the heap
+    qos = Qos(Policy.DataRepresentation(use_cdrv0_representation=not use_xcdrv2, use_xcdrv2_representation=use_xcdrv2))
+    dp = DomainParticipant(0)
+    tp = Topic(dp, f"InstanceKeys{_type.__name__}", _type)
+    dr = DataReader(dp, tp, qos=qos)
+    dw = DataWriter(dp, tp, qos=qos)
+
+    samples = [_type(value=value) for value in values]
+    handles = [dw.register_instance(sample) for sample in samples]
+    assert len(set(handles)) == len(samples)
+    assert dw.register_instances(samples) == handles
+
+    for sample, handle in zip(samples, handles):
+        dw.write(sample)
+        dw.write(sample, handle=handle)
+
+    received = dr.take(N=2 * len(samples))
+    assert sorted(received, key=lambda s: values.index(s.value)) == samples
+    assert len({s.sample_info.instance_handle for s in received}) == len(samples)
+    for sample in received:
+        assert dr.lookup_instance(sample) == sample.sample_info.instance_handle
+
+
+def test_writer_releases_pinned_samples(monkeypatch):
+    from cyclonedds.idl._main import IDL
+
+    # The buffers large samples are serialized into are kept by the serdata instead of copied
+    pinned = []
+    hand_off = IDL._hand_off
+
+    def spy(self, view):
+        out = hand_off(self, view)
+        if out.readonly:
+            pinned.append(view.obj)
+        return out
+
+    monkeypatch.setattr(IDL, "_hand_off", spy)
+
+    dp = DomainParticipant(0)
+    tp = Topic(dp, "MessageKeyed", MessageKeyed)
+    dw = DataWriter(dp, tp, qos=Qos(Policy.Reliability.BestEffort))
+
+    # Without readers the serdata is dropped right away, the buffer is released without another write
+    dw.write(MessageKeyed(user_id=1, message="x" * IDL.pin_size))
+    assert len(pinned) == 1
+
+    buffer = pinned.pop()
+    for _ in range(100):
+        try:
+            # Resizing fails for as long as the buffer is exported
+            buffer.append(0)
+            break
+        except BufferError:
+            time.sleep(0.01)
+    else:
+        pytest.fail("The buffer of the written sample was not released")
+
+
 def test_writer_writedispose():
     dp = DomainParticipant(0)
     tp = Topic(dp, "MessageKeyed", MessageKeyed)